@@ -0,0 +1,94 @@
+"""
+基准测试: 派生图像输出编码
+对每种编码器测量编码耗时、解码耗时、每张图像字节数, 并检查往返是否无损,
+用于为各处理阶段选择输出编码 (见 src.data.codecs)
+
+用法:
+    python scripts/benchmarks/benchmark_codecs.py --images data/yolo_dataset/images/train --limit 500
+    python scripts/benchmarks/benchmark_codecs.py --codecs png:1 png:6 png:9 webp npy jpg:95
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.codecs import get_codec
+from src.data.image_store import list_image_files
+
+
+DEFAULT_CODECS = ['png:1', 'png:3', 'png:6', 'png:9', 'webp', 'npy', 'jpg:95']
+
+
+def benchmark_codec(codec, images):
+    """
+    对一组解码后的图像测量编解码
+
+    Returns:
+        result: {'encode_ms', 'decode_ms', 'bytes', 'lossless'}, 耗时和字节数均为每张图像的平均值
+    """
+    start = time.perf_counter()
+    encoded = [codec.encode(image) for image in images]
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = [codec.decode(data) for data in encoded]
+    decode_time = time.perf_counter() - start
+
+    n = len(images)
+    return {
+        'encode_ms': encode_time / n * 1000,
+        'decode_ms': decode_time / n * 1000,
+        'bytes': sum(len(data) for data in encoded) / n,
+        'lossless': all(np.array_equal(a, b) for a, b in zip(images, decoded)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='派生图像输出编码基准测试')
+    parser.add_argument('--images', default='data/yolo_dataset/images/train', help='样本图像目录')
+    parser.add_argument('--limit', type=int, default=500, help='最多使用的图像数')
+    parser.add_argument('--codecs', nargs='+', default=DEFAULT_CODECS, help='需要比较的编码器')
+    args = parser.parse_args()
+
+    images_dir = Path(args.images)
+
+    print("=" * 70)
+    print("🗜️  输出编码基准测试")
+    print("=" * 70)
+
+    if not images_dir.exists():
+        print(f"❌ 图像目录不存在: {images_dir}")
+        sys.exit(1)
+
+    image_files = list_image_files(images_dir)[:args.limit]
+    images = [img for img in (cv2.imread(str(f)) for f in image_files) if img is not None]
+    if not images:
+        print(f"❌ 未找到图像: {images_dir}")
+        sys.exit(1)
+
+    raw_bytes = sum(img.nbytes for img in images) / len(images)
+    print(f"\n样本: {images_dir} ({len(images)} 张, 平均原始像素 {raw_bytes / 1024:.1f} KB)")
+
+    print("\n" + "-" * 70)
+    print(f"{'编码器':<10} {'编码(ms)':>10} {'解码(ms)':>10} {'KB/张':>10} {'压缩比':>8} {'无损':>6}")
+    print("-" * 70)
+    for spec in args.codecs:
+        codec = get_codec(spec)
+        result = benchmark_codec(codec, images)
+        ratio = raw_bytes / result['bytes'] if result['bytes'] else 0.0
+        print(f"{codec.spec:<10} {result['encode_ms']:>10.2f} {result['decode_ms']:>10.2f} "
+              f"{result['bytes'] / 1024:>10.1f} {ratio:>7.1f}x {'✓' if result['lossless'] else '✗':>6}")
+    print("-" * 70)
+    print("\n提示: npy 只适合阶段间的中间结果 (ultralytics 无法直接读取); "
+          "训练用数据集请选择 png/webp")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+基准测试: CPU 性能配置
+在合成数据上逐项叠加 (线程 -> channels_last -> bf16 -> torch.compile) 比较训练单步和单张推理耗时,
+并可在真实验证集上检查该配置与 fp32 的 mAP 是否一致 (见 src/training/cpu_profile.py)
+
+用法:
+    # 单步耗时
+    python scripts/benchmarks/benchmark_cpu_profile.py --weights yolov8n.pt --batch 16 --imgsz 640
+
+    # 加上 torch.compile, 并用训练好的模型检查精度一致性
+    python scripts/benchmarks/benchmark_cpu_profile.py --weights experiments/exp1_baseline/run/weights/best.pt \\
+        --compile --parity --data configs/exp1_baseline.yaml
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.training.cpu_profile import PARITY_TOLERANCE, CPUProfile, bf16_supported, physical_cores
+from src.training.scheduler import available_cores
+
+
+def build_variants(profile, include_bf16, include_compile):
+    """从 PyTorch 默认设置开始逐项叠加"""
+    variants = {
+        'pytorch 默认': CPUProfile(threads=len(available_cores()), interop_threads=len(available_cores()),
+                                 channels_last=False),
+        '+线程': CPUProfile(profile.threads, profile.interop_threads, channels_last=False),
+        '+channels_last': CPUProfile(profile.threads, profile.interop_threads, channels_last=True),
+    }
+    if include_bf16:
+        variants['+bf16'] = CPUProfile(profile.threads, profile.interop_threads, bf16=True, channels_last=True)
+    if include_compile:
+        variants['+compile'] = CPUProfile(profile.threads, profile.interop_threads, bf16=include_bf16,
+                                          channels_last=True, compile=True)
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU 性能配置基准测试')
+    parser.add_argument('--weights', default='yolov8n.pt', help='模型权重')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸')
+    parser.add_argument('--batch', type=int, default=16, help='训练批次大小')
+    parser.add_argument('--steps', type=int, default=10, help='每个配置计时的步数')
+    parser.add_argument('--workers', type=int, default=0, help='训练时的 dataloader worker 数 (从线程数中扣除)')
+    parser.add_argument('--bf16', action=argparse.BooleanOptionalAction, default=None,
+                        help='是否测试 bf16 (默认 CPU 原生支持时测试)')
+    parser.add_argument('--compile', action='store_true', help='同时测试 torch.compile (编译耗时不计入)')
+    parser.add_argument('--parity', action='store_true', help='在验证集上比较 fp32 与完整配置的 mAP')
+    parser.add_argument('--data', default=None, help='精度检查所用的数据集配置 (虚拟数据集配置也可以)')
+    parser.add_argument('--split', default='val', help='精度检查所用的划分')
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE, help='允许的 mAP50-95 下降')
+    parser.add_argument('--output-json', default=None, help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    include_bf16 = bf16_supported() if args.bf16 is None else args.bf16
+    profile = CPUProfile.detect(workers=args.workers, bf16=include_bf16, compile=args.compile)
+    profile.apply_env()  # 导入 torch 之前
+
+    print("=" * 70)
+    print("⚙️  CPU 性能配置基准测试")
+    print("=" * 70)
+    print(f"\n可用逻辑核 {len(available_cores())}, 物理核 {physical_cores()}, "
+          f"原生 bf16: {'是' if bf16_supported() else '否'}")
+    print(f"推荐配置: {profile}")
+
+    print(f"\n📊 单步耗时 ({args.weights}, batch={args.batch}, imgsz={args.imgsz}, 合成数据)")
+    from src.training.cpu_profile import benchmark_steps, format_benchmark, parity_check
+
+    rows = benchmark_steps(args.weights, build_variants(profile, include_bf16, args.compile),
+                           imgsz=args.imgsz, batch=args.batch, steps=args.steps)
+    print(format_benchmark(rows))
+    report = {'profile': profile.as_dict(), 'benchmark': rows}
+
+    if args.parity:
+        if not args.data or not Path(args.data).exists():
+            print(f"\n❌ 错误: 精度检查需要存在的 --data: {args.data}")
+            sys.exit(1)
+        import yaml
+
+        data, validator = args.data, None
+        with open(args.data, 'r', encoding='utf-8') as f:
+            if 'transforms' in (yaml.safe_load(f) or {}):
+                from src.data.virtual_dataset import VirtualDataset, load_virtual_config
+                from src.data.yolo_adapter import build_validator
+
+                data, dataset_kwargs = load_virtual_config(args.data)
+                validator = build_validator(VirtualDataset, **dataset_kwargs)
+
+        print(f"\n🎯 精度一致性 ({args.data}, {args.split})")
+        parity = parity_check(args.weights, data, profile, imgsz=args.imgsz, split=args.split,
+                              validator=validator, tolerance=args.tolerance)
+        print(f"  fp32:     mAP50 {parity['fp32']['mAP50']:.4f}, mAP50-95 {parity['fp32']['mAP50-95']:.4f}")
+        print(f"  配置:     mAP50 {parity['profile']['mAP50']:.4f}, mAP50-95 {parity['profile']['mAP50-95']:.4f}")
+        print(f"  {'✅' if parity['passed'] else '❌'} mAP50-95 差异 {parity['delta_mAP50-95']:+.4f} "
+              f"(允许下降 {args.tolerance})")
+        report['parity'] = parity
+
+    if args.output_json:
+        output = Path(args.output_json)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output.with_name(output.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, output)
+        print(f"\n📄 结果: {output}")
+    if args.parity and not report['parity']['passed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
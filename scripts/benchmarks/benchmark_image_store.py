@@ -0,0 +1,109 @@
+"""
+基准测试: 打包图像存储 vs 逐个 PNG 解码
+对比读取整个数据划分所需的时间
+
+用法:
+    python scripts/benchmarks/benchmark_image_store.py --dataset data/yolo_dataset --split train
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.image_store import PackedImageStore, list_image_files, pack_image_dir
+
+
+def read_with_cv2(image_files):
+    """用 cv2.imread 逐个解码, 返回 (耗时, 像素字节数)"""
+    start = time.perf_counter()
+    total = 0
+    for img_file in image_files:
+        image = cv2.imread(str(img_file))
+        if image is not None:
+            total += image.nbytes
+    return time.perf_counter() - start, total
+
+
+def read_with_pil(image_files):
+    """用 PIL.Image.open 逐个解码"""
+    start = time.perf_counter()
+    total = 0
+    for img_file in image_files:
+        with Image.open(img_file) as img:
+            total += np.asarray(img).nbytes
+    return time.perf_counter() - start, total
+
+
+def read_with_store(store):
+    """遍历打包存储; 复制一份以确保每个像素页都被真正读入"""
+    start = time.perf_counter()
+    total = 0
+    for _, image in store:
+        total += np.array(image).nbytes
+    return time.perf_counter() - start, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='打包图像存储读取基准测试')
+    parser.add_argument('--dataset', default='data/yolo_dataset', help='YOLO 格式数据集根目录')
+    parser.add_argument('--split', default='train', help='数据划分')
+    parser.add_argument('--store', default=None, help='存储目录 (默认 <dataset>/store)')
+    parser.add_argument('--repeat', type=int, default=2, help='重复次数 (取最快一次)')
+    args = parser.parse_args()
+
+    dataset = Path(args.dataset)
+    images_dir = dataset / 'images' / args.split
+    store_root = Path(args.store) if args.store else dataset / 'store'
+
+    print("=" * 60)
+    print("📦 打包图像存储基准测试")
+    print("=" * 60)
+
+    if not images_dir.exists():
+        print(f"❌ 图像目录不存在: {images_dir}")
+        sys.exit(1)
+
+    image_files = list_image_files(images_dir)
+    print(f"\n图像目录: {images_dir} ({len(image_files)} 张)")
+
+    if args.split not in PackedImageStore.available_splits(store_root):
+        print(f"\n存储不存在，开始打包: {store_root}")
+        start = time.perf_counter()
+        pack_image_dir(images_dir, store_root, args.split)
+        print(f"✅ 打包耗时: {time.perf_counter() - start:.2f} 秒")
+
+    store = PackedImageStore(store_root, args.split)
+    png_bytes = sum(f.stat().st_size for f in image_files)
+    print(f"PNG 文件总大小: {png_bytes / 1024 / 1024:.1f} MB")
+    print(f"存储像素大小:   {store.nbytes / 1024 / 1024:.1f} MB")
+
+    results = {}
+    for name, fn in [
+        ('cv2.imread', lambda: read_with_cv2(image_files)),
+        ('PIL.Image.open', lambda: read_with_pil(image_files)),
+        ('PackedImageStore', lambda: read_with_store(store)),
+    ]:
+        best = min(fn()[0] for _ in range(args.repeat))
+        results[name] = best
+
+    print("\n" + "-" * 60)
+    print(f"{'读取方式':<20} {'耗时(秒)':>10} {'图像/秒':>12} {'加速比':>8}")
+    print("-" * 60)
+    baseline = results['cv2.imread']
+    for name, seconds in results.items():
+        rate = len(image_files) / seconds if seconds > 0 else float('inf')
+        speedup = baseline / seconds if seconds > 0 else float('inf')
+        print(f"{name:<20} {seconds:>10.3f} {rate:>12.0f} {speedup:>7.1f}x")
+    print("-" * 60)
+
+
+if __name__ == '__main__':
+    main()
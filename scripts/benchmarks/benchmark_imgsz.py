@@ -0,0 +1,127 @@
+"""
+基准测试: 按数据集分辨率选择 imgsz
+先分析图像尺寸分布并给出推荐值 (见 src/data/size_analysis.py),
+再对每个候选 imgsz 做短时训练, 比较每轮耗时和 mAP
+
+用法:
+    # 只分析, 不训练
+    python scripts/benchmarks/benchmark_imgsz.py --dataset data/baseline_lowlight_dataset --analyze-only
+
+    # 直接读取 GTSRB 标注 CSV 的 Width/Height
+    python scripts/benchmarks/benchmark_imgsz.py --csv path/to/GTSRB --analyze-only
+
+    # 对候选尺寸各训练 2 轮 (使用 20% 训练数据)
+    python scripts/benchmarks/benchmark_imgsz.py --data configs/exp1_baseline.yaml \\
+        --candidates 96 128 160 640 --epochs 2 --fraction 0.2
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.size_analysis import format_candidates, recommend_imgsz, sizes_from_csv, sizes_from_dir
+
+
+def train_candidate(data, imgsz, rect, epochs, fraction, batch, device, workers, model_path):
+    """训练一个候选尺寸, 返回 (每轮秒数, mAP50, mAP50-95)"""
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    start = time.perf_counter()
+    results = model.train(
+        data=data,
+        epochs=epochs,
+        imgsz=imgsz,
+        rect=rect,
+        batch=batch,
+        fraction=fraction,
+        device=device,
+        workers=workers,
+        project='experiments/imgsz_benchmark',
+        name=f'imgsz{imgsz}',
+        exist_ok=True,
+        plots=False,
+        verbose=False,
+        amp=False,
+    )
+    elapsed = time.perf_counter() - start
+    metrics = results.results_dict
+    return elapsed / epochs, metrics.get('metrics/mAP50(B)', 0.0), metrics.get('metrics/mAP50-95(B)', 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='imgsz 选择与基准测试')
+    parser.add_argument('--data', default='configs/exp1_baseline.yaml', help='数据集配置 (训练用)')
+    parser.add_argument('--dataset', default=None, help='数据集根目录 (默认取配置中的 path)')
+    parser.add_argument('--csv', default=None, help='GTSRB 根目录或 CSV, 从标注读取尺寸而不扫描图像')
+    parser.add_argument('--candidates', type=int, nargs='+', default=None, help='需要训练比较的 imgsz')
+    parser.add_argument('--percentile', type=float, default=95, help='至少这个百分比的图像不被缩小')
+    parser.add_argument('--batch', type=int, default=16, help='批次大小')
+    parser.add_argument('--epochs', type=int, default=1, help='每个候选训练的轮数')
+    parser.add_argument('--fraction', type=float, default=0.2, help='使用的训练数据比例')
+    parser.add_argument('--device', default='0', help='设备 (0 / cpu)')
+    parser.add_argument('--workers', type=int, default=2, help='数据加载进程数')
+    parser.add_argument('--model', default='yolov8n.pt', help='初始权重')
+    parser.add_argument('--analyze-only', action='store_true', help='只分析尺寸分布')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("📐 imgsz 分析")
+    print("=" * 70)
+
+    if args.csv:
+        sizes = sizes_from_csv(args.csv)
+        source = args.csv
+    else:
+        dataset = Path(args.dataset) if args.dataset else None
+        if dataset is None:
+            with open(args.data, 'r', encoding='utf-8') as f:
+                dataset = Path(yaml.safe_load(f)['path'])
+        images_dir = dataset / 'images' / 'train'
+        if not images_dir.exists():
+            print(f"❌ 图像目录不存在: {images_dir}")
+            sys.exit(1)
+        sizes = sizes_from_dir(images_dir)
+        source = images_dir
+
+    choice = recommend_imgsz(sizes, percentile=args.percentile, batch=args.batch)
+    summary = choice['summary']
+    print(f"\n来源: {source} ({summary['count']} 张)")
+    print("长边分位数: " + ', '.join(f"{k}={v:.0f}" for k, v in summary['long_side'].items()))
+    print(f"宽高比范围: {summary['aspect_ratio'][0]:.2f} - {summary['aspect_ratio'][1]:.2f}\n")
+    print(format_candidates(choice))
+    print(f"\n推荐: imgsz={choice['imgsz']}, rect={choice['rect']}")
+
+    if args.analyze_only:
+        return
+
+    candidates = args.candidates or sorted({choice['imgsz'], 640})
+    print("\n" + "=" * 70)
+    print(f"📊 训练基准 (每个候选 {args.epochs} 轮, {args.fraction:.0%} 训练数据)")
+    print("=" * 70)
+
+    rows = []
+    for imgsz in candidates:
+        print(f"\n▶ imgsz={imgsz}")
+        seconds, map50, map50_95 = train_candidate(
+            args.data, imgsz, choice['rect'], args.epochs, args.fraction,
+            args.batch, args.device, args.workers, args.model)
+        rows.append((imgsz, seconds, map50, map50_95))
+
+    print("\n" + "-" * 70)
+    print(f"{'imgsz':>6} {'每轮(秒)':>10} {'加速比':>8} {'mAP50':>8} {'mAP50-95':>10}")
+    print("-" * 70)
+    slowest = max(r[1] for r in rows)
+    for imgsz, seconds, map50, map50_95 in rows:
+        print(f"{imgsz:>6} {seconds:>10.1f} {slowest / seconds:>7.1f}x {map50:>8.4f} {map50_95:>10.4f}")
+    print("-" * 70)
+
+
+if __name__ == '__main__':
+    main()
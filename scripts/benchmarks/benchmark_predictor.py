@@ -0,0 +1,215 @@
+"""
+基准测试: 常驻数组推理器
+在同一批测试图像上比较每张图像的耗时:
+
+- YOLO.predict(路径):   原来 detector.predict 的做法 (每次经过数据源加载并重新读盘)
+- YOLO.predict(数组):   已解码的数组, 仍逐张构造 Results
+- FramePredictor 单张 / 批量: src.models.predictor
+- FramePredictor 单目标: 不做 NMS, 直接取最高分候选 (single_object=True)
+- 裸前向:               同尺寸的张量直接送入网络 (下限)
+
+同时检查 FramePredictor 与 YOLO.predict 的检测结果是否一致 (最高分检测的类别和框);
+给出 --data 时在该划分上比较 NMS 与单目标解码的 mAP (见 compare_decoders).
+
+用法:
+    python scripts/benchmarks/benchmark_predictor.py --weights experiments/exp1_baseline/run/weights/best.pt \\
+        --images yolo_dataset/images/test --num 200 --batch 16 --device cpu
+
+    # 加上单目标解码在测试集上的 mAP 检查
+    python scripts/benchmarks/benchmark_predictor.py --weights experiments/exp1_baseline/run/weights/best.pt \\
+        --images yolo_dataset/images/test --data configs/exp1_baseline.yaml --split test
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.image_store import list_image_files
+
+
+def _per_image_ms(fn, items, repeats):
+    """重复 repeats 轮, 取每张图像耗时的中位数 (毫秒)"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(items)
+        times.append((time.perf_counter() - start) / len(items))
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def _top_box(boxes, classes, scores):
+    """最高分检测 (类别, 框); 没有检测时为 None"""
+    if not len(scores):
+        return None
+    i = int(np.argmax(scores))
+    return int(classes[i]), np.asarray(boxes[i], dtype=np.float32)
+
+
+def _same_top(a, b):
+    """两个 Detections 的最高分检测是否为同一类别且框 IoU >= 0.9"""
+    ta, tb = _top_box(a.boxes, a.classes, a.scores), _top_box(b.boxes, b.classes, b.scores)
+    if ta is None or tb is None:
+        return ta is None and tb is None
+    return ta[0] == tb[0] and _iou(ta[1], tb[1]) >= 0.9
+
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻数组推理器基准测试')
+    parser.add_argument('--weights', required=True, help='模型权重')
+    parser.add_argument('--images', required=True, help='测试图像目录')
+    parser.add_argument('--num', type=int, default=200, help='使用的图像数')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸')
+    parser.add_argument('--batch', type=int, default=16, help='批量推理的批次大小')
+    parser.add_argument('--device', default='', help="推理设备 ('' 为自动选择)")
+    parser.add_argument('--conf', type=float, default=0.25, help='置信度阈值')
+    parser.add_argument('--repeats', type=int, default=3, help='每种方式重复的轮数 (取中位数)')
+    parser.add_argument('--data', default=None, help='比较两种解码 mAP 所用的数据集配置 (虚拟数据集配置也可以)')
+    parser.add_argument('--split', default='test', help='mAP 比较所用的划分')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='单目标解码允许的 mAP50-95 下降')
+    parser.add_argument('--output-json', default=None, help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    image_files = list_image_files(args.images)[:args.num]
+    if not image_files:
+        print(f"❌ 错误: 目录中没有图像: {args.images}")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("⏱️  常驻数组推理器基准测试")
+    print("=" * 70)
+    print(f"\n{len(image_files)} 张图像, imgsz={args.imgsz}, batch={args.batch}, 设备 '{args.device or 'auto'}'")
+
+    import torch
+    from ultralytics import YOLO
+    from src.models.predictor import FramePredictor, compare_decoders
+
+    frames = [cv2.imread(str(p)) for p in image_files]
+    paths = [str(p) for p in image_files]
+    model = YOLO(args.weights)
+    common = {'imgsz': args.imgsz, 'conf': args.conf, 'device': args.device, 'verbose': False}
+
+    def predict_paths(items):
+        return [model.predict(source=p, **common)[0] for p in items]
+
+    def predict_arrays(items):
+        return [model.predict(source=f, **common)[0] for f in items]
+
+    single = FramePredictor(args.weights, imgsz=args.imgsz, device=args.device, batch=1, conf=args.conf)
+    batched = FramePredictor(args.weights, imgsz=args.imgsz, device=args.device, batch=args.batch,
+                             conf=args.conf)
+
+    def single_object(items):
+        return batched.predict(items, single_object=True)
+
+    def bare_forward(items):
+        im = torch.zeros(min(args.batch, len(items)), 3, args.imgsz, args.imgsz, device=batched.device)
+        with torch.inference_mode():
+            for i in range(0, len(items), args.batch):
+                batched.backend(im[:len(items[i:i + args.batch])])
+
+    predict_paths(paths[:2])  # 预热 ultralytics 的推理器
+    rows = [
+        ('YOLO.predict(路径)', _per_image_ms(predict_paths, paths, args.repeats)),
+        ('YOLO.predict(数组)', _per_image_ms(predict_arrays, frames, args.repeats)),
+        ('FramePredictor batch=1', _per_image_ms(single.predict, frames, args.repeats)),
+        (f'FramePredictor batch={args.batch}', _per_image_ms(batched.predict, frames, args.repeats)),
+        (f'FramePredictor batch={args.batch} 单目标', _per_image_ms(single_object, frames, args.repeats)),
+        (f'裸前向 batch={args.batch}', _per_image_ms(bare_forward, frames, args.repeats)),
+    ]
+
+    print(f"\n  {'方式':<28} {'毫秒/张':>10} {'相对路径方式':>12}")
+    for name, ms in rows:
+        print(f"  {name:<28} {ms:>10.2f} {rows[0][1] / ms:>11.2f}x")
+
+    batched.reset_timing()
+    detections = batched.predict(frames)
+    timing = batched.timing()
+    batched.reset_timing()
+    single_detections = single_object(frames)
+    single_timing = batched.timing()
+    print(f"\n  FramePredictor 分阶段 (毫秒/张): 预处理 {timing['preprocess_ms']:.2f}, "
+          f"前向 {timing['forward_ms']:.2f}, 后处理 {timing['postprocess_ms']:.2f} "
+          f"(单目标解码 {single_timing['postprocess_ms']:.3f})")
+    same_top = sum(_same_top(a, b) for a, b in zip(detections, single_detections))
+    print(f"  单目标解码与 NMS 最高分检测一致: {same_top}/{len(frames)}")
+
+    # 一致性: 最高分检测的类别相同且框 IoU >= 0.9
+    matched, compared = 0, 0
+    for result, det in zip(predict_arrays(frames), detections):
+        ref = _top_box(result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy(),
+                       result.boxes.conf.cpu().numpy())
+        ours = _top_box(det.boxes, det.classes, det.scores)
+        if ref is None and ours is None:
+            continue
+        compared += 1
+        if ref is not None and ours is not None and ref[0] == ours[0] and _iou(ref[1], ours[1]) >= 0.9:
+            matched += 1
+    agreement = matched / compared if compared else 1.0
+    print(f"  与 YOLO.predict 一致: {matched}/{compared} ({agreement:.1%})")
+    print("  (YOLO.predict 单张时使用最小矩形填充, 个别低分检测可能因此不同)")
+
+    report = {
+        'images': len(frames), 'imgsz': args.imgsz, 'batch': args.batch,
+        'per_image_ms': {name: round(ms, 3) for name, ms in rows},
+        'stages_ms': timing, 'single_object_stages_ms': single_timing, 'agreement': round(agreement, 4),
+        'single_object_same_top': same_top,
+    }
+
+    passed = True
+    if args.data:
+        if not Path(args.data).exists():
+            print(f"\n❌ 错误: 数据集配置不存在: {args.data}")
+            sys.exit(1)
+        import yaml
+
+        data, validator = args.data, None
+        with open(args.data, 'r', encoding='utf-8') as f:
+            if 'transforms' in (yaml.safe_load(f) or {}):
+                from src.data.virtual_dataset import VirtualDataset, load_virtual_config
+                from src.data.yolo_adapter import build_validator
+
+                data, dataset_kwargs = load_virtual_config(args.data)
+                validator = build_validator(VirtualDataset, **dataset_kwargs)
+
+        print(f"\n🎯 解码方式比较 ({args.data}, {args.split})")
+        comparison = compare_decoders(args.weights, data, split=args.split, imgsz=args.imgsz, device=args.device,
+                                      validator=validator)
+        for key, name in (('nms', 'NMS'), ('single_object', '单目标')):
+            row = comparison[key]
+            print(f"  {name:<6} mAP50 {row['mAP50']:.4f}, mAP50-95 {row['mAP50-95']:.4f}, "
+                  f"后处理 {row['postprocess_ms']:.3f} 毫秒/张")
+        passed = comparison['delta_mAP50-95'] >= -args.tolerance
+        print(f"  {'✅' if passed else '❌'} mAP50-95 差异 {comparison['delta_mAP50-95']:+.4f} "
+              f"(允许下降 {args.tolerance}), 后处理加速 {comparison['postprocess_speedup']}x")
+        report['decoders'] = comparison
+    if args.output_json:
+        output = Path(args.output_json)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output.with_name(output.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, output)
+        print(f"\n📄 结果: {output}")
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+基准测试: 本地推理服务
+以不同的并发数向 scripts/inference/serve.py 启动的服务发送检测请求, 比较吞吐量、客户端看到的
+p50 / p95 / p99 延迟和服务端的平均批次大小, 用来选择 --batch / --max-wait-ms 以满足延迟目标.
+
+用法:
+    python scripts/inference/serve.py --weights best.pt --port 8000 &
+    python scripts/benchmarks/benchmark_server.py --url http://127.0.0.1:8000 \\
+        --images yolo_dataset/images/test --concurrency 1,4,16 --requests 200 --method traditional
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.image_store import list_image_files
+
+
+def _get_json(url, path):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    try:
+        conn.request('GET', path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def run_level(url, bodies, concurrency, requests, query):
+    """
+    以 concurrency 个并发客户端 (各自保持 keep-alive 连接) 发送 requests 个请求
+
+    Returns:
+        {'concurrency', 'requests', 'errors', 'throughput', 'latency_ms': {'p50', 'p95', 'p99'}}
+    """
+    parts = urlsplit(url)
+    local = threading.local()
+    latencies, errors = [], []
+
+    def _send(i):
+        if not hasattr(local, 'conn'):
+            local.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        body = bodies[i % len(bodies)]
+        start = time.perf_counter()
+        try:
+            local.conn.request('POST', f'/detect?{query}', body=body,
+                               headers={'Content-Type': 'application/octet-stream'})
+            response = local.conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                return
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            local.conn.close()
+            del local.conn
+            return
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_send, range(requests)))
+    seconds = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (np.nan,) * 3
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': len(errors),
+        'throughput': round(len(latencies) / seconds, 1),
+        'latency_ms': {'p50': round(float(p50), 2), 'p95': round(float(p95), 2), 'p99': round(float(p99), 2)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地推理服务基准测试')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='服务地址')
+    parser.add_argument('--images', required=True, help='测试图像目录 (读取原始字节作为请求体)')
+    parser.add_argument('--num-images', type=int, default=64, help='循环使用的图像数')
+    parser.add_argument('--concurrency', default='1,4,16', help='并发数 (逗号分隔)')
+    parser.add_argument('--requests', type=int, default=200, help='每个并发数发送的请求数')
+    parser.add_argument('--method', default=None, help='增强方法 (默认使用服务端默认值)')
+    parser.add_argument('--conf', type=float, default=None, help='置信度阈值')
+    parser.add_argument('--single-object', action='store_true', help='单目标快速解码')
+    parser.add_argument('--slo-ms', type=float, default=None, help='p95 延迟目标; 标出满足目标的最大并发数')
+    parser.add_argument('--output-json', default=None, help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    image_files = list_image_files(args.images)[:args.num_images]
+    if not image_files:
+        print(f"❌ 错误: 目录中没有图像: {args.images}")
+        sys.exit(1)
+    bodies = [path.read_bytes() for path in image_files]
+    query = '&'.join(f'{k}={v}' for k, v in (('method', args.method), ('conf', args.conf),
+                                             ('single_object', 1 if args.single_object else None))
+                     if v is not None)
+
+    print("=" * 70)
+    print("🌐 本地推理服务基准测试")
+    print("=" * 70)
+    try:
+        health = _get_json(args.url, '/health')
+    except OSError as e:
+        print(f"❌ 无法连接服务 {args.url}: {e}")
+        sys.exit(1)
+    print(f"\n服务: {args.url}, max_batch={health['max_batch']}, max_wait={health['max_wait_ms']} ms, "
+          f"请求参数: {query or '(默认)'}")
+
+    rows = []
+    for concurrency in (int(c) for c in args.concurrency.split(',')):
+        before = _get_json(args.url, '/metrics')
+        row = run_level(args.url, bodies, concurrency, args.requests, query)
+        after = _get_json(args.url, '/metrics')
+        batches = after['batches'] - before['batches']
+        images = after['requests'] - before['requests']
+        row['server_mean_batch'] = round(images / batches, 2) if batches else None
+        row['server_max_queue_depth'] = after['queue_depth']['max']
+        rows.append(row)
+
+    print(f"\n  {'并发':>4} {'吞吐(张/秒)':>11} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'平均批次':>8} {'错误':>4}")
+    for row in rows:
+        latency = row['latency_ms']
+        mark = ''
+        if args.slo_ms is not None:
+            mark = ' ✅' if latency['p95'] <= args.slo_ms else ' ❌'
+        print(f"  {row['concurrency']:>4} {row['throughput']:>11.1f} {latency['p50']:>9.2f} {latency['p95']:>9.2f} "
+              f"{latency['p99']:>9.2f} {row['server_mean_batch'] or 0:>8.2f} {row['errors']:>4}{mark}")
+    if args.slo_ms is not None:
+        ok = [row['concurrency'] for row in rows if row['latency_ms']['p95'] <= args.slo_ms]
+        print(f"\n  p95 <= {args.slo_ms} ms 的最大并发数: {max(ok) if ok else '无'}")
+
+    if args.output_json:
+        output = Path(args.output_json)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output.with_name(output.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url, 'query': query, 'levels': rows}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, output)
+        print(f"\n📄 结果: {output}")
+
+
+if __name__ == '__main__':
+    main()
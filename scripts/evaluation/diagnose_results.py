@@ -3,9 +3,15 @@
 """
 
 from pathlib import Path
+import sys
 import pandas as pd
 import yaml
 
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.perceptual_hash import DEFAULT_RADIUS, build_hash_index, find_cross_split_duplicates
+
 def check_dataset_split():
     """检查数据集划分是否正确"""
     print("\n" + "=" * 70)
@@ -57,7 +63,32 @@ def check_dataset_split():
     else:
         print("✅ 训练集和验证集无重叠")
     
-    return splits, len(overlap) > 0
+    # 文件名不同但内容几乎相同的图像（同一 track 的相邻帧）
+    print(f"\n检查近重复图像（感知哈希，汉明距离 ≤ {DEFAULT_RADIUS}）...")
+    index = build_hash_index(dataset_path)
+    dups = find_cross_split_duplicates(index, reference='train', queries=('val', 'test'))
+    
+    has_leakage = False
+    for split in ['val', 'test']:
+        total = splits[split]['images']
+        if total == 0:
+            continue
+        mask = dups['split'] == split
+        leaked = len(set(dups['query'][mask]))
+        ratio = leaked / total * 100
+        if leaked:
+            has_leakage = True
+            print(f"❌ {split} 集中 {leaked}/{total} 张 ({ratio:.1f}%) 与训练集近重复！")
+            for query, ref, dist in list(zip(dups['query'][mask], dups['reference'][mask], dups['distance'][mask]))[:5]:
+                print(f"   {query} ≈ train/{ref} (距离 {dist})")
+        else:
+            print(f"✅ {split} 集与训练集无近重复")
+    
+    if has_leakage:
+        print("   GTSRB 同一标志的连续帧被随机分到不同集合，验证指标会虚高")
+        print("   建议按 track 划分训练集和验证集")
+    
+    return splits, len(overlap) > 0 or has_leakage
 
 def check_training_results():
     """检查训练结果"""
@@ -222,7 +253,7 @@ def main():
     issues = []
     
     if has_overlap:
-        issues.append("❌ 严重：训练集和验证集有重叠")
+        issues.append("❌ 严重：训练集和验证/测试集有重叠或近重复")
     
     if df is not None:
         final_map = df.iloc[-1]['metrics/mAP50(B)']
@@ -0,0 +1,136 @@
+"""
+批量推理
+对一个图像目录 (递归) 或图像列表文件做检测, 每张图像写一行 JSONL (框、类别、置信度、耗时、增强 / 解码方式),
+不打开任何窗口. 路径流式枚举, 后台线程解码和增强, 批量前向, 内存占用与输入规模无关
+(见 src/models/batch_inference.py).
+
+用法:
+    # 单进程
+    python scripts/inference/batch_predict.py --weights experiments/exp1_baseline/run/weights/best.pt \\
+        --source yolo_dataset/images/test --output experiments/predictions/test.jsonl --enhance traditional
+
+    # 4 个进程各处理一个分片, 完成后合并为一个文件
+    python scripts/inference/batch_predict.py --weights best.pt --source /data/frames --output preds.jsonl \\
+        --processes 4 --device cpu
+
+    # 手动分片 (如分布在多台机器上): 每个进程写 preds.<i>-of-<n>.jsonl
+    python scripts/inference/batch_predict.py --weights best.pt --source list.txt --output preds.jsonl \\
+        --shard 0 --num-shards 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.models.batch_inference import ENHANCE_METHODS, merge_outputs, shard_output_path
+
+
+def launch_shards(argv, processes, output):
+    """
+    以子进程运行 processes 个分片, 每个子进程分到均等的 CPU 线程; 全部成功后合并输出
+
+    Returns:
+        子进程中非零的退出码 (全部成功时为 0)
+    """
+    from src.training.scheduler import THREAD_ENV_VARS, available_cores
+
+    threads = max(1, len(available_cores()) // processes)
+    children = []
+    for shard in range(processes):
+        env = dict(os.environ, **{var: str(threads) for var in THREAD_ENV_VARS})
+        cmd = [sys.executable, __file__, *argv, '--shard', str(shard), '--num-shards', str(processes),
+               '--processes', '1', '--no-progress']
+        children.append(subprocess.Popen(cmd, env=env, stdin=subprocess.DEVNULL))
+    print(f"🚀 已启动 {processes} 个分片进程 (每个 {threads} 个线程)")
+
+    codes = [child.wait() for child in children]
+    failed = [code for code in codes if code != 0]
+    if failed:
+        print(f"❌ {len(failed)} 个分片失败, 保留已完成的分片文件")
+        return failed[0]
+
+    shard_files = [shard_output_path(output, shard, processes) for shard in range(processes)]
+    merge_outputs(shard_files, output)
+    summaries = [Path(f"{path}.summary.json") for path in shard_files]
+    total = {'images': 0, 'failed': 0, 'detections': 0}
+    enhance_routes = {}
+    for path in summaries:
+        with open(path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        for key in total:
+            total[key] += summary[key]
+        for route, count in summary.get('enhance_routes', {}).items():
+            enhance_routes[route] = enhance_routes.get(route, 0) + count
+        path.unlink()
+    print(f"\n✅ 已合并 {processes} 个分片: {output}")
+    print(f"  图像 {total['images']} 张 (无法读取 {total['failed']}), 检测 {total['detections']} 个")
+    if enhance_routes:
+        print(f"  实际增强: {', '.join(f'{k} {v} 张' for k, v in enhance_routes.items())}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='目录级批量推理 (JSONL 输出)')
+    parser.add_argument('--weights', required=True, help='模型权重')
+    parser.add_argument('--source', required=True, help='图像目录 (递归)、单张图像或图像列表 .txt')
+    parser.add_argument('--output', required=True, help='输出 JSONL')
+    parser.add_argument('--enhance', choices=ENHANCE_METHODS, default='none', help='推理前的增强方法')
+    parser.add_argument('--enlightengan-weights', default='weights/enlightengan.onnx',
+                        help='EnlightenGAN ONNX 模型 (不可用时退回传统方法)')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸')
+    parser.add_argument('--batch', type=int, default=32, help='每次前向的图像数')
+    parser.add_argument('--device', default='', help="推理设备 ('' 为自动选择)")
+    parser.add_argument('--conf', type=float, default=0.25, help='置信度阈值')
+    parser.add_argument('--iou', type=float, default=0.7, help='NMS IoU 阈值')
+    parser.add_argument('--single-object', action='store_true',
+                        help='单目标快速解码: 不做 NMS, 每张图像只保留得分最高的候选 (GTSRB 裁剪图)')
+    parser.add_argument('--workers', type=int, default=4, help='解码 / 增强线程数')
+    parser.add_argument('--limit', type=int, default=None, help='最多处理的图像数 (每个分片)')
+    parser.add_argument('--shard', type=int, default=0, help='本进程处理的分片编号')
+    parser.add_argument('--num-shards', type=int, default=1, help='分片总数')
+    parser.add_argument('--processes', type=int, default=1, help='在本机启动的分片进程数 (完成后合并输出)')
+    parser.add_argument('--no-progress', action='store_true', help='不显示进度条')
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        if args.num_shards > 1:
+            parser.error("--processes 与 --shard/--num-shards 不能同时使用")
+        sys.exit(launch_shards(sys.argv[1:], args.processes, args.output))
+    if not 0 <= args.shard < args.num_shards:
+        parser.error(f"--shard 必须在 0 ~ {args.num_shards - 1} 之间")
+    if not Path(args.source).exists():
+        print(f"❌ 错误: 输入不存在: {args.source}")
+        sys.exit(1)
+
+    from src.models.batch_inference import format_stats, iter_image_paths, run_batch_predict, shard_paths
+    from src.models.predictor import FramePredictor
+
+    output = shard_output_path(args.output, args.shard, args.num_shards)
+    shard_note = f" (分片 {args.shard + 1}/{args.num_shards})" if args.num_shards > 1 else ''
+    print(f"📦 批量推理{shard_note}: {args.source} -> {output}")
+
+    predictor = FramePredictor(args.weights, imgsz=args.imgsz, device=args.device, batch=args.batch,
+                               conf=args.conf, iou=args.iou)
+    paths = shard_paths(iter_image_paths(args.source), args.shard, args.num_shards)
+    stats = run_batch_predict(paths, output, predictor, enhance=args.enhance,
+                              enlightengan_weights=args.enlightengan_weights, workers=args.workers,
+                              single_object=args.single_object, limit=args.limit,
+                              progress=not args.no_progress)
+    print(format_stats(stats))
+
+    if args.num_shards > 1:
+        summary = Path(f"{output}.summary.json")
+        tmp = summary.with_name(summary.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+本地推理服务
+EnlightenGAN 和 YOLO 模型常驻内存, 并发请求合并为微批处理 (见 src/models/serving.py).
+只使用标准库 asyncio 和本地权重文件, 可在单台无网络的 CPU 机器上运行.
+
+用法:
+    python scripts/inference/serve.py --weights experiments/exp1_baseline/run/weights/best.pt \\
+        --port 8000 --batch 16 --max-wait-ms 5 --slo-ms 100 --cpu-profile
+
+    curl --data-binary @sign.png 'http://127.0.0.1:8000/detect?method=traditional&conf=0.3'
+    curl http://127.0.0.1:8000/metrics
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.models.batch_inference import ENHANCE_METHODS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地微批处理推理服务')
+    parser.add_argument('--weights', required=True, help='YOLO 模型权重 (本地文件)')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    parser.add_argument('--device', default='cpu', help='推理设备')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸')
+    parser.add_argument('--batch', type=int, default=16, help='每批最多的图像数')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help='第一张入队后最多等待多久开始推理')
+    parser.add_argument('--max-queue', type=int, default=256, help='排队请求上限 (超过时返回 503)')
+    parser.add_argument('--methods', default=','.join(ENHANCE_METHODS),
+                        help='常驻的增强方法 (逗号分隔)')
+    parser.add_argument('--default-method', default='none', help='请求未指定 method 时的增强方法')
+    parser.add_argument('--enlightengan-weights', default='weights/enlightengan.onnx',
+                        help='EnlightenGAN ONNX 模型 (不可用时退回传统方法)')
+    parser.add_argument('--conf', type=float, default=0.25, help='请求未指定 conf 时的置信度阈值')
+    parser.add_argument('--workers', type=int, default=4, help='解码 / 增强线程数')
+    parser.add_argument('--slo-ms', type=float, default=None, help='端到端延迟目标 (在 /metrics 中报告)')
+    parser.add_argument('--cpu-profile', action='store_true',
+                        help='CPU 推理配置: 线程数、channels_last、CPU 原生支持时 bf16 (见 src/training/cpu_profile.py)')
+    args = parser.parse_args()
+
+    methods = [m.strip() for m in args.methods.split(',') if m.strip()]
+    unknown = [m for m in methods if m not in ENHANCE_METHODS]
+    if unknown:
+        parser.error(f"未知的增强方法: {', '.join(unknown)} (可选: {', '.join(ENHANCE_METHODS)})")
+    if args.default_method not in methods:
+        parser.error(f"--default-method {args.default_method} 不在 --methods 中")
+    if not Path(args.weights).exists():
+        print(f"❌ 错误: 模型权重不存在: {args.weights} (服务只使用本地文件, 不会下载)")
+        sys.exit(1)
+
+    # 离线运行: 不检查更新、不下载任何文件 (需要在导入 ultralytics 之前设置)
+    os.environ.setdefault('YOLO_OFFLINE', '1')
+    profile = None
+    if args.cpu_profile and args.device == 'cpu':
+        from src.training.cpu_profile import CPUProfile
+
+        profile = CPUProfile.detect(workers=args.workers)
+        profile.apply_env()  # 在导入 torch 之前
+        print(f"CPU 性能配置: {profile}")
+
+    from src.models.predictor import FramePredictor
+    from src.models.serving import InferenceServer, load_enhancers
+
+    print("加载模型...")
+    predictor = FramePredictor(args.weights, imgsz=args.imgsz, device=args.device, batch=args.batch,
+                               conf=args.conf, cpu_profile=profile)
+    enhancers = load_enhancers(methods, args.enlightengan_weights)
+    for method, (_, route) in enhancers.items():
+        note = '' if route == method else f" (实际使用 {route})"
+        print(f"  增强方法 {method}{note}")
+
+    server = InferenceServer(predictor, enhancers, default_method=args.default_method,
+                             max_batch=args.batch, max_wait_ms=args.max_wait_ms, max_queue=args.max_queue,
+                             workers=args.workers, slo_ms=args.slo_ms)
+    server.run(host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+构建代理子集 (快速比较增强方法)
+按类别 x 亮度桶分层抽取一部分图像, 写成训练和评估脚本都能直接使用的数据集配置
+(见 src/data/subset.py); 在子集和完整数据集上都训练过几种方法后, 报告两者的排名是否一致
+
+用法:
+    # 10% 训练集 / 25% 验证集, 每个类别内按亮度分 4 桶
+    python scripts/preprocessing/build_subset.py configs/exp2_traditional_virtual.yaml \\
+        --output-dir data/subsets/exp2_traditional --fraction 0.1
+
+    # 在子集上训练
+    python scripts/training/train_traditional.py --data data/subsets/exp2_traditional/data.yaml ...
+
+    # 子集排名与完整数据集排名的一致性
+    python scripts/preprocessing/build_subset.py --agreement-only \\
+        --proxy-runs baseline=experiments/proxy/baseline traditional=experiments/proxy/traditional \\
+            enlightengan=experiments/proxy/enlightengan \\
+        --full-runs baseline=experiments/exp1_baseline/run traditional=experiments/exp2_traditional/run \\
+            enlightengan=experiments/exp3_enlightengan/run
+"""
+
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.subset import class_brightness_strata, format_agreement, ranking_agreement, write_subset_config
+
+
+def parse_runs(items):
+    runs = {}
+    for item in items or []:
+        name, sep, path = item.partition('=')
+        if not sep or not name or not path:
+            raise argparse.ArgumentTypeError(f"运行格式应为 名称=目录: {item}")
+        runs[name] = path
+    return runs
+
+
+def run_scores(runs, metric):
+    """各运行 results.csv 中的最佳指标; 缺少结果的运行跳过"""
+    from src.training.warm_start import run_summary
+
+    scores = {}
+    for name, run_dir in runs.items():
+        summary = run_summary(run_dir)
+        if summary is None:
+            print(f"⚠️  {name}: {run_dir} 中没有 results.csv, 跳过")
+            continue
+        scores[name] = summary[metric]
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建分层代理子集并检查排名一致性')
+    parser.add_argument('config', nargs='?', default=None, help='原数据集配置 (YOLO / 虚拟数据集配置)')
+    parser.add_argument('--output-dir', default=None, help='输出目录 (默认 data/subsets/<配置名>)')
+    parser.add_argument('--fraction', type=float, default=0.1, help='训练集抽样比例')
+    parser.add_argument('--val-fraction', type=float, default=0.25, help='验证集抽样比例 (1 表示完整验证集)')
+    parser.add_argument('--test-fraction', type=float, default=None, help='测试集抽样比例 (默认不抽样, 保持完整)')
+    parser.add_argument('--buckets', type=int, default=4, help='每个类别内的亮度桶数 (0 表示只按类别分层)')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1), help='读取亮度的线程数')
+    parser.add_argument('--agreement-only', action='store_true', help='不构建子集, 只报告排名一致性')
+    parser.add_argument('--proxy-runs', nargs='+', default=None, metavar='NAME=DIR', help='子集上的训练运行目录')
+    parser.add_argument('--full-runs', nargs='+', default=None, metavar='NAME=DIR', help='完整数据集上的训练运行目录')
+    parser.add_argument('--metric', choices=['mAP50', 'mAP50-95'], default='mAP50-95', help='排名所用指标')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧪 代理子集")
+    print("=" * 60)
+
+    output_dir = None
+    if not args.agreement_only:
+        if args.config is None or not Path(args.config).exists():
+            print(f"\n❌ 错误: 配置文件不存在: {args.config}")
+            sys.exit(1)
+        output_dir = Path(args.output_dir or Path('data/subsets') / Path(args.config).stem)
+        fractions = {'train': args.fraction, 'val': args.val_fraction}
+        if args.test_fraction is not None:
+            fractions['test'] = args.test_fraction
+        strata_fn = partial(class_brightness_strata, n_buckets=args.buckets, workers=args.workers) if args.buckets > 0 else None
+
+        print(f"\n源配置: {args.config}")
+        print(f"分层: 类别{f' x {args.buckets} 个亮度桶' if strata_fn else ''}, 随机种子 {args.seed}")
+        subset_path = write_subset_config(args.config, output_dir, fractions, seed=args.seed, strata_fn=strata_fn)
+
+        import yaml
+        with open(subset_path, 'r', encoding='utf-8') as f:
+            counts = yaml.safe_load(f)['subset']['counts']
+        for split, c in counts.items():
+            print(f"  {split:<6} {c['subset']:>6} / {c['total']:<6} 张 ({c['subset'] / max(c['total'], 1):.1%}), "
+                  f"覆盖 {c['strata_covered']}/{c['strata']} 层")
+        print(f"\n✅ 子集配置: {subset_path}")
+        print(f"   训练: python scripts/training/train_traditional.py --data {subset_path} ...")
+
+    if args.proxy_runs or args.full_runs:
+        try:
+            proxy_runs, full_runs = parse_runs(args.proxy_runs), parse_runs(args.full_runs)
+        except argparse.ArgumentTypeError as e:
+            print(f"\n❌ 错误: {e}")
+            sys.exit(1)
+        proxy_scores, full_scores = run_scores(proxy_runs, args.metric), run_scores(full_runs, args.metric)
+        try:
+            agreement = ranking_agreement(proxy_scores, full_scores)
+        except ValueError as e:
+            print(f"\n❌ 错误: {e}")
+            sys.exit(1)
+
+        print(f"\n📊 子集排名与完整数据集排名 ({args.metric}):")
+        print(format_agreement(agreement, proxy_scores, full_scores, metric=args.metric))
+
+        report_dir = output_dir or Path(args.output_dir or '.')
+        report_dir.mkdir(parents=True, exist_ok=True)
+        report_path = report_dir / 'ranking_agreement.json'
+        tmp = report_path.with_name(report_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'metric': args.metric, 'proxy_runs': proxy_runs, 'full_runs': full_runs,
+                       'proxy_scores': proxy_scores, 'full_scores': full_scores, **agreement},
+                      f, indent=2, ensure_ascii=False)
+        os.replace(tmp, report_path)
+        print(f"\n📄 报告: {report_path}")
+    elif args.agreement_only:
+        print("\n❌ 错误: --agreement-only 需要 --proxy-runs 和 --full-runs")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
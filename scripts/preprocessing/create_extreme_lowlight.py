@@ -9,8 +9,16 @@ import cv2
 import numpy as np
 from pathlib import Path
 import shutil
+import sys
 import yaml
 
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.codecs import DEFAULT_CODEC, get_codec, read_image
+from src.data.materialize import format_stats, materialize_files
+from src.data.transform_runner import MANIFEST_NAME, format_run_stats, run_transform
+
 def create_extreme_lowlight(image, gamma=0.25):
     """
     使用更极端的 Gamma 变换创建低光照图像
@@ -34,7 +42,7 @@ def create_extreme_lowlight(image, gamma=0.25):
     
     return lowlight
 
-def process_dataset(input_dir, output_dir, gamma=0.25):
+def process_dataset(input_dir, output_dir, gamma=0.25, codec=DEFAULT_CODEC):
     """
     批量处理数据集，生成极暗的低光照图像
     
@@ -42,7 +50,9 @@ def process_dataset(input_dir, output_dir, gamma=0.25):
         input_dir: 原始图像目录（YOLO格式：images/train, images/val, images/test）
         output_dir: 输出目录
         gamma: Gamma值（0.2=极暗, 0.25=很暗, 0.3=偏暗）
+        codec: 输出编码（png:级别 / webp / jpg:质量，见 src.data.codecs）
     """
+    codec = get_codec(codec)
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     
@@ -57,6 +67,7 @@ def process_dataset(input_dir, output_dir, gamma=0.25):
     print(f"输入目录: {input_dir}")
     print(f"输出目录: {output_dir}")
     print(f"Gamma值: {gamma} (越小越暗)")
+    print(f"输出编码: {codec.spec}")
     print(f"\n评估标准:")
     print(f"  gamma=0.2: 极暗 (几乎看不见)")
     print(f"  gamma=0.25: 很暗 (有挑战性) ⭐推荐")
@@ -94,32 +105,34 @@ def process_dataset(input_dir, output_dir, gamma=0.25):
         print(f"  找到 {len(images)} 张图像")
         print(f"  开始处理...")
         
-        processed = 0
-        for i, img_path in enumerate(images, 1):
-            # 读取图像
+        def transform(img_path):
             img = cv2.imread(str(img_path))
             if img is None:
-                continue
-            
-            # 生成低光照图像
-            lowlight_img = create_extreme_lowlight(img, gamma)
-            
-            # 保存图像
-            output_img_path = output_img_dir / img_path.name
-            cv2.imwrite(str(output_img_path), lowlight_img)
-            
-            # 复制标签文件
+                return None
+            return create_extreme_lowlight(img, gamma)
+        
+        # 已是最新的输出（源文件和 gamma 都未变）直接跳过，中断后重新运行可从断点继续
+        jobs = [(img_path, output_img_dir / img_path.name) for img_path in images]
+        run_stats = run_transform(
+            jobs, transform,
+            params={'op': 'extreme_lowlight', 'gamma': gamma},
+            manifest_path=output_path / MANIFEST_NAME,
+            desc=f"  {split}",
+            codec=codec
+        )
+        processed = run_stats['processed'] + run_stats['skipped']
+        print(f"  图像: {format_run_stats(run_stats)}")
+        
+        # 标签不变，统一链接
+        label_pairs = []
+        for img_path in images:
             label_path = input_label_dir / (img_path.stem + '.txt')
             if label_path.exists():
-                output_label_path = output_label_dir / label_path.name
-                shutil.copy2(label_path, output_label_path)
-            
-            processed += 1
-            
-            # 每500张显示一次进度（更频繁）
-            if processed % 500 == 0 or processed == len(images):
-                percent = processed / len(images) * 100
-                print(f"  [{percent:5.1f}%] 已处理: {processed}/{len(images)}")
+                label_pairs.append((label_path, output_label_dir / label_path.name))
+        
+        # 链接标签文件（硬链接/reflink，跨文件系统时回退为复制）
+        stats = materialize_files(label_pairs)
+        print(f"  标签: {format_stats(stats)}")
         
         print(f"  ✅ {split} 完成: {processed} 张图像")
         total_images += processed
@@ -147,9 +160,9 @@ def process_dataset(input_dir, output_dir, gamma=0.25):
     # 测试一张图像
     print("\n" + "="*60)
     print("🧪 测试生成的低光照图像...")
-    test_img_path = output_path / 'images' / 'train' / next(iter(output_path.glob('images/train/*.png')), None)
+    test_img_path = next(iter(output_path.glob(f'images/train/*{codec.suffix}')), None)
     if test_img_path and test_img_path.exists():
-        test_img = cv2.imread(str(test_img_path))
+        test_img = read_image(test_img_path)
         brightness = np.mean(test_img)
         print(f"测试图像平均亮度: {brightness:.1f} / 255 ({brightness/255*100:.1f}%)")
         
@@ -197,6 +210,14 @@ def main():
         print("⚠️ 无效选择，使用默认值0.25")
         gamma = 0.25
     
+    # 输出编码
+    print("\n请选择输出编码:")
+    print(f"  [1] PNG 快速压缩 ({DEFAULT_CODEC}) ⭐默认")
+    print("  [2] PNG 高压缩 (png:6，更小但写入更慢)")
+    print("  [3] 无损 WebP (webp)")
+    codec_choice = input("\n请选择 [1/2/3]: ").strip()
+    codec = {'2': 'png:6', '3': 'webp'}.get(codec_choice, DEFAULT_CODEC)
+    
     # 确定输入目录
     print("\n" + "="*60)
     print("选择输入数据源:")
@@ -224,19 +245,23 @@ def main():
     print("="*60)
     print(f"输出目录: {output_dir}")
     if output_dir.exists():
-        print("⚠️ 目录已存在，将会覆盖！")
-        confirm = input("确认继续？(y/N): ").strip().lower()
-        if confirm != 'y':
+        print("⚠️ 目录已存在")
+        print("  [1] 增量更新：只处理缺失或过期的图像（中断后继续也选这个）⭐默认")
+        print("  [2] 清空后重新生成")
+        print("  [3] 取消")
+        mode = input("请选择 [1/2/3]: ").strip()
+        if mode == '3':
             print("❌ 已取消")
             return
         
-        # 删除旧目录
-        shutil.rmtree(output_dir)
-        print("✅ 已清理旧数据")
+        if mode == '2':
+            # 删除旧目录
+            shutil.rmtree(output_dir)
+            print("✅ 已清理旧数据")
     
     # 开始处理
     print("\n开始处理...")
-    success = process_dataset(input_dir, output_dir, gamma)
+    success = process_dataset(input_dir, output_dir, gamma, codec=codec)
     
     if success:
         print("\n" + "="*60)
@@ -6,24 +6,38 @@
 import cv2
 import numpy as np
 from pathlib import Path
-from tqdm import tqdm
-import shutil
+import sys
 import yaml
+import zlib
 
-def create_lowlight_image(image, gamma_range=(0.3, 0.7)):
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.codecs import DEFAULT_CODEC, get_codec
+from src.data.materialize import format_stats, materialize_files, materialize_tree
+from src.data.transform_runner import MANIFEST_NAME, format_run_stats, run_transform
+
+# 输出编码 (png:0-9 / webp 无损 / jpg:质量)，见 scripts/benchmarks/benchmark_codecs.py
+OUTPUT_CODEC = DEFAULT_CODEC
+
+# 每张图像的 gamma 由 (种子, 相对路径) 决定，重新运行时结果一致，可以增量更新
+GAMMA_SEED = 42
+
+def create_lowlight_image(image, gamma_range=(0.3, 0.7), rng=None):
     """
     使用 Gamma 变换创建低光照图像
     
     Args:
         image: 输入图像
         gamma_range: Gamma 值范围
+        rng: 随机数生成器 (默认使用 np.random 全局状态)
     
     Returns:
         lowlight_image: 低光照图像
         gamma_used: 使用的 gamma 值
     """
     # 随机选择 gamma 值
-    gamma = np.random.uniform(*gamma_range)
+    gamma = (rng or np.random).uniform(*gamma_range)
     
     # 创建查找表
     inv_gamma = 1.0 / gamma
@@ -37,9 +51,12 @@ def create_lowlight_image(image, gamma_range=(0.3, 0.7)):
     
     return lowlight, gamma
 
-def process_dataset(input_dir, output_dir, gamma_range=(0.3, 0.7)):
+def process_dataset(input_dir, output_dir, gamma_range=(0.3, 0.7), codec=DEFAULT_CODEC):
     """
     批量处理数据集
+    
+    Args:
+        codec: 输出编码 (见 src.data.codecs)，训练用数据需为 ultralytics 可读的 png/webp/jpg
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
@@ -62,48 +79,43 @@ def process_dataset(input_dir, output_dir, gamma_range=(0.3, 0.7)):
     # 创建输出目录
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # 处理每张图像
-    success_count = 0
-    gamma_values = []
-    
-    for img_file in tqdm(image_files, desc="生成低光照图像"):
-        try:
-            # 读取图像
-            image = cv2.imread(str(img_file))
-            if image is None:
-                continue
-            
-            # 生成低光照版本
-            lowlight, gamma_used = create_lowlight_image(image, gamma_range)
-            gamma_values.append(gamma_used)
-            
-            # 保持相对路径结构
-            rel_path = img_file.relative_to(input_path)
-            out_file = output_path / rel_path
-            
-            # 创建输出目录
-            out_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 转换为 PNG 格式并保存
-            out_file_png = out_file.with_suffix('.png')
-            cv2.imwrite(str(out_file_png), lowlight)
-            
-            success_count += 1
-            
-        except Exception as e:
-            print(f"\n处理失败 {img_file}: {e}")
+    def transform(img_file):
+        # 读取图像
+        image = cv2.imread(str(img_file))
+        if image is None:
+            return None
+        
+        # 生成低光照版本
+        rel_path = img_file.relative_to(input_path).as_posix()
+        rng = np.random.default_rng([GAMMA_SEED, zlib.crc32(rel_path.encode('utf-8'))])
+        lowlight, gamma_used = create_lowlight_image(image, gamma_range, rng)
+        return lowlight, {'gamma': round(float(gamma_used), 6)}
+    
+    # 保持相对路径结构，扩展名由编码器决定
+    jobs = [(f, (output_path / f.relative_to(input_path)).with_suffix('.png')) for f in image_files]
+    
+    # 已是最新的输出直接跳过，中断后重新运行可从断点继续
+    stats = run_transform(
+        jobs, transform,
+        params={'op': 'pure_lowlight', 'gamma_range': list(gamma_range), 'seed': GAMMA_SEED},
+        manifest_path=output_path / MANIFEST_NAME,
+        desc="生成低光照图像",
+        codec=codec
+    )
     
     # 统计
-    avg_gamma = np.mean(gamma_values)
-    print(f"\n✅ 成功处理: {success_count}/{len(image_files)}")
-    print(f"   平均 Gamma: {avg_gamma:.3f}")
-    print(f"   Gamma 范围: [{min(gamma_values):.3f}, {max(gamma_values):.3f}]")
+    gamma_values = [extra['gamma'] for extra in stats['extras']]
+    success_count = stats['processed'] + stats['skipped']
+    print(f"\n✅ 成功处理: {success_count}/{len(image_files)} ({format_run_stats(stats)})")
+    if gamma_values:
+        print(f"   平均 Gamma: {np.mean(gamma_values):.3f}")
+        print(f"   Gamma 范围: [{min(gamma_values):.3f}, {max(gamma_values):.3f}]")
     
     return True
 
 def copy_labels(source_label_dir, dest_label_dir):
     """
-    复制标签文件
+    链接标签文件（硬链接/reflink，跨文件系统时回退为复制）
     """
     source_path = Path(source_label_dir)
     dest_path = Path(dest_label_dir)
@@ -119,21 +131,15 @@ def copy_labels(source_label_dir, dest_label_dir):
         print("⚠️  未找到标签文件")
         return False
     
-    print(f"\n复制 {len(label_files)} 个标签文件...")
+    print(f"\n链接 {len(label_files)} 个标签文件...")
     
-    for label_file in tqdm(label_files, desc="复制标签"):
-        try:
-            rel_path = label_file.relative_to(source_path)
-            dest_file = dest_path / rel_path
-            dest_file.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(label_file, dest_file)
-        except Exception as e:
-            print(f"\n复制失败 {label_file}: {e}")
+    pairs = [(f, dest_path / f.relative_to(source_path)) for f in label_files]
+    stats = materialize_files(pairs, desc="链接标签")
     
-    print("✅ 标签复制完成")
+    print(f"✅ 标签完成: {format_stats(stats)}")
     return True
 
-def create_yolo_dataset(lowlight_base, labels_source, output_dir):
+def create_yolo_dataset(lowlight_base, labels_source, output_dir, codec=DEFAULT_CODEC):
     """
     创建 YOLO 格式数据集
     """
@@ -152,31 +158,24 @@ def create_yolo_dataset(lowlight_base, labels_source, output_dir):
     # 移动图像和标签
     lowlight_path = Path(lowlight_base)
     labels_path = Path(labels_source)
+    image_pattern = f'*{get_codec(codec).suffix}'
     
     for split in ['train', 'val', 'test']:
-        # 移动图像
+        # 图像: 已直接生成在输出目录时无需处理，否则链接过去
         src_img_dir = lowlight_path / split
         dst_img_dir = output_path / 'images' / split
         
-        if src_img_dir.exists():
-            images = list(src_img_dir.glob('*.png'))
-            print(f"\n{split.upper()}: 移动 {len(images)} 张图像...")
-            
-            for img in tqdm(images, desc=f"  图像"):
-                dst = dst_img_dir / img.name
-                shutil.copy2(img, dst)
+        if src_img_dir.exists() and src_img_dir.resolve() != dst_img_dir.resolve():
+            stats = materialize_tree(src_img_dir, dst_img_dir, image_pattern, desc="  图像")
+            print(f"\n{split.upper()}: 图像 {format_stats(stats)}")
         
-        # 复制标签
+        # 标签不变，直接链接
         src_label_dir = labels_path / split
         dst_label_dir = output_path / 'labels' / split
         
         if src_label_dir.exists():
-            labels = list(src_label_dir.glob('*.txt'))
-            print(f"   复制 {len(labels)} 个标签...")
-            
-            for label in tqdm(labels, desc=f"  标签"):
-                dst = dst_label_dir / label.name
-                shutil.copy2(label, dst)
+            stats = materialize_tree(src_label_dir, dst_label_dir, '*.txt', desc="  标签")
+            print(f"   {split.upper()}: 标签 {format_stats(stats)}")
     
     print("\n✅ YOLO 数据集创建完成")
     print(f"   位置: {output_path}")
@@ -230,6 +229,7 @@ def main():
     print("  • Gamma 范围: [0.3, 0.7]")
     print("  • 不进行任何增强处理")
     print("  • 用于建立性能基线")
+    print(f"  • 输出编码: {OUTPUT_CODEC}")
     
     # 检查源数据
     print("\n" + "=" * 70)
@@ -275,7 +275,9 @@ def main():
         return
     
     # 开始处理
-    temp_lowlight = Path('data/temp_lowlight')
+    # 低光照图像直接写入最终数据集的 images/ 目录，不再经过临时目录二次复制
+    output_root = Path('data/baseline_lowlight_dataset')
+    lowlight_images = output_root / 'images'
     
     # 步骤 1: 生成低光照图像
     print("\n" + "=" * 70)
@@ -288,8 +290,9 @@ def main():
             print(f"\n处理 {split.upper()} 集...")
             process_dataset(
                 split_dir,
-                temp_lowlight / split,
-                gamma_range=(0.3, 0.7)
+                lowlight_images / split,
+                gamma_range=(0.3, 0.7),
+                codec=OUTPUT_CODEC
             )
     
     # 步骤 2: 创建 YOLO 数据集
@@ -298,9 +301,10 @@ def main():
     print("=" * 70)
     
     final_dataset = create_yolo_dataset(
-        temp_lowlight,
+        lowlight_images,
         source_label_dir,
-        'data/baseline_lowlight_dataset'
+        output_root,
+        codec=OUTPUT_CODEC
     )
     
     # 步骤 3: 创建配置文件
@@ -310,10 +314,6 @@ def main():
     
     config_file = create_config(final_dataset)
     
-    # 清理临时文件
-    print("\n清理临时文件...")
-    shutil.rmtree(temp_lowlight, ignore_errors=True)
-    
     # 完成
     print("\n" + "=" * 70)
     print("  ✅ 纯低光照数据集生成完成！".center(70))
@@ -326,7 +326,7 @@ def main():
     for split in ['train', 'val', 'test']:
         img_dir = final_dataset / 'images' / split
         if img_dir.exists():
-            count = len(list(img_dir.glob('*.png')))
+            count = len(list(img_dir.glob(f'*{get_codec(OUTPUT_CODEC).suffix}')))
             print(f"  {split.upper():<6}: {count:>6} 张")
     
     print("\n🎯 下一步:")
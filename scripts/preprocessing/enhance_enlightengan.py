@@ -8,7 +8,13 @@ from pathlib import Path
 import shutil
 import cv2
 import numpy as np
-from tqdm import tqdm
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.codecs import DEFAULT_CODEC
+from src.data.materialize import format_stats, materialize_tree
+from src.data.transform_runner import MANIFEST_NAME, format_run_stats, run_transform
 
 print("=" * 60)
 print("✨ 步骤 5: 增强低光照图像 (EnlightenGAN 版)")
@@ -39,6 +45,9 @@ if not input_root.exists():
 # 设置输出路径
 output_root = input_root.parent / 'enhanced_images'
 
+# 输出编码 (png:0-9 / webp 无损 / jpg:质量)，见 scripts/benchmarks/benchmark_codecs.py
+OUTPUT_CODEC = DEFAULT_CODEC
+
 print(f"\n输入路径: {input_root}")
 print(f"输出路径: {output_root}")
 
@@ -185,9 +194,12 @@ def enlightengan_onnx_method(image, model_path):
     except Exception as e:
         print(f"\n⚠️  ONNX 推理失败: {e}")
         print("   回退到传统方法")
-        return enhanced_traditional_method(image)
+        # 在清单中按实际使用的方法记录参数, 下次运行不会把它当作最新的 EnlightenGAN 输出
+        fallback = {'method': 'enhanced_traditional'}
+        return enhanced_traditional_method(image), {'method': 'enhanced_traditional', 'params': fallback}
 
-# 选择增强方法
+# 选择增强方法（used_method 为实际使用的方法，决定输出内容并记录在清单中）
+used_method = "enhanced_traditional"
 if method_choice == "onnx":
     print("\n正在加载 ONNX 模型...")
     try:
@@ -195,6 +207,7 @@ if method_choice == "onnx":
         session = ort.InferenceSession(str(onnx_model))
         print("✅ ONNX 模型加载成功")
         enhance_func = lambda img: enlightengan_onnx_method(img, onnx_model)
+        used_method = "onnx"
     except Exception as e:
         print(f"❌ 模型加载失败: {e}")
         print("回退到改进的传统方法")
@@ -223,7 +236,7 @@ print("\n" + "=" * 60)
 print("开始增强图像...")
 print("=" * 60)
 
-def enhance_dataset(input_dir, output_dir, enhance_func):
+def enhance_dataset(input_dir, output_dir, enhance_func, codec=OUTPUT_CODEC):
     """批量增强图像"""
     input_path = Path(input_dir)
     output_path = Path(output_dir)
@@ -236,23 +249,27 @@ def enhance_dataset(input_dir, output_dir, enhance_func):
         print(f"   ⚠️  未找到图像: {input_path}")
         return 0
     
-    for img_file in tqdm(image_files, desc=f"   增强 {input_path.name}"):
-        try:
-            # 读取图像
-            image = cv2.imread(str(img_file))
-            if image is None:
-                continue
-            
-            # 增强
-            enhanced = enhance_func(image)
-            
-            # 保存
-            output_file = output_path / img_file.name
-            cv2.imwrite(str(output_file), enhanced)
-            
-        except Exception as e:
-            print(f"\n   ⚠️  处理 {img_file.name} 时出错: {e}")
-            continue
+    def transform(img_file):
+        # 读取图像
+        image = cv2.imread(str(img_file))
+        if image is None:
+            return None
+        
+        # 增强
+        return enhance_func(image)
+    
+    # 已是最新的输出直接跳过，中断后重新运行可从断点继续
+    jobs = [(f, output_path / f.name) for f in image_files]
+    params = {'op': 'enhance', 'method': used_method}
+    if used_method == 'onnx':
+        params['model'] = str(onnx_model)
+    stats = run_transform(jobs, transform, params,
+                          manifest_path=output_path / MANIFEST_NAME,
+                          desc=f"   增强 {input_path.name}", codec=codec)
+    print(f"   {format_run_stats(stats)}")
+    fallbacks = sum(1 for extra in stats['extras'] if extra.get('method') != used_method)
+    if used_method == 'onnx' and fallbacks:
+        print(f"   ⚠️  {fallbacks} 张图像回退到传统方法 (已在清单中标记, 下次运行会重新用 EnlightenGAN 增强)")
     
     return len(image_files)
 
@@ -278,10 +295,8 @@ try:
         dst_labels.mkdir(parents=True, exist_ok=True)
         
         if src_labels.exists():
-            label_files = list(src_labels.glob('*.txt'))
-            for label_file in label_files:
-                shutil.copy(str(label_file), str(dst_labels / label_file.name))
-            print(f"✅ 复制 {len(label_files)} 个标注文件")
+            stats = materialize_tree(src_labels, dst_labels, '*.txt')
+            print(f"✅ 标注文件: {format_stats(stats)}")
     
     print("\n" + "=" * 60)
     print("✅ 图像增强完成！")
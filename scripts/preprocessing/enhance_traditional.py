@@ -7,6 +7,11 @@ import sys
 from pathlib import Path
 import shutil
 
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.materialize import format_stats, materialize_tree
+
 print("=" * 60)
 print("✨ 步骤 5: 增强低光照图像")
 print("=" * 60)
@@ -112,10 +117,8 @@ try:
         dst_labels.mkdir(parents=True, exist_ok=True)
         
         if src_labels.exists():
-            label_files = list(src_labels.glob('*.txt'))
-            for label_file in label_files:
-                shutil.copy(str(label_file), str(dst_labels / label_file.name))
-            print(f"✅ 复制 {len(label_files)} 个标注文件")
+            stats = materialize_tree(src_labels, dst_labels, '*.txt')
+            print(f"✅ 标注文件: {format_stats(stats)}")
         
         # 统计
         enhanced_count = len(list(output_images.glob('*.png')))
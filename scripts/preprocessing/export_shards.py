@@ -0,0 +1,116 @@
+"""
+将派生数据集导出为 tar 分片 (WebDataset 风格)
+用于把 data/baseline_lowlight_dataset 等数据集分发到其他训练机
+
+用法:
+    # 导出
+    python scripts/preprocessing/export_shards.py data/baseline_lowlight_dataset data/shards/baseline_lowlight
+
+    # 测量流式读取吞吐量 (与原始磁盘顺序读对比)
+    python scripts/preprocessing/export_shards.py --benchmark data/shards/baseline_lowlight
+
+训练 / 评估时使用 (ShardDataset 初始化时用 ShardStream 顺序读入全部分片):
+    python scripts/training/train_baseline.py --shards data/shards/baseline_lowlight --yes
+    python scripts/evaluation/evaluate_model.py --data data/shards/baseline_lowlight/dataset.yaml --yes
+
+    # 或直接调用 ultralytics
+    from src.data.yolo_adapter import ShardDataset, build_trainer
+    model.train(data='data/shards/baseline_lowlight/dataset.yaml',
+                trainer=build_trainer(ShardDataset), cache='ram', ...)
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.shards import READ_BUFFER_SIZE, ShardStream, export_dataset, load_index
+
+
+def raw_read_throughput(split_dir):
+    """按块顺序读取所有分片, 作为磁盘带宽参考 (MB/s)"""
+    index = load_index(split_dir)
+    total = 0
+    start = time.perf_counter()
+    for shard in index['shards']:
+        with open(Path(split_dir) / shard['name'], 'rb', buffering=0) as f:
+            while True:
+                chunk = f.read(READ_BUFFER_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+    elapsed = time.perf_counter() - start
+    return total / 1024 / 1024 / elapsed if elapsed > 0 else 0.0, total
+
+
+def stream_throughput(split_dir, decode):
+    """通过 ShardStream 读取整个划分, 返回 (MB/s, 样本/秒)"""
+    stream = ShardStream(split_dir, shuffle_buffer=0, decode=decode)
+    total = 0
+    count = 0
+    start = time.perf_counter()
+    for sample in stream:
+        total += len(sample['image_bytes'])
+        count += 1
+    elapsed = time.perf_counter() - start
+    if elapsed <= 0:
+        return 0.0, 0.0
+    return total / 1024 / 1024 / elapsed, count / elapsed
+
+
+def benchmark(shard_root):
+    """对每个划分比较原始顺序读与流式读取吞吐量"""
+    print("=" * 60)
+    print("📊 分片读取吞吐量")
+    print("=" * 60)
+
+    for split_dir in sorted(p for p in Path(shard_root).iterdir() if (p / 'index.json').exists()):
+        raw_mb, _ = raw_read_throughput(split_dir)
+        stream_mb, stream_rate = stream_throughput(split_dir, decode=False)
+        decode_mb, decode_rate = stream_throughput(split_dir, decode=True)
+
+        print(f"\n{split_dir.name}:")
+        print(f"  原始顺序读:       {raw_mb:8.1f} MB/s")
+        print(f"  流式读取 (不解码): {stream_mb:8.1f} MB/s  ({stream_rate:.0f} 样本/秒, {stream_mb / raw_mb * 100 if raw_mb else 0:.0f}%)")
+        print(f"  流式读取 (解码):   {decode_mb:8.1f} MB/s  ({decode_rate:.0f} 样本/秒)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出 tar 分片数据集')
+    parser.add_argument('dataset', help='YOLO 格式数据集根目录 (--benchmark 时为分片根目录)')
+    parser.add_argument('output', nargs='?', help='分片输出根目录')
+    parser.add_argument('--shard-size', type=int, default=256, help='单个分片大小上限 (MB)')
+    parser.add_argument('--splits', nargs='+', default=['train', 'val', 'test'], help='需要导出的划分')
+    parser.add_argument('--benchmark', action='store_true', help='测量已有分片的读取吞吐量')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.dataset)
+        return
+
+    if not args.output:
+        parser.error('需要指定输出目录')
+
+    dataset = Path(args.dataset)
+    if not dataset.exists():
+        print(f"❌ 数据集不存在: {dataset}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("📦 导出 tar 分片")
+    print("=" * 60)
+    print(f"输入: {dataset}")
+    print(f"输出: {args.output}")
+    print(f"分片大小: {args.shard_size} MB\n")
+
+    config_path = export_dataset(dataset, args.output, splits=args.splits,
+                                 max_shard_bytes=args.shard_size * 1024 * 1024)
+
+    print(f"\n📄 配置文件已创建: {config_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+预先生成小目标拼接数据集
+把 GTSRB 裁剪图连同标注拼到 640x640 画布上, 写出新的 YOLO 数据集 (见 src/data/packing.py)
+
+用法:
+    python scripts/preprocessing/pack_canvases.py data/baseline_lowlight_dataset data/packed_lowlight_dataset \
+        --crop-size 128
+    python scripts/preprocessing/pack_canvases.py data/yolo_dataset data/packed_dataset --crop-size 128 --scale 0.8 1.5
+
+裁剪图长边缩放到 --crop-size; 训练出的模型对原始裁剪图验证/推理时使用 imgsz=crop-size, 目标尺度与训练一致
+(不指定时保持原尺寸, 只适合在接近原尺寸的 imgsz 下推理)
+
+不想预先生成时, 也可以在训练时即时拼接 (imgsz 为验证/推理尺寸, 裁剪图按 imgsz 缩放):
+    from src.data.yolo_adapter import CanvasDataset, build_trainer
+    model.train(data='configs/exp1_baseline.yaml', imgsz=128,
+                trainer=build_trainer(CanvasDataset, canvas_size=640), ...)
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.codecs import DEFAULT_CODEC
+from src.data.packing import export_packed_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成小目标拼接数据集')
+    parser.add_argument('dataset', help='裁剪图数据集根目录 (YOLO 格式)')
+    parser.add_argument('output', help='输出目录')
+    parser.add_argument('--canvas-size', type=int, default=640, help='画布边长 (应与训练 imgsz 一致)')
+    parser.add_argument('--crop-size', type=int, default=None,
+                        help='裁剪图长边缩放到的尺寸, 即之后验证/推理时的 imgsz (默认保持原尺寸)')
+    parser.add_argument('--scale', type=float, nargs=2, default=[1.0, 1.0], metavar=('MIN', 'MAX'),
+                        help='训练集裁剪图随机缩放范围')
+    parser.add_argument('--seed', type=int, default=0, help='排布随机种子')
+    parser.add_argument('--splits', nargs='+', default=['train', 'val', 'test'], help='需要拼接的划分')
+    parser.add_argument('--codec', default=DEFAULT_CODEC, help='输出编码 (png:N / webp / jpg:N)')
+    args = parser.parse_args()
+
+    dataset = Path(args.dataset)
+    if not dataset.exists():
+        print(f"❌ 数据集不存在: {dataset}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("🧩 生成小目标拼接数据集")
+    print("=" * 60)
+    print(f"输入: {dataset}")
+    print(f"输出: {args.output}")
+    crop_note = f"长边 {args.crop_size}" if args.crop_size else "原尺寸 (推理时请使用接近原尺寸的 imgsz)"
+    print(f"画布: {args.canvas_size}x{args.canvas_size}, 裁剪图 {crop_note}, 缩放 {args.scale[0]}-{args.scale[1]}\n")
+
+    start = time.perf_counter()
+    config_path = export_packed_dataset(dataset, args.output, splits=args.splits,
+                                        canvas_size=args.canvas_size, seed=args.seed,
+                                        scale_range=tuple(args.scale), codec=args.codec, crop_size=args.crop_size)
+
+    print(f"\n✅ 完成，耗时 {time.perf_counter() - start:.1f} 秒")
+    print(f"📄 配置文件已创建: {config_path}")
+
+
+if __name__ == '__main__':
+    main()
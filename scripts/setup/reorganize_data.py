@@ -2,9 +2,14 @@
 重组数据集以符合 YOLOv8 标准格式
 """
 
-import shutil
+import sys
 from pathlib import Path
 
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.data.materialize import format_stats, materialize_tree
+
 print("=" * 60)
 print("🔧 重组数据集结构")
 print("=" * 60)
@@ -25,7 +30,7 @@ for split in ['train', 'val', 'test']:
     (yolo_dataset / 'images' / split).mkdir(parents=True, exist_ok=True)
     (yolo_dataset / 'labels' / split).mkdir(parents=True, exist_ok=True)
 
-print("\n开始复制文件...")
+print("\n开始链接文件（硬链接/reflink，跨文件系统时回退为复制）...")
 
 # 复制文件
 for split in ['train', 'val', 'test']:
@@ -43,26 +48,18 @@ for split in ['train', 'val', 'test']:
         print(f"  ⚠️  图像目录不存在: {src_images}")
         continue
     
-    # 复制图像
-    image_files = list(src_images.glob('*.png'))
-    print(f"  复制 {len(image_files)} 张图像...")
-    for i, img_file in enumerate(image_files, 1):
-        shutil.copy2(img_file, dst_images / img_file.name)
-        if i % 1000 == 0:
-            print(f"    已复制 {i}/{len(image_files)} 张图像...")
+    # 链接图像
+    image_stats = materialize_tree(src_images, dst_images, '*.png', desc="  图像")
+    print(f"  图像: {format_stats(image_stats)}")
     
-    # 复制标签
+    # 链接标签
     if src_labels.exists():
-        label_files = list(src_labels.glob('*.txt'))
-        print(f"  复制 {len(label_files)} 个标签...")
-        for i, label_file in enumerate(label_files, 1):
-            shutil.copy2(label_file, dst_labels / label_file.name)
-            if i % 1000 == 0:
-                print(f"    已复制 {i}/{len(label_files)} 个标签...")
+        label_stats = materialize_tree(src_labels, dst_labels, '*.txt', desc="  标签")
+        print(f"  标签: {format_stats(label_stats)}")
     else:
         print(f"  ⚠️  标签目录不存在: {src_labels}")
     
-    print(f"  ✅ {split} 集完成: {len(image_files)} 图像")
+    print(f"  ✅ {split} 集完成: {sum(image_stats.values())} 图像")
 
 print("\n" + "=" * 60)
 print("✅ 数据集重组完成！")
@@ -0,0 +1,107 @@
+"""
+同步训练三个实验 (低光照 / 传统增强 / EnlightenGAN)
+每个 batch 只读取、变暗、增强一次, 在内存中派生各实验的输入, 三个模型同步训练
+(见 src/training/cotrain.py). 每个实验的结果目录与单独训练相同, 可直接评估.
+
+用法:
+    python scripts/training/cotrain_variants.py --epochs 20 --batch 16 --device cpu --yes
+
+    # 只比较其中两个实验
+    python scripts/training/cotrain_variants.py \\
+        --variants baseline=configs/exp1_baseline_virtual.yaml traditional=configs/exp2_traditional_virtual.yaml
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.utils.cli import add_yes_argument, ask, confirm
+
+
+DEFAULT_VARIANTS = [
+    'baseline=configs/exp1_baseline_virtual.yaml',
+    'traditional=configs/exp2_traditional_virtual.yaml',
+    'enlightengan=configs/exp3_enlightengan_virtual.yaml',
+]
+
+
+def parse_variants(items):
+    variants = {}
+    for item in items:
+        name, sep, path = item.partition('=')
+        if not sep or not name or not path:
+            raise argparse.ArgumentTypeError(f"变体格式应为 名称=配置: {item}")
+        variants[name] = path
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description='共享 dataloader 同步训练多个实验')
+    parser.add_argument('--variants', nargs='+', default=DEFAULT_VARIANTS, metavar='NAME=CONFIG',
+                        help='实验名=虚拟数据集配置, 第一个为 leader (默认三个实验)')
+    parser.add_argument('--model', default='yolov8n.pt', help='初始权重')
+    parser.add_argument('--epochs', type=int, default=None, help='训练轮数 (默认 20)')
+    parser.add_argument('--batch', type=int, default=16, help='批次大小')
+    parser.add_argument('--device', default='cpu', help='设备 0 / cpu')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸')
+    parser.add_argument('--workers', type=int, default=4, help='数据加载进程数 (所有实验共用)')
+    parser.add_argument('--project', default='experiments/cotrain', help='结果目录')
+    parser.add_argument('--exist-ok', action='store_true', help='覆盖同名运行目录而不是自动编号')
+    add_yes_argument(parser)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🚀 同步训练多个实验")
+    print("=" * 60)
+
+    try:
+        variants = parse_variants(args.variants)
+    except argparse.ArgumentTypeError as e:
+        print(f"\n❌ 错误: {e}")
+        sys.exit(1)
+    for name, path in variants.items():
+        if not Path(path).exists():
+            print(f"\n❌ 错误: 配置文件不存在: {path} ({name})")
+            sys.exit(1)
+
+    epochs = ask(args.epochs, "\n请输入训练轮数 (默认 20): ", 20, int, args.yes)
+
+    print("\n训练配置总结:")
+    print(f"  实验: {', '.join(variants)} (leader: {next(iter(variants))})")
+    print(f"  模型: {args.model}")
+    print(f"  训练轮数: {epochs}")
+    print(f"  批次大小: {args.batch}")
+    print(f"  设备: {args.device}")
+    print(f"  结果目录: {args.project}/<实验名>")
+
+    if not confirm("\n是否开始训练? (输入 yes 继续): ", args.yes, accept=('yes',)):
+        print("\n❌ 用户取消训练")
+        sys.exit(0)
+
+    from src.training.cotrain import CoTrainer, SUMMARY_NAME, format_summary
+
+    try:
+        cotrainer = CoTrainer(variants, model=args.model, project=args.project)
+        summary = cotrainer.train(epochs=epochs, imgsz=args.imgsz, batch=args.batch, device=args.device,
+                                  workers=args.workers, exist_ok=args.exist_ok)
+    except ValueError as e:
+        print(f"\n❌ 错误: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  训练被用户中断")
+        sys.exit(130)
+
+    print("\n" + "=" * 60)
+    print("✅ 同步训练完成！")
+    print("=" * 60)
+    print(format_summary(summary))
+    print(f"\n📄 汇总: {Path(args.project) / SUMMARY_NAME}")
+    for name, run in summary['runs'].items():
+        print(f"  {name}: {Path(run['save_dir']) / 'weights' / 'best.pt'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+无人值守地运行一组实验
+按清单 (默认 configs/experiments.yaml) 并行启动训练 / 评估脚本, 每个实验绑定独占 CPU 核并限制内存,
+中断后再次运行会跳过已成功的实验, 最后把所有实验的指标汇总成一张表 (见 src/training/scheduler.py)
+
+用法:
+    # 查看执行计划
+    python scripts/training/run_experiments.py configs/experiments.yaml --dry-run
+
+    # 后台运行
+    nohup python scripts/training/run_experiments.py configs/experiments.yaml > scheduler.out 2>&1 &
+
+    # 只汇总已有结果
+    python scripts/training/run_experiments.py configs/experiments.yaml --collect-only
+
+    # 重新运行指定实验
+    python scripts/training/run_experiments.py configs/experiments.yaml --force exp2_traditional exp2_eval
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.training.scheduler import collect_results, load_specs, load_state, run_experiments
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行运行实验清单')
+    parser.add_argument('manifest', nargs='?', default='configs/experiments.yaml', help='实验清单')
+    parser.add_argument('--state-dir', default='experiments/scheduler', help='状态文件、日志和汇总表目录')
+    parser.add_argument('--max-parallel', type=int, default=None, help='同时运行的实验数上限')
+    parser.add_argument('--only', nargs='+', default=None, help='只运行这些实验 (及其已完成的依赖)')
+    parser.add_argument('--force', nargs='+', default=[], help='即使已成功也重新运行的实验')
+    parser.add_argument('--dry-run', action='store_true', help='只打印执行计划')
+    parser.add_argument('--collect-only', action='store_true', help='不运行, 只汇总结果')
+    args = parser.parse_args()
+
+    specs = load_specs(args.manifest)
+    if args.only:
+        specs = [s for s in specs if s['name'] in args.only]
+
+    print("=" * 70)
+    print(f"🗂  实验调度: {args.manifest} ({len(specs)} 个实验)")
+    print("=" * 70)
+
+    if args.collect_only:
+        state = load_state(args.state_dir)
+    else:
+        try:
+            state = run_experiments(specs, args.state_dir, max_parallel=args.max_parallel,
+                                    force=set(args.force), dry_run=args.dry_run)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        if args.dry_run:
+            return
+
+    collect_results(specs, state, args.state_dir)
+    table = Path(args.state_dir) / 'results_table.md'
+    print("\n" + table.read_text(encoding='utf-8'))
+    print(f"📄 汇总表: {table} / {table.with_suffix('.csv')}")
+
+    failed = [s['name'] for s in specs if state.get(s['name'], {}).get('status') != 'done']
+    if failed and not args.collect_only:
+        print(f"❌ 未成功: {', '.join(failed)} (日志见 {Path(args.state_dir) / 'logs'})")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
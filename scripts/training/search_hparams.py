@@ -0,0 +1,76 @@
+"""
+超参数搜索 (增强参数 + 训练参数)
+在按类别分层的小子集上用异步逐次减半 (ASHA) 比较配置: 先用很少的轮数训练所有配置,
+排名靠前的晋级到更长的预算; 多个试验并行运行, 结果缓存, 中断后再次运行会跳过已完成的试验
+(见 src/training/hpsearch.py)
+
+用法:
+    # 查看预算和前几个配置
+    python scripts/training/search_hparams.py configs/search_traditional.yaml --dry-run
+
+    # 运行搜索
+    python scripts/training/search_hparams.py configs/search_traditional.yaml --parallel 2
+
+    # 用最佳配置在完整数据上训练 (训练参数见 best.yaml 的 search_best.train)
+    python scripts/training/train_traditional.py --data experiments/search_traditional/best.yaml
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.training.hpsearch import BEST_NAME, TABLE_NAME, load_search_config, run_search
+
+
+def main():
+    parser = argparse.ArgumentParser(description='逐次减半超参数搜索')
+    parser.add_argument('config', nargs='?', default='configs/search_traditional.yaml', help='搜索配置')
+    parser.add_argument('--output-dir', default='experiments/search_traditional',
+                        help='输出目录 (子集、试验运行目录、试验汇总表、最佳配置)')
+    parser.add_argument('--parallel', type=int, default=None, help='同时运行的试验数 (默认按可用 CPU 核数)')
+    parser.add_argument('--trials', type=int, default=None, help='最多启动的配置数 (覆盖搜索配置)')
+    parser.add_argument('--dry-run', action='store_true', help='只打印预算和前几个配置')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"🔍 超参数搜索: {args.config}")
+    print("=" * 60)
+
+    try:
+        config = load_search_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"\n❌ 错误: {e}")
+        sys.exit(1)
+    if args.trials is not None:
+        config['trials'] = args.trials
+
+    try:
+        best = run_search(config, args.output_dir, parallel=args.parallel, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"\n❌ 错误: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  搜索被用户中断 (已完成的试验已缓存, 再次运行会跳过)")
+        sys.exit(130)
+    if args.dry_run:
+        return
+    if best is None:
+        print("\n❌ 没有成功的试验")
+        sys.exit(1)
+
+    output_dir = Path(args.output_dir)
+    print("\n" + "=" * 60)
+    print("✅ 搜索完成！")
+    print("=" * 60)
+    print(f"  最佳配置: #{best['config_id']} ({best['epochs']} 轮) {config['metric']}={best['score']:.4f}")
+    for name, value in best['params'].items():
+        print(f"    {name}: {value}")
+    print(f"\n📄 试验汇总: {output_dir / TABLE_NAME}")
+    print(f"📄 最佳配置: {output_dir / BEST_NAME}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,23 @@
 - 建立性能基线
 - 验证低光照对检测性能的影响
 - 预期 mAP: 60-70%
+
+用法:
+    # 交互式 (逐项询问)
+    python scripts/training/train_baseline.py
+
+    # 非交互 (未指定的参数使用默认值, 可由 run_experiments.py 调度)
+    python scripts/training/train_baseline.py --virtual --epochs 20 --batch 16 --device cpu --yes
+
+    # 从 tar 分片训练 (scripts/preprocessing/export_shards.py 导出, 启动时顺序读入内存)
+    python scripts/training/train_baseline.py --shards data/shards/baseline_lowlight --epochs 20 --yes
+
+    # 渐进式分辨率 (320 -> 480 -> 640), 并与固定尺寸运行比较训练时间
+    python scripts/training/train_baseline.py --virtual --imgsz 640 --progressive 320,480,640 \
+        --fixed-run experiments/exp1_baseline/run --name progressive --yes
 """
 
+import argparse
 import sys
 from pathlib import Path
 import yaml
@@ -15,8 +30,87 @@ from datetime import datetime
 # 添加项目根目录到路径
 sys.path.append(str(Path(__file__).parents[2]))
 
+from src.utils.cli import add_yes_argument, ask, confirm
+
+def parse_args():
+    """命令行参数; 未指定的参数会交互询问 (--yes 时使用默认值)"""
+    parser = argparse.ArgumentParser(description='实验 1: Baseline (纯 YOLOv8，无增强)')
+    parser.add_argument('--epochs', type=int, default=None, help='训练轮数 (默认 20)')
+    parser.add_argument('--batch', type=int, default=None, help='批次大小 (默认 2)')
+    parser.add_argument('--device', default=None, help='设备 0 / cpu (默认 0)')
+    parser.add_argument('--imgsz', type=int, default=None, help='输入尺寸 (默认按训练集尺寸分布推荐)')
+    parser.add_argument('--rect', action=argparse.BooleanOptionalAction, default=None,
+                        help='矩形批次 (默认按训练集尺寸分布推荐; 与其他实验对比时显式指定)')
+    parser.add_argument('--workers', type=int, default=0, help='数据加载进程数')
+    parser.add_argument('--autotune', action=argparse.BooleanOptionalAction, default=None,
+                        help='CPU 训练前探测并自动选择 batch / workers (默认否)')
+    parser.add_argument('--memory-gb', type=float, default=None, help='自动选择时的内存预算 (默认可用内存的 80%%)')
+    parser.add_argument('--virtual', action='store_true',
+                        help='使用虚拟数据集 (configs/exp1_baseline_virtual.yaml)，训练时即时合成低光照图像')
+    parser.add_argument('--shards', default=None, metavar='DIR',
+                        help='从 export_shards.py 导出的 tar 分片目录训练 (不需要展开成小文件)')
+    parser.add_argument('--generate', action='store_true', help='数据集不存在时直接运行 create_pure_lowlight.py')
+    parser.add_argument('--pack', action=argparse.BooleanOptionalAction, default=None,
+                        help='小目标拼接训练 (默认否)')
+    parser.add_argument('--decoded-cache', action=argparse.BooleanOptionalAction, default=None,
+                        help='使用共享解码缓存 (默认是)')
+    parser.add_argument('--progressive', nargs='?', const='320:0.3,480:0.3,640:0.4', default=None,
+                        metavar='SCHEDULE', help="渐进式分辨率阶段, 如 320,480,640 或 320:0.3,480:0.3,640:0.4 "
+                                                 "(不带值时使用后者); 验证始终使用 imgsz")
+    parser.add_argument('--fixed-run', default=None, metavar='DIR',
+                        help='固定尺寸训练的运行目录, 训练结束后比较总训练时间和 mAP')
+    parser.add_argument('--early-stop', action=argparse.BooleanOptionalAction, default=True,
+                        help='mAP50 平稳或不再提升时提前停止 (默认是)')
+    parser.add_argument('--plateau-window', type=int, default=5, help='平稳判断窗口轮数')
+    parser.add_argument('--plateau-std', type=float, default=0.001, help='窗口内 mAP50 标准差低于此值视为平稳')
+    parser.add_argument('--patience', type=int, default=10, help='连续多少轮没有提升就停止 (0 表示不使用)')
+    parser.add_argument('--auto-resume', action=argparse.BooleanOptionalAction, default=True,
+                        help='同名运行被中断时从 last.pt 继续 (默认是)')
+    parser.add_argument('--cpu-profile', action='store_true',
+                        help='CPU 性能配置: 线程数 / 绑定、channels_last、CPU 支持时 bf16 autocast')
+    parser.add_argument('--compile', action='store_true', help='配合 --cpu-profile 使用 torch.compile')
+    parser.add_argument('--project', default='experiments/exp1_baseline', help='结果目录')
+    parser.add_argument('--name', default='run', help='运行名称')
+    parser.add_argument('--exist-ok', action='store_true', help='覆盖同名运行目录而不是自动编号')
+    add_yes_argument(parser)
+    return parser.parse_args()
+
+def write_config(data_root):
+    """写出 Baseline 数据集配置 configs/exp1_baseline.yaml"""
+    config = {
+        'path': str(data_root.absolute()),
+        'train': 'images/train',
+        'val': 'images/val',
+        'test': 'images/test',
+        'nc': 43,
+        'names': [
+            "speed_20", "speed_30", "speed_50", "speed_60", "speed_70", "speed_80",
+            "speed_80_end", "speed_100", "speed_120", "no_overtaking", "no_overtaking_trucks",
+            "priority_at_next_intersection", "priority_road", "give_way", "stop", "no_entry",
+            "no_entry_trucks", "no_entry_one_way", "general_caution", "dangerous_curve_left",
+            "dangerous_curve_right", "double_curve", "bumpy_road", "slippery_road", 
+            "road_narrows_right", "road_works", "traffic_signals", "pedestrians", 
+            "children_crossing", "bicycles_crossing", "ice_or_snow", "wild_animals_crossing",
+            "end_of_all_speed_and_overtaking_limits", "turn_right_ahead", "turn_left_ahead",
+            "ahead_only", "go_straight_or_right", "go_straight_or_left", "keep_right",
+            "keep_left", "roundabout_mandatory", "end_of_no_overtaking", 
+            "end_of_no_overtaking_trucks"
+        ]
+    }
+    
+    # 保存配置
+    config_dir = Path('configs')
+    config_dir.mkdir(exist_ok=True)
+    config_path = config_dir / 'exp1_baseline.yaml'
+    
+    with open(config_path, 'w') as f:
+        yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+    
+    return config_path
+
 def main():
     """主函数"""
+    args = parse_args()
     
     print("\n" + "=" * 70)
     print("  实验 1: Baseline (纯 YOLOv8，无增强)".center(70))
@@ -35,8 +129,15 @@ def main():
     
     # 检查 Baseline 专用数据
     baseline_data = Path('data/baseline_lowlight_dataset')
+    virtual_config = Path('configs/exp1_baseline_virtual.yaml')
+    use_virtual = args.virtual
+    shard_root = Path(args.shards) if args.shards else None
+    if shard_root is not None and not (shard_root / 'dataset.yaml').exists():
+        print(f"❌ 未找到分片数据集配置: {shard_root / 'dataset.yaml'}")
+        print("   请先运行 python scripts/preprocessing/export_shards.py")
+        sys.exit(1)
     
-    if not baseline_data.exists():
+    if not baseline_data.exists() and not use_virtual and shard_root is None:
         print("❌ 未找到 Baseline 数据集")
         print("\n⚠️  Baseline 实验需要【纯低光照图像】（无任何增强）")
         print("\n请先运行:")
@@ -46,9 +147,14 @@ def main():
         print("  • 不进行任何增强处理")
         print("  • 创建 YOLO 格式数据集")
         print("  • 预计耗时: 30-60 分钟")
+        print("\n也可以不生成数据集，直接读取 data/yolo_dataset 在训练时即时合成低光照图像:")
+        print(f"   {virtual_config}")
         
-        response = input("\n是否现在运行？(y/N): ").strip().lower()
-        if response == 'y':
+        response = 'y' if args.generate else ask(
+            None, "\n是否现在运行？(y=生成数据集 / v=使用虚拟数据集 / N): ", 'n', str.lower, args.yes)
+        if response == 'v':
+            use_virtual = True
+        elif response == 'y':
             print("\n启动数据生成...")
             import subprocess
             result = subprocess.run(
@@ -66,13 +172,34 @@ def main():
             print("已取消")
             sys.exit(0)
     
-    data_root = baseline_data
-    print(f"✅ 找到Baseline数据集: {data_root}")
+    if use_virtual:
+        from src.data.virtual_dataset import VirtualDataset, load_virtual_config
+        from src.data.yolo_adapter import build_trainer
+        
+        config_path, dataset_kwargs = load_virtual_config(virtual_config)
+        with open(config_path, 'r', encoding='utf-8') as f:
+            data_root = Path(yaml.safe_load(f)['path'])
+        trainer_cls = build_trainer(VirtualDataset, **dataset_kwargs)
+        print(f"✅ 使用虚拟数据集: {data_root} ({dataset_kwargs['transforms']})")
+    elif shard_root is not None:
+        from src.data.yolo_adapter import ShardDataset, build_trainer
+        
+        data_root = shard_root
+        config_path = shard_root / 'dataset.yaml'
+        trainer_cls = build_trainer(ShardDataset)
+        print(f"✅ 使用分片数据集: {data_root}")
+    else:
+        data_root = baseline_data
+        trainer_cls = None
+        print(f"✅ 找到Baseline数据集: {data_root}")
     
     # 统计数据
     for split in ['train', 'val', 'test']:
         img_dir = data_root / 'images' / split
-        if img_dir.exists():
+        if shard_root is not None and (shard_root / split / 'index.json').exists():
+            from src.data.shards import load_index
+            print(f"  {split.upper():<6}: {len(load_index(shard_root / split)['samples']):>6} 张图像")
+        elif img_dir.exists():
             img_count = len(list(img_dir.glob('*.png')) + list(img_dir.glob('*.jpg')))
             print(f"  {split.upper():<6}: {img_count:>6} 张图像")
     
@@ -81,34 +208,8 @@ def main():
     print("创建实验配置...")
     print("=" * 70)
     
-    config = {
-        'path': str(data_root.absolute()),
-        'train': 'images/train',
-        'val': 'images/val',
-        'test': 'images/test',
-        'nc': 43,
-        'names': [
-            "speed_20", "speed_30", "speed_50", "speed_60", "speed_70", "speed_80",
-            "speed_80_end", "speed_100", "speed_120", "no_overtaking", "no_overtaking_trucks",
-            "priority_at_next_intersection", "priority_road", "give_way", "stop", "no_entry",
-            "no_entry_trucks", "no_entry_one_way", "general_caution", "dangerous_curve_left",
-            "dangerous_curve_right", "double_curve", "bumpy_road", "slippery_road", 
-            "road_narrows_right", "road_works", "traffic_signals", "pedestrians", 
-            "children_crossing", "bicycles_crossing", "ice_or_snow", "wild_animals_crossing",
-            "end_of_all_speed_and_overtaking_limits", "turn_right_ahead", "turn_left_ahead",
-            "ahead_only", "go_straight_or_right", "go_straight_or_left", "keep_right",
-            "keep_left", "roundabout_mandatory", "end_of_no_overtaking", 
-            "end_of_no_overtaking_trucks"
-        ]
-    }
-    
-    # 保存配置
-    config_dir = Path('configs')
-    config_dir.mkdir(exist_ok=True)
-    config_path = config_dir / 'exp1_baseline.yaml'
-    
-    with open(config_path, 'w') as f:
-        yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+    if not use_virtual and shard_root is None:
+        config_path = write_config(data_root)
     
     print(f"✅ 配置已保存: {config_path}")
     
@@ -120,29 +221,101 @@ def main():
     print("\n请输入训练参数（直接回车使用默认值）：")
     
     # Epochs
-    epochs_input = input(f"训练轮数 Epochs (默认 20): ").strip()
-    epochs = int(epochs_input) if epochs_input else 20
+    epochs = ask(args.epochs, "训练轮数 Epochs (默认 20): ", 20, int, args.yes)
     
     # Batch size
     print("\nBatch Size 建议:")
     print("  • RTX 4060 (8GB): 使用 2 ⭐ (最稳定)")
     print("  • 如果想更快可尝试 4，但可能OOM")
-    batch_input = input(f"Batch Size (默认 2): ").strip()
-    batch = int(batch_input) if batch_input else 2
+    batch = ask(args.batch, "Batch Size (默认 2): ", 2, int, args.yes)
     
     # Device
-    device_input = input(f"设备 (0=GPU, cpu=CPU, 默认 0): ").strip()
-    device = device_input if device_input else '0'
+    device = ask(args.device, "设备 (0=GPU, cpu=CPU, 默认 0): ", '0', str, args.yes)
+    
+    # 训练模式
+    print("\n训练模式:")
+    print("  [1] 原始裁剪图 (每张放大到 640x640)")
+    print("  [2] 小目标拼接 (裁剪图按 Image Size 缩放后拼到 640x640 画布，每轮快得多) ⭐")
+    pack = args.pack
+    if pack is None:
+        pack = ask(None, "训练模式 (默认 1): ", '1', str, args.yes) == '2'
+    if pack and (use_virtual or shard_root is not None):
+        print("⚠️  虚拟数据集 / 分片数据集暂不支持拼接模式，使用原始裁剪图")
+        pack = False
+    elif pack:
+        from src.data.yolo_adapter import CanvasDataset, build_trainer
+        trainer_cls = build_trainer(CanvasDataset, canvas_size=640)
+    
+    # Image size: 按训练集尺寸分布推荐; 拼接模式下为验证/推理尺寸 (画布固定 640, 裁剪图长边缩放到 imgsz)
+    from src.data.size_analysis import format_candidates, recommend_imgsz, sizes_from_dir, sizes_from_shards
+    
+    print("\n分析训练集图像尺寸...")
+    if shard_root is not None:
+        sizes = sizes_from_shards(shard_root / 'train')
+    else:
+        sizes = sizes_from_dir(data_root / 'images' / 'train')
+    choice = recommend_imgsz(sizes, batch=batch)
+    print(format_candidates(choice))
+    imgsz = ask(args.imgsz, f"Image Size (默认 {choice['imgsz']} 推荐值，原设置为 640): ",
+                choice['imgsz'], int, args.yes)
+    rect = choice['rect'] if args.rect is None else args.rect
+    if pack:
+        rect = False  # 画布都是正方形, 验证集总是使用矩形批次
+    imgsz_analysis = {
+        'recommended': choice['imgsz'],
+        'percentile': choice['percentile'],
+        'long_side': choice['summary']['long_side'],
+        'chosen': next((c for c in choice['candidates'] if c['imgsz'] == imgsz), None),
+    }
+
+    # 共享解码缓存: 按 imgsz 解码一次，之后各次运行通过 memmap 读取，不再逐轮解码 PNG
+    decoded_cache = False
+    if not pack and not use_virtual and shard_root is None:
+        decoded_cache = args.decoded_cache
+        if decoded_cache is None:
+            decoded_cache = ask(None, "使用共享解码缓存？(Y/n): ", 'y', str.lower, args.yes) != 'n'
+        if decoded_cache:
+            from src.data.decoded_cache import ensure_decoded_cache
+            from src.data.yolo_adapter import DecodedCacheDataset, build_trainer
+            
+            for split in ['train', 'val']:
+                split_dir = data_root / 'images' / split
+                if split_dir.exists():
+                    cache = ensure_decoded_cache(split_dir, imgsz)
+                    print(f"✅ {split} 解码缓存: {cache.cache_dir} ({cache.nbytes / 1024 / 1024:.0f} MB)")
+            trainer_cls = build_trainer(DecodedCacheDataset)
+    
+    # CPU 训练: 探测数据加载和训练步骤吞吐量，自动选择 batch / workers（见 src/training/autotune.py）
+    autotune = False
+    if device == 'cpu':
+        autotune = args.autotune
+        if autotune is None:
+            autotune = ask(None, "自动选择 batch / workers？(y/N): ", 'n', str.lower, args.yes) == 'y'
+    elif args.autotune:
+        print("⚠️  自动选择仅用于 CPU 训练，GPU 可使用 batch=-1 (ultralytics AutoBatch)")
     
     print(f"\n训练配置:")
     print(f"  Epochs:     {epochs}")
-    print(f"  Batch Size: {batch}")
+    print(f"  Batch Size: {'自动 (训练前探测)' if autotune else batch}")
     print(f"  Device:     {device}")
-    print(f"  Image Size: 640")
+    print(f"  Image Size: {imgsz}{' (rect)' if rect else ''}")
+    if args.progressive:
+        print(f"  Progressive: {args.progressive} (验证 {imgsz})")
+    print(f"  Packing:    {'拼接画布' if pack else '原始裁剪图'}")
+    print(f"  Cache:      {'共享解码缓存' if decoded_cache else '无'}")
     print(f"  Model:      YOLOv8n")
     
-    response = input("\n开始训练？(y/N): ").strip().lower()
-    if response != 'y':
+    cpu_profile = None
+    if args.cpu_profile and device == 'cpu':
+        from src.training.cpu_profile import CPUProfile
+        
+        cpu_profile = CPUProfile.detect(workers=args.workers, compile=args.compile)
+        cpu_profile.apply_env()  # 导入 torch 之前设置 OpenMP 线程数和绑定
+        print(f"  CPU 配置:   {cpu_profile}")
+    elif args.cpu_profile:
+        print("⚠️  CPU 性能配置仅用于 device=cpu，已忽略")
+    
+    if not confirm("\n开始训练？(y/N): ", args.yes):
         print("已取消")
         sys.exit(0)
     
@@ -167,6 +340,58 @@ def main():
         
         print(f"✅ 模型加载成功: YOLOv8n")
         
+        # 吞吐量统计: 每次迭代的数据等待 / 前向 / 反向 / 优化器耗时, 写在 results.csv 旁边
+        from src.training.throughput import ThroughputMeter, format_summary
+        meter = ThroughputMeter().attach(model)
+        
+        # 收敛检测 + 原子检查点 + 运行状态 (被中断的运行下次自动从 last.pt 继续)
+        from src.training.convergence import ConvergenceMonitor, train_with_resume
+        monitor = ConvergenceMonitor(window=args.plateau_window, min_std=args.plateau_std,
+                                     patience=args.patience, enabled=args.early_stop).attach(model)
+        
+        # 渐进式分辨率: 只在阶段边界重建训练 dataloader (共享解码缓存按尺寸区分, 同时准备)
+        resizer = None
+        if args.progressive:
+            from src.training.progressive import ProgressiveResize
+            
+            cache_builder = None
+            if decoded_cache:
+                cache_builder = lambda size: ensure_decoded_cache(data_root / 'images' / 'train', size)
+            resizer = ProgressiveResize(args.progressive, cache_builder=cache_builder).attach(model)
+        
+        # 不使用任何数据增强（纯baseline）
+        augment_args = dict(
+            augment=False,
+            hsv_h=0.0,
+            hsv_s=0.0,
+            hsv_v=0.0,
+            degrees=0.0,
+            translate=0.0,
+            scale=0.0,
+            fliplr=0.0,
+            mosaic=0.0,
+            mixup=0.0,
+        )
+        
+        workers = args.workers
+        autotune_result = None
+        if autotune:
+            from src.training.autotune import autotune as run_autotune, keep_workers
+            
+            autotune_result = run_autotune(
+                model.ckpt_path or 'yolov8n.pt', config_path, imgsz=imgsz, trainer_cls=trainer_cls,
+                train_kwargs=dict(rect=rect, cache=False, amp=False, **augment_args),
+                memory_budget_mb=args.memory_gb * 1024 if args.memory_gb else None,
+            )
+            batch, workers = autotune_result['batch'], autotune_result['workers']
+            trainer_cls = keep_workers(trainer_cls)
+        
+        # CPU 性能配置: 线程数按最终的 workers 计算, bf16 / channels_last 在 on_train_start 开启
+        profile_args = {}
+        if cpu_profile:
+            cpu_profile = CPUProfile.detect(workers=workers, compile=args.compile).attach(model)
+            profile_args = cpu_profile.train_args()
+        
         # 训练
         print(f"\n{'=' * 70}")
         print("开始训练...")
@@ -174,32 +399,27 @@ def main():
         
         start_time = datetime.now()
         
-        results = model.train(
+        results = train_with_resume(
+            model,
+            project=args.project,
+            name=args.name,
+            trainer=trainer_cls,
+            auto_resume=args.auto_resume,
             data=str(config_path),
             epochs=epochs,
-            imgsz=640,
+            imgsz=imgsz,
+            rect=rect,
             batch=batch,
             device=device,
-            workers=0,  # 降低到0以节省显存
-            cache=False,  # 不缓存数据到内存
-            project='experiments/exp1_baseline',
-            name='run',
+            workers=workers,  # 默认 0 以节省显存
+            cache=False,  # 不使用 ultralytics 的进程内缓存（共享解码缓存通过 memmap 读取）
+            exist_ok=args.exist_ok,
             plots=True,
             save=True,
             verbose=True,
             amp=False,  # 禁用 AMP 以节省显存
-            
-            # 不使用任何数据增强（纯baseline）
-            augment=False,
-            hsv_h=0.0,
-            hsv_s=0.0,
-            hsv_v=0.0,
-            degrees=0.0,
-            translate=0.0,
-            scale=0.0,
-            fliplr=0.0,
-            mosaic=0.0,
-            mixup=0.0,
+            **augment_args,
+            **profile_args,
         )
         
         end_time = datetime.now()
@@ -211,8 +431,9 @@ def main():
         print(f"{'=' * 70}")
         
         print(f"\n训练时间: {training_time}")
+        save_dir = Path(model.trainer.save_dir)
         print(f"\n结果保存在:")
-        print(f"  experiments/exp1_baseline/run/")
+        print(f"  {save_dir}/")
         
         # 显示关键指标
         print(f"\n关键指标:")
@@ -221,17 +442,44 @@ def main():
         print(f"  mAP@0.5:0.95: {results_dict.get('metrics/mAP50-95(B)', 0):.4f}")
         print(f"  Precision:    {results_dict.get('metrics/precision(B)', 0):.4f}")
         print(f"  Recall:       {results_dict.get('metrics/recall(B)', 0):.4f}")
+        throughput = meter.summary()
+        print(format_summary(throughput))
+        if monitor.stop_reason:
+            print(f"  提前停止:     第 {monitor.stopped_epoch}/{epochs} 轮 ({monitor.stop_reason})")
+        progressive = resizer.summary() if resizer else None
+        if resizer:
+            from src.training.progressive import compare_to_fixed, format_report
+            
+            comparison = compare_to_fixed(save_dir, args.fixed_run) if args.fixed_run else None
+            print(f"\n渐进式分辨率{f' vs 固定尺寸 ({args.fixed_run})' if args.fixed_run else ''}:")
+            print(format_report(progressive, comparison))
+            progressive['comparison'] = comparison
         
         # 保存实验信息
         exp_info = {
             'experiment': 'exp1_baseline',
             'description': '纯 YOLOv8，无图像增强',
             'data': str(data_root),
+            'transforms': str(dataset_kwargs['transforms']) if use_virtual else None,
             'model': 'YOLOv8n',
             'enhancement': 'None',
+            'packing': pack,
+            'shards': str(shard_root) if shard_root else None,
+            'decoded_cache': decoded_cache,
             'epochs': epochs,
             'batch_size': batch,
+            'workers': workers,
+            'autotune': autotune_result,
+            'cpu_profile': cpu_profile.as_dict() if cpu_profile else None,
+            'device': device,
+            'save_dir': str(save_dir),
+            'imgsz': imgsz,
+            'rect': rect,
+            'imgsz_analysis': imgsz_analysis,
             'training_time': str(training_time),
+            'throughput': throughput,
+            'convergence': monitor.summary(),
+            'progressive': progressive,
             'results': {
                 'mAP50': float(results_dict.get('metrics/mAP50(B)', 0)),
                 'mAP50-95': float(results_dict.get('metrics/mAP50-95(B)', 0)),
@@ -240,7 +488,7 @@ def main():
             }
         }
         
-        exp_info_path = Path('experiments/exp1_baseline/experiment_info.yaml')
+        exp_info_path = Path(args.project) / 'experiment_info.yaml'
         with open(exp_info_path, 'w') as f:
             yaml.dump(exp_info, f, default_flow_style=False)
         
@@ -252,22 +500,24 @@ def main():
         print(f"{'=' * 70}")
         
         print("\n1. 查看训练结果:")
-        print("   experiments/exp1_baseline/run/results.png")
-        print("   experiments/exp1_baseline/run/confusion_matrix.png")
+        print(f"   {save_dir / 'results.png'}")
+        print(f"   {save_dir / 'confusion_matrix.png'}")
         
         print("\n2. 运行实验 2 (Traditional Enhancement):")
         print("   python scripts/training/train_traditional.py")
         
         print("\n3. 评估模型:")
         print("   python scripts/evaluation/evaluate_model.py \\")
-        print("       --model experiments/exp1_baseline/run/weights/best.pt \\")
-        print("       --data configs/exp1_baseline.yaml")
+        print(f"       --model {save_dir / 'weights' / 'best.pt'} \\")
+        print(f"       --data {config_path}")
         
         print(f"\n{'=' * 70}\n")
         
     except KeyboardInterrupt:
         print("\n\n⚠️  训练被用户中断")
-        print("   已保存的检查点在: experiments/exp1_baseline/run/")
+        print(f"   已保存的检查点在: {Path(args.project) / args.name}/")
+        print("   再次运行本脚本会从 last.pt 继续训练")
+        sys.exit(130)
         
     except Exception as e:
         print(f"\n{'=' * 70}")
@@ -1,18 +1,97 @@
 """
 步骤 6: 训练 YOLOv8 模型
 使用增强后的数据训练交通标志检测模型
+
+用法:
+    # 交互式 (逐项询问)
+    python scripts/training/train_traditional.py
+
+    # 非交互; --data 指向声明了 transforms 的配置时使用虚拟数据集
+    python scripts/training/train_traditional.py --data configs/exp2_traditional_virtual.yaml \\
+        --model n --epochs 20 --batch 16 --device cpu --yes
+
+    # 热启动: 从 Baseline 的 best.pt 微调, 冻结 backbone, 并与从头训练的运行比较
+    python scripts/training/train_traditional.py --data configs/exp2_traditional_virtual.yaml \\
+        --warm-start experiments/exp1_baseline --freeze backbone \\
+        --scratch-run experiments/exp2_traditional/run --device cpu --yes
+
+    # 知识蒸馏: 先训练 s 模型作为教师, 再蒸馏到 n, 并与未蒸馏的 n 比较延迟和 mAP
+    python scripts/training/train_traditional.py --data configs/exp2_traditional_virtual.yaml --model s \\
+        --project experiments/exp2_traditional --name teacher_s --device cpu --yes
+    python scripts/training/train_traditional.py --data configs/exp2_traditional_virtual.yaml --model n \\
+        --teacher experiments/exp2_traditional/teacher_s --nano-run experiments/exp2_traditional/run \\
+        --project experiments/exp2_traditional --name distill --device cpu --yes
 """
 
+import argparse
 import sys
 from pathlib import Path
 
+import yaml
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.utils.cli import add_yes_argument, ask, confirm
+
+
+def parse_args():
+    """命令行参数; 未指定的参数会交互询问 (--yes 时使用默认值)"""
+    parser = argparse.ArgumentParser(description='训练 YOLOv8 模型')
+    parser.add_argument('--data', default=str(Path(__file__).parent / 'traffic_signs_dataset.yaml'),
+                        help='数据集配置')
+    parser.add_argument('--model', choices=['n', 's', 'm', 'l'], default=None, help='模型大小 (默认 n)')
+    parser.add_argument('--epochs', type=int, default=None, help='训练轮数 (默认 50)')
+    parser.add_argument('--batch', type=int, default=None, help='批次大小 (默认 2)')
+    parser.add_argument('--device', default=None, help='设备 0 / cpu (默认 0)')
+    parser.add_argument('--imgsz', type=int, default=640, help='输入尺寸')
+    parser.add_argument('--workers', type=int, default=2, help='数据加载进程数')
+    parser.add_argument('--pack', action=argparse.BooleanOptionalAction, default=None,
+                        help='小目标拼接训练 (默认否)')
+    parser.add_argument('--autotune', action='store_true', help='CPU 训练前探测并自动选择 batch / workers')
+    parser.add_argument('--no-early-stop', action='store_true', help='不因 mAP50 平稳提前停止')
+    parser.add_argument('--no-auto-resume', action='store_true', help='不从被中断运行的 last.pt 继续')
+    parser.add_argument('--warm-start', default=None, metavar='RUN',
+                        help='从该运行 (.pt / 运行目录 / 实验目录) 的 best.pt 微调, 默认轮数缩短为 30%%')
+    parser.add_argument('--freeze', default=None,
+                        help="冻结前 N 层; 'backbone' 表示整个 backbone (10 层)")
+    parser.add_argument('--scratch-run', default=None, metavar='DIR',
+                        help='从头训练的运行目录, 训练结束后比较训练时间和 mAP')
+    parser.add_argument('--progressive', nargs='?', const='320:0.3,480:0.3,640:0.4', default=None,
+                        metavar='SCHEDULE', help='渐进式分辨率阶段, 如 320,480,640 (验证始终使用 imgsz)')
+    parser.add_argument('--fixed-run', default=None, metavar='DIR',
+                        help='固定尺寸训练的运行目录, 训练结束后比较总训练时间和 mAP')
+    parser.add_argument('--cpu-profile', action='store_true',
+                        help='CPU 性能配置: 线程数 / 绑定、channels_last、CPU 支持时 bf16 autocast')
+    parser.add_argument('--compile', action='store_true', help='配合 --cpu-profile 使用 torch.compile')
+    parser.add_argument('--teacher', default=None, metavar='RUN',
+                        help='知识蒸馏: 教师 (在同一数据上训练的 s/m 模型) 的运行目录或权重, 学生为 --model')
+    parser.add_argument('--kd-feature', type=float, default=6.0, help='特征蒸馏损失权重')
+    parser.add_argument('--kd-cls', type=float, default=1.0, help='类别输出蒸馏损失权重')
+    parser.add_argument('--kd-box', type=float, default=0.5, help='边框分布蒸馏损失权重')
+    parser.add_argument('--kd-temperature', type=float, default=2.0, help='输出蒸馏温度')
+    parser.add_argument('--nano-run', default=None, metavar='DIR',
+                        help='未蒸馏的 nano 运行目录; 蒸馏后比较教师 / 学生 / 该运行的推理延迟和 mAP')
+    parser.add_argument('--project', default='runs/train', help='结果目录')
+    parser.add_argument('--name', default='gtsrb_enlightengan', help='运行名称')
+    parser.add_argument('--exist-ok', action='store_true', help='覆盖同名运行目录而不是自动编号')
+    add_yes_argument(parser)
+    args = parser.parse_args()
+    if args.freeze is not None:
+        from src.training.warm_start import BACKBONE_LAYERS
+        args.freeze = BACKBONE_LAYERS if args.freeze == 'backbone' else int(args.freeze)
+    return args
+
+
 def main():
+    args = parse_args()
+
     print("=" * 60)
     print("🚀 步骤 6: 训练 YOLOv8 模型")
     print("=" * 60)
 
     # 检查配置文件
-    yaml_path = Path(__file__).parent / 'traffic_signs_dataset.yaml'
+    yaml_path = Path(args.data)
 
     if not yaml_path.exists():
         print(f"\n❌ 错误: 配置文件不存在: {yaml_path}")
@@ -38,12 +117,25 @@ def main():
     print("   - yolov8m.pt (Medium): 较慢，精度较高")
     print("   - yolov8l.pt (Large): 很慢，精度很高")
 
-    model_choice = input("\n请选择模型 (n/s/m/l，默认 n): ").strip().lower()
-    if model_choice not in ['n', 's', 'm', 'l']:
-        model_choice = 'n'
+    warm_args = {}
+    if args.warm_start:
+        # 热启动: 模型大小由检查点决定
+        from src.training.warm_start import WARM_START_ARGS, resolve_weights
+
+        try:
+            model_path = str(resolve_weights(args.warm_start))
+        except FileNotFoundError as e:
+            print(f"\n❌ 错误: {e}")
+            sys.exit(1)
+        warm_args = dict(WARM_START_ARGS)
+        print(f"✅ 热启动: {model_path}")
+    else:
+        model_choice = ask(args.model, "\n请选择模型 (n/s/m/l，默认 n): ", 'n', str.lower, args.yes)
+        if model_choice not in ['n', 's', 'm', 'l']:
+            model_choice = 'n'
 
-    model_path = f'yolov8{model_choice}.pt'
-    print(f"✅ 选择的模型: {model_path}")
+        model_path = f'yolov8{model_choice}.pt'
+        print(f"✅ 选择的模型: {model_path}")
 
     # 训练轮数
     print("\n2. 训练轮数 (epochs):")
@@ -52,11 +144,14 @@ def main():
     print("   - 100: 标准训练")
     print("   - 200+: 充分训练")
 
-    epochs = input("\n请输入训练轮数 (默认 50): ").strip()
-    try:
-        epochs = int(epochs)
-    except:
-        epochs = 50
+    if args.warm_start:
+        from src.training.warm_start import WARM_EPOCH_FRACTION
+
+        default_epochs = max(1, round(50 * WARM_EPOCH_FRACTION))
+        print(f"   - 热启动: 默认 {default_epochs} 轮 (从头训练的 {WARM_EPOCH_FRACTION:.0%})")
+    else:
+        default_epochs = 50
+    epochs = ask(args.epochs, f"\n请输入训练轮数 (默认 {default_epochs}): ", default_epochs, int, args.yes)
 
     print(f"✅ 训练轮数: {epochs}")
 
@@ -67,11 +162,7 @@ def main():
     print("   - 4: 标准配置 (8GB 显存)")
     print("   - 8+: 大显存 (12GB+ 显存)")
 
-    batch = input("\n请输入批次大小 (默认 2): ").strip()
-    try:
-        batch = int(batch)
-    except:
-        batch = 2
+    batch = ask(args.batch, "\n请输入批次大小 (默认 2): ", 2, int, args.yes)
 
     print(f"✅ 批次大小: {batch}")
 
@@ -80,12 +171,48 @@ def main():
     print("   - 0: 使用 GPU 0 (如果有)")
     print("   - cpu: 使用 CPU (慢但稳定)")
 
-    device = input("\n请输入设备 (0/cpu，默认 0): ").strip()
-    if not device:
-        device = '0'
+    device = ask(args.device, "\n请输入设备 (0/cpu，默认 0): ", '0', str, args.yes)
 
     print(f"✅ 设备: {device}")
 
+    # 训练模式
+    print("\n5. 训练模式:")
+    print("   - 1: 原始裁剪图 (每张放大到 640x640)")
+    print("   - 2: 小目标拼接 (多张裁剪图拼到 640x640 画布，每轮快得多)")
+
+    pack = args.pack
+    if pack is None:
+        pack = ask(None, "\n请选择训练模式 (1/2，默认 1): ", '1', str, args.yes) == '2'
+
+    # 声明了变换链的配置: 训练时即时应用变换 (见 src/data/virtual_dataset.py)
+    with open(yaml_path, 'r', encoding='utf-8') as f:
+        virtual = 'transforms' in (yaml.safe_load(f) or {})
+    if virtual and pack:
+        print("⚠️  虚拟数据集暂不支持拼接模式，使用原始裁剪图")
+        pack = False
+
+    print(f"✅ 训练模式: {'小目标拼接' if pack else '原始裁剪图'}")
+
+    teacher = None
+    if args.teacher:
+        from src.training.warm_start import resolve_weights
+
+        try:
+            teacher = str(resolve_weights(args.teacher))
+        except FileNotFoundError as e:
+            print(f"\n❌ 错误: {e}")
+            sys.exit(1)
+        from src.training.distill import check_teacher
+
+        with open(yaml_path, 'r', encoding='utf-8') as f:
+            nc = (yaml.safe_load(f) or {}).get('nc')
+        try:
+            info = check_teacher(teacher, student_nc=nc)
+        except ValueError as e:
+            print(f"\n❌ 错误: {e}")
+            sys.exit(1)
+        print(f"✅ 知识蒸馏教师: {teacher} ({info['params_M']}M 参数)")
+
     # 确认
     print("\n" + "=" * 60)
     print("训练配置总结:")
@@ -94,15 +221,23 @@ def main():
     print(f"  训练轮数: {epochs}")
     print(f"  批次大小: {batch}")
     print(f"  设备: {device}")
+    print(f"  训练模式: {'小目标拼接' if pack else '原始裁剪图'}")
+    if args.warm_start:
+        print(f"  热启动: {', '.join(f'{k}={v}' for k, v in warm_args.items())}")
+    if args.freeze:
+        print(f"  冻结层数: {args.freeze}")
+    if args.progressive:
+        print(f"  渐进式分辨率: {args.progressive} (验证 {args.imgsz})")
+    if teacher:
+        print(f"  知识蒸馏: {teacher} (特征 {args.kd_feature}, 类别 {args.kd_cls}, 边框 {args.kd_box}, "
+              f"温度 {args.kd_temperature})")
     print(f"  配置文件: {yaml_path}")
     print("\n⚠️  注意:")
     print(f"  - 预计训练时间: {epochs * 2} - {epochs * 10} 分钟")
     print("  - 训练过程中可以按 Ctrl+C 中断")
-    print("  - 结果会保存在 runs/train/gtsrb_enlightengan/")
-
-    response = input("\n是否开始训练? (输入 yes 继续): ").strip().lower()
+    print(f"  - 结果会保存在 {Path(args.project) / args.name}/")
 
-    if response != 'yes':
+    if not confirm("\n是否开始训练? (输入 yes 继续): ", args.yes, accept=('yes',)):
         print("\n❌ 用户取消训练")
         sys.exit(0)
 
@@ -114,8 +249,24 @@ def main():
     try:
         from enlightened_gtsrb import GTSRBEnlightenGANDetector
         
+        trainer = None
+        dataset_kwargs = None
+        data_path = str(yaml_path)
+        if virtual:
+            from src.data.virtual_dataset import VirtualDataset, load_virtual_config
+            from src.data.yolo_adapter import build_trainer
+
+            data_path, dataset_kwargs = load_virtual_config(yaml_path)
+            trainer = build_trainer(VirtualDataset, **dataset_kwargs)
+            print(f"\n✅ 使用虚拟数据集 ({dataset_kwargs['transforms']})")
+
+        cpu_profile = None
+        if args.cpu_profile:
+            from src.training.cpu_profile import CPUProfile
+            cpu_profile = CPUProfile.detect(workers=args.workers, compile=args.compile)
+
         # 创建检测器
-        detector = GTSRBEnlightenGANDetector(config_path=str(yaml_path))
+        detector = GTSRBEnlightenGANDetector(config_path=data_path)
         
         # 加载模型
         print(f"\n加载模型: {model_path}")
@@ -127,10 +278,24 @@ def main():
         
         results = detector.train_yolov8(
             epochs=epochs,
-            imgsz=640,
+            imgsz=args.imgsz,
             batch=batch,
             device=device,
-            workers=2  # 减少worker数量以节省显存
+            workers=args.workers,  # 默认 2 以节省显存
+            pack=pack,
+            trainer=trainer,
+            project=args.project,
+            name=args.name,
+            exist_ok=args.exist_ok,
+            autotune=args.autotune,
+            early_stop=not args.no_early_stop,
+            auto_resume=not args.no_auto_resume,
+            freeze=args.freeze,
+            progressive=args.progressive,
+            cpu_profile=cpu_profile,
+            distill={'teacher': teacher, 'feature_weight': args.kd_feature, 'cls_weight': args.kd_cls,
+                     'box_weight': args.kd_box, 'temperature': args.kd_temperature} if teacher else None,
+            **warm_args
         )
         
         print("\n" + "=" * 60)
@@ -138,8 +303,9 @@ def main():
         print("=" * 60)
         
         # 找到最佳模型
-        best_model_path = Path('runs/train/gtsrb_enlightengan/weights/best.pt')
-        last_model_path = Path('runs/train/gtsrb_enlightengan/weights/last.pt')
+        results_dir = Path(detector.yolo_model.trainer.save_dir)
+        best_model_path = results_dir / 'weights' / 'best.pt'
+        last_model_path = results_dir / 'weights' / 'last.pt'
         
         if best_model_path.exists():
             print(f"\n✅ 最佳模型已保存: {best_model_path}")
@@ -153,8 +319,62 @@ def main():
         if last_model_path.exists():
             print(f"✅ 最后模型已保存: {last_model_path}")
         
+        # 吞吐量汇总 (明细见 throughput.csv)
+        from src.training.throughput import format_summary
+        print(f"\n{format_summary(detector.throughput)}")
+        exp_info = {
+            'data': str(yaml_path),
+            'model': model_path,
+            'epochs': epochs,
+            'batch_size': (detector.autotune_result or {}).get('batch', batch),
+            'device': device,
+            'autotune': detector.autotune_result,
+            'packing': pack,
+            'save_dir': str(results_dir),
+            'throughput': detector.throughput,
+            'convergence': detector.convergence,
+            'cpu_profile': detector.cpu_profile.as_dict() if detector.cpu_profile else None,
+        }
+        if args.warm_start:
+            exp_info['warm_start'] = {'weights': model_path, 'freeze': args.freeze, **warm_args}
+        elif args.freeze:
+            exp_info['freeze'] = args.freeze
+        if args.scratch_run:
+            # 与从头训练的运行比较训练时间和 mAP
+            from src.training.warm_start import compare_runs, format_report
+
+            report = compare_runs(results_dir, args.scratch_run)
+            print(f"\n热启动 vs 从头训练 ({args.scratch_run}):")
+            print(format_report(report))
+            exp_info['warm_start_report'] = report
+        if detector.progressive:
+            from src.training.progressive import compare_to_fixed, format_report as format_progressive
+
+            comparison = compare_to_fixed(results_dir, args.fixed_run) if args.fixed_run else None
+            print(f"\n渐进式分辨率{f' vs 固定尺寸 ({args.fixed_run})' if args.fixed_run else ''}:")
+            print(format_progressive(detector.progressive, comparison))
+            exp_info['progressive'] = {**detector.progressive, 'comparison': comparison}
+        if detector.distillation:
+            # 教师 / 蒸馏学生 / (可选) 未蒸馏 nano 的推理延迟和 mAP
+            from src.training.distill import compare_models, format_comparison, sample_images
+            from src.training.warm_start import resolve_weights
+
+            models = {'teacher': teacher, 'student (distilled)': str(best_model_path)}
+            if args.nano_run:
+                models['nano'] = str(resolve_weights(args.nano_run))
+            validator = None
+            if virtual:
+                from src.data.virtual_dataset import VirtualDataset
+                from src.data.yolo_adapter import build_validator
+                validator = build_validator(VirtualDataset, **dataset_kwargs)
+            print("\n知识蒸馏: 推理延迟 (CPU, batch=1) 与 mAP (val):")
+            rows = compare_models(models, data_path, sample_images(data_path), imgsz=args.imgsz, validator=validator)
+            print(format_comparison(rows))
+            exp_info['distillation'] = {**detector.distillation, 'comparison': rows}
+        with open(results_dir / 'experiment_info.yaml', 'w', encoding='utf-8') as f:
+            yaml.dump(exp_info, f, default_flow_style=False, allow_unicode=True)
+        
         # 显示结果
-        results_dir = Path('runs/train/gtsrb_enlightengan')
         if results_dir.exists():
             print(f"\n📊 训练结果目录: {results_dir}")
             print("\n在这个目录中你可以找到:")
@@ -166,7 +386,7 @@ def main():
         
         print("\n" + "=" * 60)
         print("下一步:")
-        print("  1. 查看训练结果: 打开 runs/train/gtsrb_enlightengan/results.png")
+        print(f"  1. 查看训练结果: 打开 {results_dir / 'results.png'}")
         print("  2. 评估模型: python step7_evaluate_model.py")
         print("  3. 测试单张图像: python step8_test_single_image.py")
         print("=" * 60)
@@ -174,7 +394,8 @@ def main():
     except KeyboardInterrupt:
         print("\n\n⚠️  训练被用户中断")
         print("   已保存的模型和结果保留在 runs/train/ 目录中")
-        print("   你可以稍后继续训练或使用当前的模型")
+        print("   再次运行本脚本会从 last.pt 继续训练，也可以直接使用当前的模型")
+        sys.exit(130)
         
     except Exception as e:
         print("\n" + "=" * 60)
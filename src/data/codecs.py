@@ -0,0 +1,195 @@
+"""
+派生图像的输出编码
+所有数据集写入器通过编码器写出图像, 每个阶段可按需选择:
+
+    png[:级别]    无损, 级别 0-9 (0 最快/最大, 9 最慢/最小), 默认 1
+    webp          无损 WebP, 体积通常小于 PNG
+    npy           原始 uint8 数组, 几乎没有编解码开销, 但体积最大;
+                  ultralytics 不能直接读取, 只适合作为阶段之间的中间结果
+    jpg[:质量]    有损 JPEG, 质量 1-100, 默认 95; 仅用于可丢弃的临时变体
+
+用法:
+    from src.data.codecs import get_codec, read_image
+
+    codec = get_codec('png:1')
+    codec.write(codec.output_path('out/a.png'), image)
+    image = read_image('out/a.png')
+"""
+
+import io
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class ImageCodec:
+    """编码器基类"""
+
+    name = None
+    suffix = None
+    lossless = True
+    # get_codec 接受的描述形式 (构造函数有参数的编码器为 '名称[:范围]')
+    usage = None
+
+    def encode(self, image):
+        """编码为字节"""
+        raise NotImplementedError
+
+    def decode(self, data):
+        """从字节解码为 BGR 图像"""
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+    @property
+    def spec(self):
+        """可传给 get_codec 的描述字符串, 同时用于变换清单的参数"""
+        return self.name
+
+    def output_path(self, path):
+        """将输出路径的扩展名替换为本编码器的扩展名"""
+        return Path(path).with_suffix(self.suffix)
+
+    def write(self, path, image):
+        """先写临时文件再重命名, 中断时不会留下损坏的输出"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(self.encode(image))
+        os.replace(tmp, path)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.spec!r})'
+
+
+class PNGCodec(ImageCodec):
+    name = 'png'
+    suffix = '.png'
+    usage = 'png[:0-9]'
+
+    def __init__(self, level=1):
+        if not 0 <= int(level) <= 9:
+            raise ValueError(f"PNG 压缩级别应为 0-9: {level} (应为 {self.usage})")
+        self.level = int(level)
+
+    @property
+    def spec(self):
+        return f'png:{self.level}'
+
+    def encode(self, image):
+        ok, buf = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, self.level])
+        if not ok:
+            raise IOError("PNG 编码失败")
+        return buf.tobytes()
+
+
+class WebPCodec(ImageCodec):
+    """无损 WebP (OpenCV 中质量 > 100 即为无损模式)"""
+
+    name = 'webp'
+    suffix = '.webp'
+    usage = 'webp'
+
+    def encode(self, image):
+        ok, buf = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, 101])
+        if not ok:
+            raise IOError("WebP 编码失败")
+        return buf.tobytes()
+
+
+class NpyCodec(ImageCodec):
+    """原始数组 (.npy), 解码时无需解压"""
+
+    name = 'npy'
+    suffix = '.npy'
+    usage = 'npy'
+
+    def encode(self, image):
+        buf = io.BytesIO()
+        np.save(buf, np.ascontiguousarray(image), allow_pickle=False)
+        return buf.getvalue()
+
+    def decode(self, data):
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+class JPEGCodec(ImageCodec):
+    name = 'jpg'
+    suffix = '.jpg'
+    lossless = False
+    usage = 'jpg[:1-100]'
+
+    def __init__(self, quality=95):
+        if not 1 <= int(quality) <= 100:
+            raise ValueError(f"JPEG 质量应为 1-100: {quality} (应为 {self.usage})")
+        self.quality = int(quality)
+
+    @property
+    def spec(self):
+        return f'jpg:{self.quality}'
+
+    def encode(self, image):
+        ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise IOError("JPEG 编码失败")
+        return buf.tobytes()
+
+
+CODECS = {
+    'png': PNGCodec,
+    'webp': WebPCodec,
+    'npy': NpyCodec,
+    'jpg': JPEGCodec,
+    'jpeg': JPEGCodec,
+}
+
+DEFAULT_CODEC = 'png:1'
+
+
+def get_codec(spec=None):
+    """
+    根据描述字符串创建编码器
+
+    Args:
+        spec: 'png', 'png:6', 'webp', 'npy', 'jpg:90' 等; 也可直接传入 ImageCodec 实例;
+              为 None 时使用默认的 png:1
+
+    Returns:
+        codec: ImageCodec 实例
+
+    Raises:
+        ValueError: 未知的编码器, 或参数不符合该编码器接受的形式 (如 'webp:90')
+    """
+    if isinstance(spec, ImageCodec):
+        return spec
+    spec = spec or DEFAULT_CODEC
+    name, _, arg = str(spec).lower().partition(':')
+    if name not in CODECS:
+        raise ValueError(f"未知的编码器: {spec}，可选: {', '.join(sorted(CODECS))}")
+    cls = CODECS[name]
+    if not arg:
+        return cls()
+    if cls.usage == cls.name:
+        raise ValueError(f"编码器 {cls.name} 不接受参数: {spec} (应为 {cls.usage})")
+    try:
+        value = int(arg)
+    except ValueError:
+        raise ValueError(f"编码器参数应为整数: {spec} (应为 {cls.usage})") from None
+    return cls(value)
+
+
+def read_image(path):
+    """
+    读取任意编码器写出的图像 (BGR)
+
+    Returns:
+        image: 图像数组; 读取失败时返回 None (与 cv2.imread 一致)
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.npy':
+        try:
+            return np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+    return cv2.imread(str(path))
@@ -0,0 +1,275 @@
+"""
+共享解码缓存
+把一个图像目录按训练 imgsz 解码并缩放 (与 ultralytics load_image 相同: 长边缩放到 imgsz),
+紧凑地写入一个 uint8 文件, 训练时通过 np.memmap 读取:
+
+- 一次构建 (多进程并行), 之后所有实验、所有运行共享, 由操作系统页缓存负责驻留内存
+- 每个源文件记录大小、修改时间和内容哈希, 打开前校验; 内容改变的图像原地更新,
+  文件增删或尺寸变化时整体重建
+- 不像 ultralytics 的 cache='ram' 那样每次运行都重新解码并占用进程内存
+
+目录结构 (cache_root/<划分名>-<目录哈希>-<imgsz>/):
+    images.bin      # 缩放后的像素 (BGR, uint8) 首尾相接
+    index.npy       # 结构化数组: offset / height / width / h0 / w0
+    sources.json    # imgsz、源目录和每个源文件的 name / size / mtime_ns / hash (最后写入, 作为完成标记)
+
+用法:
+    from src.data.decoded_cache import ensure_decoded_cache
+    from src.data.yolo_adapter import DecodedCacheDataset, build_trainer
+
+    for split in ['train', 'val']:
+        ensure_decoded_cache(f'data/yolo_dataset/images/{split}', imgsz=640)
+    model.train(..., imgsz=640, trainer=build_trainer(DecodedCacheDataset))
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.data.transform_runner import file_hash
+
+
+DEFAULT_CACHE_ROOT = Path(__file__).parents[2] / 'data' / 'cache' / 'decoded'
+
+INDEX_DTYPE = np.dtype([
+    ('offset', np.int64),
+    ('height', np.int32),
+    ('width', np.int32),
+    ('h0', np.int32),
+    ('w0', np.int32),
+])
+
+# 每个子进程一次处理的图像数
+CHUNK_SIZE = 512
+
+
+def resized_shape(h0, w0, imgsz):
+    """与 FrameSourceDataset.load_image (rect_mode) 相同的缩放尺寸"""
+    r = imgsz / max(h0, w0)
+    if r == 1:
+        return h0, w0
+    return min(int(round(h0 * r)), imgsz), min(int(round(w0 * r)), imgsz)
+
+
+def cache_dir_for(images_dir, imgsz, cache_root=None):
+    """图像目录 + imgsz 对应的缓存目录"""
+    images_dir = Path(images_dir).resolve()
+    digest = hashlib.blake2b(str(images_dir).encode('utf-8'), digest_size=4).hexdigest()
+    return Path(cache_root or DEFAULT_CACHE_ROOT) / f'{images_dir.name}-{digest}-{imgsz}'
+
+
+def _temp_path(cache_dir, name):
+    """在缓存目录中创建本进程独有的临时文件 (多个任务同时构建同一缓存时不会互相覆盖)"""
+    fd, tmp = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=cache_dir)
+    os.close(fd)
+    return Path(tmp)
+
+
+def _fill_chunk(blob_path, entries, imgsz):
+    """子进程: 解码、缩放并写入一组图像, 返回各源文件的哈希"""
+    blob = np.memmap(blob_path, dtype=np.uint8, mode='r+')
+    hashes = []
+    for path, offset, height, width in entries:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise IOError(f"无法读取图像: {path}")
+        h0, w0 = image.shape[:2]
+        if resized_shape(h0, w0, imgsz) != (height, width):
+            raise ValueError(f"图像尺寸与文件头不一致: {path}")
+        if (height, width) != (h0, w0):
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR)
+        blob[offset:offset + image.nbytes] = image.reshape(-1)
+        hashes.append(file_hash(path))
+    blob.flush()
+    del blob
+    return hashes
+
+
+def _run_fill(blob_path, entries, imgsz, workers, desc):
+    """把写入任务分块分发到进程池, 返回按顺序排列的哈希"""
+    chunks = [entries[i:i + CHUNK_SIZE] for i in range(0, len(entries), CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(chunks) <= 1:
+        results = [_fill_chunk(blob_path, chunk, imgsz) for chunk in chunks]
+    else:
+        from tqdm import tqdm
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_fill_chunk, blob_path, chunk, imgsz) for chunk in chunks]
+            results = [f.result() for f in tqdm(futures, desc=desc, unit='批')]
+    return [h for chunk_hashes in results for h in chunk_hashes]
+
+
+def build_decoded_cache(images_dir, imgsz, cache_root=None, workers=None):
+    """
+    (重新) 构建一个图像目录的解码缓存
+
+    Args:
+        images_dir: 图像目录 (如 data/yolo_dataset/images/train)
+        imgsz: 训练 imgsz
+        cache_root: 缓存根目录 (默认 data/cache/decoded)
+        workers: 进程数 (默认 CPU 核数)
+
+    Returns:
+        cache_dir: 缓存目录
+    """
+    from src.data.image_store import list_image_files
+    from src.data.packing import read_image_sizes
+
+    images_dir = Path(images_dir)
+    cache_dir = cache_dir_for(images_dir, imgsz, cache_root)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    files = list_image_files(images_dir)
+    sizes = read_image_sizes(files)
+
+    index = np.zeros(len(files), dtype=INDEX_DTYPE)
+    offset = 0
+    for i, (w0, h0) in enumerate(sizes):
+        height, width = resized_shape(int(h0), int(w0), imgsz)
+        index[i] = (offset, height, width, h0, w0)
+        offset += height * width * 3
+
+    print(f"构建解码缓存: {images_dir} @ {imgsz} ({len(files)} 张, {offset / 1024 / 1024:.0f} MB)")
+
+    # 先在临时文件中写入, 全部完成后再替换, 中断不会留下半个缓存
+    sources_path = cache_dir / 'sources.json'
+    sources_path.unlink(missing_ok=True)
+    tmp_blob = _temp_path(cache_dir, 'images.bin')
+    with open(tmp_blob, 'wb') as f:
+        f.truncate(max(offset, 1))
+
+    entries = [(str(f), int(r['offset']), int(r['height']), int(r['width'])) for f, r in zip(files, index)]
+    try:
+        hashes = _run_fill(tmp_blob, entries, imgsz, workers, desc="解码缓存")
+    except BaseException:
+        tmp_blob.unlink(missing_ok=True)
+        raise
+
+    sources = []
+    for f, digest in zip(files, hashes):
+        st = f.stat()
+        sources.append({'name': f.name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': digest})
+
+    os.replace(tmp_blob, cache_dir / 'images.bin')
+    tmp_index = _temp_path(cache_dir, 'index.npy')
+    with open(tmp_index, 'wb') as f:
+        np.save(f, index)
+    os.replace(tmp_index, cache_dir / 'index.npy')
+    _write_sources(cache_dir, imgsz, images_dir, sources)
+    return cache_dir
+
+
+def _write_sources(cache_dir, imgsz, images_dir, sources):
+    tmp = _temp_path(cache_dir, 'sources.json')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'imgsz': imgsz, 'images_dir': str(Path(images_dir).resolve()), 'files': sources}, f)
+    os.replace(tmp, cache_dir / 'sources.json')
+
+
+def validate_decoded_cache(images_dir, imgsz, cache_root=None, workers=None):
+    """
+    校验缓存与源目录是否一致, 能原地修复的直接修复
+
+    Returns:
+        ok: True 表示缓存可用; False 表示缓存不存在或需要整体重建
+    """
+    from src.data.image_store import list_image_files
+    from src.data.packing import read_image_sizes
+
+    images_dir = Path(images_dir)
+    cache_dir = cache_dir_for(images_dir, imgsz, cache_root)
+    sources_path = cache_dir / 'sources.json'
+    if not sources_path.exists():
+        return False
+
+    with open(sources_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    files = list_image_files(images_dir)
+    if meta['imgsz'] != imgsz or [s['name'] for s in meta['files']] != [f.name for f in files]:
+        return False
+
+    # 大小和修改时间未变的直接认为一致, 否则比较内容哈希
+    stale = []
+    for i, (f, source) in enumerate(zip(files, meta['files'])):
+        st = f.stat()
+        if st.st_size == source['size'] and st.st_mtime_ns == source['mtime_ns']:
+            continue
+        digest = file_hash(f)
+        if digest != source['hash']:
+            stale.append(i)
+        source.update(size=st.st_size, mtime_ns=st.st_mtime_ns, hash=digest)
+
+    if stale:
+        index = np.load(cache_dir / 'index.npy')
+        sizes = read_image_sizes([files[i] for i in stale])
+        if any((int(h0), int(w0)) != (int(index[i]['h0']), int(index[i]['w0'])) for i, (w0, h0) in zip(stale, sizes)):
+            return False
+        print(f"解码缓存中 {len(stale)} 张图像已改变, 原地更新")
+        entries = [(str(files[i]), int(index[i]['offset']), int(index[i]['height']), int(index[i]['width']))
+                   for i in stale]
+        _run_fill(cache_dir / 'images.bin', entries, imgsz, workers, desc="更新缓存")
+
+    _write_sources(cache_dir, imgsz, images_dir, meta['files'])
+    return True
+
+
+def ensure_decoded_cache(images_dir, imgsz, cache_root=None, workers=None):
+    """校验缓存, 不可用时重建; 返回打开的 DecodedImageCache"""
+    if not validate_decoded_cache(images_dir, imgsz, cache_root, workers):
+        build_decoded_cache(images_dir, imgsz, cache_root, workers)
+    return DecodedImageCache(cache_dir_for(images_dir, imgsz, cache_root))
+
+
+class DecodedImageCache:
+    """
+    解码缓存读取器
+    每张图像是 images.bin 上的只读 memmap 视图
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        sources_path = self.cache_dir / 'sources.json'
+        if not sources_path.exists():
+            raise FileNotFoundError(f"解码缓存不存在: {self.cache_dir}")
+
+        with open(sources_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.imgsz = meta['imgsz']
+        self.names = [s['name'] for s in meta['files']]
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self.index = np.load(self.cache_dir / 'index.npy')
+        self._blob = np.memmap(self.cache_dir / 'images.bin', dtype=np.uint8, mode='r')
+
+    @classmethod
+    def open(cls, images_dir, imgsz, cache_root=None):
+        """打开已构建的缓存, 不存在时返回 None (不做校验, 校验由 ensure_decoded_cache 在训练前完成)"""
+        try:
+            return cls(cache_dir_for(images_dir, imgsz, cache_root))
+        except FileNotFoundError:
+            return None
+
+    def __len__(self):
+        return len(self.names)
+
+    def index_of(self, name):
+        return self._positions.get(name)
+
+    def __getitem__(self, i):
+        """
+        Returns:
+            (image, (h0, w0)): image 为只读视图, 修改前需要复制
+        """
+        offset, height, width, h0, w0 = self.index[i]
+        view = self._blob[offset:offset + int(height) * int(width) * 3]
+        return view.reshape(int(height), int(width), 3), (int(h0), int(w0))
+
+    @property
+    def nbytes(self):
+        return int(self._blob.shape[0])
@@ -0,0 +1,336 @@
+"""
+打包图像存储 (Packed Image Store)
+将一个数据划分 (train/val/test) 的所有图像解码后连续写入一个 uint8 文件,
+并用偏移量/形状索引定位每张图像, 读取时通过 np.memmap 零拷贝得到 numpy 视图
+
+GTSRB 图像很小, 逐个打开并解码 PNG 的开销远大于像素本身,
+打包后读取整个划分只需顺序访问一个文件
+
+目录结构:
+    store_root/
+        train.bin         # 所有图像像素 (BGR, uint8, 行优先) 首尾相接
+        train.idx.npy     # 结构化数组: offset / height / width / channels
+        train.keys.json   # 与索引一一对应的文件名 (如 train_00000_000000.png)
+        train.sources.json  # 打包时源目录中每个文件的大小和修改时间, 用于判断存储是否过期
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+INDEX_DTYPE = np.dtype([
+    ('offset', np.int64),
+    ('height', np.int32),
+    ('width', np.int32),
+    ('channels', np.int32),
+])
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.ppm', '.bmp', '.webp']
+
+
+def _split_paths(store_root, split):
+    """返回某个划分的 (像素文件, 索引文件, 键文件) 路径"""
+    store_root = Path(store_root)
+    return (
+        store_root / f'{split}.bin',
+        store_root / f'{split}.idx.npy',
+        store_root / f'{split}.keys.json',
+    )
+
+
+def _sources_path(store_root, split):
+    return Path(store_root) / f'{split}.sources.json'
+
+
+def _source_stats(image_files):
+    """源文件的 [{'name', 'size', 'mtime_ns'}, ...]"""
+    stats = []
+    for path in image_files:
+        st = os.stat(path)
+        stats.append({'name': Path(path).name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns})
+    return stats
+
+
+class PackedImageWriter:
+    """
+    打包存储写入器
+    逐张追加解码后的图像, close() 时写出索引
+
+    所有文件先写入临时文件, 关闭时再原子替换,
+    中途失败不会留下半截的存储
+    """
+
+    def __init__(self, store_root, split):
+        """
+        初始化写入器
+
+        Args:
+            store_root: 存储根目录
+            split: 数据划分名称 ('train', 'val', 'test' 等)
+        """
+        self.store_root = Path(store_root)
+        self.split = split
+        self.store_root.mkdir(parents=True, exist_ok=True)
+
+        self.blob_path, self.index_path, self.keys_path = _split_paths(self.store_root, split)
+        self._tmp_blob = self.blob_path.with_name(self.blob_path.name + '.tmp')
+        self._blob = open(self._tmp_blob, 'wb')
+        self._offset = 0
+        self._records = []
+        self._keys = []
+        self._seen = set()
+        # 源文件状态 (见 _source_stats); 设置后随存储写出, store_is_current 据此判断存储是否过期
+        self.sources = None
+
+    def add(self, key, image):
+        """
+        追加一张图像
+
+        Args:
+            key: 图像键 (通常为原始文件名)
+            image: uint8 图像数组, (H, W) 或 (H, W, C)
+        """
+        if key in self._seen:
+            raise ValueError(f"重复的图像键: {key}")
+
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        if image.ndim == 2:
+            height, width = image.shape
+            channels = 1
+        else:
+            height, width, channels = image.shape
+
+        self._blob.write(image.tobytes())
+        self._records.append((self._offset, height, width, channels))
+        self._keys.append(str(key))
+        self._seen.add(key)
+        self._offset += image.nbytes
+
+    def __len__(self):
+        return len(self._keys)
+
+    def close(self):
+        """写出索引并原子替换为正式文件"""
+        if self._blob is None:
+            return
+        self._blob.close()
+        self._blob = None
+
+        index = np.array(self._records, dtype=INDEX_DTYPE)
+        tmp_index = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(tmp_index, 'wb') as f:
+            np.save(f, index)
+
+        tmp_keys = self.keys_path.with_name(self.keys_path.name + '.tmp')
+        with open(tmp_keys, 'w', encoding='utf-8') as f:
+            json.dump(self._keys, f)
+
+        # 先删除旧的源文件记录, 替换中途失败时存储被视为过期而不是误判为最新
+        sources_path = _sources_path(self.store_root, self.split)
+        sources_path.unlink(missing_ok=True)
+        os.replace(self._tmp_blob, self.blob_path)
+        os.replace(tmp_index, self.index_path)
+        os.replace(tmp_keys, self.keys_path)
+        if self.sources is not None:
+            tmp_sources = sources_path.with_name(sources_path.name + '.tmp')
+            with open(tmp_sources, 'w', encoding='utf-8') as f:
+                json.dump(self.sources, f)
+            os.replace(tmp_sources, sources_path)
+
+    def abort(self):
+        """放弃写入, 删除临时文件"""
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
+        self._tmp_blob.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class PackedImageStore:
+    """
+    打包存储读取器
+    通过 np.memmap 打开像素文件, 每张图像都是只读的零拷贝视图
+    """
+
+    def __init__(self, store_root, split):
+        """
+        打开一个划分的存储
+
+        Args:
+            store_root: 存储根目录
+            split: 数据划分名称
+        """
+        self.store_root = Path(store_root)
+        self.split = split
+        self.blob_path, self.index_path, self.keys_path = _split_paths(self.store_root, split)
+
+        if not self.index_path.exists():
+            raise FileNotFoundError(f"存储不存在: {self.index_path}")
+
+        self.index = np.load(self.index_path)
+        with open(self.keys_path, 'r', encoding='utf-8') as f:
+            self.keys = json.load(f)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+
+        if self.blob_path.stat().st_size > 0:
+            self._blob = np.memmap(self.blob_path, dtype=np.uint8, mode='r')
+        else:
+            self._blob = np.zeros(0, dtype=np.uint8)
+
+    @staticmethod
+    def available_splits(store_root):
+        """列出存储目录中已有的划分"""
+        return sorted(p.name[:-len('.idx.npy')] for p in Path(store_root).glob('*.idx.npy'))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __getitem__(self, i):
+        """
+        按位置读取图像
+
+        Returns:
+            image: 只读 uint8 视图 (BGR), 形状 (H, W, C) 或 (H, W)
+        """
+        offset, height, width, channels = self.index[i]
+        size = int(height) * int(width) * int(channels)
+        view = self._blob[offset:offset + size]
+        if channels == 1:
+            return view.reshape(int(height), int(width))
+        return view.reshape(int(height), int(width), int(channels))
+
+    def index_of(self, key):
+        """返回键对应的位置, 不存在时返回 None"""
+        return self._positions.get(key)
+
+    def get(self, key):
+        """按键读取图像, 不存在时返回 None"""
+        i = self._positions.get(key)
+        return None if i is None else self[i]
+
+    def shape_of(self, i):
+        """不读取像素, 直接从索引返回 (H, W)"""
+        return int(self.index[i]['height']), int(self.index[i]['width'])
+
+    def __iter__(self):
+        """按写入顺序遍历 (key, image)"""
+        for i, key in enumerate(self.keys):
+            yield key, self[i]
+
+    @property
+    def nbytes(self):
+        """像素数据总字节数"""
+        return int(self._blob.shape[0])
+
+
+def list_image_files(images_dir):
+    """按文件名排序列出目录中的图像文件"""
+    images_dir = Path(images_dir)
+    return sorted(p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def pack_image_dir(images_dir, store_root, split=None, desc=None):
+    """
+    将一个图像目录打包为存储中的一个划分
+
+    Args:
+        images_dir: 图像目录 (如 yolo_dataset/images/train)
+        store_root: 存储根目录
+        split: 划分名称 (默认使用目录名)
+        desc: 进度条描述
+
+    Returns:
+        count: 打包的图像数
+    """
+    import cv2
+    from tqdm import tqdm
+
+    images_dir = Path(images_dir)
+    split = split or images_dir.name
+    image_files = list_image_files(images_dir)
+    # 读取像素之前记录源文件状态, 打包期间被修改的文件下次检查时会被发现
+    sources = _source_stats(image_files)
+
+    count = 0
+    with PackedImageWriter(store_root, split) as writer:
+        writer.sources = sources
+        for img_file in tqdm(image_files, desc=desc or f"打包 {split}"):
+            image = cv2.imread(str(img_file))
+            if image is None:
+                continue
+            writer.add(img_file.name, image)
+            count += 1
+
+    return count
+
+
+def store_is_current(store_root, split, images_dir):
+    """
+    判断存储中的划分是否与源图像目录一致 (文件列表、大小、修改时间都相同)
+    没有源文件记录的存储 (旧版本打包) 视为过期
+    """
+    sources_path = _sources_path(store_root, split)
+    if not sources_path.exists() or not _split_paths(store_root, split)[1].exists():
+        return False
+    with open(sources_path, 'r', encoding='utf-8') as f:
+        recorded = json.load(f)
+    try:
+        return recorded == _source_stats(list_image_files(images_dir))
+    except OSError:
+        return False
+
+
+def ensure_image_store(images_dir, store_root, split=None):
+    """
+    确保存储中的划分是最新的; 不存在或已过期时重新打包
+
+    Returns:
+        rebuilt: 是否重新打包
+    """
+    split = split or Path(images_dir).name
+    if store_is_current(store_root, split, images_dir):
+        return False
+    if _split_paths(store_root, split)[1].exists():
+        print(f"⚠️  图像存储 {Path(store_root) / split} 与 {images_dir} 不一致, 重新打包")
+    pack_image_dir(images_dir, store_root, split)
+    return True
+
+
+def pack_yolo_dataset(dataset_root, store_root=None, splits=('train', 'val', 'test')):
+    """
+    将 YOLO 格式数据集 (images/<split>) 的所有划分打包
+
+    Args:
+        dataset_root: 数据集根目录
+        store_root: 存储根目录 (默认为 dataset_root/store)
+        splits: 需要打包的划分
+
+    Returns:
+        store_root: 存储根目录
+    """
+    dataset_root = Path(dataset_root)
+    store_root = Path(store_root) if store_root else dataset_root / 'store'
+
+    for split in splits:
+        images_dir = dataset_root / 'images' / split
+        if not images_dir.exists():
+            continue
+        count = pack_image_dir(images_dir, store_root, split)
+        print(f"✅ {split}: 打包 {count} 张图像")
+
+    return store_root
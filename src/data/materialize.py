@@ -0,0 +1,192 @@
+"""
+派生数据集物化工具
+派生数据集中未改变的文件 (标签 .txt、原样保留的图像) 不再逐字节复制,
+而是按 reflink -> 硬链接 -> 复制 的顺序尝试创建 (也可显式指定符号链接),
+跨文件系统时自动回退为复制; 多个文件并行处理
+
+用法:
+    from src.data.materialize import materialize_tree
+    stats = materialize_tree('data/yolo_dataset/labels/train', 'data/new_variant/labels/train', '*.txt')
+"""
+
+import errno
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+# Linux FICLONE ioctl (btrfs / xfs / overlayfs 等支持写时复制的文件系统)
+FICLONE = 0x40049409
+
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'symlink', 'copy')
+
+# 这些错误表示当前方式不可用 (跨设备、不支持等), 应继续尝试下一种方式
+_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.EACCES, errno.EINVAL, errno.ENOTTY,
+    errno.EOPNOTSUPP, errno.ENOTSUP, errno.EMLINK, errno.ENOSYS,
+}
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        # Windows 没有 fcntl: 与文件系统不支持 FICLONE 一样, 继续尝试下一种方式
+        raise OSError(errno.EOPNOTSUPP, "当前平台不支持 reflink", src) from None
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _hardlink(src, dst):
+    os.link(src, dst)
+
+
+def _symlink(src, dst):
+    os.symlink(os.path.abspath(src), dst)
+
+
+def _copy(src, dst):
+    shutil.copy2(src, dst)
+
+
+_METHODS = {
+    'reflink': _reflink,
+    'hardlink': _hardlink,
+    'symlink': _symlink,
+    'copy': _copy,
+}
+
+_AUTO_ORDER = ('reflink', 'hardlink', 'copy')
+
+
+def _is_same_file(src, dst):
+    try:
+        return os.path.samefile(src, dst)
+    except OSError:
+        return False
+
+
+def link_file(src, dst, mode='auto'):
+    """
+    在 dst 处创建与 src 内容相同的文件
+
+    Args:
+        src: 源文件
+        dst: 目标文件 (已存在时被替换)
+        mode: 'auto' (reflink -> 硬链接 -> 复制), 'reflink', 'hardlink', 'symlink' 或 'copy'
+
+    Returns:
+        method: 实际使用的方式; 目标已是同一文件时返回 'skipped'
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"未知的链接方式: {mode}，可选: {LINK_MODES}")
+
+    src = os.fspath(src)
+    dst = os.fspath(dst)
+
+    if _is_same_file(src, dst):
+        return 'skipped'
+
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+
+    # 先在临时路径创建, 再原子替换, 避免中断时留下半个文件
+    tmp = f'{dst}.tmp{os.getpid()}'
+    order = _AUTO_ORDER if mode == 'auto' else (mode, 'copy')
+
+    for method in order:
+        try:
+            if os.path.lexists(tmp):
+                os.unlink(tmp)
+            _METHODS[method](src, tmp)
+        except OSError as e:
+            if e.errno in _FALLBACK_ERRNOS and method != 'copy':
+                continue
+            raise
+        os.replace(tmp, dst)
+        return method
+
+    raise OSError(f"无法创建文件: {dst}")
+
+
+def materialize_files(pairs, mode='auto', workers=8, desc=None):
+    """
+    并行物化一组 (源文件, 目标文件)
+
+    Args:
+        pairs: (src, dst) 可迭代对象
+        mode: 链接方式, 见 link_file
+        workers: 并行线程数 (链接/复制都是系统调用, 线程即可并行)
+        desc: 进度条描述 (为 None 时不显示进度条)
+
+    Returns:
+        stats: 各方式使用次数, 如 {'hardlink': 39209, 'failed': 0}
+    """
+    pairs = list(pairs)
+    stats = {}
+    if not pairs:
+        return stats
+
+    def _one(pair):
+        try:
+            return link_file(pair[0], pair[1], mode)
+        except OSError as e:
+            print(f"\n物化失败 {pair[0]}: {e}")
+            return 'failed'
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(_one, pairs, chunksize=64)
+        if desc:
+            from tqdm import tqdm
+            results = tqdm(results, total=len(pairs), desc=desc)
+        for method in results:
+            stats[method] = stats.get(method, 0) + 1
+
+    return stats
+
+
+def materialize_tree(src_dir, dst_dir, pattern='*', mode='auto', workers=8, desc=None, recursive=False):
+    """
+    将 src_dir 中匹配 pattern 的文件物化到 dst_dir (保持相对路径)
+
+    Args:
+        src_dir: 源目录
+        dst_dir: 目标目录
+        pattern: 文件匹配模式 (如 '*.txt')
+        mode: 链接方式, 见 link_file
+        workers: 并行线程数
+        desc: 进度条描述
+        recursive: 是否递归子目录
+
+    Returns:
+        stats: 各方式使用次数; 源目录不存在时为空
+    """
+    src_dir = Path(src_dir)
+    dst_dir = Path(dst_dir)
+    if not src_dir.exists():
+        return {}
+
+    files = src_dir.rglob(pattern) if recursive else src_dir.glob(pattern)
+    pairs = [(f, dst_dir / f.relative_to(src_dir)) for f in files if f.is_file()]
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    return materialize_files(pairs, mode=mode, workers=workers, desc=desc)
+
+
+def format_stats(stats):
+    """将统计结果格式化为一行文本, 如 '硬链接 39209, 复制 0'"""
+    names = {
+        'reflink': 'reflink',
+        'hardlink': '硬链接',
+        'symlink': '符号链接',
+        'copy': '复制',
+        'skipped': '已存在',
+        'failed': '失败',
+    }
+    return ', '.join(f"{names.get(k, k)} {v}" for k, v in stats.items()) or '无文件'
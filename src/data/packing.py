@@ -0,0 +1,233 @@
+"""
+小目标拼接 (packing)
+GTSRB 裁剪图中位尺寸约 50 px, 直接以 imgsz=640 训练时绝大部分计算都花在放大的像素上;
+这里把许多裁剪图连同标注框按行 (shelf) 排布拼到 640x640 画布上, 一张画布包含上百个目标,
+每个 epoch 的图像数和计算量都大幅下降, 画面也更接近真实的检测场景
+
+目标尺度: 验证和推理时原始裁剪图被 letterbox 到 imgsz, 标志的长边约为 imgsz; 画布上的裁剪图按 crop_size
+(取验证/推理的 imgsz) 缩放长边, 训练与测试时的目标尺度一致. crop_size=None 时保持原尺寸 (约 30-60 px),
+只适合在 imgsz 接近原尺寸 (如 64) 时验证和推理, 否则会引入数倍的尺度差异
+
+两种用法:
+- 预先生成: export_packed_dataset() 写出画布图像和标签 (scripts/preprocessing/pack_canvases.py)
+- 即时拼接: src.data.yolo_adapter.CanvasDataset 在 dataloader worker 中按布局读取裁剪图并拼接
+
+用法:
+    from src.data.packing import export_packed_dataset
+    export_packed_dataset('data/yolo_dataset', 'data/packed_dataset', canvas_size=640, crop_size=128)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from src.data.shards import parse_label_text
+
+
+# 裁剪图之间的间隔 (像素), 避免相邻标志的边缘粘连
+DEFAULT_GAP = 2
+
+# 画布背景 (低光照数据集整体偏暗, 用黑色而不是 ultralytics 的灰色填充)
+DEFAULT_FILL = 0
+
+
+def read_image_sizes(image_files, workers=8):
+    """
+    只读取文件头获得图像尺寸, 不解码像素
+
+    Returns:
+        sizes: (n, 2) int 数组, 每行为 (宽, 高)
+    """
+    from PIL import Image
+
+    def _size(path):
+        with Image.open(path) as img:
+            return img.size
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return np.array(list(pool.map(_size, image_files)), dtype=np.int64).reshape(-1, 2)
+
+
+def read_crop_labels(label_files):
+    """读取每个裁剪图的 YOLO 标签, 缺失的标签文件视为无目标"""
+    labels = []
+    for label_file in label_files:
+        try:
+            labels.append(parse_label_text(Path(label_file).read_text()))
+        except FileNotFoundError:
+            labels.append(np.zeros((0, 5), dtype=np.float32))
+    return labels
+
+
+def plan_canvases(sizes, canvas_size=640, seed=0, scale_range=(1.0, 1.0), gap=DEFAULT_GAP, crop_size=None):
+    """
+    按行 (shelf) 排布裁剪图
+
+    Args:
+        sizes: (n, 2) 裁剪图尺寸 (宽, 高)
+        canvas_size: 画布边长
+        seed: 随机种子 (决定排布顺序和缩放)
+        scale_range: 每个裁剪图的随机缩放范围 (在 crop_size 缩放之后), (1.0, 1.0) 表示不做随机缩放
+        gap: 裁剪图间隔
+        crop_size: 裁剪图长边缩放到的尺寸 (验证/推理时的 imgsz); None 表示保持原尺寸
+
+    Returns:
+        layouts: 画布列表, 每个为 (k, 5) int 数组, 每行为 (裁剪图序号, x, y, 宽, 高)
+    """
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(sizes))
+    scales = rng.uniform(scale_range[0], scale_range[1], len(sizes))
+    if crop_size:
+        scales *= crop_size / sizes.max(axis=1)
+
+    # 缩放后的尺寸, 超过画布的裁剪图等比缩小到画布内
+    scaled = sizes * scales[:, None]
+    fit = np.minimum(1.0, canvas_size / scaled.max(axis=1))
+    scaled = np.maximum(1, np.round(scaled * fit[:, None])).astype(np.int64)
+
+    layouts = []
+    current = []
+    x = y = shelf_h = 0
+    for i in order:
+        w, h = scaled[i]
+        if x + w > canvas_size:
+            x, y, shelf_h = 0, y + shelf_h + gap, 0
+        if y + h > canvas_size:
+            layouts.append(np.array(current, dtype=np.int64))
+            current = []
+            x = y = shelf_h = 0
+        current.append((i, x, y, w, h))
+        x += w + gap
+        shelf_h = max(shelf_h, h)
+    if current:
+        layouts.append(np.array(current, dtype=np.int64))
+    return layouts
+
+
+def canvas_labels(layout, crop_labels, canvas_size=640):
+    """
+    将裁剪图上的归一化标注框换算到画布坐标
+
+    Returns:
+        labels: (m, 5) float32 数组, 每行为 class x_center y_center width height (相对画布归一化)
+    """
+    rows = []
+    for i, x, y, w, h in layout:
+        labels = crop_labels[i]
+        if not len(labels):
+            continue
+        boxes = labels.copy()
+        boxes[:, 1] = (x + labels[:, 1] * w) / canvas_size
+        boxes[:, 2] = (y + labels[:, 2] * h) / canvas_size
+        boxes[:, 3] = labels[:, 3] * w / canvas_size
+        boxes[:, 4] = labels[:, 4] * h / canvas_size
+        rows.append(boxes)
+    if not rows:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.concatenate(rows).astype(np.float32)
+
+
+def compose_canvas(layout, read_crop, canvas_size=640, fill=DEFAULT_FILL):
+    """
+    按布局拼接画布
+
+    Args:
+        layout: plan_canvases 返回的一个画布布局
+        read_crop: read_crop(i) -> BGR 图像
+        canvas_size: 画布边长
+        fill: 背景像素值
+
+    Returns:
+        canvas: (canvas_size, canvas_size, 3) uint8 图像
+    """
+    canvas = np.full((canvas_size, canvas_size, 3), fill, dtype=np.uint8)
+    for i, x, y, w, h in layout:
+        crop = read_crop(i)
+        if crop is None:
+            continue
+        if crop.shape[1] != w or crop.shape[0] != h:
+            crop = cv2.resize(crop, (int(w), int(h)), interpolation=cv2.INTER_LINEAR)
+        canvas[y:y + h, x:x + w] = crop
+    return canvas
+
+
+def format_label_rows(labels):
+    """(m, 5) 标签数组 -> YOLO 标签文本"""
+    return ''.join(f'{int(c)} {xc:.6f} {yc:.6f} {bw:.6f} {bh:.6f}\n' for c, xc, yc, bw, bh in labels)
+
+
+def export_packed_dataset(dataset_root, output_root, splits=('train', 'val', 'test'), canvas_size=640,
+                          seed=0, scale_range=(1.0, 1.0), codec=None, names=None, crop_size=None):
+    """
+    预先生成拼接后的数据集并写出 dataset.yaml
+
+    Args:
+        dataset_root: 裁剪图数据集 (YOLO 格式, images/<split> + labels/<split>)
+        output_root: 输出目录
+        splits: 需要拼接的划分
+        canvas_size: 画布边长
+        seed: 排布随机种子
+        scale_range: 训练集裁剪图的随机缩放范围 (验证/测试集保持原尺寸)
+        codec: 输出编码 (见 src.data.codecs)
+        names: 类别名称 (默认从 dataset_root/dataset.yaml 读取, 否则为 0..42)
+        crop_size: 所有划分的裁剪图长边缩放到的尺寸; 训练得到的模型对原始裁剪图推理时应使用 imgsz=crop_size
+
+    Returns:
+        config_path: 生成的 dataset.yaml 路径
+    """
+    from tqdm import tqdm
+
+    from src.data.codecs import get_codec
+    from src.data.image_store import list_image_files
+
+    dataset_root = Path(dataset_root)
+    output_root = Path(output_root)
+    codec = get_codec(codec)
+
+    config = {'path': str(output_root.absolute())}
+    for split in splits:
+        images_dir = dataset_root / 'images' / split
+        if not images_dir.exists():
+            continue
+
+        image_files = list_image_files(images_dir)
+        label_files = [dataset_root / 'labels' / split / f'{f.stem}.txt' for f in image_files]
+        crop_labels = read_crop_labels(label_files)
+        sizes = read_image_sizes(image_files)
+        layouts = plan_canvases(sizes, canvas_size, seed=seed,
+                                scale_range=scale_range if split == 'train' else (1.0, 1.0), crop_size=crop_size)
+
+        out_images = output_root / 'images' / split
+        out_labels = output_root / 'labels' / split
+        out_labels.mkdir(parents=True, exist_ok=True)
+
+        def read_crop(i):
+            return cv2.imread(str(image_files[i]))
+
+        for c, layout in enumerate(tqdm(layouts, desc=f"拼接 {split}")):
+            name = f'{split}_canvas_{c:06d}'
+            canvas = compose_canvas(layout, read_crop, canvas_size)
+            codec.write(codec.output_path(out_images / name), canvas)
+            (out_labels / f'{name}.txt').write_text(format_label_rows(canvas_labels(layout, crop_labels, canvas_size)))
+
+        print(f"  {split}: {len(image_files)} 张裁剪图 -> {len(layouts)} 张画布 "
+              f"(平均每张 {len(image_files) / max(1, len(layouts)):.0f} 个目标)")
+        config[split] = f'images/{split}'
+
+    if names is None:
+        source_yaml = dataset_root / 'dataset.yaml'
+        if source_yaml.exists():
+            with open(source_yaml, 'r', encoding='utf-8') as f:
+                names = yaml.safe_load(f).get('names')
+    if names is None:
+        names = list(range(43))
+    config.update({'nc': len(names), 'names': names})
+
+    config_path = output_root / 'dataset.yaml'
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+    return config_path
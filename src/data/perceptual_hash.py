@@ -0,0 +1,390 @@
+"""
+感知哈希近重复检测 (跨划分数据泄露)
+GTSRB 每个物理标志由约 30 帧连续图像 (track) 组成, 随机划分会把几乎相同的帧
+同时放入 train 和 val; 按文件名比较无法发现这种泄露
+
+本模块:
+- 在进程池中为每张图像计算 64 位 dHash 和 pHash (每个进程内按批向量化)
+- 哈希与文件大小/修改时间一起保存在数据集索引 (<dataset>/phash_index.npz) 中,
+  重新运行时只为新增或变化的图像计算哈希
+- 用多索引汉明查找 (multi-index hashing) 在亚二次时间内找出跨划分的近重复:
+  64 位码分为 4 段, 汉明距离 <= r 的两个码至少有一段的距离 <= r // 4,
+  因此只需在每段的有序表中查找少量翻转变体, 再对候选计算完整距离
+
+用法:
+    from src.data.perceptual_hash import build_hash_index, find_cross_split_duplicates
+
+    index = build_hash_index('data/yolo_dataset')
+    dups = find_cross_split_duplicates(index, reference='train', queries=('val', 'test'))
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+
+HASH_INDEX_NAME = 'phash_index.npz'
+
+HASH_NAMES = ('dhash', 'phash')
+
+# 每个子进程一次处理的图像数
+CHUNK_SIZE = 256
+
+# 默认汉明距离阈值 (64 位中不同的位数)
+DEFAULT_RADIUS = 6
+
+_INDEX_FIELDS = ('split', 'filename', 'size', 'mtime_ns', 'dhash', 'phash')
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _dct_matrix(n=32):
+    """正交 DCT-II 矩阵"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    mat = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    mat[0] /= np.sqrt(2.0)
+    return mat.astype(np.float32)
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _pack_bits(bits):
+    """(n, 64) 布尔数组 -> (n,) uint64, 第一位为最高位"""
+    packed = np.packbits(bits.reshape(len(bits), 64), axis=1)
+    return packed.view('>u8').ravel().astype(np.uint64)
+
+
+def popcount64(x):
+    """逐元素统计 uint64 中置位的个数"""
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x).astype(np.int64)
+    return _POPCOUNT_TABLE[x.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+def hash_images(images):
+    """
+    为一批图像计算 dHash 和 pHash
+
+    Args:
+        images: BGR 或灰度图像列表 (尺寸可以不同)
+
+    Returns:
+        (dhash, phash): 两个 (n,) uint64 数组
+    """
+    import cv2
+
+    n = len(images)
+    if n == 0:
+        return np.zeros(0, np.uint64), np.zeros(0, np.uint64)
+
+    small = np.empty((n, 8, 9), np.float32)
+    large = np.empty((n, 32, 32), np.float32)
+    for i, image in enumerate(images):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        small[i] = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        large[i] = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)
+
+    # dHash: 相邻像素的亮度梯度方向
+    dbits = small[:, :, 1:] > small[:, :, :-1]
+
+    # pHash: 32x32 DCT 的左上 8x8 低频系数与中位数比较 (排除直流分量)
+    coeffs = (_DCT32 @ large @ _DCT32.T)[:, :8, :8].reshape(n, 64)
+    median = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+    pbits = coeffs > median
+
+    return _pack_bits(dbits), _pack_bits(pbits)
+
+
+def _init_worker():
+    import cv2
+
+    # 并行发生在进程之间, 避免每个进程再开多线程
+    cv2.setNumThreads(1)
+
+
+def _hash_chunk(paths):
+    """子进程: 读取并哈希一组文件, 返回 (dhash, phash, ok)"""
+    from src.data.codecs import read_image
+
+    images = []
+    ok = np.zeros(len(paths), bool)
+    for i, path in enumerate(paths):
+        image = read_image(path)
+        if image is not None:
+            images.append(image)
+            ok[i] = True
+
+    dhash = np.zeros(len(paths), np.uint64)
+    phash = np.zeros(len(paths), np.uint64)
+    dhash[ok], phash[ok] = hash_images(images)
+    return dhash, phash, ok
+
+
+def hash_files(paths, workers=None, desc=None):
+    """
+    在进程池中为一组图像文件计算哈希
+
+    Args:
+        paths: 图像文件路径列表
+        workers: 进程数 (默认 CPU 核数)
+        desc: 进度条描述 (为 None 时不显示)
+
+    Returns:
+        (dhash, phash, ok): ok[i] 为 False 表示该文件无法读取
+    """
+    paths = [os.fspath(p) for p in paths]
+    chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+    if not chunks:
+        return np.zeros(0, np.uint64), np.zeros(0, np.uint64), np.zeros(0, bool)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(chunks) == 1:
+        results = map(_hash_chunk, chunks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        results = pool.map(_hash_chunk, chunks)
+
+    try:
+        if desc:
+            from tqdm import tqdm
+            results = tqdm(results, total=len(chunks), desc=desc, unit='批')
+        results = list(results)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def load_hash_index(path):
+    """读取哈希索引; 不存在时返回 None"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in _INDEX_FIELDS}
+
+
+def save_hash_index(index, path):
+    """原子地写出哈希索引"""
+    path = Path(path)
+    tmp = path.with_name(f'.{path.stem}.tmp.npz')
+    np.savez(tmp, **{name: index[name] for name in _INDEX_FIELDS})
+    os.replace(tmp, path)
+
+
+def build_hash_index(dataset_root, splits=('train', 'val', 'test'), workers=None, index_path=None):
+    """
+    为 YOLO 格式数据集的各划分计算 (或增量更新) 感知哈希索引
+
+    Args:
+        dataset_root: 数据集根目录 (包含 images/<split>)
+        splits: 需要索引的划分
+        workers: 进程数
+        index_path: 索引文件 (默认 <dataset_root>/phash_index.npz)
+
+    Returns:
+        index: 字典, 各字段为等长数组:
+               split, filename (images/<split> 中的文件名), size, mtime_ns, dhash, phash
+    """
+    from src.data.image_store import list_image_files
+
+    dataset_root = Path(dataset_root)
+    index_path = Path(index_path) if index_path else dataset_root / HASH_INDEX_NAME
+
+    # 旧索引中大小和修改时间未变的条目直接沿用
+    previous = {}
+    old = load_hash_index(index_path)
+    if old is not None:
+        for i in range(len(old['filename'])):
+            previous[(str(old['split'][i]), str(old['filename'][i]))] = i
+
+    rows = []
+    for split in splits:
+        images_dir = dataset_root / 'images' / split
+        if not images_dir.exists():
+            continue
+        for path in list_image_files(images_dir):
+            st = path.stat()
+            rows.append((split, path.name, st.st_size, st.st_mtime_ns, path))
+
+    n = len(rows)
+    index = {
+        'split': np.array([r[0] for r in rows], dtype=str),
+        'filename': np.array([r[1] for r in rows], dtype=str),
+        'size': np.array([r[2] for r in rows], dtype=np.int64),
+        'mtime_ns': np.array([r[3] for r in rows], dtype=np.int64),
+        'dhash': np.zeros(n, np.uint64),
+        'phash': np.zeros(n, np.uint64),
+    }
+
+    stale = []
+    for i, (split, name, size, mtime_ns, path) in enumerate(rows):
+        j = previous.get((split, name))
+        if j is not None and old['size'][j] == size and old['mtime_ns'][j] == mtime_ns:
+            index['dhash'][i] = old['dhash'][j]
+            index['phash'][i] = old['phash'][j]
+        else:
+            stale.append(i)
+
+    # 有新算的哈希或有文件被删除时才重写索引
+    changed = bool(stale) or old is None or len(old['filename']) != n
+
+    if stale:
+        dhash, phash, ok = hash_files([rows[i][4] for i in stale], workers=workers, desc="计算感知哈希")
+        stale = np.array(stale)
+        index['dhash'][stale] = dhash
+        index['phash'][stale] = phash
+        if not ok.all():
+            print(f"⚠️  {int((~ok).sum())} 张图像无法读取, 已从索引中排除")
+            keep = np.ones(n, bool)
+            keep[stale[~ok]] = False
+            index = {name: values[keep] for name, values in index.items()}
+
+    if changed:
+        save_hash_index(index, index_path)
+
+    return index
+
+
+class HammingIndex:
+    """
+    64 位码的多索引汉明查找表
+
+    将每个码切成若干段, 每段建立一个有序表; 查询时对每段枚举距离不超过 radius // blocks
+    的变体并用二分查找取出候选, 最后计算完整汉明距离过滤
+    """
+
+    def __init__(self, codes, blocks=4):
+        if 64 % blocks:
+            raise ValueError(f"段数需整除 64: {blocks}")
+        self.codes = np.ascontiguousarray(codes, dtype=np.uint64)
+        self.blocks = blocks
+        self.bits = 64 // blocks
+        self._mask = np.uint64((1 << self.bits) - 1)
+
+        self._tables = []
+        for b in range(blocks):
+            values = self._block(self.codes, b)
+            order = np.argsort(values, kind='stable')
+            self._tables.append((values[order], order))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _block(self, codes, b):
+        return (codes >> np.uint64(b * self.bits)) & self._mask
+
+    def _flip_masks(self, radius):
+        """段内所有距离不超过 radius 的翻转掩码"""
+        masks = [0]
+        for r in range(1, radius + 1):
+            for bits in combinations(range(self.bits), r):
+                masks.append(sum(1 << bit for bit in bits))
+        return np.array(masks, dtype=np.uint64)
+
+    def query(self, queries, radius=DEFAULT_RADIUS, chunk_size=4096):
+        """
+        查找所有汉明距离不超过 radius 的 (查询, 参考) 对
+
+        Args:
+            queries: (m,) uint64 查询码
+            radius: 汉明距离阈值
+            chunk_size: 每次处理的查询数 (限制候选数组的内存)
+
+        Returns:
+            (query_idx, ref_idx, distance): 三个等长数组, 按 (query_idx, ref_idx) 排序
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.uint64)
+        masks = self._flip_masks(radius // self.blocks)
+        n_ref = len(self.codes)
+        found_q, found_r, found_d = [], [], []
+
+        for start in range(0, len(queries), chunk_size):
+            q = queries[start:start + chunk_size]
+            cand_q, cand_r = [], []
+            for b, (sorted_values, order) in enumerate(self._tables):
+                qv = self._block(q, b)
+                for mask in masks:
+                    target = qv ^ mask
+                    lo = np.searchsorted(sorted_values, target, 'left')
+                    hi = np.searchsorted(sorted_values, target, 'right')
+                    counts = hi - lo
+                    total = int(counts.sum())
+                    if total == 0:
+                        continue
+                    qi = np.repeat(np.arange(len(q)), counts)
+                    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                    cand_q.append(qi)
+                    cand_r.append(order[np.repeat(lo, counts) + offsets])
+
+            if not cand_q:
+                continue
+
+            # 同一对可能在多段中命中, 先去重再计算完整距离
+            pair = np.unique(np.concatenate(cand_q).astype(np.int64) * n_ref + np.concatenate(cand_r))
+            qi, ri = pair // n_ref, pair % n_ref
+            dist = popcount64(q[qi] ^ self.codes[ri])
+            keep = dist <= radius
+            found_q.append(qi[keep] + start)
+            found_r.append(ri[keep])
+            found_d.append(dist[keep])
+
+        if not found_q:
+            empty = np.zeros(0, np.int64)
+            return empty, empty, empty
+        return np.concatenate(found_q), np.concatenate(found_r), np.concatenate(found_d)
+
+
+def find_cross_split_duplicates(index, reference='train', queries=('val', 'test'),
+                                radius=DEFAULT_RADIUS, hash_name='phash'):
+    """
+    查找查询划分中与参考划分近重复的图像
+
+    Args:
+        index: build_hash_index 返回的索引
+        reference: 参考划分 (通常为 train)
+        queries: 查询划分
+        radius: 汉明距离阈值
+        hash_name: 'phash' 或 'dhash'; 另一种哈希也需满足阈值才算近重复
+
+    Returns:
+        dups: 字典, 各字段为等长数组:
+              split (查询划分), query (查询文件名), reference (参考文件名), distance
+    """
+    if hash_name not in HASH_NAMES:
+        raise ValueError(f"未知的哈希: {hash_name}，可选: {HASH_NAMES}")
+    other = 'dhash' if hash_name == 'phash' else 'phash'
+
+    ref_mask = index['split'] == reference
+    ref_files = index['filename'][ref_mask]
+    table = HammingIndex(index[hash_name][ref_mask])
+    ref_other = index[other][ref_mask]
+
+    result = {'split': [], 'query': [], 'reference': [], 'distance': []}
+    for split in queries:
+        mask = index['split'] == split
+        if not mask.any() or not len(table):
+            continue
+        qi, ri, dist = table.query(index[hash_name][mask], radius)
+
+        # 用另一种哈希确认, 减少误报
+        confirmed = popcount64(index[other][mask][qi] ^ ref_other[ri]) <= radius
+        qi, ri, dist = qi[confirmed], ri[confirmed], dist[confirmed]
+
+        result['split'].append(np.full(len(qi), split))
+        result['query'].append(index['filename'][mask][qi])
+        result['reference'].append(ref_files[ri])
+        result['distance'].append(dist)
+
+    return {
+        name: np.concatenate(values) if values else np.zeros(0, dtype=np.int64 if name == 'distance' else str)
+        for name, values in result.items()
+    }
@@ -213,12 +213,29 @@ class GTSRBDatasetConverter:
         
         print(f"验证集分割完成！训练集: {len(list(train_images.glob('*.png')))} 张，验证集: {len(list(val_images.glob('*.png')))} 张")
     
-    def convert_all(self, val_ratio=0.2):
+    def pack_image_store(self, store_root=None):
+        """
+        将转换后的各个划分打包为 memmap 存储 (见 src.data.image_store)
+        后续的增强、评估和可视化可直接读取解码后的像素, 无需再逐个解码 PNG
+        
+        Args:
+            store_root: 存储目录 (默认为 output_root/store)
+            
+        Returns:
+            store_root: 存储目录
+        """
+        from src.data.image_store import pack_yolo_dataset
+        
+        print("正在打包图像存储...")
+        return pack_yolo_dataset(self.output_root, store_root)
+    
+    def convert_all(self, val_ratio=0.2, pack_store=False):
         """
         执行完整的数据集转换流程
         
         Args:
             val_ratio: 验证集比例
+            pack_store: 是否在分割完成后打包图像存储
         """
         print("开始转换 GTSRB 数据集到 YOLO 格式...")
         print(f"输入: {self.gtsrb_root}")
@@ -233,6 +250,10 @@ class GTSRBDatasetConverter:
         # 分割验证集
         self.split_train_val(val_ratio)
         
+        # 打包图像存储（需在分割之后，保证各划分内容正确）
+        if pack_store:
+            self.pack_image_store()
+        
         print("\n数据集转换完成！")
         self.print_statistics()
     
@@ -252,7 +273,7 @@ class GTSRBDatasetConverter:
                 print(f"{split.capitalize():5s}: {num_images} 张图像, {num_labels} 个标注文件")
 
 
-def create_low_light_images(input_dir, output_dir, gamma_values=[0.3, 0.5, 0.7]):
+def create_low_light_images(input_dir, output_dir, gamma_values=[0.3, 0.5, 0.7], codec=None):
     """
     创建低光照图像
     
@@ -260,7 +281,12 @@ def create_low_light_images(input_dir, output_dir, gamma_values=[0.3, 0.5, 0.7])
         input_dir: 输入图像目录
         output_dir: 输出图像目录
         gamma_values: Gamma 值列表 (越小越暗)
+        codec: 输出编码 (见 src.data.codecs); 为 None 时保持源文件格式
     """
+    from src.data.codecs import get_codec
+    
+    if codec is not None:
+        codec = get_codec(codec)
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -286,7 +312,10 @@ def create_low_light_images(input_dir, output_dir, gamma_values=[0.3, 0.5, 0.7])
         
         # 保存
         output_file = output_path / img_file.name
-        cv2.imwrite(str(output_file), low_light)
+        if codec is not None:
+            codec.write(codec.output_path(output_file), low_light)
+        else:
+            cv2.imwrite(str(output_file), low_light)
     
     print("低光照图像创建完成！")
 
@@ -300,7 +329,7 @@ if __name__ == "__main__":
     # 步骤 1: 转换数据集格式
     print("\n=== 步骤 1: 转换 GTSRB 数据集到 YOLO 格式 ===")
     converter = GTSRBDatasetConverter(GTSRB_ROOT, OUTPUT_ROOT)
-    converter.convert_all(val_ratio=0.2)
+    converter.convert_all(val_ratio=0.2, pack_store=True)
     
     # 步骤 2: 创建低光照版本
     print("\n=== 步骤 2: 创建低光照数据集 ===")
@@ -311,13 +340,11 @@ if __name__ == "__main__":
         if os.path.exists(input_dir):
             create_low_light_images(input_dir, output_dir)
             
-            # 复制标注文件
+            # 链接标注文件（标注不变，无需逐字节复制）
+            from src.data.materialize import materialize_tree
             src_labels = Path(f"{OUTPUT_ROOT}/labels/{split}")
             dst_labels = Path(f"../traffic_sign_data/low_light/labels/{split}")
-            dst_labels.mkdir(parents=True, exist_ok=True)
-            
-            for label_file in src_labels.glob('*.txt'):
-                shutil.copy(str(label_file), str(dst_labels / label_file.name))
+            materialize_tree(src_labels, dst_labels, '*.txt')
     
     print("\n数据准备完成！")
 
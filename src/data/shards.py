@@ -0,0 +1,402 @@
+"""
+Tar 分片数据集格式 (WebDataset 风格)
+将 YOLO 格式数据集导出为固定大小的 tar 分片, 图像与标签成对相邻存放,
+用于在训练机之间分发派生数据集, 以顺序读代替数万个小文件的随机访问
+
+目录结构:
+    shard_root/
+        dataset.yaml               # 可直接传给 ultralytics (配合 ShardDataset)
+        train/
+            index.json             # 分片列表 + 每个样本的偏移量/尺寸
+            train-000000.tar       # <key>.png, <key>.txt, <key>.png, <key>.txt, ...
+            train-000001.tar
+        val/
+            ...
+"""
+
+import io
+import json
+import os
+import random
+import tarfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import yaml
+from PIL import Image
+
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.ppm', '.bmp', '.webp']
+
+# 顺序读取时使用较大的缓冲区, 减少系统调用
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+
+# os.pread 只在 POSIX 平台上提供
+HAS_PREAD = hasattr(os, 'pread')
+
+
+def parse_label_text(text):
+    """
+    解析 YOLO 标签文本
+
+    Returns:
+        labels: (N, 5) float32 数组, 每行为 class x_center y_center width height
+    """
+    rows = [line.split() for line in text.strip().splitlines() if line.strip()]
+    if not rows:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.array(rows, dtype=np.float32)[:, :5]
+
+
+class ShardWriter:
+    """
+    分片写入器
+    按样本追加 (图像字节, 标签文本), 当前分片达到大小上限后自动切换到下一个
+    """
+
+    def __init__(self, output_dir, split, max_shard_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            output_dir: 该划分的输出目录 (shard_root/<split>)
+            split: 数据划分名称
+            max_shard_bytes: 单个分片的大小上限
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # 重新导出会覆盖同名分片, 先删除旧索引, 导出完成前目录中不会有看似有效的索引
+        (self.output_dir / 'index.json').unlink(missing_ok=True)
+        self.split = split
+        self.max_shard_bytes = max_shard_bytes
+
+        self.shards = []
+        self.samples = []
+        self._tar = None
+        self._shard_bytes = 0
+
+    def _next_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+        name = f'{self.split}-{len(self.shards):06d}.tar'
+        self._tar = tarfile.open(self.output_dir / name, mode='w')
+        self.shards.append({'name': name, 'samples': 0, 'bytes': 0})
+        self._shard_bytes = 0
+
+    def _add_member(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self._tar.addfile(info, io.BytesIO(data))
+        # 数据块按 512 字节对齐, 写入后的位置减去数据块长度即为数据起点
+        blocks, remainder = divmod(len(data), tarfile.BLOCKSIZE)
+        if remainder:
+            blocks += 1
+        return self._tar.offset - blocks * tarfile.BLOCKSIZE
+
+    def write(self, key, image_bytes, image_ext, label_text, shape):
+        """
+        写入一个样本
+
+        Args:
+            key: 样本键 (文件名去掉扩展名)
+            image_bytes: 编码后的图像字节 (原样写入, 不重新编码)
+            image_ext: 图像扩展名 (如 '.png')
+            label_text: YOLO 标签文本
+            shape: 图像 (高, 宽)
+        """
+        sample_bytes = len(image_bytes) + len(label_text) + 2048
+        if self._tar is None or (self._shard_bytes and self._shard_bytes + sample_bytes > self.max_shard_bytes):
+            self._next_shard()
+
+        label_data = label_text.encode('utf-8')
+        image_offset = self._add_member(f'{key}{image_ext}', image_bytes)
+        self._add_member(f'{key}.txt', label_data)
+
+        shard = self.shards[-1]
+        shard['samples'] += 1
+        shard['bytes'] += sample_bytes
+        self._shard_bytes += sample_bytes
+
+        self.samples.append({
+            'key': key,
+            'ext': image_ext,
+            'shard': len(self.shards) - 1,
+            'offset': image_offset,
+            'size': len(image_bytes),
+            'shape': [int(shape[0]), int(shape[1])],
+            'labels': label_text.strip(),
+        })
+
+    def close(self, write_index=True):
+        """
+        关闭当前分片并写出索引
+
+        Args:
+            write_index: False 时只关闭分片 (导出中途出错, 分片可能不完整, 不写出指向它的索引)
+        """
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        if not write_index:
+            return
+
+        # 先写临时文件再替换, 中断时不会留下半个 index.json
+        index = {'split': self.split, 'shards': self.shards, 'samples': self.samples}
+        path = self.output_dir / 'index.json'
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp, path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(write_index=exc_type is None)
+        return False
+
+
+def export_split(dataset_root, shard_root, split, max_shard_bytes=256 * 1024 * 1024):
+    """
+    将 YOLO 数据集的一个划分导出为 tar 分片
+
+    Args:
+        dataset_root: 数据集根目录 (包含 images/<split> 和 labels/<split>)
+        shard_root: 分片输出根目录
+        split: 数据划分
+        max_shard_bytes: 单个分片的大小上限
+
+    Returns:
+        count: 导出的样本数
+    """
+    from tqdm import tqdm
+
+    images_dir = Path(dataset_root) / 'images' / split
+    labels_dir = Path(dataset_root) / 'labels' / split
+    if not images_dir.exists():
+        return 0
+
+    image_files = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+    with ShardWriter(Path(shard_root) / split, split, max_shard_bytes) as writer:
+        for img_file in tqdm(image_files, desc=f"导出 {split}"):
+            image_bytes = img_file.read_bytes()
+            # 只读取图像头获取尺寸, 不解码像素
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                width, height = img.size
+
+            label_file = labels_dir / f'{img_file.stem}.txt'
+            label_text = label_file.read_text(encoding='utf-8') if label_file.exists() else ''
+
+            writer.write(img_file.stem, image_bytes, img_file.suffix.lower(), label_text, (height, width))
+
+    return len(writer.samples)
+
+
+def export_dataset(dataset_root, shard_root, splits=('train', 'val', 'test'),
+                   max_shard_bytes=256 * 1024 * 1024, names=None):
+    """
+    导出整个数据集并生成 dataset.yaml
+
+    Args:
+        dataset_root: YOLO 格式数据集根目录
+        shard_root: 分片输出根目录
+        splits: 需要导出的划分
+        max_shard_bytes: 单个分片的大小上限
+        names: 类别名称列表 (默认从 dataset_root/dataset.yaml 读取, 否则为 0..42)
+
+    Returns:
+        config_path: 生成的 dataset.yaml 路径
+    """
+    dataset_root = Path(dataset_root)
+    shard_root = Path(shard_root)
+    shard_root.mkdir(parents=True, exist_ok=True)
+
+    if names is None:
+        source_yaml = dataset_root / 'dataset.yaml'
+        if source_yaml.exists():
+            with open(source_yaml, 'r', encoding='utf-8') as f:
+                names = yaml.safe_load(f).get('names')
+    if names is None:
+        names = list(range(43))
+
+    config = {'path': str(shard_root.absolute()), 'nc': len(names), 'names': names}
+    for split in splits:
+        count = export_split(dataset_root, shard_root, split, max_shard_bytes)
+        if count:
+            config[split] = split
+            print(f"✅ {split}: {count} 个样本")
+
+    config_path = shard_root / 'dataset.yaml'
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+
+    return config_path
+
+
+def load_index(split_dir):
+    """读取某个划分的分片索引"""
+    with open(Path(split_dir) / 'index.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_shard_config(config):
+    """数据集配置 (dataset.yaml 的内容) 的各个划分是否都是 export_dataset 导出的分片目录"""
+    root = Path(config.get('path', ''))
+    splits = [config[s] for s in ('train', 'val', 'test') if isinstance(config.get(s), str)]
+    return bool(splits) and all((root / s / 'index.json').exists() for s in splits)
+
+
+class ShardReader:
+    """
+    按索引随机读取单个样本
+    每个分片保持一个打开的文件描述符, 用 os.pread 按偏移量读取图像数据
+    (不依赖共享的文件位置, fork 出的 worker 可以安全复用);
+    没有 os.pread 的平台 (Windows) 退回 seek + read, 用锁保护共享的文件位置
+    """
+
+    def __init__(self, split_dir):
+        self.split_dir = Path(split_dir)
+        self.index = load_index(self.split_dir)
+        self.samples = self.index['samples']
+        self._handles = {}
+        self._lock = None
+
+    def __getstate__(self):
+        # 文件句柄和锁不随对象序列化, 在各个 worker 中重新创建
+        state = self.__dict__.copy()
+        state['_handles'] = {}
+        state['_lock'] = None
+        return state
+
+    def __len__(self):
+        return len(self.samples)
+
+    def read_bytes(self, i):
+        """读取第 i 个样本的原始图像字节"""
+        sample = self.samples[i]
+        shard = sample['shard']
+        path = self.split_dir / self.index['shards'][shard]['name']
+        if HAS_PREAD:
+            fd = self._handles.get(shard)
+            if fd is None:
+                fd = self._handles[shard] = os.open(path, os.O_RDONLY)
+            return os.pread(fd, sample['size'], sample['offset'])
+
+        # cache='ram' 时 ultralytics 用线程池并发读取, seek + read 必须成对执行
+        if self._lock is None:
+            self._lock = threading.Lock()
+        with self._lock:
+            f = self._handles.get(shard)
+            if f is None:
+                f = self._handles[shard] = open(path, 'rb')
+            f.seek(sample['offset'])
+            return f.read(sample['size'])
+
+    def read_image(self, i):
+        """读取并解码第 i 个样本 (BGR)"""
+        import cv2
+
+        data = np.frombuffer(self.read_bytes(i), dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def close(self):
+        for handle in self._handles.values():
+            if HAS_PREAD:
+                os.close(handle)
+            else:
+                handle.close()
+        self._handles = {}
+
+
+class ShardStream:
+    """
+    顺序流式读取分片 (可迭代)
+
+    - 每个 epoch 打乱分片顺序, 分片内部顺序读取, 再经过洗牌缓冲区打乱样本
+    - 多节点时按 rank/world_size 划分分片; 在 torch DataLoader 中还会按 worker 再次划分
+    - 产出 dict: key, image (BGR, decode=True 时), image_bytes, labels ((N, 5) 数组)
+    """
+
+    def __init__(self, split_dir, shuffle_buffer=1000, seed=0, rank=0, world_size=1, decode=True):
+        """
+        Args:
+            split_dir: 划分目录 (shard_root/<split>)
+            shuffle_buffer: 洗牌缓冲区大小 (0 表示不打乱, 完全按顺序)
+            seed: 随机种子
+            rank: 当前节点序号
+            world_size: 节点总数
+            decode: 是否解码图像
+        """
+        self.split_dir = Path(split_dir)
+        self.index = load_index(self.split_dir)
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.decode = decode
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """设置 epoch, 使每个 epoch 的打乱顺序不同但可复现"""
+        self.epoch = epoch
+
+    def __len__(self):
+        return len(self.index['samples'])
+
+    def _assigned_shards(self):
+        names = [s['name'] for s in self.index['shards']]
+        rng = random.Random(self.seed + self.epoch)
+        if self.shuffle_buffer:
+            rng.shuffle(names)
+        names = names[self.rank::self.world_size]
+
+        try:
+            from torch.utils.data import get_worker_info
+            worker = get_worker_info()
+        except ImportError:
+            worker = None
+        if worker is not None:
+            names = names[worker.id::worker.num_workers]
+        return names
+
+    def _iter_raw(self):
+        """按分片顺序产出 (key, 图像扩展名, 图像字节, 标签文本)"""
+        for name in self._assigned_shards():
+            with open(self.split_dir / name, 'rb', buffering=READ_BUFFER_SIZE) as f:
+                with tarfile.open(fileobj=f, mode='r|') as tar:
+                    pending = {}
+                    for member in tar:
+                        if not member.isfile():
+                            continue
+                        key, ext = member.name.rsplit('.', 1)
+                        data = tar.extractfile(member).read()
+                        sample = pending.setdefault(key, {})
+                        sample['label' if ext == 'txt' else 'image'] = (f'.{ext}', data)
+                        if 'image' in sample and 'label' in sample:
+                            del pending[key]
+                            yield key, sample['image'][0], sample['image'][1], sample['label'][1].decode('utf-8')
+
+    def _make_sample(self, key, ext, image_bytes, label_text):
+        sample = {'key': key, 'ext': ext, 'image_bytes': image_bytes, 'labels': parse_label_text(label_text)}
+        if self.decode:
+            import cv2
+            sample['image'] = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return sample
+
+    def __iter__(self):
+        rng = random.Random(self.seed + self.epoch + 7919 * self.rank)
+        buffer = []
+        for raw in self._iter_raw():
+            if self.shuffle_buffer <= 1:
+                yield self._make_sample(*raw)
+                continue
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(raw)
+                continue
+            j = rng.randrange(len(buffer))
+            buffer[j], raw = raw, buffer[j]
+            yield self._make_sample(*raw)
+
+        rng.shuffle(buffer)
+        for raw in buffer:
+            yield self._make_sample(*raw)
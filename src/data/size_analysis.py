@@ -0,0 +1,179 @@
+"""
+按数据集分辨率选择训练/验证 imgsz 与矩形批次
+GTSRB 裁剪图的边长大多在 30-100 px, 固定 imgsz=640 时绝大部分输入像素都是插值放大出来的;
+这里统计尺寸分布, 对每个候选 imgsz 估算:
+
+- upsampled: 插值放大产生的像素占比 (不含新信息)
+- downscaled: 长边超过 imgsz、会被缩小而丢失细节的图像占比
+- pad_square / pad_rect: 正方形输入 / 矩形批次 (与 ultralytics set_rectangle 相同的分批方式) 下的填充像素占比
+
+并推荐满足 "被缩小的图像不超过 (100 - percentile)%" 的最小 imgsz
+
+用法:
+    from src.data.size_analysis import sizes_from_dir, recommend_imgsz
+
+    sizes = sizes_from_dir('data/yolo_dataset/images/train')
+    choice = recommend_imgsz(sizes, batch=16)
+    print(choice['imgsz'], choice['rect'])
+"""
+
+import csv
+from pathlib import Path
+
+import numpy as np
+
+
+DEFAULT_CANDIDATES = (64, 96, 128, 160, 192, 224, 256, 320, 416, 512, 640)
+
+# 矩形批次比正方形少填充这么多 (占比) 时才推荐 rect
+RECT_GAIN_THRESHOLD = 0.05
+
+
+def sizes_from_csv(csv_root):
+    """
+    从 GTSRB 标注 CSV (GT-*.csv 的 Width/Height 列) 读取图像尺寸, 不需要打开图像
+
+    Args:
+        csv_root: GTSRB 根目录或单个 CSV 文件
+
+    Returns:
+        sizes: (n, 2) int 数组, 每行为 (宽, 高)
+    """
+    csv_root = Path(csv_root)
+    csv_files = [csv_root] if csv_root.is_file() else sorted(csv_root.rglob('GT-*.csv'))
+    sizes = []
+    for csv_file in csv_files:
+        with open(csv_file, 'r') as f:
+            for row in csv.DictReader(f, delimiter=';'):
+                sizes.append((int(row['Width']), int(row['Height'])))
+    return np.array(sizes, dtype=np.int64).reshape(-1, 2)
+
+
+def sizes_from_dir(images_dir, workers=8):
+    """扫描图像目录 (只读文件头) 得到 (n, 2) 尺寸数组"""
+    from src.data.image_store import list_image_files
+    from src.data.packing import read_image_sizes
+
+    return read_image_sizes(list_image_files(images_dir), workers=workers)
+
+
+def sizes_from_shards(split_dir):
+    """从 tar 分片索引 (src.data.shards) 读取 (n, 2) 尺寸数组, 不需要读取图像"""
+    from src.data.shards import load_index
+
+    shapes = [sample['shape'] for sample in load_index(split_dir)['samples']]
+    return np.array(shapes, dtype=np.int64).reshape(-1, 2)[:, ::-1]
+
+
+def size_summary(sizes):
+    """尺寸分布摘要: 长边的分位数和宽高比范围"""
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    long_side = sizes.max(axis=1)
+    ar = sizes[:, 1] / sizes[:, 0]
+    return {
+        'count': int(len(sizes)),
+        'long_side': {f'p{p}': float(np.percentile(long_side, p)) for p in (5, 25, 50, 75, 95, 99)},
+        'long_side_max': float(long_side.max()),
+        'aspect_ratio': [float(ar.min()), float(ar.max())],
+    }
+
+
+def _rect_batch_shapes(sizes, imgsz, batch, stride, pad):
+    """与 ultralytics BaseDataset.set_rectangle 相同: 按宽高比排序后每批取共同的矩形形状"""
+    hw = sizes[:, ::-1]
+    ar = hw[:, 0] / hw[:, 1]
+    order = ar.argsort()
+    ar = ar[order]
+    n = len(ar)
+    bi = np.arange(n) // batch
+    shapes = np.ones((bi[-1] + 1, 2))
+    for i in range(len(shapes)):
+        ari = ar[bi == i]
+        mini, maxi = ari.min(), ari.max()
+        if maxi < 1:
+            shapes[i] = [maxi, 1]
+        elif mini > 1:
+            shapes[i] = [1, 1 / mini]
+    batch_shapes = np.ceil(shapes * imgsz / stride + pad).astype(int) * stride
+    return order, batch_shapes[bi]
+
+
+def evaluate_imgsz(sizes, imgsz, batch=16, stride=32, pad=0.0):
+    """
+    估算某个 imgsz 下的像素浪费
+
+    Args:
+        pad: 矩形批次的额外填充 (以 stride 为单位; ultralytics 训练为 0.0, 验证为 0.5)
+
+    Returns:
+        stats: {'imgsz', 'upsampled', 'downscaled', 'pad_square', 'pad_rect', 'pixels_square', 'pixels_rect'};
+               pixels_* 为每个 epoch 送入网络的总像素数 (相对值, 用于比较计算量)
+    """
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    native = sizes[:, 0] * sizes[:, 1]
+    r = imgsz / sizes.max(axis=1)
+    resized = native * r ** 2
+    content = resized.sum()
+
+    # 放大产生的像素中只有 native 个携带原始信息
+    upsampled = np.where(r > 1, resized - native, 0).sum() / content
+
+    pixels_square = float(len(sizes)) * imgsz ** 2
+    order, shapes = _rect_batch_shapes(sizes, imgsz, batch, stride, pad)
+    pixels_rect = float((shapes[:, 0] * shapes[:, 1]).sum())
+
+    return {
+        'imgsz': int(imgsz),
+        'upsampled': float(upsampled),
+        'downscaled': float((r < 1).mean()),
+        'pad_square': float(1 - content / pixels_square),
+        'pad_rect': float(max(0.0, 1 - content / pixels_rect)),
+        'pixels_square': pixels_square,
+        'pixels_rect': pixels_rect,
+    }
+
+
+def recommend_imgsz(sizes, candidates=DEFAULT_CANDIDATES, percentile=95, batch=16, stride=32):
+    """
+    推荐 imgsz 与是否使用矩形批次
+
+    Args:
+        sizes: (n, 2) 图像尺寸
+        candidates: 候选 imgsz (应为 stride 的倍数)
+        percentile: 至少这个百分比的图像不被缩小
+        batch: 批次大小 (影响矩形批次的形状)
+        stride: 模型最大步长
+
+    Returns:
+        choice: {'imgsz', 'rect', 'percentile', 'summary', 'candidates': [evaluate_imgsz 结果, ...]}
+    """
+    sizes = np.asarray(sizes).reshape(-1, 2)
+    if not len(sizes):
+        raise ValueError("没有可分析的图像尺寸")
+
+    target = np.percentile(sizes.max(axis=1), percentile)
+    candidates = sorted(int(c) for c in candidates if c % stride == 0)
+    evaluated = [evaluate_imgsz(sizes, c, batch=batch, stride=stride) for c in candidates]
+
+    # 满足分位数要求的最小候选; 都不满足时取最大候选
+    imgsz = next((c for c in candidates if c >= target), candidates[-1])
+    chosen = next(e for e in evaluated if e['imgsz'] == imgsz)
+
+    return {
+        'imgsz': imgsz,
+        'rect': chosen['pad_square'] - chosen['pad_rect'] > RECT_GAIN_THRESHOLD,
+        'percentile': percentile,
+        'summary': size_summary(sizes),
+        'candidates': evaluated,
+    }
+
+
+def format_candidates(choice):
+    """将候选评估结果格式化为表格文本"""
+    lines = [f"{'imgsz':>6} {'放大像素':>8} {'被缩小':>8} {'方形填充':>8} {'矩形填充':>8} {'相对计算量':>10}"]
+    base = max(e['pixels_square'] for e in choice['candidates'])
+    for e in choice['candidates']:
+        mark = ' ⭐' if e['imgsz'] == choice['imgsz'] else ''
+        lines.append(f"{e['imgsz']:>6} {e['upsampled']:>8.1%} {e['downscaled']:>8.1%} "
+                     f"{e['pad_square']:>8.1%} {e['pad_rect']:>8.1%} {e['pixels_square'] / base:>10.3f}{mark}")
+    return '\n'.join(lines)
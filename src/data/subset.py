@@ -0,0 +1,256 @@
+"""
+分层子集
+从 YOLO 数据集中按类别 (可选再按亮度分桶) 分层抽取一部分图像, 写成图像列表
+(ultralytics 支持 train: xxx.txt) 和一份新的数据集配置; 配置中的其余键
+(transforms / transform_cache / names ...) 原样保留, 因此训练和评估脚本可以直接使用
+(虚拟数据集配置仍按变换链即时生成图像).
+
+用子集快速比较增强方法之前, 可以用 ranking_agreement 检查子集上的排名与完整数据集上的排名是否一致.
+
+用法:
+    from functools import partial
+    from src.data.subset import class_brightness_strata, write_subset_config
+
+    config = write_subset_config('configs/exp2_traditional_virtual.yaml', 'experiments/search/subset',
+                                 fractions={'train': 0.1, 'val': 0.25},
+                                 strata_fn=partial(class_brightness_strata, n_buckets=4))
+    model.train(data=config, ...)
+"""
+
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from src.data.image_store import list_image_files
+
+
+PROJECT_ROOT = Path(__file__).parents[2]
+
+SUBSET_CONFIG_NAME = 'data.yaml'
+
+
+def label_path_for(image_path):
+    """与 ultralytics img2label_paths 相同: .../images/xxx.png -> .../labels/xxx.txt"""
+    image_path = str(image_path)
+    sa, sb = f'{os.sep}images{os.sep}', f'{os.sep}labels{os.sep}'
+    return Path(sb.join(image_path.rsplit(sa, 1))).with_suffix('.txt')
+
+
+def image_class(image_path):
+    """图像第一个目标的类别 (GTSRB 裁剪图只有一个目标); 没有标签时返回 -1"""
+    try:
+        with open(label_path_for(image_path), 'r') as f:
+            line = f.readline().split()
+    except FileNotFoundError:
+        return -1
+    return int(float(line[0])) if line else -1
+
+
+def read_brightness(image_files, workers=8):
+    """
+    平均亮度 (灰度, 0-255); 以 1/2 分辨率解码, 无法读取的图像为 NaN
+
+    Returns:
+        (n,) float 数组
+    """
+    def _brightness(path):
+        image = cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_2)
+        return float(image.mean()) if image is not None and image.size else np.nan
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return np.array(list(pool.map(_brightness, image_files)), dtype=np.float64)
+
+
+def brightness_buckets(values, n_buckets):
+    """
+    按分位数把亮度分为 n_buckets 个等频桶
+
+    Returns:
+        (桶编号数组 (0 为最暗, 无法读取的图像为 -1), 桶边界)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    if not valid.any() or n_buckets <= 1:
+        return np.where(valid, 0, -1), np.array([])
+    edges = np.quantile(values[valid], np.linspace(0, 1, n_buckets + 1)[1:-1])
+    buckets = np.searchsorted(edges, values, side='right')
+    return np.where(valid, buckets, -1), edges
+
+
+def class_brightness_strata(image_files, n_buckets=4, workers=8):
+    """类别 x 亮度桶分层键 (亮度桶在该划分内按分位数划分)"""
+    buckets, _ = brightness_buckets(read_brightness(image_files, workers=workers), n_buckets)
+    return [(image_class(path), int(bucket)) for path, bucket in zip(image_files, buckets)]
+
+
+def stratified_sample(image_files, fraction, strata, seed=0):
+    """
+    分层抽样: 每层至少保留一张, 其余按比例取整
+
+    Args:
+        image_files: 图像路径列表
+        fraction: 抽样比例
+        strata: 与 image_files 等长的分层键
+        seed: 随机种子
+
+    Returns:
+        按原顺序排列的抽样结果
+    """
+    groups = defaultdict(list)
+    for i, key in enumerate(strata):
+        groups[key].append(i)
+
+    rng = np.random.default_rng(seed)
+    chosen = []
+    for key in sorted(groups, key=str):
+        indices = groups[key]
+        n = min(len(indices), max(1, round(len(indices) * fraction)))
+        chosen.extend(rng.choice(indices, size=n, replace=False).tolist())
+    return [image_files[i] for i in sorted(chosen)]
+
+
+def _dataset_root(config, config_path):
+    """数据集根目录; 相对 path 按项目根目录解析 (与 load_virtual_config 一致)"""
+    path = Path(config.get('path', ''))
+    return path if path.is_absolute() else (PROJECT_ROOT / path).resolve()
+
+
+def write_subset_config(config_path, output_dir, fractions, seed=0, strata_fn=None):
+    """
+    写出子集的图像列表和数据集配置
+
+    Args:
+        config_path: 原数据集配置
+        output_dir: 输出目录 (写入 <划分>.txt 和 data.yaml)
+        fractions: {划分: 比例}, 未列出的划分保持完整
+        seed: 随机种子
+        strata_fn: strata_fn(image_files) -> 分层键列表; 默认按类别分层
+
+    Returns:
+        新数据集配置的路径
+    """
+    config_path, output_dir = Path(config_path), Path(output_dir)
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    root = _dataset_root(config, config_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    subset = dict(config)
+    subset['path'] = str(root)
+    counts = {}
+    for split, fraction in fractions.items():
+        if split not in config:
+            continue
+        images_dir = root / config[split]
+        image_files = [str(p) for p in list_image_files(images_dir)]
+        strata = strata_fn(image_files) if strata_fn else [image_class(p) for p in image_files]
+        chosen = stratified_sample(image_files, fraction, strata, seed=seed)
+
+        list_path = output_dir / f'{split}.txt'
+        tmp = list_path.with_name(list_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(chosen) + '\n')
+        os.replace(tmp, list_path)
+        subset[split] = str(list_path.resolve())
+        chosen_set = set(chosen)
+        counts[split] = {
+            'total': len(image_files),
+            'subset': len(chosen),
+            'strata': len(set(strata)),
+            'strata_covered': len({key for path, key in zip(image_files, strata) if path in chosen_set}),
+        }
+
+    subset['subset'] = {'source': str(config_path), 'fractions': dict(fractions), 'seed': seed, 'counts': counts}
+    subset_path = output_dir / SUBSET_CONFIG_NAME
+    with open(subset_path, 'w', encoding='utf-8') as f:
+        yaml.dump(subset, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+    return subset_path
+
+
+# ---------------- 排名一致性 ----------------
+
+def average_ranks(values):
+    """从大到小的名次 (1 为最高), 并列取平均名次"""
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(-values, kind='stable')
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    for value in np.unique(values):
+        tied = values == value
+        ranks[tied] = ranks[tied].mean()
+    return ranks
+
+
+def spearman(a, b):
+    """Spearman 等级相关系数 (名次的 Pearson 相关); 任一方名次全部相同时返回 None"""
+    ra, rb = average_ranks(a), average_ranks(b)
+    if ra.std() == 0 or rb.std() == 0:
+        return None
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def kendall_tau(a, b):
+    """Kendall tau-b (考虑并列); 任一方取值全部相同时返回 None"""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    i, j = np.triu_indices(len(a), k=1)
+    da, db = np.sign(a[i] - a[j]), np.sign(b[i] - b[j])
+    n_a, n_b = np.count_nonzero(da), np.count_nonzero(db)
+    if n_a == 0 or n_b == 0:
+        return None
+    return float((da * db).sum() / np.sqrt(n_a * n_b))
+
+
+def ranking_agreement(proxy_scores, full_scores):
+    """
+    比较子集和完整数据集上各方法的排名
+
+    Args:
+        proxy_scores: {方法: 子集上的指标}
+        full_scores: {方法: 完整数据集上的指标}; 只比较两边都有的方法
+
+    Returns:
+        {'methods', 'proxy_order', 'full_order', 'spearman', 'kendall', 'top1_match', 'pairs_agree'}
+    """
+    methods = [m for m in full_scores if m in proxy_scores]
+    if len(methods) < 2:
+        raise ValueError(f"至少需要两个同时有子集和完整结果的方法, 现有: {methods}")
+    proxy = [proxy_scores[m] for m in methods]
+    full = [full_scores[m] for m in methods]
+    proxy_order = sorted(methods, key=proxy_scores.get, reverse=True)
+    full_order = sorted(methods, key=full_scores.get, reverse=True)
+
+    # 两两比较中方向一致的比例 (任一方并列的方法对不计入)
+    p, f = np.asarray(proxy, dtype=np.float64), np.asarray(full, dtype=np.float64)
+    i, j = np.triu_indices(len(methods), k=1)
+    dp, df = np.sign(p[i] - p[j]), np.sign(f[i] - f[j])
+    decided = (dp != 0) & (df != 0)
+    return {
+        'methods': methods,
+        'proxy_order': proxy_order,
+        'full_order': full_order,
+        'spearman': spearman(proxy, full),
+        'kendall': kendall_tau(proxy, full),
+        'top1_match': proxy_order[0] == full_order[0],
+        'pairs_agree': float((dp[decided] == df[decided]).mean()) if decided.any() else None,
+    }
+
+
+def format_agreement(agreement, proxy_scores, full_scores, metric='mAP50-95'):
+    """把排名一致性格式化为几行文本"""
+    lines = [f"  {'方法':<16} {'子集 ' + metric:>16} {'名次':>4} {'完整 ' + metric:>16} {'名次':>4}"]
+    for method in agreement['full_order']:
+        lines.append(f"  {method:<16} {proxy_scores[method]:>16.4f} {agreement['proxy_order'].index(method) + 1:>4} "
+                     f"{full_scores[method]:>16.4f} {agreement['full_order'].index(method) + 1:>4}")
+
+    def _fmt(value):
+        return f"{value:+.3f}" if value is not None else '-'
+
+    pairs = f"{agreement['pairs_agree']:.0%}" if agreement['pairs_agree'] is not None else '-'
+    lines.append(f"  Spearman {_fmt(agreement['spearman'])}, Kendall {_fmt(agreement['kendall'])}, "
+                 f"两两方向一致 {pairs}, 第一名{'一致' if agreement['top1_match'] else '不一致'}")
+    return '\n'.join(lines)
@@ -0,0 +1,267 @@
+"""
+增量、可恢复的数据集变换
+为每个输出文件在清单 (manifest) 中记录源文件哈希和变换参数:
+- 重新运行时跳过已是最新的输出, 只处理过期或缺失的文件
+- 清单逐条追加写入, 进程中断后再次运行即可从断点继续
+
+清单格式 (JSON Lines, 后写入的记录覆盖先前的记录):
+    {"output": "train/a.png", "source": "/abs/a.png", "size": 1234, "mtime_ns": ...,
+     "source_hash": "...", "params": "...", "extra": {...}}
+
+用法:
+    from src.data.transform_runner import run_transform
+
+    def darken(src):
+        return create_extreme_lowlight(cv2.imread(str(src)), gamma)
+
+    stats = run_transform(jobs, darken, params={'op': 'gamma', 'gamma': gamma},
+                          manifest_path=output_dir / '.manifest.jsonl')
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+MANIFEST_NAME = '.manifest.jsonl'
+
+# 每写入多少条记录执行一次 fsync
+SYNC_EVERY = 100
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """计算文件内容哈希 (blake2b, 128 位)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def params_hash(params):
+    """计算变换参数的哈希 (参数需可 JSON 序列化)"""
+    text = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class TransformManifest:
+    """
+    变换清单
+    记录每个输出的来源和参数, 判断输出是否需要重新生成
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 清单文件路径; 输出路径以其所在目录为根记录相对路径
+        """
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.entries = {}
+        self._file = None
+        self._pending = 0
+        self._stems = None  # 去掉扩展名的输出路径 -> 记录 (remove_other_suffixes 首次调用时建立)
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时可能留下半行, 忽略即可
+                        continue
+                    self.entries[entry['output']] = entry
+
+    def key(self, output):
+        return os.path.relpath(os.fspath(output), self.root)
+
+    def source_hash(self, source, previous=None):
+        """
+        计算源文件哈希; 如果大小和修改时间与上一次记录相同, 直接沿用记录中的哈希
+        """
+        st = os.stat(source)
+        if previous and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+            return previous['source_hash'], st
+        return file_hash(source), st
+
+    def is_current(self, source, output, phash):
+        """
+        判断输出是否为最新
+
+        Returns:
+            (current, entry): current 为 True 时可以跳过; entry 为已有记录 (可能为 None)
+        """
+        entry = self.entries.get(self.key(output))
+        if entry is None or not os.path.exists(output):
+            return False, entry
+        if entry.get('params') != phash:
+            return False, entry
+        digest, _ = self.source_hash(source, entry)
+        return digest == entry.get('source_hash'), entry
+
+    def record(self, source, output, phash, extra=None, digest=None):
+        """追加一条记录 (先写入输出文件, 再调用本方法)"""
+        previous = self.entries.get(self.key(output))
+        if digest is None:
+            digest, st = self.source_hash(source, previous)
+        else:
+            st = os.stat(source)
+
+        entry = {
+            'output': self.key(output),
+            'source': os.path.abspath(source),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'source_hash': digest,
+            'params': phash,
+        }
+        if extra:
+            entry['extra'] = extra
+        self.entries[entry['output']] = entry
+
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= SYNC_EVERY:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def remove_other_suffixes(self, output):
+        """
+        删除同一输出以其他扩展名记录的旧文件和记录 (如更换编码器后 a.png 被 a.webp 取代)
+
+        Returns:
+            删除的记录数
+        """
+        if self._stems is None:
+            self._stems = {}
+            for k in self.entries:
+                self._stems.setdefault(os.path.splitext(k)[0], set()).add(k)
+        key = self.key(output)
+        keys = self._stems.setdefault(os.path.splitext(key)[0], set())
+        stale = [k for k in keys if k != key and k in self.entries]
+        for k in stale:
+            (self.root / k).unlink(missing_ok=True)
+            del self.entries[k]
+        keys.clear()
+        keys.add(key)
+        return len(stale)
+
+    def compact(self):
+        """去掉被覆盖的旧记录, 原子地重写清单"""
+        self.close()
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._pending = 0
+
+
+def write_image_atomic(output, image):
+    """先写临时文件再重命名, 中断时不会留下损坏的输出"""
+    import cv2
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f'.{output.stem}.tmp{output.suffix}')
+    if not cv2.imwrite(str(tmp), image):
+        raise IOError(f"写入失败: {output}")
+    os.replace(tmp, output)
+
+
+def run_transform(jobs, transform, params, manifest_path, writer=write_image_atomic, desc=None,
+                  force=False, codec=None):
+    """
+    对 (源文件, 输出文件) 列表执行变换, 跳过已是最新的输出
+
+    Args:
+        jobs: (src, dst) 列表
+        transform: transform(src) -> image 或 (image, extra); 返回 None 表示跳过该文件;
+                   extra 为需要记录在清单中的附加信息 (如随机生成的 gamma); extra['params'] 覆盖该输出
+                   记录的部分参数 (如该图像回退到了其他方法), 记录与本次参数不同, 下次运行会重新生成
+        params: 变换参数 (决定输出内容的全部参数, 参数改变会触发重新生成)
+        manifest_path: 清单文件路径
+        writer: writer(dst, image), 默认为原子写入的 cv2.imwrite
+        desc: 进度条描述
+        force: 为 True 时忽略清单, 全部重新生成
+        codec: 输出编码器 (见 src.data.codecs, 如 'png:1', 'webp'); 指定后输出扩展名随之改变,
+               编码器也计入参数, 更换编码器会触发重新生成, 并删除清单中旧扩展名的输出
+
+    Returns:
+        stats: {'processed', 'skipped', 'failed', 'removed', 'extras'}; removed 为删除的旧扩展名输出数,
+               extras 为每个输出的附加信息 (含跳过的)
+    """
+    from tqdm import tqdm
+
+    jobs = list(jobs)
+    if codec is not None:
+        from src.data.codecs import get_codec
+
+        codec = get_codec(codec)
+        jobs = [(src, codec.output_path(dst)) for src, dst in jobs]
+        params = dict(params, codec=codec.spec)
+        writer = codec.write
+
+    manifest = TransformManifest(manifest_path)
+    phash = params_hash(params)
+    stats = {'processed': 0, 'skipped': 0, 'failed': 0, 'removed': 0, 'extras': []}
+
+    try:
+        for src, dst in tqdm(jobs, desc=desc or "处理图像"):
+            if not force:
+                current, entry = manifest.is_current(src, dst, phash)
+                if current:
+                    stats['skipped'] += 1
+                    if entry.get('extra'):
+                        stats['extras'].append(entry['extra'])
+                    continue
+
+            try:
+                result = transform(src)
+                if result is None:
+                    stats['failed'] += 1
+                    continue
+                image, extra = result if isinstance(result, tuple) else (result, None)
+                writer(dst, image)
+                record_hash = phash
+                if extra and extra.get('params'):
+                    record_hash = params_hash(dict(params, **extra['params']))
+                manifest.record(src, dst, record_hash, extra=extra)
+                if codec is not None:
+                    stats['removed'] += manifest.remove_other_suffixes(dst)
+            except Exception as e:
+                print(f"\n处理失败 {src}: {e}")
+                stats['failed'] += 1
+                continue
+
+            stats['processed'] += 1
+            if extra:
+                stats['extras'].append(extra)
+    finally:
+        manifest.close()
+
+    manifest.compact()
+    return stats
+
+
+def format_run_stats(stats):
+    """将统计结果格式化为一行文本"""
+    text = f"新处理 {stats['processed']}, 已是最新 {stats['skipped']}, 失败 {stats['failed']}"
+    if stats.get('removed'):
+        text += f", 删除旧格式输出 {stats['removed']}"
+    return text
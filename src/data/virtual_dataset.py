@@ -0,0 +1,315 @@
+"""
+虚拟派生数据集
+直接读取原始 yolo_dataset, 在 dataloader worker 中按声明式变换链 (如 gamma 变暗 -> CLAHE)
+即时生成低光照/增强图像, 不再为每个实验写出一份完整的数据集副本
+
+变换结果保存在有上限的 LRU 缓存中:
+- 内存: 每个 worker 进程一份, 按字节数限制
+- 磁盘 (可选): 多个 worker / 多次运行共享, 超出上限时删除最久未使用的文件
+
+变换链写在 configs/ 的数据集配置中 (ultralytics 会忽略这些额外的键):
+
+    path: data/yolo_dataset
+    train: images/train
+    val: images/val
+    transforms:
+      - {op: random_gamma, low: 0.3, high: 0.7, seed: 42}
+      - {op: clahe, clip_limit: 3.0, tile: 8}
+      - {op: gamma, gamma: 1.2}
+    transform_cache:
+      ram_mb: 512
+      disk_mb: 4096
+      dir: data/cache/virtual
+
+用法:
+    from src.data.virtual_dataset import VirtualDataset, load_virtual_config
+    from src.data.yolo_adapter import build_trainer
+
+    data_path, dataset_kwargs = load_virtual_config('configs/exp2_traditional_virtual.yaml')
+    model.train(data=data_path, trainer=build_trainer(VirtualDataset, **dataset_kwargs), ...)
+"""
+
+import hashlib
+import os
+import tempfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from src.data.codecs import NpyCodec
+from src.data.transform_runner import params_hash
+from src.data.yolo_adapter import FrameSourceDataset
+
+
+PROJECT_ROOT = Path(__file__).parents[2]
+
+
+def _gamma_table(gamma):
+    """与 create_extreme_lowlight / create_pure_lowlight 相同的查找表 (gamma < 1 变暗, > 1 变亮)"""
+    inv_gamma = 1.0 / gamma
+    return np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)]).astype('uint8')
+
+
+def _op_gamma(image, key, gamma):
+    return cv2.LUT(image, _gamma_table(gamma))
+
+
+def _op_random_gamma(image, key, low=0.3, high=0.7, seed=42):
+    # 与 create_pure_lowlight 一致: gamma 由 (种子, 文件名) 决定, 每次读取结果相同
+    rng = np.random.default_rng([seed, zlib.crc32(key.encode('utf-8'))])
+    return cv2.LUT(image, _gamma_table(rng.uniform(low, high)))
+
+
+def _op_clahe(image, key, clip_limit=3.0, tile=8):
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile, tile))
+    return cv2.cvtColor(cv2.merge([clahe.apply(l), a, b]), cv2.COLOR_LAB2BGR)
+
+
+_ENLIGHTEN_MODELS = {}
+
+
+def _op_enlightengan(image, key, model='weights/enlightengan.onnx'):
+    # 每个 worker 进程加载一次模型
+    if model not in _ENLIGHTEN_MODELS:
+        from src.models.enlightengan import EnlightenGANInference
+
+        inference = EnlightenGANInference(PROJECT_ROOT / model if not os.path.isabs(model) else model)
+        if inference.session is None:
+            raise RuntimeError(f"EnlightenGAN 模型加载失败: {model}")
+        _ENLIGHTEN_MODELS[model] = inference
+    return _ENLIGHTEN_MODELS[model].process(image)
+
+
+TRANSFORM_OPS = {
+    'gamma': _op_gamma,
+    'random_gamma': _op_random_gamma,
+    'clahe': _op_clahe,
+    'enlightengan': _op_enlightengan,
+}
+
+
+class TransformChain:
+    """
+    声明式变换链
+    每一步为 {'op': 名称, **参数}; 同一张图像 (按文件名) 每次得到相同结果
+    """
+
+    def __init__(self, steps):
+        self.steps = [dict(step) for step in steps or []]
+        for step in self.steps:
+            if step.get('op') not in TRANSFORM_OPS:
+                raise ValueError(f"未知的变换: {step.get('op')}，可选: {', '.join(TRANSFORM_OPS)}")
+
+    @property
+    def fingerprint(self):
+        """变换链的哈希, 用作缓存命名空间"""
+        return params_hash(self.steps)
+
+    def __call__(self, image, key):
+        for step in self.steps:
+            params = {k: v for k, v in step.items() if k != 'op'}
+            image = TRANSFORM_OPS[step['op']](image, key, **params)
+        return image
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return ' -> '.join(step['op'] for step in self.steps) or 'identity'
+
+
+class TransformCache:
+    """
+    变换结果的 LRU 缓存 (内存 + 可选磁盘)
+    """
+
+    def __init__(self, namespace, ram_bytes=512 * 1024 * 1024, disk_dir=None, disk_bytes=0):
+        """
+        Args:
+            namespace: 缓存命名空间 (变换链指纹), 不同变换链互不干扰
+            ram_bytes: 内存缓存上限 (字节, 0 表示不缓存)
+            disk_dir: 磁盘缓存根目录 (为 None 时不使用磁盘缓存)
+            disk_bytes: 磁盘缓存上限 (字节)
+        """
+        self.ram_bytes = ram_bytes
+        self.disk_dir = Path(disk_dir) / namespace if disk_dir and disk_bytes > 0 else None
+        self.disk_bytes = disk_bytes
+        self._ram = OrderedDict()
+        self._ram_used = 0
+        self._disk_used = None
+        self._codec = NpyCodec()
+        self.hits = {'ram': 0, 'disk': 0, 'miss': 0}
+
+    def __getstate__(self):
+        # 内存缓存不随数据集复制到 worker
+        state = self.__dict__.copy()
+        state['_ram'] = OrderedDict()
+        state['_ram_used'] = 0
+        state['_disk_used'] = None
+        return state
+
+    def _disk_path(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+        return self.disk_dir / digest[:2] / f'{digest}.npy'
+
+    def get(self, key):
+        image = self._ram.get(key)
+        if image is not None:
+            self._ram.move_to_end(key)
+            self.hits['ram'] += 1
+            return image
+
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                image = np.load(path, allow_pickle=False)
+                os.utime(path)  # 更新访问时间, 作为 LRU 依据
+            except (OSError, ValueError):
+                image = None
+            if image is not None:
+                self.hits['disk'] += 1
+                self._put_ram(key, image)
+                return image
+
+        self.hits['miss'] += 1
+        return None
+
+    def put(self, key, image):
+        self._put_ram(key, image)
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                self._codec.write(path, image)
+            except OSError:
+                return
+            if self._disk_used is None:
+                self._disk_used = self._scan_disk()[1]
+            self._disk_used += path.stat().st_size
+            if self._disk_used > self.disk_bytes:
+                self._evict_disk()
+
+    def _put_ram(self, key, image):
+        if image.nbytes > self.ram_bytes:
+            return
+        self._ram[key] = image
+        self._ram_used += image.nbytes
+        while self._ram_used > self.ram_bytes:
+            _, old = self._ram.popitem(last=False)
+            self._ram_used -= old.nbytes
+
+    def _scan_disk(self):
+        files = []
+        total = 0
+        for path in self.disk_dir.rglob('*.npy'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, path))
+            total += st.st_size
+        return files, total
+
+    def _evict_disk(self):
+        """删除最久未使用的文件, 降到上限的 90%; 多个 worker 同时淘汰时忽略已被删除的文件"""
+        files, total = self._scan_disk()
+        target = int(self.disk_bytes * 0.9)
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+        self._disk_used = total
+
+
+class VirtualDataset(FrameSourceDataset):
+    """
+    读取原始图像并即时应用变换链的数据集
+    """
+
+    def __init__(self, *args, transforms=None, ram_cache_mb=512, disk_cache_mb=0, cache_dir=None, **kwargs):
+        """
+        Args:
+            transforms: 变换链 (步骤列表或 TransformChain)
+            ram_cache_mb: 每个 worker 的内存缓存上限 (MB)
+            disk_cache_mb: 磁盘缓存上限 (MB, 0 表示不使用)
+            cache_dir: 磁盘缓存目录 (默认 data/cache/virtual)
+        """
+        self.chain = transforms if isinstance(transforms, TransformChain) else TransformChain(transforms)
+        cache_dir = Path(cache_dir) if cache_dir else PROJECT_ROOT / 'data' / 'cache' / 'virtual'
+        self.transform_cache = TransformCache(
+            self.chain.fingerprint,
+            ram_bytes=int(ram_cache_mb * 1024 * 1024),
+            disk_dir=cache_dir,
+            disk_bytes=int(disk_cache_mb * 1024 * 1024),
+        )
+        super().__init__(*args, **kwargs)
+
+    def read_frame(self, i):
+        im_file = self.im_files[i]
+        if not len(self.chain):
+            return cv2.imread(im_file)
+
+        # 源文件改变 (大小或修改时间) 后缓存自然失效
+        try:
+            st = os.stat(im_file)
+        except OSError:
+            return None
+        cache_key = f'{im_file}:{st.st_size}:{st.st_mtime_ns}'
+
+        image = self.transform_cache.get(cache_key)
+        if image is not None:
+            return image
+
+        image = cv2.imread(im_file)
+        if image is None:
+            return None
+        image = self.chain(image, Path(im_file).name)
+        self.transform_cache.put(cache_key, image)
+        return image
+
+
+def load_virtual_config(config_path):
+    """
+    读取声明了变换链的数据集配置
+
+    Args:
+        config_path: configs/ 中的 YAML 配置
+
+    Returns:
+        (data_path, dataset_kwargs): data_path 可直接传给 model.train(data=...)
+            (相对 path 会按项目根目录解析并写出一份临时配置);
+            dataset_kwargs 传给 build_trainer(VirtualDataset, ...) / build_validator
+    """
+    config_path = Path(config_path)
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    cache = config.get('transform_cache') or {}
+    dataset_kwargs = {
+        'transforms': TransformChain(config.get('transforms')),
+        'ram_cache_mb': cache.get('ram_mb', 512),
+        'disk_cache_mb': cache.get('disk_mb', 0),
+        'cache_dir': PROJECT_ROOT / cache['dir'] if cache.get('dir') else None,
+    }
+
+    # ultralytics 把相对 path 解析到其 datasets 目录, 这里改为相对项目根目录
+    data_path = config_path
+    path = Path(config.get('path', ''))
+    if not path.is_absolute():
+        config['path'] = str((PROJECT_ROOT / path).resolve())
+        out_dir = Path(tempfile.gettempdir()) / 'virtual_datasets'
+        out_dir.mkdir(parents=True, exist_ok=True)
+        data_path = out_dir / config_path.name
+        with open(data_path, 'w', encoding='utf-8') as f:
+            yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
+
+    return str(data_path), dataset_kwargs
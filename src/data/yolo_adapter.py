@@ -0,0 +1,367 @@
+"""
+YOLO 数据集适配器
+让 ultralytics 训练/验证从自定义的图像来源读取像素 (打包存储、tar 分片等),
+标签默认仍按 YOLO 格式从 labels/ 目录读取
+
+用法:
+    from src.data.yolo_adapter import PackedStoreDataset, build_trainer
+
+    trainer = build_trainer(PackedStoreDataset, store_root='data/yolo_dataset/store')
+    model.train(data='configs/exp1_baseline.yaml', trainer=trainer, ...)
+"""
+
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.utils import colorstr
+
+from src.data.decoded_cache import DecodedImageCache
+from src.data.image_store import PackedImageStore, store_is_current
+from src.data.packing import (DEFAULT_FILL, canvas_labels, compose_canvas, plan_canvases,
+                              read_crop_labels, read_image_sizes)
+from src.data.shards import ShardReader, ShardStream, parse_label_text
+
+
+class FrameSourceDataset(YOLODataset):
+    """
+    可替换图像来源的 YOLODataset
+    子类只需实现 read_frame(i), 返回 BGR uint8 图像;
+    缩放与 mosaic 缓冲逻辑与 ultralytics 的 load_image 保持一致
+    """
+
+    def read_frame(self, i):
+        """读取第 i 张原始图像 (BGR), 默认直接从磁盘解码"""
+        return cv2.imread(self.im_files[i])
+
+    def load_image(self, i, rect_mode=True):
+        """读取并缩放第 i 张图像, 返回 (图像, 原始尺寸, 缩放后尺寸)"""
+        im = self.ims[i]
+        if im is not None:
+            return im, self.im_hw0[i], self.im_hw[i]
+
+        im = self.read_frame(i)
+        if im is None:
+            raise FileNotFoundError(f"Image Not Found {self.im_files[i]}")
+
+        h0, w0 = im.shape[:2]
+        if rect_mode:
+            r = self.imgsz / max(h0, w0)
+            if r != 1:
+                w, h = (min(int(round(w0 * r)), self.imgsz), min(int(round(h0 * r)), self.imgsz))
+                im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+        elif not (h0 == w0 == self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+
+        return self._remember(i, im, (h0, w0))
+
+    def _remember(self, i, im, hw0):
+        """训练增强时把图像放入 mosaic 缓冲区 (与 ultralytics 相同), 返回 (图像, 原始尺寸, 缩放后尺寸)"""
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, hw0, im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != 'ram':
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, hw0, im.shape[:2]
+
+
+class PackedStoreDataset(FrameSourceDataset):
+    """
+    从打包存储 (src.data.image_store) 读取像素的数据集
+    图像路径的父目录名作为划分名, 文件名作为键; 存储中缺失的图像回退到磁盘读取
+    """
+
+    def __init__(self, *args, store_root=None, **kwargs):
+        """
+        Args:
+            store_root: 存储根目录 (默认为 <数据集根目录>/store; 自动找到的存储与源图像不一致时不使用)
+        """
+        self.store_root = Path(store_root) if store_root else None
+        self._stores = {}
+        super().__init__(*args, **kwargs)
+
+    def __getstate__(self):
+        # memmap 不随数据集序列化, 在各个 worker 中重新打开
+        state = self.__dict__.copy()
+        state['_stores'] = {}
+        return state
+
+    def _store(self, split, image_path):
+        if split not in self._stores:
+            root = self.store_root or image_path.parents[2] / 'store'
+            try:
+                self._stores[split] = PackedImageStore(root, split)
+            except FileNotFoundError:
+                self._stores[split] = None
+            if (self._stores[split] is not None and self.store_root is None
+                    and not store_is_current(root, split, image_path.parent)):
+                print(f"⚠️  图像存储 {root / split} 与源图像不一致, 改为从磁盘读取 (可用 ensure_image_store 重新打包)")
+                self._stores[split] = None
+        return self._stores[split]
+
+    def read_frame(self, i):
+        image_path = Path(self.im_files[i])
+        store = self._store(image_path.parent.name, image_path)
+        if store is not None:
+            image = store.get(image_path.name)
+            if image is not None:
+                return image
+        return cv2.imread(self.im_files[i])
+
+
+class DecodedCacheDataset(FrameSourceDataset):
+    """
+    从共享解码缓存 (src.data.decoded_cache) 读取已缩放到 imgsz 的图像
+    缓存需在训练前用 ensure_decoded_cache 构建; 缺失时回退为逐个解码
+    """
+
+    def __init__(self, *args, cache_root=None, **kwargs):
+        """
+        Args:
+            cache_root: 缓存根目录 (默认 data/cache/decoded)
+        """
+        self.cache_root = cache_root
+        self._caches = {}
+        super().__init__(*args, **kwargs)
+
+    def __getstate__(self):
+        # memmap 不随数据集序列化, 在各个 worker 中重新打开
+        state = self.__dict__.copy()
+        state['_caches'] = {}
+        return state
+
+    def _cache(self, images_dir):
+        if images_dir not in self._caches:
+            self._caches[images_dir] = DecodedImageCache.open(images_dir, self.imgsz, self.cache_root)
+        return self._caches[images_dir]
+
+    def load_image(self, i, rect_mode=True):
+        if self.ims[i] is None and rect_mode:
+            image_path = Path(self.im_files[i])
+            cache = self._cache(str(image_path.parent))
+            j = cache.index_of(image_path.name) if cache is not None else None
+            if j is not None:
+                view, hw0 = cache[j]
+                # 后续增强 (如 HSV) 会原地修改图像, 需要复制一份
+                im = np.array(view)
+                return self._remember(i, im, hw0)
+        return super().load_image(i, rect_mode)
+
+
+class ShardDataset(FrameSourceDataset):
+    """
+    从 tar 分片 (src.data.shards) 读取的数据集
+    img_path 指向分片划分目录 (shard_root/<split>), 图像和标签都来自分片索引,
+    不需要在本机展开成小文件
+
+    初始化时用 ShardStream 按分片顺序把全部编码后的图像读入内存 (顺序读, 接近磁盘带宽),
+    之后训练和验证 (包括 cache='ram' 的解码) 都从内存解码, 不再按样本随机读取分片;
+    编码后的数据集放不进内存时使用 preload=False, 改为用 ShardReader 按偏移量逐个读取
+    """
+
+    def __init__(self, *args, preload=True, **kwargs):
+        """
+        Args:
+            preload: 是否在初始化时把编码后的图像顺序读入内存
+        """
+        self.preload = preload
+        self._encoded = None
+        super().__init__(*args, **kwargs)
+        if self.cache == 'ram':
+            # 已全部解码进 ultralytics 的内存缓存, 编码字节不再需要
+            self._encoded = None
+
+    def get_img_files(self, img_path):
+        split_dirs = img_path if isinstance(img_path, list) else [img_path]
+        self._readers = [ShardReader(d) for d in split_dirs]
+        locations = []
+        im_files = []
+        for r, reader in enumerate(self._readers):
+            for i, sample in enumerate(reader.samples):
+                locations.append((r, i))
+                im_files.append(str(reader.split_dir / f"{sample['key']}{sample['ext']}"))
+        if self.fraction < 1:
+            n = round(len(im_files) * self.fraction)
+            im_files, locations = im_files[:n], locations[:n]
+        # 按文件名索引: rect 模式 (验证时总是开启) 会按宽高比重新排列 im_files
+        self._locations = dict(zip(im_files, locations))
+        if self.preload:
+            self._encoded = self._stream_encoded()
+        return im_files
+
+    def _stream_encoded(self):
+        """用 ShardStream 按分片顺序读出编码后的图像, 返回 {im_file: 字节}"""
+        wanted = {loc: f for f, loc in self._locations.items()}
+        encoded = {}
+        for r, reader in enumerate(self._readers):
+            positions = {sample['key']: i for i, sample in enumerate(reader.samples)}
+            for sample in ShardStream(reader.split_dir, shuffle_buffer=0, decode=False):
+                im_file = wanted.get((r, positions[sample['key']]))
+                if im_file is not None:
+                    encoded[im_file] = sample['image_bytes']
+        nbytes = sum(len(data) for data in encoded.values())
+        print(f"{self.prefix}分片已读入内存: {len(encoded)} 张图像 ({nbytes / 1024 / 1024:.0f} MB)")
+        return encoded
+
+    def get_labels(self):
+        labels = []
+        for im_file in self.im_files:
+            r, i = self._locations[im_file]
+            sample = self._readers[r].samples[i]
+            rows = parse_label_text(sample['labels'])
+            labels.append({
+                'im_file': im_file,
+                'shape': tuple(sample['shape']),
+                'cls': rows[:, 0:1],
+                'bboxes': rows[:, 1:5],
+                'segments': [],
+                'keypoints': None,
+                'normalized': True,
+                'bbox_format': 'xywh',
+            })
+        self.label_files = [str(Path(f).with_suffix('.txt')) for f in self.im_files]
+        return labels
+
+    def read_frame(self, i):
+        im_file = self.im_files[i]
+        data = self._encoded.get(im_file) if self._encoded is not None else None
+        if data is not None:
+            return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        r, j = self._locations[im_file]
+        return self._readers[r].read_image(j)
+
+
+class CanvasDataset(FrameSourceDataset):
+    """
+    小目标拼接数据集 (见 src.data.packing)
+    img_path 仍指向裁剪图目录 (如 yolo_dataset/images/train), 初始化时只读取尺寸和标签并规划布局,
+    每张画布在 dataloader worker 中由裁剪图即时拼接, 不需要预先生成
+
+    布局在数据集创建时由 seed 决定, 训练集可对裁剪图随机缩放 (scale_range); 不支持 cache='disk'.
+    build_trainer 只用它构建训练集, 验证集仍为原始裁剪图 (与推理时的输入一致)
+
+    model.train 的 imgsz 是验证和推理的输入尺寸: 裁剪图在画布上按 crop_size (默认即 imgsz) 缩放长边,
+    与验证/推理时 letterbox 后的目标尺度一致; 画布边长由 canvas_size 决定, 与 imgsz 无关
+    """
+
+    # 只用于训练集 (build_trainer 在验证时改用标准 YOLODataset)
+    train_only = True
+
+    def __init__(self, *args, canvas_size=640, crop_size=None, seed=0, scale_range=(1.0, 1.0), fill=DEFAULT_FILL,
+                 **kwargs):
+        """
+        Args:
+            canvas_size: 画布边长 (训练输入尺寸)
+            crop_size: 裁剪图长边缩放到的尺寸 (默认为 imgsz, 即验证/推理时的目标尺寸)
+            seed: 排布随机种子
+            scale_range: 训练集裁剪图的随机缩放范围
+            fill: 画布背景像素值
+        """
+        self.crop_size = crop_size or kwargs.get('imgsz', canvas_size)
+        kwargs['imgsz'] = canvas_size
+        self.canvas_size = canvas_size
+        self.seed = seed
+        self.scale_range = scale_range
+        self.fill = fill
+        super().__init__(*args, **kwargs)
+
+    def get_img_files(self, img_path):
+        from ultralytics.data.utils import img2label_paths
+
+        self.crop_files = super().get_img_files(img_path)
+        self._crop_labels = read_crop_labels(img2label_paths(self.crop_files))
+        sizes = read_image_sizes(self.crop_files)
+        self._layouts = plan_canvases(sizes, self.canvas_size, seed=self.seed,
+                                      scale_range=self.scale_range if self.augment else (1.0, 1.0),
+                                      crop_size=self.crop_size)
+
+        # 画布没有对应的文件, 用虚拟路径作为标识
+        root = Path(self.crop_files[0]).parent if self.crop_files else Path(str(img_path))
+        return [str(root / f'canvas_{i:06d}.png') for i in range(len(self._layouts))]
+
+    def get_labels(self):
+        labels = []
+        for im_file, layout in zip(self.im_files, self._layouts):
+            rows = canvas_labels(layout, self._crop_labels, self.canvas_size)
+            labels.append({
+                'im_file': im_file,
+                'shape': (self.canvas_size, self.canvas_size),
+                'cls': rows[:, 0:1],
+                'bboxes': rows[:, 1:5],
+                'segments': [],
+                'keypoints': None,
+                'normalized': True,
+                'bbox_format': 'xywh',
+            })
+        self.label_files = [str(Path(f).with_suffix('.txt')) for f in self.im_files]
+        return labels
+
+    def read_frame(self, i):
+        return compose_canvas(self._layouts[i], lambda j: cv2.imread(self.crop_files[j]),
+                              self.canvas_size, self.fill)
+
+
+def build_adapter_dataset(dataset_cls, cfg, img_path, batch, data, mode='train', rect=False,
+                          stride=32, **dataset_kwargs):
+    """与 ultralytics.data.build.build_yolo_dataset 相同, 但使用指定的数据集类"""
+    return dataset_cls(
+        img_path=img_path,
+        imgsz=cfg.imgsz,
+        batch_size=batch,
+        augment=mode == 'train',
+        hyp=cfg,
+        rect=cfg.rect or rect,
+        cache=cfg.cache or None,
+        single_cls=cfg.single_cls or False,
+        stride=int(stride),
+        pad=0.0 if mode == 'train' else 0.5,
+        prefix=colorstr(f'{mode}: '),
+        task=cfg.task,
+        classes=cfg.classes,
+        data=data,
+        fraction=cfg.fraction if mode == 'train' else 1.0,
+        **dataset_kwargs,
+    )
+
+
+def build_trainer(dataset_cls, **dataset_kwargs):
+    """
+    生成使用指定数据集类的 DetectionTrainer 子类
+    传给 model.train(trainer=...) 即可
+
+    Args:
+        dataset_cls: FrameSourceDataset 子类; train_only 为 True 时验证集使用标准 YOLODataset
+        **dataset_kwargs: 传给数据集构造函数的额外参数
+    """
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils.torch_utils import unwrap_model
+
+    class AdapterTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode='train', batch=None):
+            if mode != 'train' and getattr(dataset_cls, 'train_only', False):
+                return super().build_dataset(img_path, mode, batch)
+            gs = max(int(unwrap_model(self.model).stride.max() if self.model else 0), 32)
+            return build_adapter_dataset(dataset_cls, self.args, img_path, batch, self.data,
+                                         mode=mode, rect=mode == 'val', stride=gs, **dataset_kwargs)
+
+    AdapterTrainer.__name__ = f'{dataset_cls.__name__}Trainer'
+    return AdapterTrainer
+
+
+def build_validator(dataset_cls, **dataset_kwargs):
+    """
+    生成使用指定数据集类的 DetectionValidator 子类
+    传给 model.val(validator=...) 即可
+    """
+    from ultralytics.models.yolo.detect import DetectionValidator
+
+    class AdapterValidator(DetectionValidator):
+        def build_dataset(self, img_path, mode='val', batch=None):
+            return build_adapter_dataset(dataset_cls, self.args, img_path, batch, self.data,
+                                         mode=mode, stride=self.stride, **dataset_kwargs)
+
+    AdapterValidator.__name__ = f'{dataset_cls.__name__}Validator'
+    return AdapterValidator
@@ -0,0 +1,275 @@
+"""
+目录级批量推理
+对一个图像目录 (递归) 或图像列表文件做检测, 每张图像写一行 JSONL:
+
+- 流式: 路径逐个枚举 (os.scandir, 不先列出整个目录), 后台线程解码 + 增强, 预取数量有上限,
+  结果按批写出并 flush; 内存占用与输入规模无关
+- 批量: 解码后的图像交给 FramePredictor 按 batch 做一次前向 (见 src.models.predictor)
+- 路径: 每条记录注明该图像实际使用的增强方法 (EnlightenGAN 不可用或推理失败时为传统方法)
+  和解码方式 (nms / single_object)
+- 分片: 按路径的 crc32 分配到 num_shards 个分片之一, 与枚举顺序无关;
+  多个进程各跑一个分片, 各写各的输出, 最后用 merge_outputs 合并
+
+记录格式:
+    {"path": ..., "shape": [h, w], "route": {"enhance": "traditional", "decoder": "nms"},
+     "boxes": [[x1, y1, x2, y2], ...], "classes": [...], "scores": [...], "names": [...],
+     "timing_ms": {"decode": ..., "enhance": ..., "infer": ...}}
+无法读取的图像: {"path": ..., "error": "..."}
+
+用法:
+    from src.models.batch_inference import iter_image_paths, run_batch_predict
+    from src.models.predictor import FramePredictor
+
+    predictor = FramePredictor('best.pt', imgsz=640, device='cpu', batch=32)
+    stats = run_batch_predict(iter_image_paths('yolo_dataset/images/test'), 'preds.jsonl', predictor,
+                              enhance='traditional')
+"""
+
+import json
+import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from src.data.image_store import IMAGE_EXTENSIONS
+
+
+ENHANCE_METHODS = ('none', 'traditional', 'enlightengan')
+
+
+def _scan(directory):
+    """递归枚举目录中的图像 (边读目录边产出)"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                yield entry.path
+
+
+def iter_image_paths(source):
+    """
+    逐个产出图像路径
+
+    Args:
+        source: 图像目录 (递归), 单张图像, 或每行一个路径的列表文件 (.txt, 相对路径相对于列表文件所在目录)
+    """
+    source = Path(source)
+    if source.is_dir():
+        yield from _scan(source)
+    elif source.suffix.lower() == '.txt':
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    path = Path(line)
+                    yield str(path if path.is_absolute() else source.parent / path)
+    else:
+        yield str(source)
+
+
+def shard_of(path, num_shards):
+    """路径所属的分片 (0 ~ num_shards-1); 只取决于路径本身"""
+    return zlib.crc32(str(path).encode('utf-8')) % num_shards
+
+
+def shard_paths(paths, shard, num_shards):
+    """只保留属于第 shard 个分片的路径"""
+    if num_shards <= 1:
+        yield from paths
+        return
+    for path in paths:
+        if shard_of(path, num_shards) == shard:
+            yield path
+
+
+def shard_output_path(output, shard, num_shards):
+    """分片的输出文件: preds.jsonl -> preds.01-of-04.jsonl"""
+    output = Path(output)
+    if num_shards <= 1:
+        return output
+    width = len(str(num_shards - 1))
+    return output.with_name(f"{output.stem}.{shard:0{width}d}-of-{num_shards:0{width}d}{output.suffix}")
+
+
+def make_enhancer(method, enlightengan_weights='weights/enlightengan.onnx'):
+    """
+    增强函数和实际使用的方法
+
+    Args:
+        method: 'none' / 'traditional' / 'enlightengan'
+        enlightengan_weights: EnlightenGAN ONNX 模型; 无法加载时退回传统方法
+
+    Returns:
+        (enhance(image) -> (image, 该图像实际使用的方法) 或 None (不增强), 加载时确定的方法名)
+    """
+    if method not in ENHANCE_METHODS:
+        raise ValueError(f"未知的增强方法: {method} (可选: {', '.join(ENHANCE_METHODS)})")
+    if method == 'none':
+        return None, 'none'
+
+    from src.models.detector import GTSRBEnlightenGANDetector
+
+    traditional_enhancement = GTSRBEnlightenGANDetector().traditional_enhancement
+    if method == 'enlightengan':
+        from src.models.enlightengan import EnlightenGANInference
+
+        model = EnlightenGANInference(enlightengan_weights)
+        if model.session is not None:
+            # 单张推理失败时 process_with_method 退回传统方法, 并如实返回 'traditional'
+            return model.process_with_method, 'enlightengan'
+        print("⚠️  EnlightenGAN 不可用, 使用传统方法增强")
+    return lambda image: (traditional_enhancement(image), 'traditional'), 'traditional'
+
+
+def _prepare(path, enhance):
+    """解码 (+ 增强) 一张图像; 在线程池中运行, 返回 (图像, 耗时, 实际使用的增强方法)"""
+    t0 = time.perf_counter()
+    image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+    t1 = time.perf_counter()
+    if image is None:
+        return None, {'decode': (t1 - t0) * 1000}, None
+    route = 'none'
+    if enhance is not None:
+        image, route = enhance(image)
+    t2 = time.perf_counter()
+    return image, {'decode': (t1 - t0) * 1000, 'enhance': (t2 - t1) * 1000}, route
+
+
+def decode_stream(paths, enhance=None, workers=4, prefetch=64):
+    """
+    后台线程解码 (+ 增强), 按输入顺序产出 (路径, 图像或 None, 耗时, 增强方法); 同时在途的图像不超过 prefetch 张
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(_prepare, path, enhance)))
+            if len(pending) >= prefetch:
+                path, future = pending.popleft()
+                yield (path, *future.result())
+        while pending:
+            path, future = pending.popleft()
+            yield (path, *future.result())
+
+
+def _records(batch, detections, infer_ms, decoder, names):
+    for (path, image, timing, enhance), det in zip(batch, detections):
+        route = {'enhance': enhance, 'decoder': decoder}
+        record = {'path': str(path), 'shape': list(image.shape[:2]), 'route': route, **det.as_dict(names)}
+        record['timing_ms'] = {k: round(v, 3) for k, v in {**timing, 'infer': infer_ms}.items()}
+        yield record
+
+
+def run_batch_predict(paths, output, predictor, enhance='none', enlightengan_weights='weights/enlightengan.onnx',
+                      workers=4, prefetch=None, conf=None, single_object=False, limit=None, progress=True):
+    """
+    流式批量推理, 结果写入 JSONL (先写 .tmp, 完成后替换)
+
+    Args:
+        paths: 图像路径的可迭代对象 (如 iter_image_paths / shard_paths 的结果)
+        output: 输出 JSONL
+        predictor: FramePredictor
+        enhance: 增强方法 ('none' / 'traditional' / 'enlightengan')
+        workers: 解码线程数
+        prefetch: 在途图像上限, 默认 4 个批次
+        conf: 置信度阈值 (默认使用 predictor 的设置)
+        single_object: 单目标快速解码 (不做 NMS)
+        limit: 最多处理的图像数
+
+    Returns:
+        {'images', 'failed', 'detections', 'seconds', 'images_per_s', 'route', 'enhance_routes', 'mean_ms': {...}}
+        enhance_routes 为各增强方法实际处理的图像数 (如 EnlightenGAN 单张失败时计入 traditional)
+    """
+    from itertools import islice
+
+    from tqdm import tqdm
+
+    enhance_fn, enhance_route = make_enhancer(enhance, enlightengan_weights)
+    route = {'enhance': enhance_route, 'decoder': 'single_object' if single_object else 'nms'}
+    prefetch = prefetch or predictor.batch * 4
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + '.tmp')
+
+    stats = {'images': 0, 'failed': 0, 'detections': 0}
+    enhance_routes = {}
+    totals = {'decode': 0.0, 'enhance': 0.0, 'infer': 0.0}
+    start = time.perf_counter()
+    stream = decode_stream(islice(paths, limit), enhance_fn, workers=workers, prefetch=prefetch)
+    with open(tmp, 'w', encoding='utf-8') as f, tqdm(desc="批量推理", unit='张', disable=not progress) as bar:
+        batch = []
+
+        def flush():
+            t0 = time.perf_counter()
+            detections = predictor.predict([image for _, image, _, _ in batch], conf=conf,
+                                           single_object=single_object)
+            infer_ms = (time.perf_counter() - t0) * 1000 / len(batch)
+            for record in _records(batch, detections, infer_ms, route['decoder'], predictor.names):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                stats['detections'] += len(record['scores'])
+                used = record['route']['enhance']
+                enhance_routes[used] = enhance_routes.get(used, 0) + 1
+                for key, value in record['timing_ms'].items():
+                    totals[key] += value
+            stats['images'] += len(batch)
+            f.flush()
+            bar.update(len(batch))
+            batch.clear()
+
+        for path, image, timing, used in stream:
+            if image is None:
+                f.write(json.dumps({'path': str(path), 'error': '无法读取图像'}, ensure_ascii=False) + '\n')
+                stats['failed'] += 1
+                bar.update(1)
+                continue
+            batch.append((path, image, timing, used))
+            if len(batch) >= predictor.batch:
+                flush()
+        if batch:
+            flush()
+    os.replace(tmp, output)
+
+    seconds = time.perf_counter() - start
+    n = max(stats['images'], 1)
+    return {
+        **stats,
+        'seconds': round(seconds, 2),
+        'images_per_s': round(stats['images'] / seconds, 1) if seconds > 0 else None,
+        'route': route,
+        'enhance_routes': enhance_routes,
+        'mean_ms': {k: round(v / n, 3) for k, v in totals.items()},
+    }
+
+
+def merge_outputs(shard_files, output):
+    """把各分片的 JSONL 依次拼接为一个文件 (流式复制, 原子替换), 并删除分片文件"""
+    import shutil
+
+    output = Path(output)
+    tmp = output.with_name(output.name + '.tmp')
+    with open(tmp, 'wb') as out:
+        for path in shard_files:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp, output)
+    for path in shard_files:
+        Path(path).unlink()
+    return output
+
+
+def format_stats(stats):
+    """把 run_batch_predict 的统计格式化为几行文本"""
+    mean = stats['mean_ms']
+    enhance = stats['route']['enhance']
+    if len(stats.get('enhance_routes') or {}) > 1:
+        enhance += ' (实际: ' + ', '.join(f'{k} {v} 张' for k, v in stats['enhance_routes'].items()) + ')'
+    return '\n'.join([
+        f"  图像 {stats['images']} 张 (无法读取 {stats['failed']}), 检测 {stats['detections']} 个, "
+        f"耗时 {stats['seconds']:.1f} 秒 ({stats['images_per_s']} 张/秒)",
+        f"  增强 {enhance}, 解码 {stats['route']['decoder']}; 每张平均: 读取 {mean['decode']:.2f} ms, "
+        f"增强 {mean['enhance']:.2f} ms, 推理 {mean['infer']:.2f} ms",
+    ])
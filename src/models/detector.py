@@ -16,6 +16,8 @@ import shutil
 from PIL import Image
 import torch
 
+from src.data.transform_runner import MANIFEST_NAME, format_run_stats, run_transform
+
 
 class GTSRBEnlightenGANDetector:
     """
@@ -33,6 +35,13 @@ class GTSRBEnlightenGANDetector:
         self.config_path = config_path
         self.enlighten_model = None
         self.yolo_model = None
+        self.throughput = None  # 最近一次 train_yolov8 的吞吐量汇总
+        self.autotune_result = None  # 最近一次 train_yolov8 的 batch / workers 自动选择结果
+        self.convergence = None  # 最近一次 train_yolov8 的收敛 / 提前停止摘要
+        self.progressive = None  # 最近一次 train_yolov8 的渐进式分辨率阶段耗时
+        self.distillation = None  # 最近一次 train_yolov8 的知识蒸馏配置
+        self.cpu_profile = None  # CPU 训练 / 推理配置 (见 src.training.cpu_profile)
+        self.predictor = None  # 常驻的数组推理器 (见 detect / src.models.predictor)
         
     def setup_enlightengan(self, model_path='weights/enlightengan.pth'):
         """
@@ -62,6 +71,7 @@ class GTSRBEnlightenGANDetector:
         print("正在加载 YOLOv8 模型...")
         from ultralytics import YOLO
         self.yolo_model = YOLO(model_path)
+        self.predictor = None
         print("YOLOv8 模型加载成功！")
         
     def enhance_image(self, image_path, output_path=None, method='enlightengan'):
@@ -81,12 +91,7 @@ class GTSRBEnlightenGANDetector:
         if image is None:
             raise ValueError(f"无法读取图像: {image_path}")
             
-        if method == 'enlightengan' and self.enlighten_model is not None:
-            # 使用 EnlightenGAN 增强
-            enhanced = self.enlighten_model.process(image)
-        else:
-            # 使用传统方法增强（CLAHE + Gamma 校正）
-            enhanced = self.traditional_enhancement(image)
+        enhanced = self.enhance_array(image, method=method)
             
         # 保存增强后的图像
         if output_path:
@@ -95,13 +100,33 @@ class GTSRBEnlightenGANDetector:
             
         return enhanced
     
-    def traditional_enhancement(self, image):
+    def enhance_array(self, image, method='enlightengan'):
+        """
+        增强已解码的图像
+        
+        Args:
+            image: 输入图像 (BGR 格式)
+            method: 增强方法 ('enlightengan' 或 'traditional')
+            
+        Returns:
+            enhanced: 增强后的图像
+        """
+        if method == 'enlightengan' and self.enlighten_model is not None:
+            # 使用 EnlightenGAN 增强
+            return self.enlighten_model.process(image)
+        # 使用传统方法增强（CLAHE + Gamma 校正）
+        return self.traditional_enhancement(image)
+    
+    def traditional_enhancement(self, image, clip_limit=3.0, tile=8, gamma=1.2):
         """
         传统图像增强方法（作为 EnlightenGAN 的后备方案）
         使用 CLAHE (对比度限制自适应直方图均衡) + Gamma 校正
         
         Args:
             image: 输入图像 (BGR 格式)
+            clip_limit: CLAHE 对比度限制
+            tile: CLAHE 网格大小 (tile x tile)
+            gamma: Gamma 校正系数 (> 1 变亮); 参数搜索见 src.training.hpsearch
             
         Returns:
             enhanced: 增强后的图像
@@ -111,7 +136,7 @@ class GTSRBEnlightenGANDetector:
         l, a, b = cv2.split(lab)
         
         # 应用 CLAHE 到 L 通道
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile, tile))
         l_enhanced = clahe.apply(l)
         
         # 合并通道
@@ -119,7 +144,6 @@ class GTSRBEnlightenGANDetector:
         enhanced = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
         
         # Gamma 校正
-        gamma = 1.2
         inv_gamma = 1.0 / gamma
         table = np.array([((i / 255.0) ** inv_gamma) * 255 
                          for i in np.arange(0, 256)]).astype("uint8")
@@ -127,7 +151,7 @@ class GTSRBEnlightenGANDetector:
         
         return enhanced
     
-    def enhance_dataset(self, input_dir, output_dir, method='enlightengan'):
+    def enhance_dataset(self, input_dir, output_dir, method='enlightengan', codec=None):
         """
         批量增强数据集图像
         
@@ -135,6 +159,7 @@ class GTSRBEnlightenGANDetector:
             input_dir: 输入目录
             output_dir: 输出目录
             method: 增强方法
+            codec: 输出编码 (见 src.data.codecs); 为 None 时保持源文件格式
         """
         input_path = Path(input_dir)
         output_path = Path(output_dir)
@@ -147,19 +172,72 @@ class GTSRBEnlightenGANDetector:
             
         print(f"找到 {len(image_files)} 张图像，开始增强...")
         
-        for img_file in tqdm(image_files, desc="增强图像"):
-            # 构建输出路径，保持目录结构
-            rel_path = img_file.relative_to(input_path)
-            out_file = output_path / rel_path
+        def transform(img_file):
+            image = cv2.imread(str(img_file))
+            if image is None:
+                raise ValueError(f"无法读取图像: {img_file}")
+            return self.enhance_array(image, method=method)
+        
+        # 构建输出路径，保持目录结构
+        jobs = [(f, output_path / f.relative_to(input_path)) for f in image_files]
+        
+        # 实际使用的方法（EnlightenGAN 未加载时回退为传统方法）决定输出内容
+        used_method = method if method == 'enlightengan' and self.enlighten_model is not None else 'traditional'
+        params = {'op': 'enhance', 'method': used_method}
+        if used_method == 'enlightengan':
+            params['model'] = str(getattr(self.enlighten_model, 'model_path', ''))
+        
+        # 已是最新的输出直接跳过，中断后重新运行可从断点继续
+        stats = run_transform(jobs, transform, params,
+                              manifest_path=output_path / MANIFEST_NAME, desc="增强图像", codec=codec)
+                
+        print(f"图像增强完成！({format_run_stats(stats)})")
+    
+    def enhance_store(self, store_root, split, output, method='enlightengan'):
+        """
+        从打包图像存储批量增强 (见 src.data.image_store)
+        直接读取解码后的像素, 跳过逐个 PNG 解码
+        
+        Args:
+            store_root: 输入存储目录
+            split: 数据划分
+            output: 输出位置; 目录则写出 PNG 文件, PackedImageWriter 则写入新的存储
+            method: 增强方法
             
+        Returns:
+            count: 增强的图像数
+        """
+        from src.data.image_store import PackedImageStore, PackedImageWriter
+        
+        store = PackedImageStore(store_root, split)
+        writer = output if isinstance(output, PackedImageWriter) else None
+        if writer is None:
+            output_path = Path(output)
+            output_path.mkdir(parents=True, exist_ok=True)
+        
+        print(f"从存储读取 {len(store)} 张图像，开始增强...")
+        
+        count = 0
+        for key, image in tqdm(store, total=len(store), desc="增强图像"):
             try:
-                self.enhance_image(img_file, out_file, method=method)
+                enhanced = self.enhance_array(image, method=method)
             except Exception as e:
-                print(f"处理图像 {img_file} 时出错: {e}")
-                
+                print(f"处理图像 {key} 时出错: {e}")
+                continue
+            
+            if writer is not None:
+                writer.add(key, enhanced)
+            else:
+                cv2.imwrite(str(output_path / key), enhanced)
+            count += 1
+        
         print("图像增强完成！")
+        return count
     
-    def train_yolov8(self, epochs=100, imgsz=640, batch=16, device='0', workers=4):
+    def train_yolov8(self, epochs=100, imgsz=640, batch=16, device='0', workers=4, pack=False,
+                     trainer=None, project='runs/train', name='gtsrb_enlightengan', exist_ok=False,
+                     throughput=True, autotune=False, memory_budget_mb=None, early_stop=True, auto_resume=True,
+                     freeze=None, progressive=None, distill=None, cpu_profile=None, **train_overrides):
         """
         训练 YOLOv8 模型
         
@@ -169,30 +247,127 @@ class GTSRBEnlightenGANDetector:
             batch: 批次大小
             device: 设备 ('0' for GPU, 'cpu' for CPU)
             workers: 数据加载线程数
+            pack: 是否把小裁剪图拼接到 640x640 画布上训练 (见 src.data.packing); 裁剪图长边缩放到 imgsz,
+                验证和之后的推理也使用 imgsz, 训练与测试的目标尺度一致
+            trainer: 自定义训练器 (如 build_trainer(VirtualDataset, ...)); 与 pack 同时指定时以 trainer 为准
+            project / name: 结果目录 project/name
+            exist_ok: 覆盖同名运行目录而不是自动编号
+            throughput: 统计每次迭代的数据等待 / 前向 / 反向 / 优化器耗时 (见 src.training.throughput),
+                汇总保存在 self.throughput
+            autotune: CPU 训练前探测并自动选择 batch / workers (见 src.training.autotune),
+                忽略传入的 batch / workers; 选择结果和理由保存在 self.autotune_result 和运行目录的 autotune.json
+            memory_budget_mb: 自动选择时的内存预算 (默认可用内存的 80%)
+            early_stop: mAP50 平稳或不再提升时提前停止; 也可以传入 ConvergenceMonitor 的参数 dict
+                (见 src.training.convergence), 摘要保存在 self.convergence
+            auto_resume: project/name 中有被中断的运行时从其 last.pt 以相同超参数继续
+            progressive: 渐进式分辨率阶段, 如 '320,480,640' 或 '320:0.3,480:0.3,640:0.4'
+                (见 src.training.progressive); 验证始终使用 imgsz, 各阶段耗时保存在 self.progressive
+            distill: 知识蒸馏的教师权重 (如在同一数据上训练的 yolov8s/m 的 best.pt), 或
+                {'teacher': ..., 'feature_weight': ..., 'cls_weight': ..., 'box_weight': ..., 'temperature': ...}
+                (见 src.training.distill); 配置保存在 self.distillation
+            cpu_profile: CPU 训练配置 (CPUProfile, 或 True 表示按本机自动生成): 线程数、bf16 autocast、
+                channels_last、可选 torch.compile (见 src.training.cpu_profile); 之后的 predict 也使用该配置
+            freeze: 冻结前 N 层 (热启动时常用 10, 即整个 backbone; 见 src.training.warm_start)
+            **train_overrides: 其余传给 model.train 的超参数 (如热启动的 lr0 / optimizer / warmup_epochs)
         """
         if self.yolo_model is None:
             raise ValueError("请先使用 setup_yolov8() 加载模型")
+        
+        if trainer is None and pack:
+            from src.data.yolo_adapter import CanvasDataset, build_trainer
+            trainer = build_trainer(CanvasDataset, canvas_size=640)
+            
+        self.predictor = None  # 训练后模型权重会变化, 推理器需要重建
+        self.autotune_result = None
+        if autotune and str(device) != 'cpu':
+            print("⚠️  自动选择仅用于 CPU 训练，GPU 可使用 batch=-1 (ultralytics AutoBatch)")
+        elif autotune:
+            from src.training.autotune import autotune as run_autotune, keep_workers
+            
+            self.autotune_result = run_autotune(self.yolo_model.ckpt_path or 'yolov8n.pt', self.config_path,
+                                                imgsz=imgsz, trainer_cls=trainer, train_kwargs={'amp': False},
+                                                memory_budget_mb=memory_budget_mb)
+            batch, workers = self.autotune_result['batch'], self.autotune_result['workers']
+            trainer = keep_workers(trainer)
+            
+        meter = None
+        if throughput:
+            from src.training.throughput import ThroughputMeter
+            meter = ThroughputMeter().attach(self.yolo_model)
+            
+        from src.training.convergence import ConvergenceMonitor, train_with_resume
+        monitor_kwargs = early_stop if isinstance(early_stop, dict) else {'enabled': bool(early_stop)}
+        monitor = ConvergenceMonitor(**monitor_kwargs).attach(self.yolo_model)
+        
+        resizer = None
+        if progressive:
+            from src.training.progressive import ProgressiveResize
+            resizer = ProgressiveResize(progressive).attach(self.yolo_model)
+            
+        distiller = None
+        if distill:
+            from src.training.distill import DEFAULT_FEATURE_WEIGHT, LogitDistiller, distill_train_args
+            distill = dict(distill) if isinstance(distill, dict) else {'teacher': distill}
+            feature_weight = distill.pop('feature_weight', DEFAULT_FEATURE_WEIGHT)
+            train_overrides.update(distill_train_args(distill.pop('teacher'), feature_weight))
+            distiller = LogitDistiller(**distill).attach(self.yolo_model)
+            
+        profile = None
+        if cpu_profile and str(device) != 'cpu':
+            print("⚠️  CPU 性能配置仅用于 device=cpu，已忽略")
+        elif cpu_profile:
+            from src.training.cpu_profile import CPUProfile
+            profile = CPUProfile.detect(workers=workers) if cpu_profile is True else cpu_profile
+            train_overrides.update(profile.train_args())
+            profile.attach(self.yolo_model)
+            self.cpu_profile = profile
+            print(f"CPU 性能配置: {profile}")
             
         print("开始训练 YOLOv8 模型...")
-        results = self.yolo_model.train(
-            data=self.config_path,
-            epochs=epochs,
-            imgsz=imgsz,
-            batch=batch,
-            device=device,
-            workers=workers,
-            project='runs/train',
-            name='gtsrb_enlightengan',
-            plots=True,
-            save=True,
-            verbose=True,
-            amp=False  # 关闭自动混合精度，减少显存
-        )
+        try:
+            results = train_with_resume(
+                self.yolo_model,
+                project=project,
+                name=name,
+                trainer=trainer,
+                auto_resume=auto_resume,
+                data=self.config_path,
+                epochs=epochs,
+                imgsz=imgsz,
+                batch=batch,
+                device=device,
+                workers=workers,
+                exist_ok=exist_ok,
+                plots=True,
+                save=True,
+                verbose=True,
+                amp=False,  # 关闭自动混合精度，减少显存
+                freeze=freeze,
+                **train_overrides
+            )
+        finally:
+            monitor.detach(self.yolo_model)
+            if resizer:
+                resizer.detach(self.yolo_model)
+            if distiller:
+                distiller.detach(self.yolo_model)
+            if profile:
+                profile.detach(self.yolo_model)
+            if meter:
+                meter.detach(self.yolo_model)
         
+        self.throughput = meter.summary() if meter else None
+        self.convergence = monitor.summary()
+        self.progressive = resizer.summary() if resizer else None
+        self.distillation = distiller.summary(train_overrides['dis']) if distiller else None
+        if self.autotune_result:
+            import json
+            with open(Path(self.yolo_model.trainer.save_dir) / 'autotune.json', 'w', encoding='utf-8') as f:
+                json.dump(self.autotune_result, f, ensure_ascii=False, indent=2)
         print("训练完成！")
         return results
     
-    def validate(self, split='val', device='0', workers=2):
+    def validate(self, split='val', device='0', workers=2, image_store=None, validator=None):
         """
         验证模型
         
@@ -200,9 +375,18 @@ class GTSRBEnlightenGANDetector:
             split: 数据集划分 ('val' 或 'test')
             device: 设备
             workers: 数据加载线程数
+            image_store: 打包图像存储目录; 指定后从存储读取像素而不是解码 PNG
+            validator: 自定义验证器 (如 build_validator(VirtualDataset, ...)); 优先于 image_store
         """
         if self.yolo_model is None:
             raise ValueError("请先使用 setup_yolov8() 加载模型")
+        
+        extra = {}
+        if validator is not None:
+            extra['validator'] = validator
+        elif image_store is not None:
+            from src.data.yolo_adapter import PackedStoreDataset, build_validator
+            extra['validator'] = build_validator(PackedStoreDataset, store_root=image_store)
             
         print(f"开始验证模型 (数据集: {split})...")
         results = self.yolo_model.val(
@@ -210,33 +394,88 @@ class GTSRBEnlightenGANDetector:
             split=split,
             device=device,
             workers=workers,
-            plots=True
+            plots=True,
+            **extra
         )
         
         return results
     
-    def predict(self, image_path, conf=0.25, save=True, save_dir='runs/predict'):
+    def setup_predictor(self, imgsz=640, device='', batch=16):
         """
-        预测单张图像
+        创建常驻的数组推理器 (模型融合并预热一次, 之后的 detect 调用复用)
         
         Args:
-            image_path: 图像路径
+            imgsz: 输入边长
+            device: 推理设备 ('' 为自动选择; 设置了 cpu_profile 时为 cpu)
+            batch: 每次前向的最大图像数
+            
+        Returns:
+            FramePredictor
+        """
+        if self.yolo_model is None:
+            raise ValueError("请先使用 setup_yolov8() 加载模型")
+        from src.models.predictor import FramePredictor
+        
+        if self.cpu_profile is not None:
+            device = 'cpu'
+        self.predictor = FramePredictor(self.yolo_model, imgsz=imgsz, device=device, batch=batch,
+                                        cpu_profile=self.cpu_profile)
+        return self.predictor
+    
+    def detect(self, frames, conf=0.25, iou=0.7, max_det=300, single_object=False):
+        """
+        检测已解码的图像 (不经过 ultralytics 的数据源加载, 也不重新读盘)
+        
+        Args:
+            frames: BGR 图像数组, 或图像数组列表
+            conf / iou / max_det: NMS 参数
+            single_object: 单目标快速解码 (不做 NMS, 每张图像至多一个检测)
+            
+        Returns:
+            单张时为 Detections (boxes / classes / scores 数组), 列表时为 [Detections, ...]
+        """
+        if self.predictor is None:
+            self.setup_predictor()
+        return self.predictor(frames, conf=conf, iou=iou, max_det=max_det, single_object=single_object)
+    
+    def predict(self, image_path, conf=0.25, save=True, save_dir='runs/predict', single_object=False):
+        """
+        预测单张图像 (返回 ultralytics Results; 已解码的图像用 detect 更快)
+        
+        Args:
+            image_path: 图像路径或 BGR 图像数组
             conf: 置信度阈值
             save: 是否保存结果
             save_dir: 保存目录
+            single_object: 单目标快速解码 (不做 NMS, 只保留得分最高的候选; 适用于 GTSRB 裁剪图)
             
         Returns:
             results: 预测结果
         """
         if self.yolo_model is None:
             raise ValueError("请先使用 setup_yolov8() 加载模型")
+        from src.models.predictor import single_object_predictor
+        from ultralytics.models.yolo.detect import DetectionPredictor
+        
+        # 显式指定推理器类; 较早的 ultralytics 会一直复用已缓存的推理器 (不检查类是否变化),
+        # 两种解码方式切换时先清除缓存, 让 YOLO 按新的类重建
+        predictor = single_object_predictor() if single_object else DetectionPredictor
+        if self.yolo_model.predictor is not None and type(self.yolo_model.predictor) is not predictor:
+            self.yolo_model.predictor = None
+            
+        if self.cpu_profile is not None:
+            with self.cpu_profile.inference(self.yolo_model):
+                return self.yolo_model.predict(source=image_path, conf=conf, save=save, project=save_dir,
+                                               device='cpu', verbose=False, predictor=predictor,
+                                               **self.cpu_profile.predict_args())
             
         results = self.yolo_model.predict(
             source=image_path,
             conf=conf,
             save=save,
             project=save_dir,
-            verbose=False
+            verbose=False,
+            predictor=predictor
         )
         
         return results
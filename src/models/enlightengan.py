@@ -112,9 +112,18 @@ class EnlightenGANInference:
         Returns:
             enhanced: 增强后的图像 (BGR 格式)
         """
+        return self.process_with_method(image)[0]
+    
+    def process_with_method(self, image):
+        """
+        处理图像, 并返回实际使用的方法
+        
+        Returns:
+            (enhanced, used_method): used_method 为 'enlightengan', 模型未加载或推理失败时为 'traditional'
+        """
         if self.session is None:
             print("警告: 模型未加载，使用传统方法增强")
-            return self.fallback_enhancement(image)
+            return self.fallback_enhancement(image), 'traditional'
         
         try:
             # 获取原始尺寸
@@ -139,11 +148,11 @@ class EnlightenGANInference:
             # 调整回原始尺寸
             enhanced = cv2.resize(enhanced, (original_width, original_height))
             
-            return enhanced
+            return enhanced, 'enlightengan'
             
         except Exception as e:
             print(f"推理失败: {e}")
-            return self.fallback_enhancement(image)
+            return self.fallback_enhancement(image), 'traditional'
     
     def fallback_enhancement(self, image):
         """
@@ -0,0 +1,386 @@
+"""
+常驻推理器
+YOLO.predict(source=路径) 每次调用都要经过 ultralytics 的数据源加载 (重新读盘、解码、LoadImagesAndVideos)
+并为每张图像构造 Results 对象; 调用方需要画图时往往还要再 cv2.imread 一次.
+FramePredictor 直接接收已解码的 BGR 数组 (单张或列表):
+
+- 模型在构造时加载 (AutoBackend, 融合 Conv+BN) 并预热, 之后一直常驻
+- letterbox 到固定的 imgsz x imgsz, 写入预分配的 uint8 批次, 按 batch 分块做一次前向
+- NMS 后把框换算回原图坐标, 返回紧凑的 numpy 数组 (Detections: boxes / classes / scores)
+- 累计预处理 / 前向 / 后处理耗时, timing() 给出每张图像的开销, 可与裸前向耗时比较
+  (见 scripts/benchmarks/benchmark_predictor.py)
+
+单目标快速解码: GTSRB 裁剪图中只有一个交通标志, 通用 NMS 却要在上千个候选框上做阈值筛选、排序和 IoU 抑制.
+single_object=True 时直接从检测头的原始输出中取得分最高的 k 个锚点 (默认 k=1, 即 max_det=1 的语义),
+不做 NMS. single_object_predictor / single_object_validator 把同样的解码用于 YOLO.predict 和 model.val,
+compare_decoders 在测试集上比较两种解码的 mAP 和后处理耗时.
+
+用法:
+    from src.models.predictor import FramePredictor, draw_detections
+
+    predictor = FramePredictor('experiments/exp1_baseline/run/weights/best.pt', imgsz=640, device='cpu')
+    frame = cv2.imread('test.png')
+    det = predictor(frame, conf=0.25)          # 单张 -> Detections
+    dets = predictor([frame1, frame2, ...])    # 列表 -> [Detections, ...]
+    det = predictor(frame, single_object=True)  # 不做 NMS, 只取最高分候选
+    annotated = draw_detections(frame, det, predictor.names)
+"""
+
+import time
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+# letterbox 填充色 (与 ultralytics LetterBox 一致)
+PAD_VALUE = 114
+
+
+class Detections:
+    """
+    单张图像的检测结果 (原图坐标)
+
+    Attributes:
+        boxes: (n, 4) float32, xyxy 像素坐标
+        classes: (n,) int32 类别编号
+        scores: (n,) float32 置信度
+    """
+
+    __slots__ = ('boxes', 'classes', 'scores')
+
+    def __init__(self, boxes, classes, scores):
+        self.boxes = boxes
+        self.classes = classes
+        self.scores = scores
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.int32), np.zeros(0, np.float32))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __repr__(self):
+        return f"Detections(n={len(self)})"
+
+    def as_dict(self, names=None):
+        """可写入 JSON 的字典; 给出 names 时附带类别名"""
+        result = {
+            'boxes': [[round(float(v), 1) for v in box] for box in self.boxes],
+            'classes': self.classes.tolist(),
+            'scores': [round(float(s), 4) for s in self.scores],
+        }
+        if names is not None:
+            result['names'] = [names[int(c)] for c in self.classes]
+        return result
+
+
+def letterbox(image, size, out=None):
+    """
+    等比缩放并居中填充到 size x size (与 ultralytics LetterBox(auto=False) 一致), 同时 BGR -> RGB
+
+    Args:
+        image: HxWx3 BGR (灰度图会转为三通道)
+        size: 目标边长
+        out: 可选的 (size, size, 3) uint8 输出缓冲区
+
+    Returns:
+        (size, size, 3) uint8 RGB
+    """
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    elif image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    h, w = image.shape[:2]
+    gain = min(size / h, size / w)
+    new_h, new_w = round(h * gain), round(w * gain)
+    top, left = round((size - new_h) / 2 - 0.1), round((size - new_w) / 2 - 0.1)
+
+    if out is None:
+        out = np.empty((size, size, 3), dtype=np.uint8)
+    out.fill(PAD_VALUE)
+    if (new_h, new_w) != (h, w):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=out[top:top + new_h, left:left + new_w])
+    return out
+
+
+def top_candidates(prediction, k=1, conf_thres=0.0, end2end=False):
+    """
+    单目标解码: 每张图像取得分最高的 k 个候选, 不做 NMS
+
+    Args:
+        prediction: 检测头的推理输出 (B, 4 + nc, 锚点数), 框为 xywh; 验证模式下的 (输出, 原始特征) 取第一个.
+            end2end 模型为 (B, N, 6)
+        k: 每张图像保留的候选数 (k > 1 时候选可能指向同一目标, 一般用 1)
+        conf_thres: 置信度阈值
+
+    Returns:
+        与 non_max_suppression 相同格式的列表: 每张图像 (n, 6) 张量 (x1, y1, x2, y2, conf, cls), n <= k
+    """
+    import torch
+    from ultralytics.utils.ops import xywh2xyxy
+
+    if isinstance(prediction, (list, tuple)):
+        prediction = prediction[0]
+    if prediction.shape[-1] == 6 or end2end:
+        conf, idx = prediction[..., 4].topk(min(k, prediction.shape[1]), dim=1)
+        det = prediction.gather(1, idx[..., None].expand(-1, -1, 6)).float()
+    else:
+        conf, cls = prediction[:, 4:].max(1)  # (B, 锚点数)
+        conf, idx = conf.topk(min(k, conf.shape[1]), dim=1)
+        boxes = prediction[:, :4].gather(2, idx[:, None].expand(-1, 4, -1)).transpose(1, 2)
+        det = torch.cat([xywh2xyxy(boxes), conf[..., None], cls.gather(1, idx)[..., None].to(conf.dtype)], 2).float()
+    return [d[c > conf_thres] for d, c in zip(det, conf)]
+
+
+@lru_cache(maxsize=None)
+def single_object_predictor(k=1):
+    """
+    生成用 top_candidates 代替 NMS 的 DetectionPredictor 子类
+    传给 model.predict(predictor=...) 即可; 同一个 k 返回同一个类, 可按类型判断是否需要重建推理器
+    """
+    from ultralytics.models.yolo.detect import DetectionPredictor
+
+    class SingleObjectPredictor(DetectionPredictor):
+        def postprocess(self, preds, img, orig_imgs, **kwargs):
+            from ultralytics.utils import ops
+
+            preds = top_candidates(preds, k, self.args.conf, end2end=getattr(self.model, 'end2end', False))
+            if not isinstance(orig_imgs, list):
+                orig_imgs = ops.convert_torch2numpy_batch(orig_imgs)[..., ::-1]
+            return self.construct_results(preds, img, orig_imgs)
+
+    return SingleObjectPredictor
+
+
+def single_object_validator(base=None, k=1):
+    """
+    生成用 top_candidates 代替 NMS 的验证器子类
+    传给 model.val(validator=...) 即可
+
+    Args:
+        base: 验证器基类 (如 build_validator 生成的虚拟数据集验证器), 默认 DetectionValidator
+        k: 每张图像保留的候选数
+    """
+    if base is None:
+        from ultralytics.models.yolo.detect import DetectionValidator as base
+
+    class SingleObjectValidator(base):
+        def postprocess(self, preds):
+            outputs = top_candidates(preds, k, self.args.conf, end2end=self.end2end)
+            return [{'bboxes': x[:, :4], 'conf': x[:, 4], 'cls': x[:, 5], 'extra': x[:, 6:]} for x in outputs]
+
+    SingleObjectValidator.__name__ = f'SingleObject{base.__name__}'
+    return SingleObjectValidator
+
+
+class FramePredictor:
+    """
+    常驻的批量推理器
+
+    Args:
+        model: YOLO 对象或权重路径
+        imgsz: 输入边长 (32 的倍数)
+        device: 推理设备 ('' 为自动选择, 同 ultralytics)
+        batch: 每次前向的最大图像数
+        conf / iou / max_det: 默认的 NMS 参数 (调用时可覆盖)
+        half: CUDA 上使用 fp16
+        cpu_profile: CPUProfile (线程数、bf16 autocast、channels_last), 仅 CPU
+        single_object: 默认使用单目标快速解码 (调用时可覆盖)
+        topk: 单目标解码保留的候选数
+    """
+
+    def __init__(self, model, imgsz=640, device='', batch=16, conf=0.25, iou=0.7, max_det=300,
+                 half=False, cpu_profile=None, single_object=False, topk=1):
+        import torch
+        from ultralytics import YOLO
+        from ultralytics.nn.autobackend import AutoBackend
+        from ultralytics.utils.torch_utils import select_device
+
+        if not isinstance(model, YOLO):
+            model = YOLO(str(model))
+        self.device = select_device(str(device), verbose=False)
+        self.cpu_profile = cpu_profile if self.device.type == 'cpu' else None
+        if self.cpu_profile is not None:
+            self.cpu_profile.apply_threads()
+        channels_last = self.cpu_profile.channels_last if self.cpu_profile is not None else None
+
+        self.backend = AutoBackend(model.model, device=self.device, fp16=half and self.device.type != 'cpu',
+                                   fuse=True, verbose=False, channels_last=channels_last)
+        self.backend.eval()
+        self.names = self.backend.names
+        self.imgsz = imgsz
+        self.batch = max(1, batch)
+        self.conf, self.iou, self.max_det = conf, iou, max_det
+        self.single_object, self.topk = single_object, topk
+        self._buffer = np.empty((self.batch, imgsz, imgsz, 3), dtype=np.uint8)
+        self._bf16 = bool(self.cpu_profile is not None and self.cpu_profile.bf16)
+        self._channels_last = bool(channels_last)
+        self.reset_timing()
+
+        with torch.inference_mode():
+            self._forward(torch.zeros(1, 3, imgsz, imgsz, device=self.device))  # 预热
+
+    def reset_timing(self):
+        self._timing = {'images': 0, 'batches': 0, 'preprocess_s': 0.0, 'forward_s': 0.0, 'postprocess_s': 0.0}
+
+    def timing(self):
+        """累计的每张图像耗时 (毫秒)"""
+        n = max(self._timing['images'], 1)
+        stages = ('preprocess', 'forward', 'postprocess')
+        result = {f'{s}_ms': round(self._timing[f'{s}_s'] / n * 1000, 3) for s in stages}
+        result['total_ms'] = round(sum(result.values()), 3)
+        result['images'] = self._timing['images']
+        result['batches'] = self._timing['batches']
+        return result
+
+    def _forward(self, im):
+        """网络前向; 返回 NMS 前的原始输出"""
+        import torch
+
+        if self._bf16:
+            from src.training.cpu_profile import _to_float
+
+            with torch.autocast('cpu', dtype=torch.bfloat16):
+                return _to_float(self.backend(im))
+        return self.backend(im)
+
+    def _preprocess(self, frames):
+        """letterbox 到预分配缓冲区 -> (n, 3, imgsz, imgsz) 张量"""
+        import torch
+
+        buffer = self._buffer[:len(frames)]
+        for frame, out in zip(frames, buffer):
+            letterbox(frame, self.imgsz, out=out)
+        im = torch.from_numpy(buffer).to(self.device, non_blocking=True).permute(0, 3, 1, 2)  # NHWC 内存
+        if not self._channels_last:
+            im = im.contiguous()
+        im = im.half() if self.backend.fp16 else im.float()
+        return im.div_(255)
+
+    def _postprocess(self, preds, shapes, conf, iou, max_det, single_object):
+        from ultralytics.utils import nms, ops
+
+        end2end = getattr(self.backend, 'end2end', False)
+        if single_object:
+            preds = top_candidates(preds, self.topk, conf, end2end=end2end)
+        else:
+            preds = nms.non_max_suppression(preds, conf, iou, max_det=max_det, end2end=end2end)
+        results = []
+        for det, shape in zip(preds, shapes):
+            if not len(det):
+                results.append(Detections.empty())
+                continue
+            boxes = ops.scale_boxes((self.imgsz, self.imgsz), det[:, :4].float(), shape)
+            det = det.cpu()
+            results.append(Detections(boxes.cpu().numpy().astype(np.float32),
+                                      det[:, 5].numpy().astype(np.int32),
+                                      det[:, 4].float().numpy()))
+        return results
+
+    def predict(self, frames, conf=None, iou=None, max_det=None, single_object=None):
+        """
+        批量推理
+
+        Args:
+            frames: BGR 图像列表 (尺寸可以不同)
+            conf / iou / max_det: 覆盖默认的 NMS 参数
+            single_object: 覆盖默认的解码方式 (True 时不做 NMS, 每张图像至多 topk 个检测)
+
+        Returns:
+            与 frames 等长的 [Detections, ...]
+        """
+        import torch
+
+        conf = self.conf if conf is None else conf
+        iou = self.iou if iou is None else iou
+        max_det = self.max_det if max_det is None else max_det
+        single_object = self.single_object if single_object is None else single_object
+        results = []
+        with torch.inference_mode():
+            for i in range(0, len(frames), self.batch):
+                chunk = frames[i:i + self.batch]
+                t0 = time.perf_counter()
+                im = self._preprocess(chunk)
+                t1 = time.perf_counter()
+                preds = self._forward(im)
+                if self.device.type == 'cuda':
+                    torch.cuda.synchronize(self.device)
+                t2 = time.perf_counter()
+                results.extend(self._postprocess(preds, [f.shape[:2] for f in chunk], conf, iou, max_det,
+                                                  single_object))
+                t3 = time.perf_counter()
+
+                self._timing['images'] += len(chunk)
+                self._timing['batches'] += 1
+                self._timing['preprocess_s'] += t1 - t0
+                self._timing['forward_s'] += t2 - t1
+                self._timing['postprocess_s'] += t3 - t2
+        return results
+
+    def __call__(self, frames, **kwargs):
+        """单张数组 -> Detections; 列表 -> [Detections, ...]"""
+        if isinstance(frames, np.ndarray) and frames.ndim in (2, 3):
+            return self.predict([frames], **kwargs)[0]
+        return self.predict(list(frames), **kwargs)
+
+
+def draw_detections(image, detections, names=None, color=(0, 255, 0)):
+    """
+    在 BGR 图像的副本上画出检测框和标签
+
+    Returns:
+        标注后的 BGR 图像
+    """
+    annotated = image.copy()
+    thickness = max(1, round(sum(image.shape[:2]) / 600))
+    scale = max(0.3, thickness / 3)
+    for box, cls, score in zip(detections.boxes, detections.classes, detections.scores):
+        x1, y1, x2, y2 = (int(round(v)) for v in box)
+        label = f"{names[int(cls)] if names is not None else int(cls)} {score:.2f}"
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, thickness)
+        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+        y_text = y1 - 2 if y1 - th - 4 >= 0 else y1 + th + 2
+        cv2.rectangle(annotated, (x1, y_text - th - 2), (x1 + tw, y_text + 2), color, -1)
+        cv2.putText(annotated, label, (x1, y_text), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), thickness,
+                    cv2.LINE_AA)
+    return annotated
+
+
+# ---------------- 解码方式比较 ----------------
+
+def compare_decoders(weights, data, split='test', imgsz=640, device='', validator=None, k=1):
+    """
+    在同一划分上比较通用 NMS 与单目标快速解码的 mAP 和后处理耗时
+
+    Args:
+        weights: 模型权重
+        data: 数据集配置
+        validator: 验证器类 (虚拟数据集配置用 build_validator 生成), 默认 DetectionValidator
+        k: 单目标解码保留的候选数
+
+    Returns:
+        {'nms': {'mAP50', 'mAP50-95', 'postprocess_ms'}, 'single_object': {...},
+         'delta_mAP50', 'delta_mAP50-95', 'postprocess_speedup'}; delta = 单目标 - NMS
+    """
+    from ultralytics import YOLO
+
+    def _val(validator_cls):
+        extra = {'validator': validator_cls} if validator_cls is not None else {}
+        metrics = YOLO(weights).val(data=data, split=split, imgsz=imgsz, device=device, plots=False,
+                                    verbose=False, **extra)
+        return {'mAP50': round(float(metrics.box.map50), 4), 'mAP50-95': round(float(metrics.box.map), 4),
+                'postprocess_ms': round(float(metrics.speed['postprocess']), 3)}
+
+    standard = _val(validator)
+    fast = _val(single_object_validator(validator, k=k))
+    return {
+        'nms': standard,
+        'single_object': fast,
+        'delta_mAP50': round(fast['mAP50'] - standard['mAP50'], 4),
+        'delta_mAP50-95': round(fast['mAP50-95'] - standard['mAP50-95'], 4),
+        'postprocess_speedup': (round(standard['postprocess_ms'] / fast['postprocess_ms'], 2)
+                                if fast['postprocess_ms'] else None),
+    }
@@ -0,0 +1,417 @@
+"""
+本地推理服务 (微批处理)
+只用标准库 asyncio 实现的 HTTP 服务, EnlightenGAN 和 YOLO 模型常驻内存, 供本机其他服务调用:
+
+- 微批处理: 并发到达的请求进入同一个队列, 凑满 max_batch 张或第一张入队后等待 max_wait_ms 即开始推理
+  (FramePredictor 一次前向), 低负载时延迟只增加不超过 max_wait_ms, 高负载时吞吐随批次增大
+- 流水线: 请求体解码和增强在线程池中进行, 与上一批的推理重叠; 推理在单独的线程中串行执行, 事件循环不被阻塞
+- 每个请求可以选择增强方法 (none / traditional / enlightengan)、置信度阈值和单目标快速解码;
+  同一批中阈值不同的请求按最低阈值推理一次, 再各自过滤 (NMS 按得分贪心, 结果与单独推理相同)
+- 指标: 最近 window 个请求的 p50 / p95 / p99 端到端延迟、排队时间、每批推理耗时和批次大小、
+  队列深度 (当前 / 最大 / 平均)、超过 SLO 的比例
+- 背压: 等待解码的请求和推理队列各不超过 max_queue; 解码完成后按入队时的实际队列深度判断,
+  队列满时返回 503 而不是无限排队
+- 离线: 只加载本地权重文件, 不访问网络
+
+接口:
+    POST /detect?method=traditional&conf=0.25&single_object=1   请求体为编码后的图像 (PNG / JPEG ...)
+    GET  /metrics
+    GET  /health
+
+用法:
+    from src.models.predictor import FramePredictor
+    from src.models.serving import InferenceServer, load_enhancers
+
+    predictor = FramePredictor('best.pt', imgsz=640, device='cpu', batch=16)
+    server = InferenceServer(predictor, load_enhancers(['none', 'traditional', 'enlightengan']))
+    server.run(host='127.0.0.1', port=8000)
+
+    # 客户端
+    curl --data-binary @sign.png 'http://127.0.0.1:8000/detect?method=enlightengan&conf=0.3'
+"""
+
+import asyncio
+import json
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from src.models.batch_inference import ENHANCE_METHODS, make_enhancer
+
+
+# 请求体上限
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+# 统计延迟分位数的窗口 (最近的请求数)
+METRICS_WINDOW = 10000
+
+
+class HTTPError(Exception):
+    """返回给客户端的错误 (状态码 + 说明)"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def load_enhancers(methods=ENHANCE_METHODS, enlightengan_weights='weights/enlightengan.onnx'):
+    """
+    加载各增强方法 (EnlightenGAN 只加载一次并常驻)
+
+    Returns:
+        {方法: (enhance(image) -> (image, 该图像实际使用的方法) 或 None, 加载时确定的方法名)}
+    """
+    return {method: make_enhancer(method, enlightengan_weights) for method in methods}
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    p50, p95, p99 = np.percentile(np.fromiter(values, dtype=np.float64), [50, 95, 99])
+    return {'p50': round(float(p50), 2), 'p95': round(float(p95), 2), 'p99': round(float(p99), 2),
+            'max': round(float(max(values)), 2)}
+
+
+class ServerMetrics:
+    """请求 / 批次 / 队列深度统计 (只在事件循环线程中更新)"""
+
+    def __init__(self, window=METRICS_WINDOW, slo_ms=None):
+        self.slo_ms = slo_ms
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_images = 0
+        self.latency_ms = deque(maxlen=window)
+        self.queue_ms = deque(maxlen=window)
+        self.batch_ms = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.queue_depths = deque(maxlen=window)
+        self.max_queue_depth = 0
+
+    def record_enqueue(self, depth):
+        self.queue_depths.append(depth)
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def record_batch(self, size, seconds):
+        self.batches += 1
+        self.batched_images += size
+        self.batch_sizes.append(size)
+        self.batch_ms.append(seconds * 1000)
+
+    def record_request(self, latency_ms, queue_ms):
+        self.requests += 1
+        self.latency_ms.append(latency_ms)
+        self.queue_ms.append(queue_ms)
+
+    def snapshot(self, queue_depth, decoding=0):
+        """/metrics 的内容 (decoding: 等待解码 / 增强的请求数)"""
+        result = {
+            'uptime_s': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'mean_batch_size': round(self.batched_images / self.batches, 2) if self.batches else None,
+            'latency_ms': _percentiles(self.latency_ms),
+            'queue_wait_ms': _percentiles(self.queue_ms),
+            'batch_infer_ms': _percentiles(self.batch_ms),
+            'batch_size': _percentiles(self.batch_sizes),
+            'queue_depth': {
+                'current': queue_depth,
+                'decoding': decoding,
+                'max': self.max_queue_depth,
+                'mean': round(float(np.mean(self.queue_depths)), 2) if self.queue_depths else 0.0,
+            },
+            'window': len(self.latency_ms),
+        }
+        if self.slo_ms is not None:
+            over = sum(1 for v in self.latency_ms if v > self.slo_ms)
+            result['slo'] = {
+                'latency_ms': self.slo_ms,
+                'violations': round(over / len(self.latency_ms), 4) if self.latency_ms else 0.0,
+                'p95_ok': result['latency_ms']['p95'] is None or result['latency_ms']['p95'] <= self.slo_ms,
+            }
+        return result
+
+
+class _Item:
+    """队列中的一个请求"""
+
+    __slots__ = ('frame', 'conf', 'single_object', 'future', 'enqueued')
+
+    def __init__(self, frame, conf, single_object, future, enqueued):
+        self.frame = frame
+        self.conf = conf
+        self.single_object = single_object
+        self.future = future
+        self.enqueued = enqueued
+
+
+class InferenceServer:
+    """
+    微批处理推理服务
+
+    Args:
+        predictor: FramePredictor (常驻的 YOLO 模型)
+        enhancers: load_enhancers 的结果
+        default_method: 请求未指定时的增强方法
+        max_batch: 每批最多的图像数 (默认为 predictor.batch)
+        max_wait_ms: 第一张入队后最多等待的时间
+        max_queue: 排队请求上限 (推理队列和等待解码的请求分别计算), 超过时返回 503
+        workers: 解码 / 增强线程数
+        slo_ms: 端到端延迟目标 (只用于 /metrics 报告)
+    """
+
+    def __init__(self, predictor, enhancers, default_method='none', max_batch=None, max_wait_ms=5.0,
+                 max_queue=256, workers=4, slo_ms=None):
+        if default_method not in enhancers:
+            raise ValueError(f"默认增强方法 {default_method} 未加载 (已加载: {', '.join(enhancers)})")
+        self.predictor = predictor
+        self.enhancers = enhancers
+        self.default_method = default_method
+        self.max_batch = max_batch or predictor.batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.metrics = ServerMetrics(slo_ms=slo_ms)
+        self._decode_pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='decode')
+        self._infer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='infer')
+        self._queue = None
+        self._getter = None
+        self._decoding = 0  # 已接收、尚未解码完成的请求数
+
+    # ---------------- 推理 ----------------
+
+    def _prepare(self, body, method):
+        """解码 + 增强 (线程池中运行), 返回 (图像, 耗时, 实际使用的增强方法)"""
+        t0 = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise HTTPError(400, '无法解码图像')
+        t1 = time.perf_counter()
+        enhance, route = self.enhancers[method]
+        if enhance is not None:
+            frame, route = enhance(frame)
+        t2 = time.perf_counter()
+        return frame, {'decode': (t1 - t0) * 1000, 'enhance': (t2 - t1) * 1000}, route
+
+    def _infer(self, batch):
+        """一批请求的推理 (推理线程中运行); 按解码方式分组, 每组按最低阈值推理一次"""
+        results = [None] * len(batch)
+        for single_object in (False, True):
+            group = [i for i, item in enumerate(batch) if item.single_object == single_object]
+            if not group:
+                continue
+            conf = min(batch[i].conf for i in group)
+            detections = self.predictor.predict([batch[i].frame for i in group], conf=conf,
+                                                single_object=single_object)
+            for i, det in zip(group, detections):
+                keep = det.scores >= batch[i].conf
+                det.boxes, det.classes, det.scores = det.boxes[keep], det.classes[keep], det.scores[keep]
+                results[i] = det
+        return results
+
+    async def _next_item(self, timeout=None):
+        """从队列取一个请求; 超时返回 None (未完成的 get 留给下一次, 不会丢失请求)"""
+        if self._getter is None:
+            self._getter = asyncio.ensure_future(self._queue.get())
+        done, _ = await asyncio.wait({self._getter}, timeout=timeout)
+        if not done:
+            return None
+        item, self._getter = self._getter.result(), None
+        return item
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._next_item()
+            batch = [first]
+            deadline = first.enqueued + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                item = await self._next_item(remaining) if remaining > 0 else None
+                if item is None:
+                    break
+                batch.append(item)
+
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._infer_pool, self._infer, batch)
+            except Exception as e:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+            self.metrics.record_batch(len(batch), time.perf_counter() - start)
+            for item, det in zip(batch, results):
+                if not item.future.done():
+                    item.future.set_result((det, len(batch)))
+
+    async def detect(self, body, method=None, conf=None, single_object=False):
+        """
+        处理一个检测请求
+
+        Returns:
+            响应字典 {'detections', 'shape', 'route', 'batch_size', 'timing_ms'}
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        method = method or self.default_method
+        if method not in self.enhancers:
+            raise HTTPError(400, f"未加载的增强方法: {method} (可选: {', '.join(self.enhancers)})")
+        conf = self.predictor.conf if conf is None else conf
+        if not 0.0 <= conf <= 1.0:
+            raise HTTPError(400, f"conf 必须在 0 ~ 1 之间: {conf}")
+        # 解码 / 增强也要限流: 等待解码的请求过多时直接拒绝, 不再提交到线程池
+        if self._decoding >= self.max_queue:
+            self.metrics.rejected += 1
+            raise HTTPError(503, '解码队列已满, 请稍后重试')
+
+        self._decoding += 1
+        try:
+            frame, timing, route = await loop.run_in_executor(self._decode_pool, self._prepare, body, method)
+        finally:
+            self._decoding -= 1
+
+        # 入队时按实际队列深度判断 (解码期间队列可能已经排空或已满)
+        if self._queue.qsize() >= self.max_queue:
+            self.metrics.rejected += 1
+            raise HTTPError(503, '队列已满, 请稍后重试')
+        future = loop.create_future()
+        enqueued = loop.time()
+        self.metrics.record_enqueue(self._queue.qsize() + 1)
+        self._queue.put_nowait(_Item(frame, conf, single_object, future, enqueued))
+        det, batch_size = await future
+        done = loop.time()
+
+        timing['queue_and_infer'] = (done - enqueued) * 1000
+        timing['total'] = (done - start) * 1000
+        self.metrics.record_request(timing['total'], timing['queue_and_infer'])
+        return {
+            'detections': det.as_dict(self.predictor.names),
+            'shape': list(frame.shape[:2]),
+            'route': {'enhance': route, 'decoder': 'single_object' if single_object else 'nms'},
+            'batch_size': batch_size,
+            'timing_ms': {k: round(v, 2) for k, v in timing.items()},
+        }
+
+    # ---------------- HTTP ----------------
+
+    async def _read_request(self, reader):
+        """读取一个 HTTP/1.1 请求; 连接关闭时返回 None"""
+        line = await reader.readline()
+        if not line or line in (b'\r\n', b'\n'):
+            return None
+        try:
+            verb, target, _ = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, '无效的请求行')
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"请求体超过 {MAX_BODY_BYTES // (1024 * 1024)} MB")
+        body = await reader.readexactly(length) if length else b''
+        return verb.upper(), target, headers, body
+
+    async def _dispatch(self, verb, target, body):
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == '/detect':
+            if verb != 'POST':
+                raise HTTPError(405, '请用 POST 上传图像')
+            if not body:
+                raise HTTPError(400, '请求体为空')
+            try:
+                conf = float(query['conf']) if 'conf' in query else None
+            except ValueError:
+                raise HTTPError(400, f"无效的 conf: {query['conf']}")
+            single_object = query.get('single_object', '0').lower() in ('1', 'true', 'yes')
+            return 200, await self.detect(body, method=query.get('method'), conf=conf, single_object=single_object)
+        if url.path == '/metrics':
+            return 200, self.metrics.snapshot(self._queue.qsize(), self._decoding)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'methods': {m: route for m, (_, route) in self.enhancers.items()},
+                         'max_batch': self.max_batch, 'max_wait_ms': self.max_wait * 1000}
+        raise HTTPError(404, f"未知路径: {url.path}")
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+
+    async def _handle(self, reader, writer):
+        """一个连接 (支持 keep-alive)"""
+        try:
+            while True:
+                request = None
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    verb, target, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, payload = await self._dispatch(verb, target, body)
+                except HTTPError as e:
+                    if e.status != 503:
+                        self.metrics.errors += 1
+                    # 请求没有读完整时连接上的剩余数据无法解析, 回复后关闭
+                    keep_alive = request is not None and request[2].get('connection', '').lower() != 'close'
+                    status, payload = e.status, {'error': e.message}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    self.metrics.errors += 1
+                    keep_alive, status, payload = False, 500, {'error': f"{type(e).__name__}: {e}"}
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        """启动服务, 直到收到 SIGINT / SIGTERM"""
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch_loop())
+        server = await asyncio.start_server(self._handle, host, port)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):  # Windows / 非主线程
+                pass
+        print(f"🚀 推理服务已启动: http://{host}:{port} "
+              f"(max_batch={self.max_batch}, max_wait={self.max_wait * 1000:.1f} ms)")
+        async with server:
+            await stop.wait()
+        batcher.cancel()
+        self._decode_pool.shutdown(wait=False)
+        self._infer_pool.shutdown(wait=False)
+        print("推理服务已停止")
+
+    def run(self, host='127.0.0.1', port=8000):
+        asyncio.run(self.serve(host, port))
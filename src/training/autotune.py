@@ -0,0 +1,300 @@
+"""
+CPU 训练的 dataloader workers / batch size 自动选择
+脚本里的 batch=2、workers=0 是当初为了避免 GPU 显存不足设的, 在纯 CPU 节点上会让大部分核闲置;
+另外 ultralytics 在 device=cpu 时会强制 workers=0. 训练前先做一次短时探测:
+
+1. 数据加载: 用训练时同样的数据集类和增强参数, 对每个候选 workers 计时若干个 batch (张/秒),
+   同时记录 worker 进程占用的内存
+2. 训练步骤: 对每个候选 batch 在真实 batch 上计时前向 + 反向 + 参数更新 (张/秒), 记录内存增长;
+   按已测结果线性外推, 预计超出内存预算的 batch 不再尝试
+3. 选择: 预算内吞吐量最高的 batch (更大的 batch 至少快 MIN_GAIN 才采用),
+   再取数据加载速度达到训练速度 LOADER_MARGIN 倍的最少 workers; 每一步的理由都记录下来
+
+用法:
+    from src.training.autotune import autotune, keep_workers
+
+    choice = autotune('yolov8n.pt', 'configs/exp1_baseline.yaml', imgsz=640, train_kwargs={...})
+    model.train(..., batch=choice['batch'], workers=choice['workers'], trainer=keep_workers(trainer_cls))
+"""
+
+import gc
+import os
+import tempfile
+import time
+
+
+# 候选值
+BATCH_CANDIDATES = (2, 4, 8, 16, 32, 64)
+
+# 更大的 batch 至少快这么多才采用
+MIN_GAIN = 0.05
+
+# 数据加载速度至少达到训练速度的这个倍数, 才认为训练不会等待数据
+LOADER_MARGIN = 1.2
+
+# 未指定内存预算时使用可用内存的比例
+MEMORY_FRACTION = 0.8
+
+
+def worker_candidates(cores=None):
+    """0, 1, 2, 4, ... 直到可用核数"""
+    if cores is None:
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    candidates, w = [0], 1
+    while w < cores:
+        candidates.append(w)
+        w *= 2
+    return candidates + ([cores] if cores > 1 else [])
+
+
+def default_memory_budget_mb():
+    """可用内存的 MEMORY_FRACTION; 进程设置了 RLIMIT_DATA (如由 run_experiments.py 启动) 时不超过该上限"""
+    from src.training.scheduler import available_memory_gb
+
+    budget = available_memory_gb() * 1024 * MEMORY_FRACTION
+    try:
+        import resource
+    except ImportError:  # Windows 没有 rlimit
+        return budget
+    soft, _ = resource.getrlimit(resource.RLIMIT_DATA)
+    if soft != resource.RLIM_INFINITY:
+        budget = min(budget, soft / 1024 / 1024 * MEMORY_FRACTION)
+    return budget
+
+
+def _process_rss_mb(include_children=True):
+    import psutil
+
+    process = psutil.Process(os.getpid())
+    total = process.memory_info().rss
+    if include_children:
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                pass
+    return total / 1024 / 1024
+
+
+def _peak_rss_mb():
+    """主进程的历史峰值内存 (Unix 上为 ru_maxrss, Windows 上为 psutil 的 peak_wset)"""
+    try:
+        import resource
+    except ImportError:
+        import psutil
+
+        info = psutil.Process(os.getpid()).memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def keep_workers(trainer_cls=None):
+    """
+    包装训练器: ultralytics 在 device=cpu 时会把 workers 改为 0, 这里恢复为传入的 workers
+
+    Args:
+        trainer_cls: 原训练器 (如 build_trainer(...) 的结果), 默认 DetectionTrainer
+    """
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils import DEFAULT_CFG
+
+    base = trainer_cls or DetectionTrainer
+
+    class WorkersTrainer(base):
+        def __init__(self, cfg=DEFAULT_CFG, overrides=None, _callbacks=None):
+            workers = (overrides or {}).get('workers')
+            super().__init__(cfg, overrides, _callbacks)
+            if workers is not None:
+                self.args.workers = workers
+
+    WorkersTrainer.__name__ = base.__name__
+    return WorkersTrainer
+
+
+def _build_probe(model, data, imgsz, trainer_cls, train_kwargs, project):
+    """构造一个不训练的训练器, 用它按训练时的设置建立数据集和模型"""
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    overrides = {k: v for k, v in (train_kwargs or {}).items()
+                 if k not in ('epochs', 'batch', 'workers', 'project', 'name', 'exist_ok', 'trainer', 'resume')}
+    overrides.update(model=str(model), data=str(data), imgsz=imgsz, device='cpu', batch=BATCH_CANDIDATES[0],
+                     project=project, name='probe', exist_ok=True, plots=False, verbose=False)
+    return (trainer_cls or DetectionTrainer)(overrides=overrides)
+
+
+def probe_loader(dataset, batch, workers_list, n_batches=20):
+    """
+    数据加载吞吐量
+
+    Returns:
+        [{'workers', 'images_per_sec', 'rss_mb'}, ...]: rss_mb 为 worker 进程的内存合计
+    """
+    from ultralytics.data.build import build_dataloader
+
+    results = []
+    for workers in workers_list:
+        loader = build_dataloader(dataset, batch=batch, workers=workers, shuffle=True, rank=-1, pin_memory=False)
+        iterator = iter(loader)
+        try:
+            next(iterator)  # 启动 worker
+            images, start = 0, time.perf_counter()
+            for _ in range(n_batches):
+                images += int(next(iterator)['img'].shape[0])
+            elapsed = time.perf_counter() - start
+            rss = _process_rss_mb() - _process_rss_mb(include_children=False) if workers else 0.0
+        except StopIteration:
+            elapsed, images, rss = 1.0, 0, 0.0
+        finally:
+            loader.close()
+            del iterator, loader
+            gc.collect()
+        results.append({'workers': workers, 'images_per_sec': round(images / elapsed, 1), 'rss_mb': round(rss, 1)})
+        print(f"  workers={workers:<3} {results[-1]['images_per_sec']:>8.1f} 张/秒  worker 内存 {rss:.0f} MB")
+    return results
+
+
+def probe_step(probe, dataset, batch_sizes, budget_mb, n_steps=3):
+    """
+    训练步骤吞吐量 (前向 + 反向 + SGD 更新)
+
+    Returns:
+        [{'batch', 'images_per_sec', 'step_ms', 'memory_mb'}, ...]; memory_mb 为训练进程的峰值 RSS,
+        跳过的 batch 带 'skipped' 原因
+    """
+    import torch
+
+    probe.setup_model()
+    probe.set_model_attributes()
+    model = probe.model.to(probe.device).train()
+    optimizer = torch.optim.SGD(model.parameters(), lr=1e-4, momentum=0.9)
+
+    results = []
+    for batch_size in batch_sizes:
+        measured = [r for r in results if 'memory_mb' in r]
+        if len(measured) >= 2:
+            # 内存随 batch 近似线性增长, 按最近两点外推
+            (b1, m1), (b2, m2) = [(r['batch'], r['memory_mb']) for r in measured[-2:]]
+            predicted = m2 + (m2 - m1) / (b2 - b1) * (batch_size - b2)
+            if predicted > budget_mb:
+                results.append({'batch': batch_size, 'skipped': f'预计内存 {predicted:.0f} MB 超出预算'})
+                break
+        if batch_size > len(dataset):
+            break
+
+        batch = dataset.collate_fn([dataset[i % len(dataset)] for i in range(batch_size)])
+        batch = probe.preprocess_batch(batch)
+        times = []
+        for step in range(n_steps + 1):
+            start = time.perf_counter()
+            loss, _ = model(batch)
+            loss.sum().backward()
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+            if step:  # 第一步包含内存分配等一次性开销
+                times.append(time.perf_counter() - start)
+        del batch, loss
+        gc.collect()
+
+        # ru_maxrss 单调不减, 按从小到大的顺序测量时即为当前 batch 的峰值
+        memory = _peak_rss_mb()
+        step_s = sorted(times)[len(times) // 2]
+        results.append({'batch': batch_size, 'images_per_sec': round(batch_size / step_s, 1),
+                        'step_ms': round(step_s * 1000, 1), 'memory_mb': round(memory, 1)})
+        print(f"  batch={batch_size:<4} {results[-1]['images_per_sec']:>8.1f} 张/秒  "
+              f"{step_s * 1000:>8.0f} ms/步  峰值内存 {memory:.0f} MB")
+        if memory > budget_mb:
+            results[-1]['skipped'] = f'内存 {memory:.0f} MB 超出预算'
+            break
+    return results
+
+
+def choose(loader_results, step_results, budget_mb):
+    """按探测结果选择 (batch, workers), 返回 (batch, workers, 理由列表)"""
+    reasons = []
+    feasible = [r for r in step_results if 'skipped' not in r]
+    if not feasible:
+        batch = BATCH_CANDIDATES[0]
+        reasons.append(f"所有候选 batch 都超出内存预算 {budget_mb:.0f} MB, 使用最小值 {batch}")
+        step_rate, step_memory = None, 0.0
+    else:
+        best = feasible[0]
+        for r in feasible[1:]:
+            if r['images_per_sec'] >= best['images_per_sec'] * (1 + MIN_GAIN):
+                best = r
+        batch, step_rate, step_memory = best['batch'], best['images_per_sec'], best['memory_mb']
+        fastest = max(feasible, key=lambda r: r['images_per_sec'])
+        reasons.append(f"batch={batch}: 训练 {step_rate:.1f} 张/秒, 峰值内存 {step_memory:.0f} MB "
+                       f"(预算 {budget_mb:.0f} MB)")
+        if fastest['batch'] != batch:
+            reasons.append(f"batch={fastest['batch']} 只快 {fastest['images_per_sec'] / step_rate - 1:.1%} "
+                           f"(< {MIN_GAIN:.0%}), 不值得更大的 batch")
+        for r in step_results:
+            if 'skipped' in r:
+                reasons.append(f"batch={r['batch']} 未采用: {r['skipped']}")
+
+    affordable = [r for r in loader_results if step_memory + r['rss_mb'] <= budget_mb] or loader_results[:1]
+    enough = [r for r in affordable if step_rate and r['images_per_sec'] >= step_rate * LOADER_MARGIN]
+    if enough:
+        pick = min(enough, key=lambda r: r['workers'])
+        reasons.append(f"workers={pick['workers']}: 数据加载 {pick['images_per_sec']:.1f} 张/秒, "
+                       f"已达到训练速度的 {LOADER_MARGIN}x; 更多 worker 只会和计算线程抢核")
+    else:
+        pick = max(affordable, key=lambda r: r['images_per_sec'])
+        reasons.append(f"workers={pick['workers']}: 数据加载最快 ({pick['images_per_sec']:.1f} 张/秒), "
+                       f"但仍低于训练速度的 {LOADER_MARGIN}x, 训练将受数据加载限制")
+    dropped = [r['workers'] for r in loader_results if r not in affordable]
+    if dropped:
+        reasons.append(f"workers={dropped} 未采用: worker 内存加训练内存超出预算")
+    return batch, pick['workers'], reasons
+
+
+def autotune(model, data, imgsz=640, trainer_cls=None, train_kwargs=None, memory_budget_mb=None,
+             batch_sizes=BATCH_CANDIDATES, workers_list=None, n_batches=20, n_steps=3):
+    """
+    探测并选择 CPU 训练的 batch 和 workers
+
+    Args:
+        model: 初始权重 (如 'yolov8n.pt')
+        data: 数据集配置
+        imgsz: 训练 imgsz
+        trainer_cls: 训练时使用的训练器 (决定数据集类), 默认 DetectionTrainer
+        train_kwargs: 训练时传给 model.train 的其它参数 (增强、rect 等影响数据加载开销)
+        memory_budget_mb: 内存预算 (默认可用内存的 80%)
+        batch_sizes / workers_list: 候选值
+        n_batches / n_steps: 每个候选计时的 batch 数 / 训练步数
+
+    Returns:
+        {'batch', 'workers', 'reasons', 'budget_mb', 'loader', 'step', 'seconds'}
+    """
+    start = time.perf_counter()
+    budget_mb = memory_budget_mb or default_memory_budget_mb()
+    workers_list = workers_list or worker_candidates()
+
+    with tempfile.TemporaryDirectory() as project:
+        probe = _build_probe(model, data, imgsz, trainer_cls, train_kwargs, project)
+        probe_batch = max(batch_sizes[0], 8)
+        dataset = probe.build_dataset(probe.data['train'], mode='train', batch=probe_batch)
+
+        print(f"\n🔧 自动选择 workers / batch (内存预算 {budget_mb:.0f} MB)")
+        print("数据加载:")
+        loader_results = probe_loader(dataset, probe_batch, workers_list, n_batches)
+        print("训练步骤:")
+        step_results = probe_step(probe, dataset, sorted(batch_sizes), budget_mb, n_steps)
+        del probe, dataset
+        gc.collect()
+
+    batch, workers, reasons = choose(loader_results, step_results, budget_mb)
+    seconds = time.perf_counter() - start
+    print(f"✅ 选择 batch={batch}, workers={workers} (探测耗时 {seconds:.0f} 秒)")
+    for reason in reasons:
+        print(f"   • {reason}")
+
+    return {
+        'batch': batch,
+        'workers': workers,
+        'reasons': reasons,
+        'budget_mb': round(budget_mb, 1),
+        'loader': loader_results,
+        'step': step_results,
+        'seconds': round(seconds, 1),
+    }
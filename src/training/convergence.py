@@ -0,0 +1,263 @@
+"""
+在线收敛检测、原子检查点与自动续训
+diagnose_results.check_training_results 事后检查最后 5 轮 mAP50 的标准差是否低于 0.001,
+但到那时这些轮次已经跑完了. ConvergenceMonitor 在每轮验证后做同样的判断:
+
+- 平稳: 最近 window 轮指标的标准差 < min_std
+- 无提升: 连续 patience 轮没有超过历史最佳 min_delta
+两条规则任一满足 (且已训练 min_epochs 轮) 即停止训练, 随后 ultralytics 照常用 best.pt 做最终验证.
+
+同时:
+- 原子检查点: last.pt / best.pt 先写入临时文件、fsync 后再替换, 中断不会留下损坏的 last.pt
+- 运行状态: 运行目录下的 run_state.json 记录 running / finished / early_stopped 和已完成的轮数;
+  train_with_resume 发现状态仍为 running 的运行时, 从其 last.pt 以相同超参数继续训练
+
+用法:
+    from src.training.convergence import ConvergenceMonitor, train_with_resume
+
+    model = YOLO('yolov8n.pt')
+    monitor = ConvergenceMonitor(window=5, min_std=0.001, patience=10).attach(model)
+    results = train_with_resume(model, project='experiments/exp1_baseline', name='run', data=..., epochs=100)
+    exp_info['convergence'] = monitor.summary()
+"""
+
+import csv
+import json
+import os
+import re
+import statistics
+from datetime import datetime
+from pathlib import Path
+
+
+STATE_NAME = 'run_state.json'
+
+DEFAULT_METRIC = 'metrics/mAP50(B)'
+
+
+def _write_json(path, data):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def read_run_state(save_dir):
+    """读取运行目录的 run_state.json, 不存在时返回 None"""
+    path = Path(save_dir) / STATE_NAME
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_interrupted_run(project, name):
+    """
+    查找 project 下名为 name (或被 ultralytics 自动编号为 name2, name3, ...) 且被中断的运行
+
+    Returns:
+        last.pt 路径; 没有可续训的运行时返回 None
+    """
+    project = Path(project)
+    if not project.exists():
+        return None
+    pattern = re.compile(rf'^{re.escape(name)}\d*$')
+    candidates = []
+    for run_dir in project.iterdir():
+        last = run_dir / 'weights' / 'last.pt'
+        state = read_run_state(run_dir) if pattern.match(run_dir.name) else None
+        if state and state.get('status') == 'running' and last.exists():
+            candidates.append(last)
+    return max(candidates, key=lambda p: p.stat().st_mtime) if candidates else None
+
+
+def make_atomic_save(trainer):
+    """让 trainer.save_model 先写临时文件再替换 (ultralytics 直接 write_bytes, 中断时会留下半个文件)"""
+    save_model = trainer.save_model
+
+    def atomic_save_model():
+        last, best = trainer.last, trainer.best
+        tmp_last, tmp_best = last.with_name(last.name + '.tmp'), best.with_name(best.name + '.tmp')
+        trainer.last, trainer.best = tmp_last, tmp_best
+        try:
+            saved = save_model()
+        finally:
+            trainer.last, trainer.best = last, best
+        for tmp, final in ((tmp_last, last), (tmp_best, best)):
+            if tmp.exists():
+                with open(tmp, 'rb') as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp, final)
+        return saved
+
+    # 实例属性覆盖方法, _do_train 中的 self.save_model() 会调用这里
+    trainer.save_model = atomic_save_model
+
+
+class ConvergenceMonitor:
+    """
+    收敛检测回调 (同时负责原子检查点和 run_state.json)
+
+    Args:
+        metric: 监控的 results.csv 列
+        window: 平稳判断的窗口轮数
+        min_std: 窗口内标准差低于此值视为平稳 (与 diagnose_results 的 "已充分收敛" 一致)
+        patience: 连续多少轮没有提升就停止; 0 表示不使用该规则
+        min_delta: 超过历史最佳多少才算提升
+        min_epochs: 至少训练的轮数
+        enabled: False 时只做原子检查点和运行状态记录, 不提前停止
+    """
+
+    def __init__(self, metric=DEFAULT_METRIC, window=5, min_std=0.001, patience=10, min_delta=0.001,
+                 min_epochs=10, enabled=True):
+        self.metric = metric
+        self.window = window
+        self.min_std = min_std
+        self.patience = patience
+        self.min_delta = min_delta
+        self.min_epochs = min_epochs
+        self.enabled = enabled
+
+        self.history = []
+        self.best = None
+        self.best_epoch = 0
+        self.stop_reason = None
+        self.stopped_epoch = None
+        self.resumed_from = None
+        self._pending = False
+
+    def attach(self, model):
+        """在 YOLO 模型上注册回调"""
+        model.add_callback('on_train_start', self.on_train_start)
+        model.add_callback('on_train_epoch_end', self.on_train_epoch_end)
+        model.add_callback('on_fit_epoch_end', self.on_fit_epoch_end)
+        model.add_callback('on_train_end', self.on_train_end)
+        return self
+
+    def detach(self, model):
+        """从 YOLO 模型上移除回调 (同一个模型多次训练时避免重复统计)"""
+        for event, callbacks in model.callbacks.items():
+            model.callbacks[event] = [c for c in callbacks if getattr(c, '__self__', None) is not self]
+
+    # ---------------- 规则 ----------------
+
+    def update(self, epoch, value):
+        """
+        记录一轮的指标, 返回停止原因 (不停止时返回 None)
+
+        Args:
+            epoch: 轮次 (从 1 开始)
+            value: 指标值
+        """
+        self.history.append(value)
+        if self.best is None or value > self.best + self.min_delta:
+            self.best, self.best_epoch = value, epoch
+
+        if not self.enabled or epoch < self.min_epochs:
+            return None
+        if len(self.history) >= self.window:
+            std = statistics.stdev(self.history[-self.window:]) if self.window > 1 else 0.0
+            if std < self.min_std:
+                return f"最近 {self.window} 轮 {self.metric} 标准差 {std:.6f} < {self.min_std}"
+        if self.patience and epoch - self.best_epoch >= self.patience:
+            return f"{self.patience} 轮没有提升 (最佳 {self.best:.4f} @ 第 {self.best_epoch} 轮)"
+        return None
+
+    def _load_history(self, csv_path):
+        """续训时从 results.csv 恢复历史"""
+        if not csv_path.exists():
+            return
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                row = {k.strip(): v for k, v in row.items()}
+                if row.get(self.metric):
+                    self.update(int(float(row['epoch'])), float(row[self.metric]))
+
+    def _write_state(self, trainer, status):
+        _write_json(Path(trainer.save_dir) / STATE_NAME, {
+            'status': status,
+            'epoch': trainer.epoch + 1,
+            'epochs': trainer.epochs,
+            'best': self.best,
+            'best_epoch': self.best_epoch,
+            'stop_reason': self.stop_reason,
+            'resumed_from': self.resumed_from,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        })
+
+    # ---------------- 回调 ----------------
+
+    def on_train_start(self, trainer):
+        make_atomic_save(trainer)
+        if trainer.args.resume:
+            self.resumed_from = str(trainer.args.resume)
+            self._load_history(Path(trainer.csv))
+            print(f"从 {self.resumed_from} 继续训练 (第 {trainer.start_epoch + 1} 轮起, 已有 {len(self.history)} 轮记录)")
+        self._write_state(trainer, 'running')
+
+    def on_train_epoch_end(self, trainer):
+        self._pending = True
+
+    def on_fit_epoch_end(self, trainer):
+        # final_eval 用 best.pt 验证时会再触发一次, 此时没有新的训练轮次
+        if not self._pending:
+            return
+        self._pending = False
+
+        value = (trainer.metrics or {}).get(self.metric)
+        if value is None:
+            self._write_state(trainer, 'running')
+            return
+        reason = self.update(trainer.epoch + 1, float(value))
+        if reason and trainer.epoch + 1 < trainer.epochs:
+            self.stop_reason = reason
+            self.stopped_epoch = trainer.epoch + 1
+            trainer.stop = True
+            print(f"\n⏹  收敛提前停止 (第 {self.stopped_epoch}/{trainer.epochs} 轮): {reason}")
+        self._write_state(trainer, 'running')
+
+    def on_train_end(self, trainer):
+        self._write_state(trainer, 'early_stopped' if self.stop_reason else 'finished')
+
+    # ---------------- 汇总 ----------------
+
+    def summary(self):
+        """写入 experiment_info 的摘要"""
+        return {
+            'metric': self.metric,
+            'rules': {'window': self.window, 'min_std': self.min_std, 'patience': self.patience,
+                      'min_delta': self.min_delta, 'min_epochs': self.min_epochs, 'enabled': self.enabled},
+            'epochs_trained': len(self.history),
+            'best': self.best,
+            'best_epoch': self.best_epoch,
+            'stopped_epoch': self.stopped_epoch,
+            'stop_reason': self.stop_reason,
+            'resumed_from': self.resumed_from,
+        }
+
+
+def train_with_resume(model, project, name, trainer=None, auto_resume=True, **train_kwargs):
+    """
+    训练; project/name (或其自动编号的目录) 中有被中断的运行时从 last.pt 继续
+
+    续训使用检查点中保存的超参数; train_kwargs 中只有 batch / workers / device 等
+    ultralytics 允许续训时修改的参数会生效, 其余参数会被忽略 (ultralytics 会给出警告)
+
+    Args:
+        model: ultralytics.YOLO
+        project / name: 结果目录
+        trainer: 自定义训练器 (续训时也需要传入同一个, 数据集类不保存在检查点中)
+        auto_resume: False 时总是开始新的运行
+        **train_kwargs: 传给 model.train 的其余参数
+    """
+    last = find_interrupted_run(project, name) if auto_resume else None
+    if last is not None:
+        print(f"🔁 发现被中断的运行: {last.parents[1]}")
+        resume_kwargs = {k: v for k, v in train_kwargs.items() if k not in ('exist_ok',)}
+        # 与 YOLO(last).train(resume=True) 相同, 但在原模型对象上加载, 已注册的回调和 model.trainer 保持可用;
+        # 较早的 ultralytics 中 model.load 不更新 ckpt_path, resume=True 会从原始权重 (而不是 last.pt) 续训,
+        # 这里显式指定检查点
+        model.load(last)
+        model.ckpt_path = str(last)
+        return model.train(trainer=trainer, resume=str(last), **resume_kwargs)
+    return model.train(trainer=trainer, project=project, name=name, **train_kwargs)
@@ -0,0 +1,427 @@
+"""
+多变体同步训练 (co-training)
+三个实验 (低光照 / 传统增强 / EnlightenGAN) 读取的是同一批原始图像, 分开训练时每张图像要被解码、
+变暗、增强 (mosaic / 仿射 / HSV ...) 三次. 同步训练只用一个 dataloader:
+
+1. 各实验变换链的公共前缀 (如 random_gamma 变暗) 在 dataloader worker 中照常执行一次,
+   随后 ultralytics 的数据增强也只执行一次
+2. 同一个 worker 在增强后的 batch 上应用各实验剩余的变换 (如 CLAHE + gamma, EnlightenGAN),
+   得到每个实验的输入; 几何变换、标签和增强随机数因此完全相同
+3. 第一个实验 (leader) 由 ultralytics 正常训练, 其余实验 (follower) 各自持有完整的
+   DetectionTrainer (模型、优化器、EMA、学习率调度、验证器), 在 leader 的每个 batch 之后
+   用对应的输入前向/反向一次, 每轮结束时各自验证并保存 results.csv / best.pt
+
+注意: 剩余变换应用在增强之后的图像上 (包括 letterbox 填充和 HSV 抖动之后), 而不是像单独训练那样
+应用在原图上. 增强算子都是逐像素或局部的, 影响很小; 但同步训练的结果应当彼此比较,
+而不是与单独训练的结果逐位比较. 验证集不共享, 每个实验按自己的完整变换链验证, 与单独训练一致.
+
+每个实验的运行目录与单独训练相同 (project/<实验名>/results.csv, weights/best.pt),
+可直接用于 evaluate_model.py / warm_start.compare_runs / 实验调度汇总.
+
+用法:
+    from src.training.cotrain import CoTrainer
+
+    cotrainer = CoTrainer({
+        'baseline': 'configs/exp1_baseline_virtual.yaml',
+        'traditional': 'configs/exp2_traditional_virtual.yaml',
+        'enlightengan': 'configs/exp3_enlightengan_virtual.yaml',
+    }, model='yolov8n.pt', project='experiments/cotrain')
+    summary = cotrainer.train(epochs=20, batch=16, device='cpu', workers=4)
+"""
+
+import json
+import os
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from src.data.virtual_dataset import TransformChain, VirtualDataset, load_virtual_config
+
+
+SUMMARY_NAME = 'cotrain_summary.json'
+
+
+def split_chains(chains):
+    """
+    拆分各实验变换链的公共前缀
+
+    Args:
+        chains: {实验名: TransformChain}
+
+    Returns:
+        (prefix, suffixes): 公共前缀 TransformChain 和 {实验名: 剩余部分 TransformChain}
+    """
+    steps = [chain.steps for chain in chains.values()]
+    n = 0
+    while all(len(s) > n for s in steps) and all(s[n] == steps[0][n] for s in steps):
+        n += 1
+    prefix = TransformChain(steps[0][:n])
+    return prefix, {name: TransformChain(chain.steps[n:]) for name, chain in chains.items()}
+
+
+class CoTrainDataset(VirtualDataset):
+    """
+    只读取、增强一次, 同时输出多个变体的训练集
+    label['img'] 为公共前缀的结果; 训练模式下 label['img_variants'] 为 (V, 3, H, W) 张量,
+    依次是 variants 中各变体 (剩余变换为空的变体不在其中, 直接使用 img)
+    """
+
+    def __init__(self, *args, variants=None, **kwargs):
+        """
+        Args:
+            variants: {实验名: 剩余变换链}, 在增强后的图像上应用
+        """
+        self.variants = {name: chain if isinstance(chain, TransformChain) else TransformChain(chain)
+                         for name, chain in (variants or {}).items()}
+        self.variants = {name: chain for name, chain in self.variants.items() if len(chain)}
+        super().__init__(*args, **kwargs)
+
+    def __getitem__(self, index):
+        label = super().__getitem__(index)
+        if self.augment and self.variants:
+            import torch
+
+            # Format 输出 RGB CHW, 变换链按 BGR HWC 编写
+            image = np.ascontiguousarray(label['img'].numpy()[::-1].transpose(1, 2, 0))
+            key = Path(label['im_file']).name
+            label['img_variants'] = torch.stack([
+                torch.from_numpy(np.ascontiguousarray(chain(image.copy(), key).transpose(2, 0, 1)[::-1]))
+                for chain in self.variants.values()
+            ])
+        return label
+
+
+def build_cotrain_trainer(prefix, variants, leader_chain, **dataset_kwargs):
+    """
+    生成 leader 的训练器: 训练集为 CoTrainDataset (输出所有变体), 验证集为 leader 自己的完整变换链
+
+    Args:
+        prefix: 公共前缀变换链
+        variants: {实验名: 剩余变换链}
+        leader_chain: leader 的完整变换链
+        **dataset_kwargs: 缓存参数 (ram_cache_mb / disk_cache_mb / cache_dir)
+    """
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils.torch_utils import unwrap_model
+
+    from src.data.yolo_adapter import build_adapter_dataset
+
+    class CoTrainTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode='train', batch=None):
+            gs = max(int(unwrap_model(self.model).stride.max() if self.model else 0), 32)
+            if mode == 'train':
+                return build_adapter_dataset(CoTrainDataset, self.args, img_path, batch, self.data, mode=mode,
+                                             stride=gs, transforms=prefix, variants=variants, **dataset_kwargs)
+            return build_adapter_dataset(VirtualDataset, self.args, img_path, batch, self.data, mode=mode,
+                                         rect=True, stride=gs, transforms=leader_chain, **dataset_kwargs)
+
+    return CoTrainTrainer
+
+
+def _follower_trainer(trainer_cls):
+    """follower 的训练集不会被迭代, 用 0 个 worker 建立, 避免启动多余的进程"""
+
+    class FollowerTrainer(trainer_cls):
+        def get_dataloader(self, dataset_path, batch_size=16, rank=0, mode='train'):
+            if mode != 'train':
+                return super().get_dataloader(dataset_path, batch_size, rank, mode)
+            workers, self.args.workers = self.args.workers, 0
+            try:
+                return super().get_dataloader(dataset_path, batch_size, rank, mode)
+            finally:
+                self.args.workers = workers
+
+    FollowerTrainer.__name__ = trainer_cls.__name__
+    return FollowerTrainer
+
+
+class _Follower:
+    """
+    跟随 leader 训练的实验
+    逐段复现 BaseTrainer._do_train 中每个 batch / 每轮的步骤, 但 batch 来自 leader 的 dataloader
+    """
+
+    def __init__(self, name, trainer):
+        self.name = name
+        self.trainer = trainer
+        self.step_seconds = 0.0
+        self._last_opt_step = -1
+
+    def setup(self):
+        t = self.trainer
+        t._setup_train()
+        t.train_time_start = t.epoch_time_start = time.time()
+        t.optimizer.zero_grad()
+
+    def start_epoch(self, epoch):
+        t = self.trainer
+        t.epoch = epoch
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            t.scheduler.step()
+        if hasattr(t, '_model_train'):
+            t._model_train()
+        else:
+            t.model.train()
+        t.tloss = None
+
+    @staticmethod
+    def _warmup_iterations(t, nb):
+        """warmup 的迭代数 (较早的 ultralytics 在 _do_train 中直接计算, 没有 _get_warmup_iterations)"""
+        if hasattr(t, '_get_warmup_iterations'):
+            return t._get_warmup_iterations(nb)
+        return max(round(t.args.warmup_epochs * nb), 100) if t.args.warmup_epochs > 0 else -1
+
+    @staticmethod
+    def _is_bias_group(j, group):
+        """
+        参数组是否为偏置组
+        较新的 ultralytics 用 param_group 标记; 较早的版本没有标记, 构建优化器时偏置组 (g[2]) 作为第 0 组传入
+        """
+        if 'param_group' in group:
+            return group['param_group'] == 'bias'
+        return j == 0
+
+    def step(self, batch, i, nb):
+        """用本实验的输入训练一个 batch (与 _do_train 的 warmup / 累积梯度规则相同)"""
+        from ultralytics.utils.torch_utils import autocast
+
+        t = self.trainer
+        start = time.perf_counter()
+        ni = i + nb * t.epoch
+        nw = self._warmup_iterations(t, nb)
+        if ni < nw:
+            xi = [0, nw]
+            t.accumulate = max(1, int(np.interp(ni, xi, [1, t.args.nbs / t.batch_size]).round()))
+            for j, x in enumerate(t.optimizer.param_groups):
+                x['lr'] = float(np.interp(ni, xi, [t.args.warmup_bias_lr if self._is_bias_group(j, x) else 0.0,
+                                                   x['initial_lr'] * t.lf(t.epoch)]))
+                if 'momentum' in x:
+                    x['momentum'] = float(np.interp(ni, xi, [t.args.warmup_momentum, t.args.momentum]))
+
+        with autocast(t.amp, device=t.device.type):
+            batch = t.preprocess_batch(batch)
+            loss, t.loss_items = t.model(batch)
+            t.loss = loss.sum()
+            if isinstance(t.loss_items, dict):
+                # 较新的 ultralytics: 损失函数返回 dict, 第一个 batch 时据此确定 loss_names
+                if not t.loss_names:
+                    t.loss_names = tuple(t.loss_items)
+                    t.metrics.update(dict.fromkeys(t.label_loss_items(prefix='val'), 0.0))
+                t.tloss = (t.loss_items if t.tloss is None
+                           else {k: (t.tloss[k] * i + v) / (i + 1) for k, v in t.loss_items.items()})
+            else:
+                # 较早的版本: loss_items 为张量, loss_names 由训练器预先设定
+                t.tloss = t.loss_items if t.tloss is None else (t.tloss * i + t.loss_items) / (i + 1)
+        t.scaler.scale(t.loss).backward()
+
+        if ni - self._last_opt_step >= t.accumulate:
+            t.optimizer_step()
+            self._last_opt_step = ni
+        self.step_seconds += time.perf_counter() - start
+
+    def end_epoch(self):
+        """验证、写 results.csv、保存 last.pt / best.pt"""
+        from ultralytics.utils.torch_utils import unwrap_model
+
+        t = self.trainer
+        if hasattr(unwrap_model(t.model).criterion, 'update'):
+            unwrap_model(t.model).criterion.update()
+        t.lr = {f'lr/pg{ir}': x['lr'] for ir, x in enumerate(t.optimizer.param_groups)}
+        t.ema.update_attr(t.model, include=['yaml', 'nc', 'args', 'names', 'stride', 'class_weights'])
+        t.metrics, t.fitness = t.validate()
+        t.save_metrics(metrics={**t.label_loss_items(t.tloss), **t.metrics, **t.lr})
+        t.stopper(t.epoch + 1, t.fitness)  # 只记录最佳轮次, 停止与否由 leader 决定
+        t.save_model()
+        now = time.time()
+        t.epoch_time, t.epoch_time_start = now - t.epoch_time_start, now
+
+    def finish(self):
+        t = self.trainer
+        t.final_eval()
+        if t.args.plots:
+            t.plot_metrics()
+        for loader in (t.train_loader, t.test_loader):
+            if hasattr(loader, 'close'):
+                loader.close()
+
+
+class CoTrainer:
+    """
+    多变体同步训练
+
+    Args:
+        configs: {实验名: 声明了 transforms 的数据集配置}; 第一个为 leader.
+            所有配置必须指向同一个原始数据集 (path / train 相同)
+        model: 初始权重, 每个实验各加载一份
+        project: 结果目录, 每个实验的运行目录为 project/<实验名>
+    """
+
+    def __init__(self, configs, model='yolov8n.pt', project='experiments/cotrain'):
+        if len(configs) < 2:
+            raise ValueError("同步训练至少需要两个实验")
+        self.names = list(configs)
+        self.configs = {name: Path(path) for name, path in configs.items()}
+        self.model = str(model)
+        self.project = Path(project)
+
+        sources = set()
+        for name, path in self.configs.items():
+            with open(path, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+            if 'transforms' not in config:
+                raise ValueError(f"{path} 没有声明 transforms, 无法在内存中派生 ({name})")
+            sources.add((config.get('path'), config.get('train')))
+        if len(sources) > 1:
+            raise ValueError(f"各实验的原始数据集不同, 无法共享 dataloader: {sorted(sources, key=str)}")
+
+        self.followers = []
+        self.summary = None
+        self._variant_names = []
+        self._batch = None
+        self._variants = {}
+        self._index = 0
+
+    # ---------------- leader 回调 ----------------
+
+    def _wrap_preprocess(self, trainer):
+        preprocess = trainer.preprocess_batch
+        leader, order = self.names[0], list(self._variant_names)
+
+        def shared_preprocess(batch):
+            # 保留未移动到设备的原始 batch, 供 follower 使用
+            self._batch = batch
+            variants = batch.pop('img_variants', None)
+            self._variants = dict(zip(order, _stack(variants))) if variants is not None else {}
+            own = dict(batch)
+            if leader in self._variants:
+                own['img'] = self._variants[leader]
+            return preprocess(own)
+
+        # 实例属性覆盖方法, _do_train 中的 self.preprocess_batch() 会调用这里
+        trainer.preprocess_batch = shared_preprocess
+
+    def on_train_start(self, trainer):
+        self._wrap_preprocess(trainer)
+
+    def on_train_epoch_start(self, trainer):
+        self._index = 0
+        for follower in self.followers:
+            follower.start_epoch(trainer.epoch)
+
+    def on_train_batch_end(self, trainer):
+        nb = len(trainer.train_loader)
+        for follower in self.followers:
+            batch = dict(self._batch)
+            if follower.name in self._variants:
+                batch['img'] = self._variants[follower.name]
+            follower.step(batch, self._index, nb)
+        self._index += 1
+
+    def on_train_epoch_end(self, trainer):
+        for follower in self.followers:
+            follower.end_epoch()
+
+    def on_train_end(self, trainer):
+        for follower in self.followers:
+            follower.finish()
+
+    # ---------------- 训练 ----------------
+
+    def train(self, epochs=20, imgsz=640, batch=16, device='cpu', workers=4, exist_ok=False, **train_kwargs):
+        """
+        同步训练所有实验
+
+        Args:
+            epochs / imgsz / batch / device / workers: 与 model.train 相同, 所有实验共用
+            exist_ok: 覆盖同名运行目录
+            **train_kwargs: 其余传给 model.train 的超参数 (所有实验相同)
+
+        Returns:
+            汇总 dict (同时写入 project/cotrain_summary.json)
+        """
+        from ultralytics import YOLO
+
+        from src.data.yolo_adapter import build_trainer
+        from src.training.autotune import keep_workers
+
+        loaded = {name: load_virtual_config(path) for name, path in self.configs.items()}
+        prefix, suffixes = split_chains({name: kwargs['transforms'] for name, (_, kwargs) in loaded.items()})
+        self._variant_names = [name for name, chain in suffixes.items() if len(chain)]
+        leader = self.names[0]
+        leader_data, leader_kwargs = loaded[leader]
+        cache_kwargs = {k: v for k, v in leader_kwargs.items() if k != 'transforms'}
+
+        print(f"公共变换: {prefix}")
+        for name in self.names:
+            print(f"  {name:<14} + {suffixes[name]}")
+
+        common = dict(epochs=epochs, imgsz=imgsz, batch=batch, device=device, workers=workers,
+                      project=str(self.project), exist_ok=exist_ok, amp=False, **train_kwargs)
+
+        # follower 在 leader 之前建立, leader 初始化时重新设置随机种子, 增强随机数与单独训练一致
+        self.followers = []
+        for name in self.names[1:]:
+            data_path, dataset_kwargs = loaded[name]
+            trainer_cls = _follower_trainer(keep_workers(build_trainer(VirtualDataset, **dataset_kwargs)))
+            trainer = trainer_cls(overrides={'model': self.model, 'data': data_path, 'name': name, **common})
+            follower = _Follower(name, trainer)
+            follower.setup()
+            self.followers.append(follower)
+            print(f"✅ {name}: {trainer.save_dir}")
+
+        model = YOLO(self.model)
+        for event in ('on_train_start', 'on_train_epoch_start', 'on_train_batch_end',
+                      'on_train_epoch_end', 'on_train_end'):
+            model.add_callback(event, getattr(self, event))
+
+        leader_cls = keep_workers(build_cotrain_trainer(prefix, suffixes, leader_kwargs['transforms'],
+                                                        **cache_kwargs))
+        start = time.time()
+        model.train(trainer=leader_cls, data=leader_data, name=leader, **common)
+        wall = time.time() - start
+
+        return self._write_summary(model.trainer, wall)
+
+    def _write_summary(self, leader_trainer, wall):
+        from src.training.warm_start import run_summary
+
+        runs = {self.names[0]: Path(leader_trainer.save_dir)}
+        runs.update({f.name: Path(f.trainer.save_dir) for f in self.followers})
+        self.summary = {
+            'configs': {name: str(path) for name, path in self.configs.items()},
+            'leader': self.names[0],
+            'wall_s': round(wall, 1),
+            'follower_step_s': {f.name: round(f.step_seconds, 1) for f in self.followers},
+            'runs': {name: {'save_dir': str(save_dir), **(run_summary(save_dir) or {})}
+                     for name, save_dir in runs.items()},
+        }
+        path = self.project / SUMMARY_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.summary, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return self.summary
+
+
+def _stack(variants):
+    """collate_fn 把 img_variants 保留为列表 [(V, 3, H, W)] * B, 转为按变体排列的 [(B, 3, H, W)] * V"""
+    import torch
+
+    return torch.stack(list(variants)).unbind(1)
+
+
+def format_summary(summary):
+    """把 CoTrainer 的汇总格式化为几行文本"""
+    lines = [f"  {'实验':<14} {'轮数':>6} {'mAP50':>8} {'mAP50-95':>10} {'附加计算':>10}"]
+    for name, run in summary['runs'].items():
+        extra = summary['follower_step_s'].get(name)
+        extra = f"{extra / 60:.1f}分" if extra is not None else 'leader'
+        lines.append(f"  {name:<14} {run.get('epochs', 0):>6} {run.get('mAP50', 0):>8.4f} "
+                     f"{run.get('mAP50-95', 0):>10.4f} {extra:>10}")
+    lines.append(f"  总耗时 {summary['wall_s'] / 60:.1f} 分钟 (一次解码和数据增强, {len(summary['runs'])} 个模型)")
+    return '\n'.join(lines)
@@ -0,0 +1,357 @@
+"""
+CPU 性能配置 (训练和推理)
+train_yolov8 固定 amp=False, 也没有设置线程数和内存布局; 在只有 CPU 的机器上 PyTorch 的默认值
+浪费了不少算力. CPUProfile 统一设置:
+
+- 线程: intra-op 线程数 = 可用物理核数 - dataloader worker 数 (超线程的兄弟核对卷积没有帮助),
+  inter-op 线程数较小; OMP_PROC_BIND / OMP_PLACES 把 OpenMP 线程绑定到核上
+  (环境变量需要在导入 torch 之前设置, 见 apply_env)
+- bf16 autocast: 仅在 CPU 原生支持 bf16 (avx512_bf16 / amx_bf16) 时默认开启.
+  ultralytics 的 amp='bf16' 只支持 CUDA, 这里保持 amp=False (不创建 GradScaler, bf16 也不需要),
+  在 on_train_start 把 trainer.amp 改为 True, 训练循环的 autocast 在 CPU 上即为 bf16;
+  EMA 与验证仍为 fp32
+- channels_last: 训练时模型和输入都转为 NHWC (ultralytics 只在 CUDA 上这样做), 推理时由 inference 上下文
+  转换网络和输入 (不依赖 ultralytics 的 channels_last 参数, 较早的版本没有该参数)
+- torch.compile: 可选, 通过 ultralytics 的 compile 参数 (需要 C++ 编译器, 否则自动退回)
+
+是否值得开启各项由 benchmark_steps (合成数据上的训练 / 推理单步耗时) 和
+parity_check (fp32 与该配置的 mAP 差异) 决定, 见 scripts/benchmarks/benchmark_cpu_profile.py.
+
+用法:
+    from src.training.cpu_profile import CPUProfile
+
+    profile = CPUProfile.detect(workers=2)
+    profile.apply_env()          # 在导入 torch 之前
+    profile.attach(model)
+    model.train(data=..., device='cpu', amp=False, **profile.train_args())
+    with profile.inference(model):
+        results = model.predict(image, device='cpu', **profile.predict_args())
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+
+# 原生支持 bf16 的 CPU 指令集 (/proc/cpuinfo flags)
+BF16_FLAGS = ('amx_bf16', 'avx512_bf16')
+
+# 精度一致性检查允许的 mAP50-95 下降
+PARITY_TOLERANCE = 0.005
+
+# 线程相关环境变量
+OMP_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def cpu_flags():
+    """CPU 指令集标志 (Linux); 读取失败时返回空集合"""
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def bf16_supported():
+    """CPU 是否原生支持 bf16 计算 (只有 avx512bw 时 oneDNN 用模拟实现, 通常比 fp32 更慢)"""
+    return any(flag in cpu_flags() for flag in BF16_FLAGS)
+
+
+def physical_cores(cores=None):
+    """
+    可用 CPU 核中的物理核数 (超线程的兄弟核只算一个)
+
+    Args:
+        cores: 逻辑核编号列表, 默认当前进程的亲和性
+    """
+    from src.training.scheduler import available_cores
+
+    cores = available_cores() if cores is None else cores
+    seen = set()
+    for cpu in cores:
+        try:
+            with open(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list', 'r') as f:
+                seen.add(f.read().strip())
+        except OSError:
+            seen.add(str(cpu))
+    return max(1, len(seen))
+
+
+class CPUProfile:
+    """
+    CPU 训练 / 推理配置
+
+    Args:
+        threads: intra-op 线程数
+        interop_threads: inter-op 线程数
+        bf16: 是否使用 bf16 autocast
+        channels_last: 是否使用 NHWC 内存布局
+        compile: torch.compile 模式 (False / True / 'default' / 'max-autotune-no-cudagraphs' ...)
+    """
+
+    def __init__(self, threads, interop_threads=1, bf16=False, channels_last=True, compile=False):
+        self.threads = max(1, int(threads))
+        self.interop_threads = max(1, int(interop_threads))
+        self.bf16 = bool(bf16)
+        self.channels_last = bool(channels_last)
+        self.compile = compile
+        self._preprocess = None
+
+    @classmethod
+    def detect(cls, workers=0, bf16=None, channels_last=True, compile=False):
+        """
+        按本机 CPU 生成配置
+
+        Args:
+            workers: dataloader worker 数 (每个 worker 占一个核)
+            bf16: None 表示 CPU 原生支持 bf16 时开启
+        """
+        cores = physical_cores()
+        return cls(
+            threads=max(1, cores - workers),
+            interop_threads=min(2, cores),
+            bf16=bf16_supported() if bf16 is None else bf16,
+            channels_last=channels_last,
+            compile=compile,
+        )
+
+    def as_dict(self):
+        return {'threads': self.threads, 'interop_threads': self.interop_threads, 'bf16': self.bf16,
+                'channels_last': self.channels_last, 'compile': self.compile}
+
+    def __repr__(self):
+        return ', '.join(f'{k}={v}' for k, v in self.as_dict().items())
+
+    # ---------------- 线程 ----------------
+
+    def apply_env(self):
+        """设置 OpenMP 线程数和绑定方式; 需要在导入 torch 之前调用, 已设置的变量保持不变"""
+        for var in OMP_ENV_VARS:
+            os.environ.setdefault(var, str(self.threads))
+        os.environ.setdefault('OMP_PROC_BIND', 'close')
+        os.environ.setdefault('OMP_PLACES', 'cores')
+
+    def apply_threads(self):
+        """设置 torch 线程数; inter-op 线程池启动后无法再修改, 此时保持原值"""
+        import torch
+
+        torch.set_num_threads(self.threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError:
+            pass
+
+    # ---------------- 训练 ----------------
+
+    def train_args(self):
+        """model.train 的额外参数 (compile 交给 ultralytics); amp 必须保持 False, bf16 由回调开启"""
+        return {'compile': self.compile} if self.compile else {}
+
+    def attach(self, model):
+        """在 YOLO 模型上注册回调"""
+        model.add_callback('on_train_start', self.on_train_start)
+        model.add_callback('on_train_end', self.on_train_end)
+        return self
+
+    def detach(self, model):
+        """从 YOLO 模型上移除回调"""
+        for event, callbacks in model.callbacks.items():
+            model.callbacks[event] = [c for c in callbacks if getattr(c, '__self__', None) is not self]
+
+    def on_train_start(self, trainer):
+        import torch
+
+        if trainer.device.type != 'cpu':
+            return
+        self.apply_threads()
+        if self.bf16:
+            trainer.amp = True  # 训练循环的 autocast(trainer.amp, device='cpu') 即为 bf16
+        if self.channels_last:
+            trainer.model.to(memory_format=torch.channels_last)  # 就地转换, 优化器持有的参数不变
+            self._preprocess = trainer.preprocess_batch
+
+            def preprocess_batch(batch):
+                batch = self._preprocess(batch)
+                batch['img'] = batch['img'].contiguous(memory_format=torch.channels_last)
+                return batch
+
+            trainer.preprocess_batch = preprocess_batch
+
+    def on_train_end(self, trainer):
+        if self._preprocess is not None:
+            trainer.preprocess_batch = self._preprocess
+            self._preprocess = None
+
+    # ---------------- 推理 ----------------
+
+    def predict_args(self):
+        """model.predict / model.val 参数 (channels_last 由 inference 上下文处理)"""
+        args = {'half': False}
+        if self.compile:
+            args['compile'] = self.compile
+        return args
+
+    @contextmanager
+    def inference(self, model):
+        """
+        推理上下文: 设置线程数; channels_last 时网络和输入在前向时转为 NHWC
+        (推理器融合 Conv+BN 生成的新权重是默认布局, 所以在前向时而不是进入上下文时转换);
+        bf16 时网络前向在 autocast 中运行, 输出转回 fp32 再做 NMS 等后处理
+
+        Args:
+            model: YOLO 对象
+        """
+        import torch
+
+        self.apply_threads()
+        net = model.model
+        if not (self.bf16 or self.channels_last) or not isinstance(net, torch.nn.Module):
+            yield model
+            return
+
+        forward = net.forward
+
+        def profiled_forward(x, *args, **kwargs):
+            if self.channels_last and isinstance(x, torch.Tensor) and x.dim() == 4:
+                net.to(memory_format=torch.channels_last)
+                x = x.contiguous(memory_format=torch.channels_last)
+            if not self.bf16:
+                return forward(x, *args, **kwargs)
+            with torch.autocast('cpu', dtype=torch.bfloat16):
+                return _to_float(forward(x, *args, **kwargs))
+
+        net.forward = profiled_forward
+        try:
+            yield model
+        finally:
+            del net.forward  # 恢复类上的 forward
+
+
+def _to_float(value):
+    """把输出中的 bf16 张量转回 fp32"""
+    import torch
+
+    if isinstance(value, torch.Tensor):
+        return value.float() if value.dtype == torch.bfloat16 else value
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_float(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _to_float(v) for k, v in value.items()}
+    return value
+
+
+# ---------------- 基准测试与精度检查 ----------------
+
+def _synthetic_batch(batch, imgsz, nc, seed=0):
+    """合成训练批次: 每张图像一个随机框"""
+    import torch
+
+    g = torch.Generator().manual_seed(seed)
+    xy = torch.rand(batch, 2, generator=g) * 0.6 + 0.2
+    wh = torch.rand(batch, 2, generator=g) * 0.2 + 0.1
+    return {
+        'img': torch.rand(batch, 3, imgsz, imgsz, generator=g),
+        'batch_idx': torch.arange(batch, dtype=torch.float32),
+        'cls': torch.randint(0, nc, (batch, 1), generator=g).float(),
+        'bboxes': torch.cat([xy, wh], dim=1),
+    }
+
+
+def benchmark_steps(weights, profiles, imgsz=640, batch=16, steps=10, warmup=3):
+    """
+    在合成数据上比较各配置的训练单步 (前向 + 反向 + 优化器) 和推理 (batch=1) 耗时
+
+    Args:
+        weights: 模型权重 (如 yolov8n.pt)
+        profiles: {名称: CPUProfile}; 第一个作为基准
+        steps / warmup: 计时步数 / 预热步数 (torch.compile 的编译耗时计入预热)
+
+    Returns:
+        每个配置一行 {'name', **配置, 'train_step_ms', 'infer_ms', 'train_speedup', 'infer_speedup'}
+    """
+    import torch
+    from ultralytics.nn.tasks import load_checkpoint
+    from ultralytics.utils import DEFAULT_CFG
+
+    rows = []
+    for name, profile in profiles.items():
+        profile.apply_threads()
+        model = load_checkpoint(weights)[0].float()
+        model.args = DEFAULT_CFG  # 损失函数需要 box / cls / dfl 增益
+        for p in model.parameters():
+            p.requires_grad = True
+        memory_format = torch.channels_last if profile.channels_last else torch.contiguous_format
+        model = model.to(memory_format=memory_format).train()
+        optimizer = torch.optim.SGD(model.parameters(), lr=1e-4, momentum=0.9)
+        data = _synthetic_batch(batch, imgsz, model.model[-1].nc)
+        data['img'] = data['img'].contiguous(memory_format=memory_format)
+        forward = torch.compile(model) if profile.compile else model
+
+        times = []
+        for i in range(warmup + steps):
+            start = time.perf_counter()
+            with torch.autocast('cpu', dtype=torch.bfloat16, enabled=profile.bf16):
+                loss, _ = model.loss(data, forward(data['img']))
+            loss.sum().backward()
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+            if i >= warmup:
+                times.append(time.perf_counter() - start)
+        train_ms = sorted(times)[len(times) // 2] * 1000
+
+        model.eval()
+        image = data['img'][:1]
+        times = []
+        with torch.inference_mode():
+            for i in range(warmup + steps):
+                start = time.perf_counter()
+                with torch.autocast('cpu', dtype=torch.bfloat16, enabled=profile.bf16):
+                    forward(image)
+                if i >= warmup:
+                    times.append(time.perf_counter() - start)
+        infer_ms = sorted(times)[len(times) // 2] * 1000
+        rows.append({'name': name, **profile.as_dict(), 'train_step_ms': round(train_ms, 1),
+                     'infer_ms': round(infer_ms, 2)})
+
+    for row in rows:
+        row['train_speedup'] = round(rows[0]['train_step_ms'] / row['train_step_ms'], 2)
+        row['infer_speedup'] = round(rows[0]['infer_ms'] / row['infer_ms'], 2)
+    return rows
+
+
+def parity_check(weights, data, profile, imgsz=640, split='val', validator=None, tolerance=PARITY_TOLERANCE):
+    """
+    比较 fp32 与该配置在同一划分上的 mAP
+
+    Returns:
+        {'fp32': {'mAP50', 'mAP50-95'}, 'profile': {...}, 'delta_mAP50-95', 'passed'}
+    """
+    from ultralytics import YOLO
+
+    extra = {'validator': validator} if validator is not None else {}
+
+    def _val(model, **kwargs):
+        metrics = model.val(data=data, split=split, imgsz=imgsz, device='cpu', plots=False, verbose=False,
+                            **extra, **kwargs)
+        return {'mAP50': round(float(metrics.box.map50), 4), 'mAP50-95': round(float(metrics.box.map), 4)}
+
+    fp32 = _val(YOLO(weights))
+    model = YOLO(weights)
+    with profile.inference(model):
+        tuned = _val(model, **profile.predict_args())
+    delta = round(tuned['mAP50-95'] - fp32['mAP50-95'], 4)
+    return {'fp32': fp32, 'profile': tuned, 'delta_mAP50-95': delta, 'passed': delta >= -tolerance}
+
+
+def format_benchmark(rows):
+    """把 benchmark_steps 的结果格式化为表格"""
+    lines = [f"  {'配置':<16} {'线程':>4} {'bf16':>5} {'NHWC':>5} {'compile':>8} "
+             f"{'训练步(ms)':>11} {'加速':>6} {'推理(ms)':>9} {'加速':>6}"]
+    for row in rows:
+        lines.append(f"  {row['name']:<16} {row['threads']:>4} {str(row['bf16']):>5} {str(row['channels_last']):>5} "
+                     f"{str(row['compile']):>8} {row['train_step_ms']:>11.1f} {row['train_speedup']:>5.2f}x "
+                     f"{row['infer_ms']:>9.2f} {row['infer_speedup']:>5.2f}x")
+    return '\n'.join(lines)
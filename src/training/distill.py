@@ -0,0 +1,316 @@
+"""
+知识蒸馏: 用在低光照数据上训练好的 yolov8s/m (教师) 监督 yolov8n (学生)
+CPU 部署只能用 nano 模型, 蒸馏让它在保持 nano 推理延迟的同时接近 small 的精度.
+
+- 特征蒸馏: ultralytics 自带的 distill_model / dis 参数 (把学生的检测头输入特征投影到教师的通道数,
+  按教师前景分数加权的 L2); 教师随训练器构建, 检查点只保存学生和投影层, 断点续训由训练器处理
+- 输出 (logit) 蒸馏: LogitDistiller 在 on_train_start (EMA 已创建之后) 把学生的损失函数换成
+  LogitDistillLoss, 在原检测损失之外加上
+    kd_cls: 每个 anchor 每个类别的 sigmoid 分数, 以教师的 (温度软化的) 分数为软标签的 KL
+    kd_box: DFL 边框分布 (每条边 reg_max 个 bin) 的 KL, 按教师的最大类别分数加权, 只关注前景
+  教师的检测头输出直接取自特征蒸馏的前向 hook, 不需要再跑一次教师
+
+教师与学生必须类别数相同、步长相同 (同一 YOLOv8 系列), 输出的 anchor 一一对应.
+
+训练后用 compare_models 比较教师 / 蒸馏学生 / 未蒸馏的 nano 的推理延迟和 mAP.
+
+用法:
+    from src.training.distill import LogitDistiller, distill_train_args, compare_models, format_comparison
+
+    distiller = LogitDistiller().attach(model)
+    model.train(data=..., **distill_train_args('experiments/teacher_s/run/weights/best.pt'))
+    rows = compare_models({'teacher': 'teacher.pt', 'student': 'best.pt'}, data=..., images=val_images)
+    print(format_comparison(rows))
+"""
+
+import time
+
+import numpy as np
+
+
+# 特征蒸馏损失权重 (ultralytics 的 dis 参数, 默认 6.0)
+DEFAULT_FEATURE_WEIGHT = 6.0
+
+# 输出蒸馏的损失权重和温度
+DEFAULT_CLS_WEIGHT = 1.0
+DEFAULT_BOX_WEIGHT = 0.5
+DEFAULT_TEMPERATURE = 2.0
+
+# distill_model / dis 参数、DistillationModel 和训练器的教师特征 hook 所需的最低 ultralytics 版本
+MIN_ULTRALYTICS_VERSION = (8, 4, 175)
+
+
+def check_ultralytics_version():
+    """
+    检查已安装的 ultralytics 是否支持蒸馏
+
+    Raises:
+        RuntimeError: 版本过低 (get_cfg 不认识 distill_model / dis, 训练器没有教师特征)
+    """
+    import ultralytics
+
+    version = tuple(int(x) for x in ultralytics.__version__.split('.')[:3] if x.isdigit())
+    if version < MIN_ULTRALYTICS_VERSION:
+        required = '.'.join(map(str, MIN_ULTRALYTICS_VERSION))
+        raise RuntimeError(f"知识蒸馏需要 ultralytics>={required}, 当前为 {ultralytics.__version__} "
+                           f"(pip install -U 'ultralytics>={required}')")
+
+
+def distill_train_args(teacher, feature_weight=DEFAULT_FEATURE_WEIGHT):
+    """特征蒸馏的 model.train 参数"""
+    check_ultralytics_version()
+    return {'distill_model': str(teacher), 'dis': feature_weight}
+
+
+def check_teacher(teacher, student_nc=None):
+    """
+    检查教师权重能否用于输出蒸馏
+
+    Returns:
+        {'weights', 'nc', 'stride', 'reg_max', 'params_M'}
+
+    Raises:
+        ValueError: 类别数与学生不同
+    """
+    from ultralytics.nn.tasks import load_checkpoint
+
+    model = load_checkpoint(teacher)[0]
+    head = model.model[-1]
+    if student_nc is not None and head.nc != student_nc:
+        raise ValueError(f"教师类别数 {head.nc} 与数据集 {student_nc} 不同: {teacher}")
+    return {
+        'weights': str(teacher),
+        'nc': int(head.nc),
+        'stride': [int(s) for s in head.stride.tolist()],
+        'reg_max': int(head.reg_max),
+        'params_M': round(sum(p.numel() for p in model.parameters()) / 1e6, 2),
+    }
+
+
+def _raw_head(preds):
+    """训练时检测头的原始输出 dict ('boxes' / 'scores' / 'feats'); 端到端检测头取 one2many 分支"""
+    if isinstance(preds, tuple):
+        preds = preds[1]
+    return preds.get('one2many', preds)
+
+
+class LogitDistillLoss:
+    """
+    在学生原检测损失后追加 kd_cls / kd_box 两项
+
+    Args:
+        base: 学生原来的损失函数 (init_criterion() 的结果)
+        distill_model: ultralytics 的 DistillationModel (读取其教师前向 hook 的检测头输出)
+        cls_weight / box_weight: 两项的权重
+        temperature: 软化温度
+    """
+
+    def __init__(self, base, distill_model, cls_weight=DEFAULT_CLS_WEIGHT, box_weight=DEFAULT_BOX_WEIGHT,
+                 temperature=DEFAULT_TEMPERATURE):
+        self.base = base
+        self.distill_model = distill_model
+        self.cls_weight = cls_weight
+        self.box_weight = box_weight
+        self.temperature = temperature
+
+    def update(self):
+        """端到端检测头的损失按轮更新权重, 转发给原损失函数"""
+        if hasattr(self.base, 'update'):
+            self.base.update()
+
+    def _teacher_head(self):
+        model = self.distill_model
+        head_level = len(model.feats_idx) - 1  # 最后一个 hook 挂在检测头上
+        return _raw_head(model.decouple_outputs(model._teacher_feats[head_level], branch='one2many'))
+
+    def __call__(self, preds, batch):
+        import torch
+        import torch.nn.functional as F
+
+        loss, loss_items = self.base(preds, batch)
+        student, teacher = _raw_head(preds), self._teacher_head()
+        s_scores, t_scores = student['scores'], teacher['scores'].detach()
+        if s_scores.shape != t_scores.shape:
+            raise ValueError(f"教师与学生的输出形状不同 {tuple(t_scores.shape)} vs {tuple(s_scores.shape)}, "
+                             "输出蒸馏要求类别数和步长相同")
+        T = self.temperature
+
+        # 类别: 逐元素的伯努利 KL = BCE(学生, 软标签) - 软标签的熵
+        t_logits = t_scores.float() / T
+        t_prob = t_logits.sigmoid()
+        kl_cls = (F.binary_cross_entropy_with_logits(s_scores.float() / T, t_prob, reduction='none')
+                  - F.binary_cross_entropy_with_logits(t_logits, t_prob, reduction='none'))
+
+        # 与检测损失相同, 用 (教师的) 前景分数之和归一化
+        weight = t_scores.float().sigmoid().amax(dim=1)  # (B, anchors)
+        norm = weight.sum().clamp(min=1.0)
+        kd_cls = kl_cls.sum() / norm * T * T
+
+        # 边框: 每条边 reg_max 个 bin 的分布
+        b, _, a = student['boxes'].shape
+        s_dist = (student['boxes'].float() / T).view(b, 4, -1, a).log_softmax(dim=2)
+        t_dist = (teacher['boxes'].detach().float() / T).view(b, 4, -1, a).log_softmax(dim=2)
+        kl_box = (t_dist.exp() * (t_dist - s_dist)).sum(dim=(1, 2))  # (B, anchors)
+        kd_box = (kl_box * weight).sum() / norm * T * T
+
+        kd = torch.stack([kd_cls * self.cls_weight, kd_box * self.box_weight])
+        loss_items = {**loss_items, 'kd_cls': kd[0].detach(), 'kd_box': kd[1].detach()}
+        return torch.cat([loss, kd * b]), loss_items
+
+
+class LogitDistiller:
+    """
+    输出蒸馏回调; 需要与特征蒸馏 (distill_train_args) 一起使用
+
+    Args:
+        cls_weight / box_weight / temperature: 见 LogitDistillLoss
+    """
+
+    def __init__(self, cls_weight=DEFAULT_CLS_WEIGHT, box_weight=DEFAULT_BOX_WEIGHT, temperature=DEFAULT_TEMPERATURE):
+        self.cls_weight = cls_weight
+        self.box_weight = box_weight
+        self.temperature = temperature
+        self.teacher = None
+        self._student = None
+
+    def attach(self, model):
+        """在 YOLO 模型上注册回调"""
+        check_ultralytics_version()
+        model.add_callback('on_train_start', self.on_train_start)
+        model.add_callback('on_train_end', self.on_train_end)
+        return self
+
+    def detach(self, model):
+        """从 YOLO 模型上移除回调"""
+        for event, callbacks in model.callbacks.items():
+            model.callbacks[event] = [c for c in callbacks if getattr(c, '__self__', None) is not self]
+
+    # ---------------- 回调 ----------------
+
+    def on_train_start(self, trainer):
+        from ultralytics.utils.torch_utils import unwrap_model
+
+        model = unwrap_model(trainer.model)
+        if not hasattr(model, 'student_model'):
+            raise ValueError("输出蒸馏需要同时开启特征蒸馏 (model.train(distill_model=教师权重))")
+        # EMA 在此之前已从模型复制, 验证仍使用原检测损失
+        self._student = model.student_model
+        self._student.criterion = LogitDistillLoss(self._student.init_criterion(), model, self.cls_weight,
+                                                   self.box_weight, self.temperature)
+        self.teacher = str(trainer.args.distill_model)
+
+    def on_train_end(self, trainer):
+        if self._student is not None:
+            self._student.criterion = None
+            self._student = None
+
+    def summary(self, feature_weight=DEFAULT_FEATURE_WEIGHT):
+        """写入 experiment_info 的摘要"""
+        return {
+            'teacher': self.teacher,
+            'feature_weight': feature_weight,
+            'cls_weight': self.cls_weight,
+            'box_weight': self.box_weight,
+            'temperature': self.temperature,
+        }
+
+
+# ---------------- 延迟与精度比较 ----------------
+
+def measure_latency(weights, images, imgsz=640, device='cpu', runs=50, warmup=5):
+    """
+    逐张推理的延迟 (batch=1, 与部署时相同), 循环使用给定图像
+
+    Args:
+        weights: 模型权重
+        images: 图像路径列表 (或 BGR 数组)
+        runs / warmup: 计时次数 / 预热次数
+
+    Returns:
+        {'inference_ms', 'inference_p95_ms', 'total_ms'}: 推理中位数 / P95 和含前后处理的中位数
+    """
+    from ultralytics import YOLO
+
+    if not len(images):
+        raise ValueError("测量延迟至少需要一张图像")
+    model = YOLO(weights)
+    inference, total = [], []
+    for i in range(warmup + runs):
+        start = time.perf_counter()
+        result = model.predict(images[i % len(images)], imgsz=imgsz, device=device, verbose=False)[0]
+        elapsed = (time.perf_counter() - start) * 1000
+        if i >= warmup:
+            inference.append(result.speed['inference'])
+            total.append(elapsed)
+    return {
+        'inference_ms': round(float(np.median(inference)), 2),
+        'inference_p95_ms': round(float(np.percentile(inference, 95)), 2),
+        'total_ms': round(float(np.median(total)), 2),
+    }
+
+
+def evaluate_map(weights, data, imgsz=640, device='cpu', split='val', validator=None, workers=2):
+    """在数据集划分上验证, 返回 (mAP50, mAP50-95)"""
+    from ultralytics import YOLO
+
+    extra = {'validator': validator} if validator is not None else {}
+    metrics = YOLO(weights).val(data=data, split=split, imgsz=imgsz, device=device, workers=workers,
+                                plots=False, verbose=False, **extra)
+    return float(metrics.box.map50), float(metrics.box.map)
+
+
+def compare_models(models, data, images, imgsz=640, device='cpu', split='val', validator=None, runs=50):
+    """
+    比较多个模型的推理延迟和 mAP
+
+    Args:
+        models: {名称: 权重}, 如 {'teacher (s)': ..., 'student (n, 蒸馏)': ..., 'nano': ...}
+        data: 数据集配置
+        images: 测量延迟的图像
+        validator: 自定义验证器 (虚拟数据集配置需要 build_validator(VirtualDataset, ...))
+
+    Returns:
+        每个模型一行 {'name', 'weights', 'params_M', 'inference_ms', 'inference_p95_ms', 'total_ms', 'mAP50', 'mAP50-95'}
+    """
+    from ultralytics.nn.tasks import load_checkpoint
+
+    rows = []
+    for name, weights in models.items():
+        model = load_checkpoint(weights)[0]
+        model = getattr(model, 'student_model', model)  # 蒸馏检查点只统计学生
+        params = sum(p.numel() for p in model.parameters()) / 1e6
+        latency = measure_latency(weights, images, imgsz=imgsz, device=device, runs=runs)
+        map50, map50_95 = evaluate_map(weights, data, imgsz=imgsz, device=device, split=split, validator=validator)
+        rows.append({'name': name, 'weights': str(weights), 'params_M': round(params, 2), **latency,
+                     'mAP50': round(map50, 4), 'mAP50-95': round(map50_95, 4)})
+    return rows
+
+
+def format_comparison(rows):
+    """把 compare_models 的结果格式化为表格 (相对第一行的延迟倍数)"""
+    reference = rows[0]['inference_ms'] if rows else 0
+    lines = [f"  {'模型':<22} {'参数(M)':>8} {'推理(ms)':>9} {'P95(ms)':>8} {'端到端(ms)':>11} {'相对':>6} "
+             f"{'mAP50':>7} {'mAP50-95':>9}"]
+    for row in rows:
+        ratio = row['inference_ms'] / reference if reference else 0
+        lines.append(f"  {row['name']:<22} {row['params_M']:>8.2f} {row['inference_ms']:>9.2f} "
+                     f"{row['inference_p95_ms']:>8.2f} {row['total_ms']:>11.2f} {ratio:>5.2f}x "
+                     f"{row['mAP50']:>7.4f} {row['mAP50-95']:>9.4f}")
+    return '\n'.join(lines)
+
+
+def sample_images(data, split='val', n=20):
+    """从数据集配置的某个划分中取前 n 张图像 (用于测量延迟); 划分可以是目录或图像列表 .txt"""
+    from pathlib import Path
+
+    import yaml
+
+    from src.data.image_store import list_image_files
+
+    with open(data, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    source = Path(config.get('path', '')) / config[split]
+    if source.suffix == '.txt':
+        with open(source, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()][:n]
+    return [str(p) for p in list_image_files(source)[:n]]
@@ -0,0 +1,462 @@
+"""
+逐次减半 (ASHA) 超参数搜索
+同时搜索传统增强参数 (CLAHE clip_limit / tile, gamma) 和 YOLO 训练参数 (lr0, imgsz ...):
+
+- 数据: 在按类别分层的小子集上训练 (src.data.subset), 变换链在 dataloader 中即时应用,
+  每个试验只需改写变换链参数, 不生成数据集副本
+- 调度: 异步逐次减半 (ASHA). 第 k 级预算为 min_epochs * eta^k 轮; 某一级已完成的试验中
+  排名前 1/eta 的配置晋级到下一级 (用更长的预算从头训练), 有空闲进程时就启动新的配置,
+  不等待整级完成
+- 并行: 进程池, 每个试验在新进程中运行, 绑定 cpus 个独占 CPU 核并限制数据段大小 (同 scheduler);
+  线程数环境变量在进程池的 initializer 中设置, 早于试验进程导入 numpy / torch
+  (本模块不在顶层导入 numpy, spawn 进程重新导入主脚本时也不会提前加载 OpenMP / BLAS)
+- 缓存: 每个试验 (参数 + 轮数 + 子集 + 固定训练参数) 的结果追加到 trials.jsonl;
+  重新运行搜索时已完成的试验直接读取结果, 汇总表写在 trials.csv
+
+搜索配置 (见 configs/search_traditional.yaml):
+    data: configs/exp2_traditional_virtual.yaml
+    subset: {train: 0.1, val: 0.25}
+    trials: 27
+    asha: {min_epochs: 2, max_epochs: 18, eta: 3}
+    train: {batch: 16, device: cpu, optimizer: SGD}
+    space:
+      clahe.clip_limit: {low: 1.0, high: 4.0}      # <变换>.<参数>: 改写变换链
+      lr0: {low: 0.001, high: 0.02, log: true}     # 其余: model.train 参数
+      imgsz: {choices: [320, 480, 640]}
+
+用法:
+    from src.training.hpsearch import load_search_config, run_search
+
+    config = load_search_config('configs/search_traditional.yaml')
+    best = run_search(config, 'experiments/search_traditional', parallel=2)
+"""
+
+import csv
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import yaml
+
+from src.data.transform_runner import file_hash, params_hash
+
+
+TRIALS_NAME = 'trials.jsonl'
+TABLE_NAME = 'trials.csv'
+BEST_NAME = 'best.yaml'
+
+DEFAULT_SPACE = {
+    'clahe.clip_limit': {'low': 1.0, 'high': 4.0},
+    'clahe.tile': {'choices': [4, 8, 16]},
+    'gamma.gamma': {'low': 0.8, 'high': 1.6},
+    'lr0': {'low': 0.001, 'high': 0.02, 'log': True},
+    'imgsz': {'choices': [320, 480, 640]},
+}
+
+DEFAULT_ASHA = {'min_epochs': 2, 'max_epochs': 18, 'eta': 3}
+
+DEFAULT_RESOURCES = {'cpus': 4, 'memory_gb': 6}
+
+# 试验使用的固定训练参数; 搜索配置的 train 中可以覆盖
+DEFAULT_TRAIN = {'batch': 16, 'device': 'cpu', 'workers': 2, 'optimizer': 'SGD', 'amp': False}
+
+
+def load_search_config(path):
+    """读取搜索配置并补全默认值"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    if 'data' not in config:
+        raise ValueError(f"搜索配置缺少 data: {path}")
+    config.setdefault('model', 'yolov8n.pt')
+    config.setdefault('subset', {'train': 0.1, 'val': 0.25})
+    config.setdefault('trials', 27)
+    config.setdefault('metric', 'mAP50-95')
+    config.setdefault('seed', 0)
+    config['asha'] = {**DEFAULT_ASHA, **(config.get('asha') or {})}
+    config['train'] = {**DEFAULT_TRAIN, **(config.get('train') or {})}
+    config['resources'] = {**DEFAULT_RESOURCES, **(config.get('resources') or {})}
+    config['space'] = config.get('space') or DEFAULT_SPACE
+    return config
+
+
+# ---------------- 搜索空间 ----------------
+
+def sample_params(space, rng):
+    """从搜索空间采样一组参数"""
+    params = {}
+    for name, dim in space.items():
+        if 'choices' in dim:
+            params[name] = dim['choices'][int(rng.integers(len(dim['choices'])))]
+        elif dim.get('log'):
+            params[name] = float(math.exp(rng.uniform(math.log(dim['low']), math.log(dim['high']))))
+        else:
+            params[name] = float(rng.uniform(dim['low'], dim['high']))
+        if isinstance(params[name], float):
+            params[name] = round(params[name], 6)
+    return params
+
+
+def config_params(space, seed, config_id):
+    """第 config_id 个配置的参数; 由 (seed, config_id) 决定, 重新运行搜索时得到相同的配置"""
+    import numpy as np
+
+    return sample_params(space, np.random.default_rng([seed, config_id]))
+
+
+def split_params(params):
+    """拆分为 (变换链参数, 训练参数); 变换链参数名为 <变换>.<参数>"""
+    transform = {k: v for k, v in params.items() if '.' in k}
+    train = {k: v for k, v in params.items() if '.' not in k}
+    return transform, train
+
+
+def apply_transform_params(steps, params):
+    """
+    改写变换链参数
+
+    Args:
+        steps: 变换链步骤列表
+        params: {'clahe.clip_limit': 2.0, ...}; 同名变换出现多次时改写所有同名步骤
+    """
+    steps = [dict(step) for step in steps]
+    for name, value in params.items():
+        op, _, key = name.partition('.')
+        matched = [step for step in steps if step.get('op') == op]
+        if not matched:
+            raise ValueError(f"变换链中没有 {op} (参数 {name}); 现有: {[s.get('op') for s in steps]}")
+        for step in matched:
+            step[key] = value
+    return steps
+
+
+def rung_epochs(min_epochs, max_epochs, eta):
+    """各级预算 (轮数): min_epochs, min_epochs * eta, ... 不超过 max_epochs"""
+    rungs = [int(min_epochs)]
+    while rungs[-1] * eta <= max_epochs:
+        rungs.append(int(rungs[-1] * eta))
+    return rungs
+
+
+class ASHA:
+    """
+    异步逐次减半
+
+    Args:
+        n_rungs: 级数
+        eta: 每级保留 1/eta
+        n_trials: 最多启动的配置数
+    """
+
+    def __init__(self, n_rungs, eta, n_trials):
+        self.n_rungs = n_rungs
+        self.eta = eta
+        self.n_trials = n_trials
+        self.sampled = 0
+        self.results = [{} for _ in range(n_rungs)]     # 每级 {配置: 分数}
+        self.promoted = [set() for _ in range(n_rungs)]
+
+    def next_job(self):
+        """
+        下一个要运行的 (配置, 级); 暂时没有可运行的试验时返回 None
+
+        优先晋级: 从高到低检查每一级, 已完成试验中排名前 1/eta 且尚未晋级的配置进入下一级
+        """
+        for k in reversed(range(self.n_rungs - 1)):
+            done = self.results[k]
+            top = sorted(done, key=done.get, reverse=True)[:len(done) // self.eta]
+            for config_id in top:
+                if config_id not in self.promoted[k] and done[config_id] > -math.inf:
+                    self.promoted[k].add(config_id)
+                    return config_id, k + 1
+        if self.sampled < self.n_trials:
+            self.sampled += 1
+            return self.sampled - 1, 0
+        return None
+
+    def report(self, config_id, rung, score):
+        """记录试验结果 (失败的试验记为 -inf, 不会晋级)"""
+        self.results[rung][config_id] = -math.inf if score is None else score
+
+    def best(self):
+        """最高一级中分数最高的 (配置, 级, 分数)"""
+        for k in reversed(range(self.n_rungs)):
+            done = {c: s for c, s in self.results[k].items() if s > -math.inf}
+            if done:
+                config_id = max(done, key=done.get)
+                return config_id, k, done[config_id]
+        return None
+
+
+# ---------------- 试验缓存 ----------------
+
+class TrialCache:
+    """试验结果缓存 (JSON Lines, 以试验指纹为键, 后写入的记录覆盖先前的记录)"""
+
+    def __init__(self, output_dir):
+        self.path = Path(output_dir) / TRIALS_NAME
+        self.records = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 被中断时写了一半的行
+                    self.records[record['key']] = record
+
+    def get(self, key):
+        record = self.records.get(key)
+        return record if record and record.get('status') == 'done' else None
+
+    def add(self, record):
+        self.records[record['key']] = record
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_table(self, path=None):
+        """所有试验写成一张 CSV (按分数降序)"""
+        path = Path(path) if path else self.path.with_name(TABLE_NAME)
+        records = sorted(self.records.values(), key=lambda r: (r.get('score') is None, -(r.get('score') or 0)))
+        param_names = sorted({k for r in records for k in r.get('params', {})})
+        columns = ['key', 'config_id', 'rung', 'epochs', *param_names, 'score', 'mAP50', 'mAP50-95',
+                   'seconds', 'status', 'run_dir']
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for record in records:
+                writer.writerow({**record, **record.get('params', {})})
+        os.replace(tmp, path)
+        return path
+
+
+# ---------------- 试验进程 ----------------
+
+def _limit_trial(cores, memory_gb):
+    """
+    试验进程的 initializer (在反序列化试验任务、导入 numpy / torch 之前执行):
+    绑定 CPU 核、线程数与核数一致、限制数据段大小 (仅 POSIX)
+    """
+    from src.training.scheduler import THREAD_ENV_VARS
+
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(len(cores))
+    if memory_gb and os.name == 'posix':
+        import resource
+
+        limit = int(memory_gb * 1024 ** 3)
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def run_trial(job):
+    """
+    在进程池中运行一个试验: 用改写后的变换链在子集上训练 job['epochs'] 轮
+
+    Returns:
+        试验记录 (写入缓存)
+    """
+    start = time.time()
+    record = {k: job[k] for k in ('key', 'config_id', 'rung', 'epochs', 'params', 'run_dir')}
+    try:
+        import torch
+        from ultralytics import YOLO
+
+        from src.data.virtual_dataset import TransformChain, VirtualDataset, load_virtual_config
+        from src.data.yolo_adapter import build_trainer
+        from src.training.autotune import keep_workers
+        from src.training.warm_start import run_summary
+
+        torch.set_num_threads(len(job['cores']))
+        transform_params, train_params = split_params(job['params'])
+        data_path, dataset_kwargs = load_virtual_config(job['data'])
+        dataset_kwargs['transforms'] = TransformChain(apply_transform_params(job['steps'], transform_params))
+        trainer = keep_workers(build_trainer(VirtualDataset, **dataset_kwargs))
+
+        run_dir = Path(job['run_dir'])
+        model = YOLO(job['model'])
+        model.train(trainer=trainer, data=data_path, epochs=job['epochs'], project=str(run_dir.parent),
+                    name=run_dir.name, exist_ok=True, plots=False, verbose=False,
+                    **{**job['train'], **train_params})
+
+        summary = run_summary(run_dir) or {}
+        record.update(status='done', score=summary.get(job['metric']),
+                      **{k: summary.get(k) for k in ('mAP50', 'mAP50-95')})
+    except Exception as e:  # 单个试验失败 (如超出内存) 不影响搜索
+        record.update(status='failed', score=None, error=f'{type(e).__name__}: {e}')
+    record['seconds'] = round(time.time() - start, 1)
+    return record
+
+
+class _TrialPool:
+    """
+    每个试验在新的 spawn 进程中运行, 结束后进程退出并释放全部内存
+    (效果同 ProcessPoolExecutor(max_tasks_per_child=1), 但不要求 Python 3.11)
+    """
+
+    def __init__(self):
+        self._context = multiprocessing.get_context('spawn')
+        self._executors = {}
+
+    def submit(self, fn, *args, initializer=None, initargs=()):
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=self._context,
+                                       initializer=initializer, initargs=initargs)
+        future = executor.submit(fn, *args)
+        self._executors[future] = executor
+        return future
+
+    def release(self, future):
+        """已完成的试验: 回收其进程"""
+        self._executors.pop(future).shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for executor in self._executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._executors.clear()
+
+
+# ---------------- 搜索 ----------------
+
+def _core_slots(cpus, parallel):
+    """把可用 CPU 核切分为 parallel 组, 每组 cpus 个"""
+    from src.training.scheduler import available_cores
+
+    cores = available_cores()
+    parallel = max(1, min(parallel or len(cores) // cpus, len(cores) // cpus or 1))
+    return [cores[i * cpus:(i + 1) * cpus] or cores for i in range(parallel)]
+
+
+def _subset_fingerprint(subset_config):
+    with open(subset_config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    return {split: file_hash(config[split]) for split in ('train', 'val') if split in config}
+
+
+def run_search(config, output_dir, parallel=None, dry_run=False):
+    """
+    运行 ASHA 搜索
+
+    Args:
+        config: load_search_config 的结果
+        output_dir: 输出目录 (子集、试验运行目录、trials.jsonl / trials.csv / best.yaml)
+        parallel: 同时运行的试验数 (默认按可用核数 / 每个试验的 cpus)
+        dry_run: 只打印各级预算和前几个配置
+
+    Returns:
+        最佳试验记录 (没有成功的试验时为 None)
+    """
+    from src.data.subset import write_subset_config
+
+    output_dir = Path(output_dir)
+    asha_cfg, resources = config['asha'], config['resources']
+    rungs = rung_epochs(asha_cfg['min_epochs'], asha_cfg['max_epochs'], asha_cfg['eta'])
+    asha = ASHA(len(rungs), asha_cfg['eta'], config['trials'])
+    slots = _core_slots(resources['cpus'], parallel)
+
+    print(f"预算 (轮): {' -> '.join(map(str, rungs))}, eta={asha_cfg['eta']}, 最多 {config['trials']} 个配置, "
+          f"{len(slots)} 个并行试验 x {resources['cpus']} 核")
+    if dry_run:
+        for config_id in range(min(config['trials'], 5)):
+            print(f"  #{config_id}: {config_params(config['space'], config['seed'], config_id)}")
+        return None
+
+    subset_config = write_subset_config(config['data'], output_dir / 'subset', config['subset'], seed=config['seed'])
+    with open(config['data'], 'r', encoding='utf-8') as f:
+        base = yaml.safe_load(f) or {}
+    steps = base.get('transforms') or []
+    context = {'model': str(config['model']), 'train': config['train'], 'steps': steps,
+               'subset': _subset_fingerprint(subset_config), 'metric': config['metric']}
+
+    cache = TrialCache(output_dir)
+    free = list(slots)
+    pending = {}
+    cached = 0
+    with _TrialPool() as pool:
+        while True:
+            while free:
+                job = asha.next_job()
+                if job is None:
+                    break
+                config_id, rung = job
+                params = config_params(config['space'], config['seed'], config_id)
+                key = params_hash({**context, 'params': params, 'epochs': rungs[rung]})
+                record = cache.get(key)
+                if record is not None:
+                    asha.report(config_id, rung, record['score'])
+                    cached += 1
+                    continue
+                cores = free.pop()
+                job = {
+                    'key': key, 'config_id': config_id, 'rung': rung, 'epochs': rungs[rung], 'params': params,
+                    'run_dir': str((output_dir / 'trials' / f'{key[:10]}_e{rungs[rung]}').resolve()),
+                    'data': str(subset_config), 'steps': steps, 'model': str(config['model']),
+                    'train': config['train'], 'metric': config['metric'],
+                    'cores': cores, 'memory_gb': resources['memory_gb'],
+                }
+                print(f"▶ #{config_id} 第 {rung} 级 ({rungs[rung]} 轮): {params}")
+                future = pool.submit(run_trial, job, initializer=_limit_trial, initargs=(cores, resources['memory_gb']))
+                pending[future] = (job, cores)
+
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, cores = pending.pop(future)
+                pool.release(future)
+                free.append(cores)
+                try:
+                    record = future.result()
+                except Exception as e:  # 进程池本身出错 (如试验进程被杀死)
+                    record = {k: job[k] for k in ('key', 'config_id', 'rung', 'epochs', 'params', 'run_dir')}
+                    record.update(status='failed', score=None, error=f'{type(e).__name__}: {e}')
+                cache.add(record)
+                asha.report(record['config_id'], record['rung'], record['score'])
+                score = f"{record['score']:.4f}" if record['score'] is not None else record.get('error')
+                print(f"{'✅' if record['status'] == 'done' else '❌'} #{record['config_id']} "
+                      f"第 {record['rung']} 级: {config['metric']}={score} ({record['seconds']:.0f} 秒)")
+
+    table = cache.write_table()
+    print(f"\n试验汇总: {table} ({cached} 个试验读取缓存)")
+    best = asha.best()
+    if best is None:
+        return None
+    config_id, rung, _ = best
+    params = config_params(config['space'], config['seed'], config_id)
+    key = params_hash({**context, 'params': params, 'epochs': rungs[rung]})
+    record = cache.records[key]
+    write_best_config(config['data'], steps, params, output_dir / BEST_NAME, record)
+    return record
+
+
+def write_best_config(data_config, steps, params, path, record):
+    """
+    把最佳配置写成完整数据集的虚拟配置 (可直接用于 train_traditional.py --data);
+    训练参数记录在 search_best.train 中
+    """
+    with open(data_config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    transform_params, train_params = split_params(params)
+    config['transforms'] = apply_transform_params(steps, transform_params)
+    config['search_best'] = {
+        'source': str(data_config),
+        'train': train_params,
+        'score': record.get('score'),
+        'epochs': record.get('epochs'),
+        'run_dir': record.get('run_dir'),
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.dump(config, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+    return path
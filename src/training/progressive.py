@@ -0,0 +1,246 @@
+"""
+渐进式分辨率训练
+每轮都在同一个 imgsz 上训练, 但前期的轮次用低分辨率即可学到大部分特征.
+ProgressiveResize 按轮数比例把训练分成几个阶段 (如 320 -> 480 -> 640):
+
+- 训练器第一次建立训练 dataloader 时就使用第一阶段的尺寸, 之后只在阶段边界重建
+  (以及按 imgsz 区分的图像缓存, 如共享解码缓存)
+- 验证集始终使用最终的 imgsz, 各轮 mAP 和 best.pt 的选择与固定尺寸训练可比
+- 记录每个阶段的耗时, 可与固定尺寸运行的 results.csv 比较总训练时间和 mAP
+
+阶段写法: "320:0.3,480:0.3,640:0.4" (尺寸:轮数比例), 省略比例时各阶段平分.
+阶段尺寸必须是 32 的倍数; 最后一个阶段通常与 imgsz 相同.
+
+用法:
+    from src.training.progressive import ProgressiveResize, compare_to_fixed, format_report
+
+    resizer = ProgressiveResize('320,480,640').attach(model)
+    model.train(data=..., imgsz=640, epochs=30)
+    report = compare_to_fixed(model.trainer.save_dir, 'experiments/exp1_baseline/run')
+    print(format_report(resizer.summary(), report))
+"""
+
+import time
+
+from src.training.warm_start import run_summary
+
+
+DEFAULT_SCHEDULE = '320:0.3,480:0.3,640:0.4'
+
+STRIDE = 32
+
+
+def parse_schedule(spec):
+    """
+    解析阶段写法
+
+    Args:
+        spec: "320:0.3,480:0.3,640:0.4" / "320,480,640" / [(320, 0.3), ...]
+
+    Returns:
+        [(imgsz, 比例), ...], 比例之和为 1
+    """
+    if isinstance(spec, str):
+        items = [item.strip() for item in spec.split(',') if item.strip()]
+        phases = []
+        for item in items:
+            size, _, fraction = item.partition(':')
+            phases.append((int(size), float(fraction) if fraction else None))
+    else:
+        phases = [(int(size), fraction) for size, fraction in spec]
+    if not phases:
+        raise ValueError("渐进式训练至少需要一个阶段")
+
+    for size, _ in phases:
+        if size % STRIDE:
+            raise ValueError(f"阶段尺寸必须是 {STRIDE} 的倍数: {size}")
+    given = [f for _, f in phases if f is not None]
+    if given and len(given) != len(phases):
+        raise ValueError(f"要么为所有阶段指定比例, 要么都不指定: {spec}")
+    if not given:
+        return [(size, 1.0 / len(phases)) for size, _ in phases]
+    total = sum(given)
+    return [(size, fraction / total) for size, fraction in phases]
+
+
+def phase_boundaries(schedule, epochs):
+    """
+    把比例换算为轮次区间
+
+    Returns:
+        [(起始轮, 结束轮 (不含), imgsz), ...]; 每个阶段至少一轮 (轮数不足时靠前的阶段被跳过)
+    """
+    bounds, start, cumulative = [], 0, 0.0
+    for i, (size, fraction) in enumerate(schedule):
+        cumulative += fraction
+        end = epochs if i == len(schedule) - 1 else min(round(cumulative * epochs), epochs)
+        if end > start:
+            bounds.append((start, end, size))
+            start = end
+    return bounds
+
+
+class ProgressiveResize:
+    """
+    渐进式分辨率回调
+
+    Args:
+        schedule: 阶段写法 (见 parse_schedule)
+        cache_builder: 进入新阶段、重建 dataloader 之前调用的函数 cache_builder(imgsz),
+            用于准备按尺寸区分的图像缓存 (如 ensure_decoded_cache)
+    """
+
+    def __init__(self, schedule=DEFAULT_SCHEDULE, cache_builder=None):
+        self.schedule = parse_schedule(schedule)
+        self.cache_builder = cache_builder
+        self.phases = []
+        self.final_imgsz = None
+        self._bounds = []
+        self._size = None
+        self._phase_start = None
+
+    def attach(self, model):
+        """在 YOLO 模型上注册回调"""
+        model.add_callback('on_pretrain_routine_start', self.on_pretrain_routine_start)
+        model.add_callback('on_train_start', self.on_train_start)
+        model.add_callback('on_train_epoch_start', self.on_train_epoch_start)
+        model.add_callback('on_train_end', self.on_train_end)
+        return self
+
+    def detach(self, model):
+        """从 YOLO 模型上移除回调 (同一个模型多次训练时避免重复统计)"""
+        for event, callbacks in model.callbacks.items():
+            model.callbacks[event] = [c for c in callbacks if getattr(c, '__self__', None) is not self]
+
+    def size_for(self, epoch):
+        """第 epoch 轮 (从 0 开始) 的训练尺寸"""
+        for start, end, size in self._bounds:
+            if start <= epoch < end:
+                return size
+        return self._bounds[-1][2]
+
+    def _wrap_get_dataloader(self, trainer):
+        """
+        让训练器的 get_dataloader 按当前阶段尺寸建立训练 dataloader;
+        _setup_train 中的第一次建立即使用第一阶段的尺寸, 不会先按最终尺寸建立一次再丢弃
+        """
+        get_dataloader = trainer.get_dataloader
+
+        def staged_get_dataloader(dataset_path, batch_size=16, rank=0, mode='train'):
+            if mode != 'train':
+                return get_dataloader(dataset_path, batch_size, rank, mode)
+            final_imgsz = trainer.args.imgsz  # 已经过 check_imgsz
+            if self._size is None:
+                self._size = self.size_for(0)
+            if self.cache_builder is not None:
+                self.cache_builder(self._size)
+            trainer.args.imgsz = self._size
+            try:
+                return get_dataloader(dataset_path, batch_size, rank, mode)
+            finally:
+                # 检查点中保存的 imgsz 以及验证保持最终尺寸
+                trainer.args.imgsz = final_imgsz
+
+        trainer.get_dataloader = staged_get_dataloader
+
+    def _rebuild(self, trainer, size):
+        """在新尺寸下重建训练 dataloader; 验证 dataloader 保持最终尺寸"""
+        from ultralytics.utils import LOCAL_RANK
+
+        if hasattr(trainer.train_loader, 'close'):
+            trainer.train_loader.close()
+        self._size = size
+        trainer.train_loader = trainer.get_dataloader(
+            trainer.data['train'], batch_size=trainer.batch_size // max(trainer.world_size, 1),
+            rank=LOCAL_RANK, mode='train')
+
+        # 新数据集默认开启 mosaic; 已进入 close_mosaic 阶段时需要重新关闭
+        if trainer.args.close_mosaic and trainer.epoch >= trainer.epochs - trainer.args.close_mosaic:
+            trainer._close_dataloader_mosaic()
+
+    def _close_phase(self, end_epoch):
+        """结束当前阶段; end_epoch 为下一阶段的起始轮 (从 0 开始, 不含)"""
+        if self.phases and self.phases[-1]['seconds'] is None:
+            phase = self.phases[-1]
+            phase['seconds'] = round(time.time() - self._phase_start, 1)
+            phase['epochs'] = end_epoch - (phase['start_epoch'] - 1)
+
+    # ---------------- 回调 ----------------
+
+    def on_pretrain_routine_start(self, trainer):
+        # 在 _setup_train 建立 dataloader 之前运行
+        self._bounds = phase_boundaries(self.schedule, trainer.epochs)
+        self._size = None
+        self.phases = []
+        self._wrap_get_dataloader(trainer)
+
+    def on_train_start(self, trainer):
+        self.final_imgsz = trainer.args.imgsz
+        self._bounds = phase_boundaries(self.schedule, trainer.epochs)  # time 模式下 epochs 可能已重新估计
+
+    def on_train_epoch_start(self, trainer):
+        size = self.size_for(trainer.epoch)
+        if self.phases and size == self._size:
+            return
+        self._close_phase(trainer.epoch)
+        if size != self._size:
+            # 从检查点恢复到后面的阶段时, 第一次建立的仍是第一阶段的尺寸
+            print(f"\n📐 渐进式训练: 第 {trainer.epoch + 1} 轮起 imgsz {self._size} -> {size}")
+            self._rebuild(trainer, size)
+        self._phase_start = time.time()
+        self.phases.append({'imgsz': size, 'start_epoch': trainer.epoch + 1, 'epochs': None, 'seconds': None})
+
+    def on_train_end(self, trainer):
+        self._close_phase(trainer.epoch + 1)
+
+    # ---------------- 汇总 ----------------
+
+    def summary(self):
+        """写入 experiment_info 的摘要"""
+        return {
+            'schedule': [{'imgsz': size, 'fraction': round(fraction, 3)} for size, fraction in self.schedule],
+            'final_imgsz': self.final_imgsz,
+            'phases': self.phases,
+            'train_s': round(sum(p['seconds'] or 0 for p in self.phases), 1),
+        }
+
+
+def compare_to_fixed(run_dir, fixed_dir):
+    """
+    比较渐进式运行和固定尺寸运行的训练时间和最佳 mAP
+
+    Returns:
+        {'progressive', 'fixed', 'time_saved_s', 'time_ratio', 'gap_mAP50', 'gap_mAP50-95'};
+        任一运行没有 results.csv 时返回 None. gap = 渐进式 - 固定尺寸
+    """
+    progressive, fixed = run_summary(run_dir), run_summary(fixed_dir)
+    if progressive is None or fixed is None:
+        return None
+    return {
+        'progressive': progressive,
+        'fixed': fixed,
+        'time_saved_s': round(fixed['train_seconds'] - progressive['train_seconds'], 1),
+        'time_ratio': round(progressive['train_seconds'] / fixed['train_seconds'], 3) if fixed['train_seconds'] else None,
+        'gap_mAP50': round(progressive['mAP50'] - fixed['mAP50'], 4),
+        'gap_mAP50-95': round(progressive['mAP50-95'] - fixed['mAP50-95'], 4),
+    }
+
+
+def format_report(summary, comparison=None):
+    """把阶段耗时和 (可选的) 固定尺寸比较格式化为几行文本"""
+    lines = []
+    for phase in summary['phases']:
+        epochs = phase['epochs'] or 0
+        seconds = phase['seconds'] or 0
+        per_epoch = seconds / epochs if epochs else 0
+        lines.append(f"  imgsz {phase['imgsz']:>4}: 第 {phase['start_epoch']}-{phase['start_epoch'] + epochs - 1} 轮, "
+                     f"{seconds / 60:.1f} 分钟 ({per_epoch:.0f} 秒/轮)")
+    lines.append(f"  合计 {summary['train_s'] / 60:.1f} 分钟 (验证尺寸 {summary['final_imgsz']})")
+    if comparison is not None:
+        ratio = f"{comparison['time_ratio']:.0%}" if comparison['time_ratio'] is not None else '-'
+        fixed = comparison['fixed']
+        lines.append(f"  固定尺寸运行: {fixed['epochs']} 轮 {fixed['train_seconds'] / 60:.1f} 分钟, "
+                     f"mAP50-95 {fixed['mAP50-95']:.4f}")
+        lines.append(f"  节省训练时间 {comparison['time_saved_s'] / 60:.1f} 分钟 (耗时为固定尺寸的 {ratio}), "
+                     f"mAP50 差距 {comparison['gap_mAP50']:+.4f}, mAP50-95 差距 {comparison['gap_mAP50-95']:+.4f}")
+    return '\n'.join(lines)
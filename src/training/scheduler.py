@@ -0,0 +1,444 @@
+"""
+实验调度器
+把一组实验 (训练 / 评估脚本 + 参数) 作为子进程并行运行, 适合无人值守的服务器:
+
+- 资源: 每个实验声明 cpus 和 memory_gb; 按空闲核数和可用内存同时启动尽可能多的实验,
+  子进程绑定到独占的 CPU 核 (sched_setaffinity), 线程数 (OMP/MKL) 与核数一致,
+  数据段上限 (RLIMIT_DATA) 设为 memory_gb, 超出时子进程 MemoryError 退出而不是拖垮整台机器
+  (核绑定和内存上限仅在 POSIX 系统上生效; 其他平台上只按核数 / 内存排队, 计划和汇总在所有平台上可用)
+- 依赖: after 中列出的实验成功后才启动 (如评估依赖训练); 依赖失败时跳过
+- 非交互: 子进程标准输入为 /dev/null, 输出写入日志文件
+- 可恢复: 每次状态变化追加到 state.jsonl; 重新运行时跳过参数未变且已成功的实验,
+  失败、被中断或参数改变的实验重新运行
+- 汇总: 从各实验的结果文件 (experiment_info.yaml / 评估 JSON / ultralytics results.csv)
+  读取指标, 写成一张 CSV + Markdown 表
+
+清单格式 (见 configs/experiments.yaml):
+    defaults: {cpus: 4, memory_gb: 8}
+    experiments:
+      - name: exp1_baseline
+        script: scripts/training/train_baseline.py
+        args: [--virtual, --epochs, 20, --device, cpu, --yes]
+        results: experiments/exp1_baseline/experiment_info.yaml
+      - name: exp1_eval
+        after: [exp1_baseline]
+        script: scripts/evaluation/evaluate_model.py
+        args: [--model, experiments/exp1_baseline/run/weights/best.pt, --output-json, ...]
+        results: ...
+
+用法:
+    from src.training.scheduler import load_specs, run_experiments, collect_results
+
+    specs = load_specs('configs/experiments.yaml')
+    state = run_experiments(specs, state_dir='experiments/scheduler')
+    collect_results(specs, state, 'experiments/scheduler')
+"""
+
+import csv
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+
+PROJECT_ROOT = Path(__file__).parents[2]
+
+STATE_NAME = 'state.jsonl'
+
+# 子进程隔离 (进程组、rlimit、wait4) 依赖 POSIX 接口
+POSIX = os.name == 'posix'
+
+# 子进程使用的线程数环境变量, 与分配到的核数一致
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+# 留给系统和调度器本身的内存
+RESERVED_MEMORY_GB = 1.0
+
+# 从结果字典中提取的指标名 (ultralytics results.csv 的列名 -> 表格列名)
+RESULTS_CSV_COLUMNS = {
+    'metrics/mAP50(B)': 'mAP50',
+    'metrics/mAP50-95(B)': 'mAP50-95',
+    'metrics/precision(B)': 'precision',
+    'metrics/recall(B)': 'recall',
+}
+
+
+def load_specs(path):
+    """
+    读取实验清单, 合并 defaults 并检查名称和依赖
+
+    Returns:
+        specs: 按清单顺序排列的 dict 列表, 每项包含 name / script / args / cpus / memory_gb /
+               after / env / results / cwd
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = yaml.safe_load(f) or {}
+
+    defaults = {'cpus': 1, 'memory_gb': None, 'after': [], 'env': {}, 'results': None, 'cwd': '.'}
+    defaults.update(manifest.get('defaults') or {})
+
+    specs = []
+    for entry in manifest.get('experiments') or []:
+        spec = {**defaults, **entry}
+        if 'name' not in spec or 'script' not in spec:
+            raise ValueError(f"实验缺少 name 或 script: {entry}")
+        spec['args'] = [str(a) for a in spec.get('args') or []]
+        spec['after'] = list(spec['after'] or [])
+        specs.append(spec)
+
+    names = [s['name'] for s in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"实验名称重复: {names}")
+    for spec in specs:
+        unknown = set(spec['after']) - set(names)
+        if unknown:
+            raise ValueError(f"{spec['name']} 依赖未知实验: {sorted(unknown)}")
+    return specs
+
+
+def spec_hash(spec):
+    """参数指纹; 指纹改变的实验即使已成功也会重新运行"""
+    keys = ('script', 'args', 'env', 'cwd')
+    payload = json.dumps({k: spec.get(k) for k in keys}, sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def available_cores():
+    """当前进程允许使用的 CPU 核"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def available_memory_gb():
+    """可用内存 (MemAvailable); 读取失败时退回 psutil 或物理内存总量"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024 / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available / 1024 ** 3
+    except ImportError:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 ** 3
+
+
+def load_state(state_dir):
+    """读取 state.jsonl, 返回 {实验名: 最后一条记录}"""
+    state = {}
+    path = Path(state_dir) / STATE_NAME
+    if not path.exists():
+        return state
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 被中断时写了一半的行
+            state[record['name']] = record
+    return state
+
+
+def _append_state(state_dir, state, record):
+    record['time'] = datetime.now().isoformat(timespec='seconds')
+    state[record['name']] = record
+    with open(Path(state_dir) / STATE_NAME, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _limit_child(cores, memory_bytes):
+    """在子进程 exec 之前执行 (仅 POSIX): 绑定 CPU 核, 限制数据段大小, 脱离调度器的进程组"""
+    import resource
+
+    os.setsid()
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    if memory_bytes:
+        resource.setrlimit(resource.RLIMIT_DATA, (memory_bytes, memory_bytes))
+
+
+class _Job:
+    """一个正在运行的实验"""
+
+    def __init__(self, spec, cores, log_path):
+        self.spec = spec
+        self.cores = cores
+        self.log_path = log_path
+        self.start = time.time()
+
+        env = os.environ.copy()
+        env.update({k: str(v) for k, v in (spec['env'] or {}).items()})
+        for var in THREAD_ENV_VARS:
+            env.setdefault(var, str(len(cores)))
+        env['PYTHONUNBUFFERED'] = '1'
+
+        memory_bytes = int(spec['memory_gb'] * 1024 ** 3) if spec['memory_gb'] else None
+        cmd = [sys.executable, spec['script'], *spec['args']]
+        self.log = open(log_path, 'ab')
+        self.log.write(f"\n$ {' '.join(cmd)}  # cores={cores}\n".encode('utf-8'))
+        self.log.flush()
+        if POSIX:
+            isolation = {'preexec_fn': lambda: _limit_child(cores, memory_bytes)}
+        else:
+            isolation = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+        self.proc = subprocess.Popen(
+            cmd,
+            cwd=PROJECT_ROOT / spec['cwd'],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+            **isolation,
+        )
+
+    def poll(self):
+        """
+        检查是否结束
+
+        Returns:
+            None 表示仍在运行; 否则 (返回码, 峰值 RSS MB; 非 POSIX 系统上为 None)
+        """
+        if not POSIX:
+            if self.proc.poll() is None:
+                return None
+            self.log.close()
+            return self.proc.returncode, None
+        pid, status, usage = os.wait4(self.proc.pid, os.WNOHANG)
+        if pid == 0:
+            return None
+        self.proc.returncode = os.waitstatus_to_exitcode(status)
+        self.log.close()
+        return self.proc.returncode, usage.ru_maxrss / 1024
+
+    def terminate(self):
+        """向整个进程组发送 SIGTERM (包括 dataloader worker); 非 POSIX 系统上只终止主进程"""
+        if not POSIX:
+            self.proc.terminate()
+            return
+        try:
+            os.killpg(self.proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def run_experiments(specs, state_dir, max_parallel=None, force=(), poll_interval=2.0, dry_run=False):
+    """
+    运行实验清单
+
+    Args:
+        specs: load_specs 的结果
+        state_dir: 状态文件和日志目录
+        max_parallel: 同时运行的实验数上限 (默认只受核数和内存限制)
+        force: 即使已成功也重新运行的实验名
+        poll_interval: 检查子进程的间隔 (秒)
+        dry_run: 只打印执行计划
+
+    Returns:
+        state: {实验名: 最后一条记录}
+    """
+    state_dir = Path(state_dir)
+    log_dir = state_dir / 'logs'
+    log_dir.mkdir(parents=True, exist_ok=True)
+    state = load_state(state_dir)
+
+    cores = available_cores()
+    memory_budget = max(available_memory_gb() - RESERVED_MEMORY_GB, 0.0)
+    print(f"可用资源: {len(cores)} 核, {memory_budget:.1f} GB 内存")
+    if not POSIX and not dry_run:
+        print("⚠️  非 POSIX 系统: 不绑定 CPU 核、不限制内存, 只按声明的资源排队")
+
+    pending = []
+    for spec in specs:
+        record = state.get(spec['name'])
+        if (record and record['status'] == 'done' and record['hash'] == spec_hash(spec)
+                and spec['name'] not in force):
+            print(f"  ⏭  {spec['name']}: 已完成 ({record['time']})")
+            continue
+        pending.append(spec)
+
+    if dry_run:
+        for spec in pending:
+            after = f" (等待 {', '.join(spec['after'])})" if spec['after'] else ''
+            print(f"  ▶ {spec['name']}: {spec['cpus']} 核, {spec['memory_gb'] or '-'} GB{after}")
+            print(f"      {spec['script']} {' '.join(spec['args'])}")
+        return state
+
+    free_cores = list(cores)
+    free_memory = memory_budget
+    running = {}
+
+    def blocked(spec):
+        """依赖状态: 'ready' / 'wait' / 'failed'"""
+        for dep in spec['after']:
+            if any(s['name'] == dep for s in pending) or dep in running:
+                return 'wait'
+            if state.get(dep, {}).get('status') != 'done':
+                return 'failed'
+        return 'ready'
+
+    try:
+        while pending or running:
+            # 启动所有依赖满足且资源足够的实验 (按清单顺序, 允许后面的小实验先填满空闲核)
+            for spec in list(pending):
+                if max_parallel and len(running) >= max_parallel:
+                    break
+                status = blocked(spec)
+                if status == 'failed':
+                    pending.remove(spec)
+                    _append_state(state_dir, state, {'name': spec['name'], 'hash': spec_hash(spec),
+                                                     'status': 'skipped', 'reason': '依赖失败'})
+                    print(f"  ⏭  {spec['name']}: 依赖失败，跳过")
+                    continue
+                need_cores = min(int(spec['cpus']), len(cores))
+                need_memory = float(spec['memory_gb'] or 0)
+                if status == 'wait' or need_cores > len(free_cores):
+                    continue
+                if need_memory > free_memory and running:
+                    continue  # 单个实验超过预算时在空闲时独占运行
+
+                job_cores, free_cores = free_cores[:need_cores], free_cores[need_cores:]
+                free_memory -= need_memory
+                pending.remove(spec)
+                log_path = log_dir / f"{spec['name']}.log"
+                running[spec['name']] = _Job(spec, job_cores, log_path)
+                _append_state(state_dir, state, {'name': spec['name'], 'hash': spec_hash(spec),
+                                                 'status': 'running', 'cores': job_cores, 'log': str(log_path)})
+                print(f"  ▶ {spec['name']}: 核 {job_cores[0]}-{job_cores[-1]}, 日志 {log_path}")
+
+            if pending and not running:
+                names = [s['name'] for s in pending]
+                raise RuntimeError(f"无法启动的实验 (资源不足或依赖循环): {names}")
+
+            time.sleep(poll_interval)
+            for name, job in list(running.items()):
+                finished = job.poll()
+                if finished is None:
+                    continue
+                returncode, peak_rss_mb = finished
+                del running[name]
+                free_cores = sorted(free_cores + job.cores)
+                free_memory += float(job.spec['memory_gb'] or 0)
+                elapsed = time.time() - job.start
+                status = 'done' if returncode == 0 else 'failed'
+                _append_state(state_dir, state, {
+                    'name': name, 'hash': spec_hash(job.spec), 'status': status,
+                    'returncode': returncode, 'seconds': round(elapsed, 1),
+                    'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+                    'log': str(job.log_path),
+                })
+                mark = '✅' if status == 'done' else '❌'
+                memory = f", 峰值内存 {peak_rss_mb:.0f} MB" if peak_rss_mb is not None else ''
+                print(f"  {mark} {name}: 返回码 {returncode}, {elapsed / 60:.1f} 分钟{memory}")
+
+    except KeyboardInterrupt:
+        print("\n⚠️  调度被中断，终止运行中的实验 (下次运行时会重新开始)")
+        for name, job in running.items():
+            job.terminate()
+        for name, job in running.items():
+            job.proc.wait()
+            job.log.close()
+            _append_state(state_dir, state, {'name': name, 'hash': spec_hash(job.spec), 'status': 'interrupted'})
+        raise
+
+    return state
+
+
+def _flatten(value, prefix=''):
+    """嵌套字典展开为 {'a.b': 数值}; 只保留数值"""
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(_flatten(item, f'{prefix}{key}.' if isinstance(item, dict) else f'{prefix}{key}'))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix.rstrip('.')] = value
+    return flat
+
+
+def read_metrics(path):
+    """
+    读取一个实验的结果文件
+
+    - .yaml / .json: 有 results 字段时取 results, 否则取全部数值字段
+    - .csv: ultralytics results.csv, 取 mAP50-95 最高的一轮
+    """
+    path = PROJECT_ROOT / path
+    if not path.exists():
+        return {}
+    if path.suffix == '.csv':
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+        if not rows:
+            return {}
+        best = max(rows, key=lambda r: float(r.get('metrics/mAP50-95(B)') or 0))
+        metrics = {name: float(best[col]) for col, name in RESULTS_CSV_COLUMNS.items() if col in best}
+        metrics['best_epoch'] = int(float(best.get('epoch', 0)))
+        return metrics
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f) if path.suffix == '.json' else yaml.safe_load(f)
+    if isinstance(data, dict) and isinstance(data.get('results'), dict):
+        data = data['results']
+    return _flatten(data)
+
+
+def collect_results(specs, state, output_dir):
+    """
+    汇总所有实验的状态和指标, 写出 results_table.csv 和 results_table.md
+
+    Returns:
+        rows: 每个实验一行的 dict 列表
+    """
+    rows = []
+    for spec in specs:
+        record = state.get(spec['name'], {})
+        row = {
+            'experiment': spec['name'],
+            'status': record.get('status', 'pending'),
+            'minutes': round(record['seconds'] / 60, 1) if 'seconds' in record else None,
+            'peak_rss_mb': record.get('peak_rss_mb'),
+        }
+        if spec['results']:
+            row.update(read_metrics(spec['results']))
+        rows.append(row)
+
+    columns = []
+    for row in rows:
+        columns += [c for c in row if c not in columns]
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tmp = output_dir / 'results_table.csv.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, output_dir / 'results_table.csv')
+
+    def cell(value):
+        if value is None:
+            return '-'
+        return f'{value:.4g}' if isinstance(value, float) else str(value)
+
+    lines = ['| ' + ' | '.join(columns) + ' |', '|' + '---|' * len(columns)]
+    lines += ['| ' + ' | '.join(cell(row.get(c)) for c in columns) + ' |' for row in rows]
+    tmp = output_dir / 'results_table.md.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp, output_dir / 'results_table.md')
+    return rows
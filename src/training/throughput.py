@@ -0,0 +1,264 @@
+"""
+训练吞吐量统计
+results.csv 只记录每轮累计的 time, 无法判断一轮 2000 秒是卡在数据加载还是计算上.
+ThroughputMeter 通过 ultralytics 回调和模型/优化器钩子, 把每次迭代拆成:
+
+    data_wait    上一次迭代结束 -> 拿到下一个 batch (dataloader 等待)
+    preprocess   拿到 batch -> 进入模型 (warmup 学习率、拷贝到设备、归一化)
+    forward      模型前向 + 损失
+    backward     前向结束 -> 优化器步骤 (反向传播, 含少量日志开销)
+    optimizer    optimizer_step (梯度裁剪、参数更新、EMA)
+
+并记录 images/sec 和峰值内存 (主进程 + dataloader worker 的 RSS 之和).
+结果写在 results.csv 旁边:
+
+    throughput.csv             每轮一行: 各阶段合计秒数、占比、images/sec、验证耗时、峰值内存
+    throughput_iterations.csv  每次迭代一行 (毫秒)
+
+用法:
+    from src.training.throughput import ThroughputMeter
+
+    meter = ThroughputMeter()
+    meter.attach(model)            # model 为 ultralytics.YOLO
+    model.train(...)
+    exp_info['throughput'] = meter.summary()
+"""
+
+import csv
+import os
+import time
+from pathlib import Path
+
+
+PHASES = ('data_wait', 'preprocess', 'forward', 'backward', 'optimizer')
+
+EPOCH_CSV_NAME = 'throughput.csv'
+ITERATION_CSV_NAME = 'throughput_iterations.csv'
+
+
+def _rss_bytes(process):
+    """主进程与所有子进程 (dataloader worker) 的 RSS 之和"""
+    if process is None:
+        # 没有 psutil 时只能取主进程历史峰值 (Linux 上单位为 KB); resource 仅在 Unix 上可用
+        try:
+            import resource
+        except ImportError:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    total = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except Exception:
+            pass  # worker 已退出
+    return total
+
+
+class ThroughputMeter:
+    """
+    训练吞吐量统计回调
+
+    Args:
+        sync: 计时前同步 CUDA (默认在 GPU 训练时开启, 否则 GPU 异步执行会把计算时间算到别的阶段)
+        rss_every: 每隔多少次迭代采样一次内存 (遍历 worker 进程有开销)
+        per_iteration: 是否写出每次迭代的明细
+    """
+
+    def __init__(self, sync=None, rss_every=10, per_iteration=True):
+        self.sync = sync
+        self._cuda = False
+        self.rss_every = rss_every
+        self.per_iteration = per_iteration
+        self.epochs = []
+
+        try:
+            import psutil
+            self._process = psutil.Process(os.getpid())
+        except ImportError:
+            self._process = None
+
+    def attach(self, model):
+        """在 YOLO 模型上注册回调; 之后的 model.train(...) 会自动统计"""
+        model.add_callback('on_train_start', self.on_train_start)
+        model.add_callback('on_train_epoch_start', self.on_train_epoch_start)
+        model.add_callback('on_train_batch_start', self.on_train_batch_start)
+        model.add_callback('on_train_batch_end', self.on_train_batch_end)
+        model.add_callback('on_train_epoch_end', self.on_train_epoch_end)
+        model.add_callback('on_fit_epoch_end', self.on_fit_epoch_end)
+        return self
+
+    def detach(self, model):
+        """从 YOLO 模型上移除回调 (同一个模型多次训练时避免重复统计)"""
+        for event, callbacks in model.callbacks.items():
+            model.callbacks[event] = [c for c in callbacks if getattr(c, '__self__', None) is not self]
+
+    # ---------------- 计时 ----------------
+
+    def _now(self):
+        if self._cuda:
+            import torch
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _forward_pre_hook(self, module, args):
+        if self._in_batch and self._depth == 0:
+            self._forward_start = self._now()
+            batch = args[0] if args else None
+            if isinstance(batch, dict) and 'img' in batch:
+                self._batch_images = int(batch['img'].shape[0])
+        self._depth += 1
+
+    def _forward_hook(self, module, args, output):
+        self._depth -= 1
+        if self._in_batch and self._depth == 0:
+            self._forward_end = self._now()
+
+    def _wrap_optimizer_step(self, trainer):
+        step = trainer.optimizer_step
+
+        def timed_step():
+            start = self._now()
+            step()
+            end = self._now()
+            self._optimizer_start = start if self._optimizer_start is None else self._optimizer_start
+            self._optimizer_time += end - start
+
+        # 实例属性覆盖方法, _do_train 中的 self.optimizer_step() 会调用这里
+        trainer.optimizer_step = timed_step
+
+    # ---------------- 回调 ----------------
+
+    def on_train_start(self, trainer):
+        self.save_dir = Path(trainer.save_dir)
+        self._cuda = trainer.device.type == 'cuda' and self.sync is not False
+        self._depth = 0
+        self._in_batch = False
+        trainer.model.register_forward_pre_hook(self._forward_pre_hook)
+        trainer.model.register_forward_hook(self._forward_hook)
+        self._wrap_optimizer_step(trainer)
+        self._batch_size = trainer.batch_size
+        self._peak_rss = _rss_bytes(self._process)
+
+        # 断点续训时保留已有记录
+        for name in (EPOCH_CSV_NAME, ITERATION_CSV_NAME):
+            path = self.save_dir / name
+            if path.exists() and not trainer.args.resume:
+                path.unlink()
+
+    def on_train_epoch_start(self, trainer):
+        self._epoch = {phase: 0.0 for phase in PHASES}
+        self._epoch.update(iterations=0, images=0)
+        self._iterations = []
+        self._epoch_start = self._last_end = self._now()
+
+    def on_train_batch_start(self, trainer):
+        self._batch_start = self._now()
+        self._in_batch = True
+        self._forward_start = self._forward_end = None
+        self._optimizer_start = None
+        self._optimizer_time = 0.0
+        self._batch_images = self._batch_size
+
+    def on_train_batch_end(self, trainer):
+        end = self._now()
+        self._in_batch = False
+        forward_start = self._forward_start or self._batch_start
+        forward_end = self._forward_end or forward_start
+        backward_end = self._optimizer_start or (end - self._optimizer_time)
+
+        timings = {
+            'data_wait': self._batch_start - self._last_end,
+            'preprocess': forward_start - self._batch_start,
+            'forward': forward_end - forward_start,
+            'backward': max(backward_end - forward_end, 0.0),
+            'optimizer': self._optimizer_time,
+        }
+        for phase, seconds in timings.items():
+            self._epoch[phase] += seconds
+        self._epoch['iterations'] += 1
+        self._epoch['images'] += self._batch_images
+        self._last_end = end
+
+        if self._epoch['iterations'] % self.rss_every == 0:
+            self._peak_rss = max(self._peak_rss, _rss_bytes(self._process))
+
+        if self.per_iteration:
+            row = {'epoch': trainer.epoch + 1, 'iteration': self._epoch['iterations'], 'images': self._batch_images}
+            row.update({f'{phase}_ms': round(seconds * 1000, 3) for phase, seconds in timings.items()})
+            row['images_per_sec'] = round(self._batch_images / max(end - self._batch_start + timings['data_wait'], 1e-9), 2)
+            self._iterations.append(row)
+
+    def on_train_epoch_end(self, trainer):
+        self._train_end = self._now()
+        self._peak_rss = max(self._peak_rss, _rss_bytes(self._process))
+
+    def on_fit_epoch_end(self, trainer):
+        # final_eval 在训练结束后用 best.pt 验证时会再触发一次, 此时没有新的迭代
+        if not self._epoch['iterations']:
+            return
+        train_seconds = self._train_end - self._epoch_start
+        row = {'epoch': trainer.epoch + 1, 'iterations': self._epoch['iterations'], 'images': self._epoch['images']}
+        row.update({f'{phase}_s': round(self._epoch[phase], 3) for phase in PHASES})
+        row['train_s'] = round(train_seconds, 3)
+        row['val_s'] = round(time.perf_counter() - self._train_end, 3)  # 验证 + 保存检查点
+        row['data_wait_frac'] = round(self._epoch['data_wait'] / max(train_seconds, 1e-9), 4)
+        row['images_per_sec'] = round(self._epoch['images'] / max(train_seconds, 1e-9), 2)
+        row['peak_rss_mb'] = round(self._peak_rss / 1024 / 1024, 1)
+        self.epochs.append(row)
+
+        _append_rows(self.save_dir / EPOCH_CSV_NAME, [row])
+        if self.per_iteration:
+            _append_rows(self.save_dir / ITERATION_CSV_NAME, self._iterations)
+        self._epoch['iterations'] = 0
+
+    # ---------------- 汇总 ----------------
+
+    def summary(self):
+        """
+        全部轮次的汇总 (写入 experiment_info)
+
+        第一轮包含 dataloader worker 启动和缓存预热, 有多轮时均值不计第一轮
+        """
+        if not self.epochs:
+            return None
+        steady = self.epochs[1:] or self.epochs
+        train_seconds = sum(r['train_s'] for r in steady)
+        iterations = sum(r['iterations'] for r in steady)
+        phase_ms = {phase: round(sum(r[f'{phase}_s'] for r in steady) / iterations * 1000, 2) for phase in PHASES}
+        bound = 'dataloader' if phase_ms['data_wait'] > sum(v for k, v in phase_ms.items() if k != 'data_wait') else 'compute'
+        return {
+            'epochs': len(self.epochs),
+            'images_per_sec': round(sum(r['images'] for r in steady) / max(train_seconds, 1e-9), 2),
+            'ms_per_iteration': phase_ms,
+            'data_wait_frac': round(sum(r['data_wait_s'] for r in steady) / max(train_seconds, 1e-9), 4),
+            'bound': bound,
+            'train_s_per_epoch': round(train_seconds / len(steady), 1),
+            'val_s_per_epoch': round(sum(r['val_s'] for r in steady) / len(steady), 1),
+            'peak_rss_mb': max(r['peak_rss_mb'] for r in self.epochs),
+            'csv': str(self.save_dir / EPOCH_CSV_NAME),
+        }
+
+
+def format_summary(summary):
+    """把 summary() 格式化为几行文本"""
+    if not summary:
+        return "  (没有吞吐量记录)"
+    phases = ', '.join(f"{phase} {ms:.1f}" for phase, ms in summary['ms_per_iteration'].items())
+    return '\n'.join([
+        f"  吞吐量:       {summary['images_per_sec']:.1f} 张/秒 ({summary['train_s_per_epoch']:.0f} 秒/轮 训练, "
+        f"{summary['val_s_per_epoch']:.0f} 秒/轮 验证)",
+        f"  每次迭代 (ms): {phases}",
+        f"  数据等待占比: {summary['data_wait_frac']:.1%} → 瓶颈: {'数据加载' if summary['bound'] == 'dataloader' else '计算'}",
+        f"  峰值内存:     {summary['peak_rss_mb']:.0f} MB",
+    ])
+
+
+def _append_rows(path, rows):
+    if not rows:
+        return
+    new = not path.exists()
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        if new:
+            writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,141 @@
+"""
+实验间热启动
+三个实验只有输入预处理不同 (低光照 / 传统增强 / EnlightenGAN), 却都从 COCO 的 yolov8n.pt 开始训练.
+热启动模式从 Baseline 运行的 best.pt 出发, 在增强数据上微调:
+
+- 可选冻结前 N 层 (YOLOv8 的 backbone 为第 0-9 层, freeze=10 即冻结整个 backbone)
+- 更短的训练计划: 默认轮数为从头训练的 WARM_EPOCH_FRACTION, 不做 warmup, 较小的固定学习率
+  (optimizer='auto' 会忽略 lr0, 所以显式使用 SGD)
+
+训练结束后与同一实验的从头训练运行比较训练耗时和 mAP, 判断微调是否已经足够.
+
+用法:
+    from src.training.warm_start import resolve_weights, WARM_START_ARGS, compare_runs, format_report
+
+    weights = resolve_weights('experiments/exp1_baseline')
+    model = YOLO(weights)
+    model.train(data=..., epochs=15, freeze=10, **WARM_START_ARGS)
+    report = compare_runs('experiments/exp2_traditional/warm', 'experiments/exp2_traditional/run')
+    print(format_report(report))
+"""
+
+import csv
+from pathlib import Path
+
+import yaml
+
+
+# 热启动的训练超参数
+WARM_START_ARGS = {
+    'optimizer': 'SGD',
+    'lr0': 0.002,
+    'warmup_epochs': 0.0,
+}
+
+# YOLOv8 backbone 的层数 (model.0 - model.9)
+BACKBONE_LAYERS = 10
+
+# 热启动默认轮数 = 从头训练轮数 x 该比例
+WARM_EPOCH_FRACTION = 0.3
+
+# mAP50-95 差距不超过该值时认为微调已经足够
+MAP_TOLERANCE = 0.01
+
+
+def resolve_weights(source, weights='best.pt'):
+    """
+    找到热启动权重
+
+    Args:
+        source: .pt 文件; 运行目录 (含 weights/); 或实验目录 (含 experiment_info.yaml, 读取其中的 save_dir)
+
+    Returns:
+        权重路径
+    """
+    source = Path(source)
+    if source.suffix == '.pt':
+        candidates = [source]
+    else:
+        candidates = [source / 'weights' / weights]
+        info_path = source / 'experiment_info.yaml'
+        if info_path.exists():
+            with open(info_path, 'r', encoding='utf-8') as f:
+                save_dir = (yaml.safe_load(f) or {}).get('save_dir')
+            if save_dir:
+                candidates.insert(0, Path(save_dir) / 'weights' / weights)
+        # 实验目录下各次运行中最新的一个
+        candidates += sorted(source.glob(f'*/weights/{weights}'), key=lambda p: p.stat().st_mtime, reverse=True)
+
+    for path in candidates:
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"找不到热启动权重: {source} (需要先完成 Baseline 训练)")
+
+
+def run_summary(run_dir):
+    """
+    从 ultralytics results.csv 读取一次运行的训练耗时和最佳指标
+
+    Returns:
+        {'run', 'epochs', 'train_seconds', 'best_epoch', 'mAP50', 'mAP50-95'}; results.csv 不存在时返回 None
+    """
+    csv_path = Path(run_dir) / 'results.csv'
+    if not csv_path.exists():
+        return None
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+    if not rows:
+        return None
+
+    best = max(rows, key=lambda r: float(r.get('metrics/mAP50-95(B)') or 0))
+    return {
+        'run': str(run_dir),
+        'epochs': len(rows),
+        'train_seconds': float(rows[-1].get('time') or 0),  # 累计秒数
+        'best_epoch': int(float(best['epoch'])),
+        'mAP50': float(best.get('metrics/mAP50(B)') or 0),
+        'mAP50-95': float(best.get('metrics/mAP50-95(B)') or 0),
+    }
+
+
+def compare_runs(warm_dir, scratch_dir, tolerance=MAP_TOLERANCE):
+    """
+    比较热启动运行和从头训练运行
+
+    Returns:
+        {'warm', 'scratch', 'time_saved_s', 'time_ratio', 'gap_mAP50', 'gap_mAP50-95', 'sufficient'};
+        任一运行没有 results.csv 时返回 None. gap = 热启动 - 从头训练 (负数表示热启动更差)
+    """
+    warm, scratch = run_summary(warm_dir), run_summary(scratch_dir)
+    if warm is None or scratch is None:
+        return None
+    gap = warm['mAP50-95'] - scratch['mAP50-95']
+    return {
+        'warm': warm,
+        'scratch': scratch,
+        'time_saved_s': round(scratch['train_seconds'] - warm['train_seconds'], 1),
+        'time_ratio': round(warm['train_seconds'] / scratch['train_seconds'], 3) if scratch['train_seconds'] else None,
+        'gap_mAP50': round(warm['mAP50'] - scratch['mAP50'], 4),
+        'gap_mAP50-95': round(gap, 4),
+        'tolerance': tolerance,
+        'sufficient': gap >= -tolerance,
+    }
+
+
+def format_report(report):
+    """把 compare_runs 的结果格式化为几行文本"""
+    if report is None:
+        return "  (缺少从头训练运行的 results.csv, 无法比较)"
+    warm, scratch = report['warm'], report['scratch']
+    ratio = f"{report['time_ratio']:.0%}" if report['time_ratio'] is not None else '-'
+    lines = [
+        f"  {'':<8} {'轮数':>6} {'训练时间':>10} {'mAP50':>8} {'mAP50-95':>10}",
+        f"  {'热启动':<8} {warm['epochs']:>6} {warm['train_seconds'] / 60:>8.1f}分 {warm['mAP50']:>8.4f} {warm['mAP50-95']:>10.4f}",
+        f"  {'从头训练':<6} {scratch['epochs']:>6} {scratch['train_seconds'] / 60:>8.1f}分 "
+        f"{scratch['mAP50']:>8.4f} {scratch['mAP50-95']:>10.4f}",
+        f"  节省训练时间 {report['time_saved_s'] / 60:.1f} 分钟 (热启动耗时为从头训练的 {ratio}), "
+        f"mAP50-95 差距 {report['gap_mAP50-95']:+.4f}",
+        f"  结论: {'微调已足够' if report['sufficient'] else '微调不足, 建议从头训练'} "
+        f"(容差 {report['tolerance']})",
+    ]
+    return '\n'.join(lines)
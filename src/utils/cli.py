@@ -0,0 +1,67 @@
+"""
+命令行参数与交互输入
+训练 / 评估脚本的每个参数都可以通过命令行给出; 未给出时才交互询问.
+指定 --yes 或标准输入不是终端 (如调度器启动的子进程、nohup、CI) 时不再调用 input(),
+直接使用默认值并跳过确认
+
+用法:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--epochs', type=int)
+    add_yes_argument(parser)
+    args = parser.parse_args()
+
+    epochs = ask(args.epochs, "训练轮数 (默认 20): ", 20, int, args.yes)
+    if not confirm("开始训练？(y/N): ", args.yes):
+        sys.exit(0)
+"""
+
+import sys
+
+
+def add_yes_argument(parser):
+    """添加 -y/--yes: 使用默认值, 不询问也不确认"""
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help='非交互模式: 未指定的参数使用默认值, 跳过所有确认')
+
+
+def is_interactive(assume_yes=False):
+    """是否可以向用户提问"""
+    if assume_yes or sys.stdin is None:
+        return False
+    try:
+        return sys.stdin.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def ask(value, message, default, cast=str, assume_yes=False):
+    """
+    取命令行给出的值; 没有给出时交互询问, 非交互模式下返回默认值
+
+    Args:
+        value: 命令行参数值 (None 表示未指定)
+        message: 询问提示
+        default: 默认值 (直接回车或非交互模式时使用)
+        cast: 输入转换函数, 转换失败时使用默认值
+        assume_yes: 是否指定了 --yes
+    """
+    if value is not None:
+        return value
+    if not is_interactive(assume_yes):
+        return default
+
+    text = input(message).strip()
+    if not text:
+        return default
+    try:
+        return cast(text)
+    except ValueError:
+        print(f"⚠️  无效输入 {text!r}，使用默认值 {default}")
+        return default
+
+
+def confirm(message, assume_yes=False, accept=('y',)):
+    """确认提示; 非交互模式下视为确认"""
+    if not is_interactive(assume_yes):
+        return True
+    return input(message).strip().lower() in accept
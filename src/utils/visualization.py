@@ -95,6 +95,13 @@ try:
     output_dir = Path('comparison_results')
     output_dir.mkdir(exist_ok=True)
     
+    # 解码一次增强图像, 一个批次完成检测 (不再由 predict 按路径重新读盘)
+    from src.models.predictor import draw_detections
+    
+    print("\n检测中...")
+    enhanced_frames = [cv2.imread(str(p)) for p in selected_images]
+    all_detections = detector.detect(enhanced_frames, conf=0.25)
+    
     # 对每张图像生成对比
     for idx, enhanced_img_path in enumerate(selected_images, 1):
         print(f"\n处理第 {idx}/{num_images} 张图像: {enhanced_img_path.name}")
@@ -119,15 +126,12 @@ try:
         else:
             print(f"   ⚠️  未找到低光照图像: {lowlight_img_path.name}")
         
-        enhanced = cv2.imread(str(enhanced_img_path))
+        enhanced = enhanced_frames[idx - 1]
         images['增强图像'] = cv2.cvtColor(enhanced, cv2.COLOR_BGR2RGB)
         
-        # 进行检测
-        print("   检测中...")
-        results = detector.predict(str(enhanced_img_path), conf=0.25, save=False)
-        result = results[0]
-        
-        annotated = result.plot()
+        # 检测结果
+        detections = all_detections[idx - 1]
+        annotated = draw_detections(enhanced, detections, detector.predictor.names)
         images['检测结果'] = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
         
         # 创建对比图
@@ -143,7 +147,7 @@ try:
             ax.axis('off')
         
         # 添加检测信息
-        num_detections = len(result.boxes)
+        num_detections = len(detections)
         fig.suptitle(f'对比 {idx}: {img_name} (检测到 {num_detections} 个标志)', 
                     fontsize=14, fontweight='bold')
         
@@ -1,19 +1,59 @@
 """
 步骤 7: 评估训练好的模型
 在验证集和测试集上评估模型性能
+
+用法:
+    # 交互式 (逐项询问)
+    python scripts/evaluation/evaluate_model.py
+
+    # 非交互, 指标写入 JSON (供 run_experiments.py 汇总)
+    python scripts/evaluation/evaluate_model.py --model experiments/exp1_baseline/run/weights/best.pt \\
+        --data configs/exp1_baseline.yaml --splits val test --device cpu --output-json metrics.json --yes
+
+    # tar 分片数据集 (scripts/preprocessing/export_shards.py 导出)
+    python scripts/evaluation/evaluate_model.py --model ... --data data/shards/baseline_lowlight/dataset.yaml --yes
 """
 
+import argparse
+import json
 import sys
 from pathlib import Path
 
+# 添加项目根目录到路径 (本脚本同时位于项目根目录和 scripts/evaluation/)
+sys.path.append(str(next(p for p in Path(__file__).resolve().parents if (p / 'src').is_dir())))
+
+from src.utils.cli import add_yes_argument, ask, is_interactive
+
+
+def parse_args():
+    """命令行参数; 未指定的参数会交互询问 (--yes 时使用默认值)"""
+    parser = argparse.ArgumentParser(description='评估训练好的模型')
+    parser.add_argument('--model', default=None, help='模型路径 (默认使用 runs/train 中最新的 best.pt)')
+    parser.add_argument('--data', default=None, help='数据集配置 (默认脚本旁的 traffic_signs_dataset.yaml)')
+    parser.add_argument('--splits', nargs='+', choices=['val', 'test'], default=None,
+                        help='评估的数据集划分 (默认 val test)')
+    parser.add_argument('--device', default=None, help='设备 0 / cpu (默认 0)')
+    parser.add_argument('--workers', type=int, default=2, help='数据加载进程数')
+    parser.add_argument('--output-json', default=None, help='把各划分的指标写入 JSON 文件')
+    add_yes_argument(parser)
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+
     print("=" * 60)
     print("📊 步骤 7: 评估模型性能")
     print("=" * 60)
 
     # 自动查找最新的训练模型
     train_dir = Path('runs/train')
-    if train_dir.exists():
+    if args.model:
+        model_path = args.model
+    elif not is_interactive(args.yes):
+        train_runs = [d for d in train_dir.glob('gtsrb*') if (d / 'weights' / 'best.pt').exists()]
+        model_path = max(train_runs, key=lambda x: x.stat().st_mtime) / 'weights' / 'best.pt' if train_runs else ''
+    elif train_dir.exists():
         # 找到最新的训练目录
         train_runs = [d for d in train_dir.iterdir() if d.is_dir() and d.name.startswith('gtsrb')]
         if train_runs:
@@ -50,18 +90,50 @@ def main():
         sys.exit(1)
 
     # 检查配置文件
-    yaml_path = Path(__file__).parent / 'traffic_signs_dataset.yaml'
+    yaml_path = Path(args.data) if args.data else Path(__file__).parent / 'traffic_signs_dataset.yaml'
 
-    if not yaml_path.exists():
+    if not yaml_path.exists() and not args.data:
         # 尝试旧的配置文件
         yaml_path = Path(__file__).parent / 'traffic_signs.yaml'
         if not yaml_path.exists():
             print(f"\n❌ 配置文件不存在: {yaml_path}")
             sys.exit(1)
+    elif not yaml_path.exists():
+        print(f"\n❌ 配置文件不存在: {yaml_path}")
+        sys.exit(1)
 
     print(f"\n✅ 模型路径: {model_path}")
     print(f"✅ 配置文件: {yaml_path}")
 
+    # 如果数据集旁有打包图像存储，直接读取解码后的像素
+    # 声明了变换链的配置则使用虚拟数据集 (见 src/data/virtual_dataset.py)
+    # 指向 tar 分片的配置 (export_shards.py 导出) 则从分片顺序读入 (见 src/data/shards.py)
+    image_store = None
+    virtual = False
+    shards = False
+    try:
+        import yaml
+        with open(yaml_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        dataset_root = Path(config.get('path', ''))
+        virtual = 'transforms' in config
+        if not virtual:
+            from src.data.shards import is_shard_config
+
+            shards = is_shard_config(config)
+        if not virtual and not shards and (dataset_root / 'store').exists():
+            from src.data.image_store import PackedImageStore, ensure_image_store
+
+            # 与源图像不一致 (打包后图像被修改、增删) 的划分重新打包, 不会读到过期的像素
+            store = dataset_root / 'store'
+            for split in PackedImageStore.available_splits(store):
+                if (dataset_root / 'images' / split).is_dir():
+                    ensure_image_store(dataset_root / 'images' / split, store, split)
+            image_store = store
+            print(f"✅ 图像存储: {image_store}")
+    except Exception:
+        pass
+
     # 选择评估数据集
     print("\n" + "=" * 60)
     print("选择评估数据集:")
@@ -70,19 +142,20 @@ def main():
     print("2. test - 测试集")
     print("3. both - 两者都评估 (推荐)")
 
-    choice = input("\n请选择 (1/2/3，默认 3): ").strip()
-
-    if choice == '1':
-        splits = ['val']
-    elif choice == '2':
-        splits = ['test']
+    if args.splits:
+        splits = args.splits
     else:
-        splits = ['val', 'test']
+        choice = ask(None, "\n请选择 (1/2/3，默认 3): ", '3', str, args.yes)
+
+        if choice == '1':
+            splits = ['val']
+        elif choice == '2':
+            splits = ['test']
+        else:
+            splits = ['val', 'test']
 
     # 设备选择
-    device = input("\n使用设备 (0/cpu，默认 0): ").strip()
-    if not device:
-        device = '0'
+    device = ask(args.device, "\n使用设备 (0/cpu，默认 0): ", '0', str, args.yes)
 
     # 开始评估
     print("\n" + "=" * 60)
@@ -92,8 +165,23 @@ def main():
     try:
         from enlightened_gtsrb import GTSRBEnlightenGANDetector
         
+        validator = None
+        data_path = str(yaml_path)
+        if virtual:
+            from src.data.virtual_dataset import VirtualDataset, load_virtual_config
+            from src.data.yolo_adapter import build_validator
+
+            data_path, dataset_kwargs = load_virtual_config(yaml_path)
+            validator = build_validator(VirtualDataset, **dataset_kwargs)
+            print(f"✅ 使用虚拟数据集 ({dataset_kwargs['transforms']})")
+        elif shards:
+            from src.data.yolo_adapter import ShardDataset, build_validator
+
+            validator = build_validator(ShardDataset)
+            print("✅ 使用分片数据集")
+
         # 创建检测器
-        detector = GTSRBEnlightenGANDetector(config_path=str(yaml_path))
+        detector = GTSRBEnlightenGANDetector(config_path=data_path)
         
         # 加载模型
         print(f"\n加载模型...")
@@ -106,7 +194,8 @@ def main():
             print(f"在 {split.upper()} 集上评估...")
             print('=' * 60)
             
-            results = detector.validate(split=split, device=device, workers=2)
+            results = detector.validate(split=split, device=device, workers=args.workers,
+                                        image_store=image_store, validator=validator)
             results_dict[split] = results
             
             print(f"\n✅ {split.upper()} 集评估完成")
@@ -124,13 +213,33 @@ def main():
                 print(f"  Precision:    {results.box.mp:.4f} ({results.box.mp*100:.2f}%)")
                 print(f"  Recall:       {results.box.mr:.4f} ({results.box.mr*100:.2f}%)")
         
+        if args.output_json:
+            metrics = {
+                'model': str(model_path),
+                'data': str(yaml_path),
+                'results': {
+                    split: {
+                        'mAP50': float(results.box.map50),
+                        'mAP50-95': float(results.box.map),
+                        'precision': float(results.box.mp),
+                        'recall': float(results.box.mr),
+                    }
+                    for split, results in results_dict.items() if hasattr(results, 'box')
+                },
+            }
+            output_json = Path(args.output_json)
+            output_json.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_json, 'w', encoding='utf-8') as f:
+                json.dump(metrics, f, ensure_ascii=False, indent=2)
+            print(f"\n✅ 指标已保存: {output_json}")
+        
         print("\n" + "=" * 60)
         print("✅ 评估完成！")
         print("=" * 60)
         
     except KeyboardInterrupt:
         print("\n\n⚠️  评估被用户中断")
-        sys.exit(0)
+        sys.exit(130)
         
     except Exception as e:
         print("\n" + "=" * 60)
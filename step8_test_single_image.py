@@ -89,32 +89,30 @@ try:
     print("\n加载模型...")
     detector.setup_yolov8(str(model_path))
     
+    # 读取图像 (只解码一次, 检测和可视化共用)
+    original = cv2.imread(str(test_image))
+    if original is None:
+        raise ValueError(f"无法读取图像: {test_image}")
+    
     # 预测
     print("正在预测...")
-    results = detector.predict(str(test_image), conf=conf, save=False)
-    
-    # 获取预测结果
-    result = results[0]
+    detections = detector.detect(original, conf=conf)
+    class_names = detector.predictor.names
     
     # 显示检测信息
     print("\n" + "=" * 60)
     print("检测结果:")
     print("=" * 60)
     
-    if len(result.boxes) > 0:
-        print(f"\n检测到 {len(result.boxes)} 个交通标志:\n")
+    if len(detections) > 0:
+        print(f"\n检测到 {len(detections)} 个交通标志:\n")
         
-        # 读取类别名称
-        class_names = result.names
-        
-        for i, box in enumerate(result.boxes):
-            cls = int(box.cls[0])
-            conf_score = float(box.conf[0])
-            class_name = class_names[cls]
+        for i, (box, cls, conf_score) in enumerate(zip(detections.boxes, detections.classes, detections.scores)):
+            class_name = class_names[int(cls)]
             
             print(f"  {i+1}. {class_name}")
             print(f"     置信度: {conf_score:.2%}")
-            print(f"     位置: {box.xyxy[0].tolist()}")
+            print(f"     位置: {[round(v, 1) for v in box.tolist()]}")
             print()
     else:
         print("\n⚠️  未检测到交通标志")
@@ -128,12 +126,12 @@ try:
     print("生成可视化结果...")
     print("=" * 60)
     
-    # 读取原始图像
-    original = cv2.imread(str(test_image))
+    from src.models.predictor import draw_detections
+    
     original_rgb = cv2.cvtColor(original, cv2.COLOR_BGR2RGB)
     
     # 获取预测结果图像
-    annotated = result.plot()
+    annotated = draw_detections(original, detections, class_names)
     annotated_rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
     
     # 绘制对比图
@@ -144,7 +142,7 @@ try:
     axes[0].axis('off')
     
     axes[1].imshow(annotated_rgb)
-    axes[1].set_title(f'检测结果 (检测到 {len(result.boxes)} 个标志)', fontsize=14)
+    axes[1].set_title(f'检测结果 (检测到 {len(detections)} 个标志)', fontsize=14)
     axes[1].axis('off')
     
     plt.tight_layout()
@@ -0,0 +1,143 @@
+"""
+收敛检测与自动续训 (src/training/convergence.py)
+续训的端到端测试需要 ultralytics (未安装时跳过), 其余测试只依赖标准库
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.training.convergence import (ConvergenceMonitor, STATE_NAME, _write_json, find_interrupted_run,
+                                      train_with_resume)
+
+
+class _FakeModel:
+    """记录 load / train 调用的模型替身"""
+
+    def __init__(self):
+        self.ckpt_path = 'yolov8n.pt'
+        self.calls = []
+
+    def load(self, weights):
+        self.calls.append(('load', str(weights)))
+
+    def train(self, **kwargs):
+        self.calls.append(('train', kwargs))
+        return kwargs
+
+
+def _interrupted_run(project, name='run'):
+    run_dir = project / name
+    (run_dir / 'weights').mkdir(parents=True)
+    last = run_dir / 'weights' / 'last.pt'
+    last.write_bytes(b'ckpt')
+    _write_json(run_dir / STATE_NAME, {'status': 'running', 'epoch': 1})
+    return last
+
+
+def test_train_with_resume_uses_last_checkpoint(tmp_path):
+    last = _interrupted_run(tmp_path)
+    model = _FakeModel()
+
+    kwargs = train_with_resume(model, project=tmp_path, name='run', data='data.yaml', epochs=2, exist_ok=True)
+
+    assert model.calls[0] == ('load', str(last))
+    assert model.ckpt_path == str(last)
+    assert kwargs['resume'] == str(last)
+    assert 'exist_ok' not in kwargs
+
+
+def test_train_with_resume_starts_fresh_without_interrupted_run(tmp_path):
+    last = _interrupted_run(tmp_path)
+    _write_json(last.parents[1] / STATE_NAME, {'status': 'finished', 'epoch': 2})
+    model = _FakeModel()
+
+    kwargs = train_with_resume(model, project=tmp_path, name='run', epochs=2)
+
+    assert find_interrupted_run(tmp_path, 'run') is None
+    assert [c[0] for c in model.calls] == ['train']
+    assert 'resume' not in kwargs and kwargs['name'] == 'run'
+
+
+def test_find_interrupted_run_matches_numbered_dirs(tmp_path):
+    _interrupted_run(tmp_path, 'other')
+    last = _interrupted_run(tmp_path, 'run2')
+
+    assert find_interrupted_run(tmp_path, 'run') == last
+
+
+def test_monitor_stops_on_plateau():
+    monitor = ConvergenceMonitor(window=3, min_std=0.001, patience=0, min_epochs=3)
+
+    assert monitor.update(1, 0.50) is None
+    assert monitor.update(2, 0.60) is None
+    assert monitor.update(3, 0.70) is None
+    assert monitor.update(4, 0.7001) is None
+    assert monitor.update(5, 0.7002) is not None
+
+
+def test_monitor_stops_without_improvement():
+    monitor = ConvergenceMonitor(window=3, min_std=0.0, patience=2, min_delta=0.01, min_epochs=1)
+
+    assert monitor.update(1, 0.5) is None
+    assert monitor.update(2, 0.4) is None
+    # 0.505 没有超过最佳值 min_delta, 不算提升
+    reason = monitor.update(3, 0.505)
+    assert reason is not None and monitor.best_epoch == 1
+
+
+def test_monitor_respects_min_epochs_and_disabled():
+    early = ConvergenceMonitor(window=2, min_std=0.1, patience=0, min_epochs=5)
+    assert all(early.update(epoch, 0.5) is None for epoch in range(1, 5))
+    assert early.update(5, 0.5) is not None
+
+    disabled = ConvergenceMonitor(window=2, min_std=0.1, patience=1, min_epochs=1, enabled=False)
+    assert all(disabled.update(epoch, 0.5) is None for epoch in range(1, 6))
+    assert disabled.summary()['epochs_trained'] == 5
+
+
+def test_resume_from_one_epoch_checkpoint(tmp_path):
+    pytest.importorskip('ultralytics')
+    import cv2
+    import numpy as np
+    import yaml
+    from ultralytics import YOLO
+
+    root = tmp_path / 'dataset'
+    rng = np.random.default_rng(0)
+    for split in ('train', 'val'):
+        (root / 'images' / split).mkdir(parents=True)
+        (root / 'labels' / split).mkdir(parents=True)
+        for i in range(4):
+            cv2.imwrite(str(root / 'images' / split / f'{i}.png'), rng.integers(0, 255, (64, 64, 3), dtype=np.uint8))
+            (root / 'labels' / split / f'{i}.txt').write_text('0 0.5 0.5 0.5 0.5\n')
+    data = tmp_path / 'data.yaml'
+    data.write_text(yaml.dump({'path': str(root), 'train': 'images/train', 'val': 'images/val', 'names': ['a']}))
+
+    class Interrupt(Exception):
+        pass
+
+    def interrupt(trainer):
+        raise Interrupt
+
+    train_kwargs = dict(data=str(data), epochs=2, imgsz=64, batch=2, workers=0, device='cpu', plots=False)
+    project = tmp_path / 'runs'
+
+    model = YOLO('yolov8n.yaml')
+    ConvergenceMonitor(enabled=False).attach(model)
+    model.add_callback('on_fit_epoch_end', interrupt)
+    with pytest.raises(Interrupt):
+        train_with_resume(model, project=str(project), name='run', **train_kwargs)
+    last = find_interrupted_run(project, 'run')
+    assert last is not None
+
+    model = YOLO('yolov8n.yaml')
+    monitor = ConvergenceMonitor(enabled=False).attach(model)
+    train_with_resume(model, project=str(project), name='run', **train_kwargs)
+
+    assert monitor.resumed_from == str(last)
+    assert model.trainer.start_epoch == 1
+    assert find_interrupted_run(project, 'run') is None
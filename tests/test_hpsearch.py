@@ -0,0 +1,104 @@
+"""
+ASHA 搜索 (src/training/hpsearch.py): 晋级规则、试验缓存、搜索空间
+只测试调度和缓存逻辑, 不运行训练 (不需要 ultralytics)
+"""
+
+import json
+import math
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.training.hpsearch import (ASHA, DEFAULT_SPACE, TRIALS_NAME, TrialCache, apply_transform_params,
+                                   config_params, rung_epochs, split_params)
+
+
+def test_rung_epochs():
+    assert rung_epochs(2, 18, 3) == [2, 6, 18]
+    assert rung_epochs(2, 17, 3) == [2, 6]
+    assert rung_epochs(1, 1, 3) == [1]
+
+
+def test_asha_samples_until_a_rung_has_eta_results():
+    asha = ASHA(n_rungs=3, eta=3, n_trials=9)
+
+    assert [asha.next_job() for _ in range(2)] == [(0, 0), (1, 0)]
+    asha.report(0, 0, 0.5)
+    asha.report(1, 0, 0.7)
+    # 2 个结果中前 1/3 为 0 个, 继续采样新配置
+    assert asha.next_job() == (2, 0)
+    asha.report(2, 0, 0.6)
+    # 3 个结果中前 1 个晋级, 且只晋级一次
+    assert asha.next_job() == (1, 1)
+    assert asha.next_job() == (3, 0)
+
+
+def test_asha_prefers_higher_rungs_and_skips_failures():
+    asha = ASHA(n_rungs=3, eta=2, n_trials=4)
+    assert [asha.next_job() for _ in range(4)] == [(i, 0) for i in range(4)]
+    for config_id, score in enumerate([None, 0.2, 0.3, 0.1]):
+        asha.report(config_id, 0, score)
+
+    # 失败的试验 (-inf) 排在最后; 前 2 个是 2、1
+    assert asha.next_job() == (2, 1)
+    asha.report(2, 1, 0.4)
+    assert asha.next_job() == (1, 1)
+    asha.report(1, 1, 0.5)
+    # 第 1 级有两个结果后, 先晋级到第 2 级
+    assert asha.next_job() == (1, 2)
+    assert asha.next_job() is None
+
+    asha.report(1, 2, 0.45)
+    assert asha.best() == (1, 2, 0.45)
+
+
+def test_asha_never_promotes_failed_trials():
+    asha = ASHA(n_rungs=2, eta=1, n_trials=1)
+    assert asha.next_job() == (0, 0)
+    asha.report(0, 0, None)
+
+    assert asha.results[0][0] == -math.inf
+    assert asha.next_job() is None
+    assert asha.best() is None
+
+
+def test_trial_cache_roundtrip(tmp_path):
+    cache = TrialCache(tmp_path)
+    cache.add({'key': 'a', 'config_id': 0, 'rung': 0, 'params': {'lr0': 0.01}, 'score': 0.3, 'status': 'done'})
+    cache.add({'key': 'b', 'config_id': 1, 'rung': 0, 'params': {'lr0': 0.02}, 'score': None, 'status': 'failed'})
+    cache.add({'key': 'a', 'config_id': 0, 'rung': 0, 'params': {'lr0': 0.01}, 'score': 0.4, 'status': 'done'})
+    with open(tmp_path / TRIALS_NAME, 'a', encoding='utf-8') as f:
+        f.write('{"key": "c", "sta')  # 中断时写了一半的行
+
+    reloaded = TrialCache(tmp_path)
+    assert reloaded.get('a')['score'] == 0.4
+    assert reloaded.get('b') is None          # 失败的试验重新运行
+    assert reloaded.get('c') is None
+    assert [json.loads(line)['key'] for line in (tmp_path / TRIALS_NAME).read_text().splitlines()[:3]] == ['a', 'b', 'a']
+
+    rows = reloaded.write_table().read_text().splitlines()
+    assert rows[0].startswith('key,config_id,rung,epochs,lr0,score')
+    assert [row.split(',')[0] for row in rows[1:]] == ['a', 'b']
+
+
+def test_config_params_are_reproducible():
+    params = config_params(DEFAULT_SPACE, seed=0, config_id=3)
+
+    assert params == config_params(DEFAULT_SPACE, seed=0, config_id=3)
+    assert params != config_params(DEFAULT_SPACE, seed=0, config_id=4)
+    assert 1.0 <= params['clahe.clip_limit'] <= 4.0
+    assert params['imgsz'] in DEFAULT_SPACE['imgsz']['choices']
+
+    transform, train = split_params(params)
+    assert set(transform) == {'clahe.clip_limit', 'clahe.tile', 'gamma.gamma'}
+    assert set(train) == {'lr0', 'imgsz'}
+
+
+def test_apply_transform_params_rewrites_all_matching_steps():
+    steps = [{'op': 'clahe', 'clip_limit': 2.0}, {'op': 'gamma', 'gamma': 1.0}, {'op': 'clahe', 'tile': 8}]
+
+    result = apply_transform_params(steps, {'clahe.clip_limit': 3.0})
+
+    assert [s.get('clip_limit') for s in result] == [3.0, None, 3.0]
+    assert steps[2] == {'op': 'clahe', 'tile': 8}
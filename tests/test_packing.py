@@ -0,0 +1,95 @@
+"""
+小目标拼接的布局与标签换算 (src/data/packing.py)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.data.packing import canvas_labels, compose_canvas, plan_canvases
+
+
+def _placed(layouts):
+    return np.concatenate(layouts)
+
+
+def test_layout_places_every_crop_once_without_overlap():
+    rng = np.random.default_rng(0)
+    sizes = rng.integers(30, 100, (300, 2))
+
+    layouts = plan_canvases(sizes, canvas_size=320, seed=0, gap=2)
+
+    placed = _placed(layouts)
+    assert sorted(placed[:, 0].tolist()) == list(range(len(sizes)))
+    assert len(layouts) > 1
+    for layout in layouts:
+        _, x, y, w, h = layout.T
+        assert (x >= 0).all() and (y >= 0).all()
+        assert (x + w <= 320).all() and (y + h <= 320).all()
+        mask = np.zeros((320, 320), dtype=np.int64)
+        for _, x0, y0, w0, h0 in layout:
+            mask[y0:y0 + h0, x0:x0 + w0] += 1
+        assert mask.max() == 1
+    # 不缩放时保持原尺寸
+    assert (placed[np.argsort(placed[:, 0])][:, 3:] == sizes).all()
+
+
+def test_layout_is_deterministic_per_seed():
+    sizes = np.random.default_rng(1).integers(30, 60, (50, 2))
+
+    a = plan_canvases(sizes, canvas_size=256, seed=3, scale_range=(0.5, 1.5))
+    b = plan_canvases(sizes, canvas_size=256, seed=3, scale_range=(0.5, 1.5))
+    c = plan_canvases(sizes, canvas_size=256, seed=4, scale_range=(0.5, 1.5))
+
+    assert all((x == y).all() for x, y in zip(a, b)) and len(a) == len(b)
+    assert not all(len(x) == len(y) and (x == y).all() for x, y in zip(a, c))
+
+
+def test_crop_size_scales_long_side():
+    sizes = np.array([(40, 30), (25, 50), (64, 64)])
+
+    placed = _placed(plan_canvases(sizes, canvas_size=640, crop_size=128))
+
+    placed = placed[np.argsort(placed[:, 0])]
+    assert placed[:, 3:].max(axis=1).tolist() == [128, 128, 128]
+    assert placed[:, 3:].tolist() == [[128, 96], [64, 128], [128, 128]]
+
+
+def test_oversized_crop_fits_canvas():
+    layouts = plan_canvases([(800, 400), (10, 10)], canvas_size=200)
+
+    placed = _placed(layouts)
+    big = placed[placed[:, 0] == 0][0]
+    assert big[3:].tolist() == [200, 100]
+
+
+def test_canvas_labels_map_boxes_to_canvas():
+    layout = np.array([(0, 0, 0, 100, 50), (1, 200, 100, 40, 40), (2, 300, 300, 20, 20)])
+    crop_labels = [
+        np.array([[3, 0.5, 0.5, 1.0, 1.0]], dtype=np.float32),
+        np.array([[1, 0.25, 0.75, 0.5, 0.5]], dtype=np.float32),
+        np.zeros((0, 5), dtype=np.float32),
+    ]
+
+    labels = canvas_labels(layout, crop_labels, canvas_size=400)
+
+    assert labels.dtype == np.float32
+    np.testing.assert_allclose(labels, [
+        [3, 50 / 400, 25 / 400, 100 / 400, 50 / 400],
+        [1, 210 / 400, 130 / 400, 20 / 400, 20 / 400],
+    ], rtol=1e-6)
+    assert canvas_labels(layout[2:], crop_labels, canvas_size=400).shape == (0, 5)
+
+
+def test_compose_canvas_resizes_crops_into_layout():
+    layout = np.array([(0, 10, 20, 8, 4), (1, 0, 0, 4, 4)])
+    crops = [np.full((2, 4, 3), 200, dtype=np.uint8), None]
+
+    canvas = compose_canvas(layout, crops.__getitem__, canvas_size=32, fill=0)
+
+    assert canvas.shape == (32, 32, 3)
+    assert (canvas[20:24, 10:18] == 200).all()
+    assert canvas.sum() == 200 * 8 * 4 * 3      # 读取失败的裁剪图留空
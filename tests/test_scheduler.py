@@ -0,0 +1,98 @@
+"""
+实验调度器 (src/training/scheduler.py): 依赖失败时跳过、按 state.jsonl 续跑
+实验脚本是临时目录中的小 Python 脚本, 不需要 ultralytics
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.training.scheduler import STATE_NAME, load_specs, load_state, run_experiments
+
+
+SCRIPT = """
+import sys
+from pathlib import Path
+
+with open(Path(__file__).with_suffix('.runs'), 'a') as f:
+    f.write(sys.argv[1] + '\\n')
+sys.exit(int(sys.argv[2]))
+"""
+
+
+def _write_manifest(tmp_path, experiments):
+    script = tmp_path / 'job.py'
+    script.write_text(SCRIPT)
+    manifest = tmp_path / 'experiments.yaml'
+    manifest.write_text(yaml.dump({
+        'defaults': {'script': str(script), 'cpus': 1},
+        'experiments': [{'name': name, 'args': [name, code, *extra], 'after': after}
+                        for name, code, after, *extra in experiments],
+    }))
+    return manifest
+
+
+def _runs(tmp_path):
+    path = tmp_path / 'job.runs'
+    return path.read_text().split() if path.exists() else []
+
+
+def _run(manifest, state_dir, **kwargs):
+    return run_experiments(load_specs(manifest), state_dir, poll_interval=0.01, **kwargs)
+
+
+def test_failed_dependency_skips_dependents(tmp_path):
+    manifest = _write_manifest(tmp_path, [('train', 1, []), ('eval', 0, ['train']), ('other', 0, [])])
+
+    state = _run(manifest, tmp_path / 'state', max_parallel=1)
+
+    assert state['train']['status'] == 'failed' and state['train']['returncode'] == 1
+    assert state['eval']['status'] == 'skipped'
+    assert state['other']['status'] == 'done'
+    assert sorted(_runs(tmp_path)) == ['other', 'train']
+
+
+def test_resume_reruns_only_unfinished(tmp_path):
+    state_dir = tmp_path / 'state'
+    manifest = _write_manifest(tmp_path, [('a', 0, []), ('b', 1, []), ('c', 0, ['a'])])
+    _run(manifest, state_dir)
+    assert sorted(_runs(tmp_path)) == ['a', 'b', 'c']
+
+    # 中断时写了一半的行被忽略
+    with open(state_dir / STATE_NAME, 'a', encoding='utf-8') as f:
+        f.write('{"name": "a", "sta')
+    assert load_state(state_dir)['a']['status'] == 'done'
+
+    # b 修复后重新运行; a / c 已成功且参数未变, 跳过
+    manifest = _write_manifest(tmp_path, [('a', 0, []), ('b', 0, []), ('c', 0, ['a'])])
+    state = _run(manifest, state_dir)
+    assert _runs(tmp_path)[3:] == ['b']
+    assert all(record['status'] == 'done' for record in state.values())
+
+    # force 和参数改变都会重新运行
+    manifest = _write_manifest(tmp_path, [('a', 0, []), ('b', 0, []), ('c', 0, ['a'], '--epochs=2')])
+    _run(manifest, state_dir, force=('a',))
+    assert sorted(_runs(tmp_path)[4:]) == ['a', 'c']
+
+
+def test_load_specs_validates_manifest(tmp_path):
+    manifest = _write_manifest(tmp_path, [('a', 0, ['missing'])])
+    with pytest.raises(ValueError, match='missing'):
+        load_specs(manifest)
+
+    manifest.write_text(yaml.dump({'experiments': [{'name': 'a', 'script': 'x.py'}, {'name': 'a', 'script': 'y.py'}]}))
+    with pytest.raises(ValueError):
+        load_specs(manifest)
+
+
+def test_state_records_are_json_lines(tmp_path):
+    manifest = _write_manifest(tmp_path, [('a', 0, [])])
+    _run(manifest, tmp_path / 'state')
+
+    lines = (tmp_path / 'state' / STATE_NAME).read_text().splitlines()
+    assert [json.loads(line)['status'] for line in lines] == ['running', 'done']
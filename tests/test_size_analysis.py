@@ -0,0 +1,68 @@
+"""
+按尺寸分布选择 imgsz / rect (src/data/size_analysis.py)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.data.size_analysis import evaluate_imgsz, recommend_imgsz, sizes_from_csv
+
+
+def test_evaluate_imgsz_pixel_waste():
+    stats = evaluate_imgsz([(32, 32), (128, 64)], imgsz=64, batch=2)
+
+    # (32, 32) 放大到 64x64: 4096 像素中 3072 个是插值出来的; (128, 64) 被缩小
+    assert stats['upsampled'] == pytest.approx(3072 / (4096 + 2048))
+    assert stats['downscaled'] == 0.5
+    assert stats['pad_square'] == pytest.approx(1 - 6144 / 8192)
+    assert stats['pixels_square'] == 2 * 64 ** 2
+
+
+def test_recommend_smallest_imgsz_covering_percentile():
+    rng = np.random.default_rng(0)
+    side = rng.integers(30, 91, 1000)
+    sizes = np.stack([side, side], axis=1)
+
+    choice = recommend_imgsz(sizes, percentile=95)
+
+    assert choice['imgsz'] == 96
+    assert choice['rect'] is False                 # 正方形图像, 矩形批次没有收益
+    assert choice['summary']['count'] == 1000
+    assert [e['imgsz'] for e in choice['candidates']] == [64, 96, 128, 160, 192, 224, 256, 320, 416, 512, 640]
+
+
+def test_recommend_rect_for_wide_images():
+    sizes = np.array([(200, 100)] * 32)
+
+    choice = recommend_imgsz(sizes, candidates=(256, 320), batch=16)
+
+    assert choice['imgsz'] == 256
+    assert choice['rect'] is True
+    chosen = choice['candidates'][0]
+    assert chosen['pad_square'] == pytest.approx(0.5)
+    assert chosen['pad_rect'] == pytest.approx(0.0)    # 256x128 的批次形状正好容纳
+
+
+def test_recommend_falls_back_to_largest_candidate():
+    choice = recommend_imgsz([(1000, 800)], candidates=(100, 320, 640))
+
+    assert choice['imgsz'] == 640                  # 100 不是 stride 的倍数, 被忽略
+    assert [e['imgsz'] for e in choice['candidates']] == [320, 640]
+    with pytest.raises(ValueError):
+        recommend_imgsz(np.zeros((0, 2)))
+
+
+def test_sizes_from_csv(tmp_path):
+    class_dir = tmp_path / 'Final_Training' / 'Images' / '00000'
+    class_dir.mkdir(parents=True)
+    (class_dir / 'GT-00000.csv').write_text(
+        'Filename;Width;Height;Roi.X1;Roi.Y1;Roi.X2;Roi.Y2;ClassId\n'
+        '00000_00000.ppm;29;30;5;6;24;25;0\n'
+        '00000_00001.ppm;40;42;5;5;35;37;0\n')
+
+    assert sizes_from_csv(tmp_path).tolist() == [[29, 30], [40, 42]]
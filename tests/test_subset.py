@@ -0,0 +1,106 @@
+"""
+分层子集与排名一致性 (src/data/subset.py)
+"""
+
+import math
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+import yaml
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.data.subset import (average_ranks, brightness_buckets, kendall_tau, ranking_agreement, spearman,
+                             stratified_sample, write_subset_config)
+
+
+def test_stratified_sample_keeps_every_stratum():
+    files = [f'{i}.png' for i in range(23)]
+    strata = [0] * 20 + [1, 2, 2]
+
+    chosen = stratified_sample(files, 0.1, strata, seed=0)
+
+    counts = Counter(strata[files.index(f)] for f in chosen)
+    assert counts == {0: 2, 1: 1, 2: 1}
+    assert chosen == sorted(chosen, key=files.index)   # 保持原顺序
+    assert chosen == stratified_sample(files, 0.1, strata, seed=0)
+    assert stratified_sample(files, 1.0, strata) == files
+
+
+def test_stratified_sample_with_tuple_strata():
+    files = [f'{i}.png' for i in range(40)]
+    strata = [(i % 4, i % 2) for i in range(40)]
+
+    chosen = stratified_sample(files, 0.5, strata, seed=1)
+
+    assert len(chosen) == 20
+    assert Counter(strata[files.index(f)] for f in chosen) == {(0, 0): 5, (1, 1): 5, (2, 0): 5, (3, 1): 5}
+
+
+def test_brightness_buckets_are_equal_frequency():
+    buckets, edges = brightness_buckets([10, 20, 30, 40, np.nan, 50, 60, 70, 80], n_buckets=4)
+
+    assert len(edges) == 3
+    assert buckets[4] == -1
+    assert Counter(buckets.tolist()) == {0: 2, 1: 2, 2: 2, 3: 2, -1: 1}
+
+
+def test_average_ranks_with_ties():
+    assert average_ranks([0.5, 0.9, 0.5, 0.1]).tolist() == [2.5, 1.0, 2.5, 4.0]
+
+
+def test_spearman():
+    assert spearman([1, 2, 3, 4], [10, 20, 30, 40]) == pytest.approx(1.0)
+    assert spearman([1, 2, 3, 4], [4, 3, 2, 1]) == pytest.approx(-1.0)
+    # 名次 (4,3,2,1) 与 (3,4,1,2): 1 - 6 * sum(d^2) / (n (n^2 - 1)) = 1 - 6 * 4 / 60
+    assert spearman([1, 2, 3, 4], [2, 1, 4, 3]) == pytest.approx(0.6)
+    assert spearman([1, 2, 3], [5, 5, 5]) is None
+
+
+def test_kendall_tau_b():
+    assert kendall_tau([1, 2, 3, 4], [1, 2, 3, 4]) == pytest.approx(1.0)
+    assert kendall_tau([1, 2, 3, 4], [4, 3, 2, 1]) == pytest.approx(-1.0)
+    # 6 对中 5 对一致, b 中有 1 对并列: 5 / sqrt(6 * 5)
+    assert kendall_tau([1, 2, 3, 4], [1, 2, 2, 3]) == pytest.approx(5 / math.sqrt(30))
+    assert kendall_tau([1, 1, 1], [1, 2, 3]) is None
+
+
+def test_ranking_agreement():
+    proxy = {'clahe': 0.60, 'gamma': 0.55, 'none': 0.40, 'proxy_only': 0.9}
+    full = {'clahe': 0.70, 'gamma': 0.72, 'none': 0.50}
+
+    report = ranking_agreement(proxy, full)
+
+    assert report['methods'] == ['clahe', 'gamma', 'none']
+    assert report['proxy_order'] == ['clahe', 'gamma', 'none']
+    assert report['full_order'] == ['gamma', 'clahe', 'none']
+    assert report['top1_match'] is False
+    assert report['pairs_agree'] == pytest.approx(2 / 3)
+    assert report['kendall'] == pytest.approx(1 / 3)
+    with pytest.raises(ValueError):
+        ranking_agreement({'a': 1.0}, {'a': 1.0})
+
+
+def test_write_subset_config(tmp_path):
+    root = tmp_path / 'dataset'
+    for split in ('train', 'val'):
+        (root / 'images' / split).mkdir(parents=True)
+        (root / 'labels' / split).mkdir(parents=True)
+        for i in range(10):
+            (root / 'images' / split / f'{i}.png').write_bytes(b'')
+            (root / 'labels' / split / f'{i}.txt').write_text(f'{i % 2} 0.5 0.5 0.5 0.5\n')
+    config = tmp_path / 'data.yaml'
+    config.write_text(yaml.dump({'path': str(root), 'train': 'images/train', 'val': 'images/val',
+                                 'names': ['a', 'b'], 'transforms': [{'op': 'clahe'}]}))
+
+    subset_path = write_subset_config(config, tmp_path / 'subset', {'train': 0.2}, seed=0)
+
+    subset = yaml.safe_load(subset_path.read_text())
+    train = Path(subset['train']).read_text().split()
+    assert len(train) == 2 and {int(Path(p).stem) % 2 for p in train} == {0, 1}
+    assert subset['val'] == 'images/val'
+    assert subset['transforms'] == [{'op': 'clahe'}]
+    assert subset['subset']['counts']['train'] == {'total': 10, 'subset': 2, 'strata': 2, 'strata_covered': 2}
@@ -0,0 +1,70 @@
+"""
+冒烟测试: 自定义图像来源的数据集在开启 mosaic / rect 时可以正常取样
+需要 ultralytics (未安装时跳过)
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+pytest.importorskip('ultralytics')
+
+
+def _make_dataset(root, n=6, size=48, vary=False):
+    images_dir = root / 'images' / 'train'
+    labels_dir = root / 'labels' / 'train'
+    images_dir.mkdir(parents=True)
+    labels_dir.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for i in range(n):
+        cv2.imwrite(str(images_dir / f'{i:05d}.png'), rng.integers(0, 255, (size, size + 8 * (n - i if vary else 1), 3), dtype=np.uint8))
+        (labels_dir / f'{i:05d}.txt').write_text(f'{i % 2} 0.5 0.5 0.6 0.6\n')
+    return images_dir
+
+
+def test_decoded_cache_dataset_mosaic(tmp_path):
+    from ultralytics.cfg import get_cfg
+
+    from src.data.decoded_cache import build_decoded_cache
+    from src.data.yolo_adapter import DecodedCacheDataset, build_adapter_dataset
+
+    images_dir = _make_dataset(tmp_path / 'dataset')
+    imgsz = 64
+    cache_root = tmp_path / 'cache'
+    build_decoded_cache(images_dir, imgsz, cache_root=cache_root, workers=1)
+
+    cfg = get_cfg(overrides={'imgsz': imgsz, 'mosaic': 1.0, 'cache': False})
+    data = {'names': {0: 'a', 1: 'b'}, 'nc': 2}
+    dataset = build_adapter_dataset(DecodedCacheDataset, cfg, str(images_dir), 2, data, mode='train',
+                                    cache_root=cache_root)
+
+    for i in range(len(dataset)):
+        sample = dataset[i]
+        assert sample['img'].shape[-2:] == (imgsz, imgsz)
+    assert dataset.buffer
+    assert all(dataset.ims[j] is not None for j in dataset.buffer)
+
+
+def test_shard_dataset_rect_order(tmp_path):
+    from ultralytics.cfg import get_cfg
+
+    from src.data.shards import export_dataset
+    from src.data.yolo_adapter import ShardDataset, build_adapter_dataset
+
+    _make_dataset(tmp_path / 'dataset', vary=True)
+    export_dataset(tmp_path / 'dataset', tmp_path / 'shards', splits=('train',), names=['a', 'b'])
+
+    cfg = get_cfg(overrides={'imgsz': 64, 'cache': False})
+    data = {'names': {0: 'a', 1: 'b'}, 'nc': 2}
+    # 验证模式开启 rect, im_files 会按宽高比重新排列; 图像必须仍与文件名对应
+    dataset = build_adapter_dataset(ShardDataset, cfg, str(tmp_path / 'shards' / 'train'), 2, data, mode='val')
+
+    assert dataset._encoded
+    for i, im_file in enumerate(dataset.im_files):
+        expected = cv2.imread(str(tmp_path / 'dataset' / 'images' / 'train' / Path(im_file).name))
+        assert np.array_equal(dataset.read_frame(i), expected)